@@ -0,0 +1,71 @@
+"""
+Location Filter Configuration for device telemetry ingest
+
+Controls which device location fixes are written. Stationary trackers send
+near-identical fixes every few seconds; these settings drop them before
+they reach the database. Suppressed fixes are counted (see
+/api/device/locations/filter-stats), not stored.
+
+A fix is suppressed when any of these hold:
+  - its HDOP is above LOCATION_FILTER_MAX_HDOP (poor geometry)
+  - it reports fewer than LOCATION_FILTER_MIN_SATELLITES satellites
+  - it arrives less than LOCATION_FILTER_MIN_INTERVAL_S after the device's
+    last kept fix (rate limit)
+  - it is within LOCATION_FILTER_MIN_DISTANCE_M of the last kept fix and
+    less than LOCATION_FILTER_HEARTBEAT_S after it (duplicate/jitter)
+
+Example configurations:
+  # Keep at most one fix per 10 s, and one per 5 min while stationary
+  LOCATION_FILTER_MIN_INTERVAL_S = 10
+  LOCATION_FILTER_HEARTBEAT_S = 300
+
+  # Write everything
+  LOCATION_FILTER_ENABLED = False
+"""
+
+import os
+
+# Master switch
+LOCATION_FILTER_ENABLED = os.getenv('LOCATION_FILTER_ENABLED', 'true').lower() in ('true', '1', 'yes')
+
+# Movement below this distance (meters) from the last kept fix counts as jitter
+LOCATION_FILTER_MIN_DISTANCE_M = float(os.getenv('LOCATION_FILTER_MIN_DISTANCE_M', '5'))
+
+# A stationary device still gets one fix written per heartbeat (seconds)
+LOCATION_FILTER_HEARTBEAT_S = float(os.getenv('LOCATION_FILTER_HEARTBEAT_S', '300'))
+
+# Minimum spacing (seconds) between kept fixes of one device; 0 = no rate limit
+LOCATION_FILTER_MIN_INTERVAL_S = float(os.getenv('LOCATION_FILTER_MIN_INTERVAL_S', '0'))
+
+# Fixes with a reported HDOP above this are dropped
+LOCATION_FILTER_MAX_HDOP = float(os.getenv('LOCATION_FILTER_MAX_HDOP', '5'))
+
+# Fixes reporting fewer satellites than this are dropped
+LOCATION_FILTER_MIN_SATELLITES = int(os.getenv('LOCATION_FILTER_MIN_SATELLITES', '4'))
+
+# Validation
+if LOCATION_FILTER_MIN_DISTANCE_M < 0:
+    raise ValueError(f"LOCATION_FILTER_MIN_DISTANCE_M must be >= 0, got {LOCATION_FILTER_MIN_DISTANCE_M}")
+
+if LOCATION_FILTER_HEARTBEAT_S < 0:
+    raise ValueError(f"LOCATION_FILTER_HEARTBEAT_S must be >= 0, got {LOCATION_FILTER_HEARTBEAT_S}")
+
+if LOCATION_FILTER_MIN_INTERVAL_S < 0:
+    raise ValueError(f"LOCATION_FILTER_MIN_INTERVAL_S must be >= 0, got {LOCATION_FILTER_MIN_INTERVAL_S}")
+
+if LOCATION_FILTER_MAX_HDOP <= 0:
+    raise ValueError(f"LOCATION_FILTER_MAX_HDOP must be > 0, got {LOCATION_FILTER_MAX_HDOP}")
+
+
+def get_config_summary():
+    """Return human-readable config summary."""
+    if not LOCATION_FILTER_ENABLED:
+        return "Location filter disabled - all fixes written"
+    parts = [
+        f"drop moves < {LOCATION_FILTER_MIN_DISTANCE_M:g} m within {LOCATION_FILTER_HEARTBEAT_S:g} s",
+        f"HDOP > {LOCATION_FILTER_MAX_HDOP:g}",
+        f"satellites < {LOCATION_FILTER_MIN_SATELLITES}",
+    ]
+    if LOCATION_FILTER_MIN_INTERVAL_S > 0:
+        parts.append(f"fixes < {LOCATION_FILTER_MIN_INTERVAL_S:g} s apart")
+    return "Location filter - " + ", ".join(parts)
@@ -0,0 +1,91 @@
+-- Migration: One token per physical NFC tag, scans in an append-only log
+-- Date: 2026-10-19
+-- Description: Stop token table bloat from repeated scans of the same tag.
+--   tokens.nfc_tag_uid becomes unique, scans go to token_scans, and
+--   token_scan_stats keeps per-token counters (count, first/last seen).
+
+BEGIN;
+
+-- ============================================
+-- SCAN LOG AND PER-TOKEN AGGREGATES
+-- ============================================
+CREATE TABLE IF NOT EXISTS token_scans (
+    id BIGSERIAL PRIMARY KEY,
+    token_id UUID NOT NULL REFERENCES tokens(token_id) ON DELETE CASCADE,
+    player TEXT,
+    device_id TEXT,
+    gps_lat DOUBLE PRECISION,
+    gps_lon DOUBLE PRECISION,
+    scanned_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_token_scans_token_time ON token_scans(token_id, scanned_at DESC);
+
+CREATE TABLE IF NOT EXISTS token_scan_stats (
+    token_id UUID PRIMARY KEY REFERENCES tokens(token_id) ON DELETE CASCADE,
+    scan_count BIGINT NOT NULL DEFAULT 0,
+    first_seen_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_seen_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_player TEXT,
+    last_device_id TEXT
+);
+
+-- ============================================
+-- TRACK TOKEN UPDATES (tag rewrites change the row in place)
+-- ============================================
+ALTER TABLE tokens ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE;
+UPDATE tokens SET updated_at = COALESCE(created_at, written_at) WHERE updated_at IS NULL;
+ALTER TABLE tokens ALTER COLUMN updated_at SET DEFAULT NOW();
+ALTER TABLE tokens ALTER COLUMN updated_at SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_tokens_updated_at ON tokens(updated_at);
+
+-- ============================================
+-- FOLD DUPLICATE TAG ROWS INTO THE OLDEST TOKEN
+-- ============================================
+CREATE TEMP TABLE token_duplicates ON COMMIT DROP AS
+SELECT t.token_id AS duplicate_id, k.token_id AS keep_id
+FROM tokens t
+JOIN (
+    SELECT DISTINCT ON (nfc_tag_uid) nfc_tag_uid, token_id
+    FROM tokens
+    WHERE nfc_tag_uid IS NOT NULL
+    ORDER BY nfc_tag_uid, created_at, token_id
+) k ON k.nfc_tag_uid = t.nfc_tag_uid AND k.token_id <> t.token_id;
+
+-- Every existing row (kept or duplicate) was one scan of its tag
+INSERT INTO token_scans (token_id, player, device_id, gps_lat, gps_lon, scanned_at)
+SELECT COALESCE(d.keep_id, t.token_id), t.written_by, t.device_id, t.gps_write_lat, t.gps_write_lon, t.written_at
+FROM tokens t
+LEFT JOIN token_duplicates d ON d.duplicate_id = t.token_id
+WHERE t.nfc_tag_uid IS NOT NULL;
+
+DELETE FROM tokens WHERE token_id IN (SELECT duplicate_id FROM token_duplicates);
+
+INSERT INTO token_scan_stats (token_id, scan_count, first_seen_at, last_seen_at, last_player, last_device_id)
+SELECT DISTINCT ON (token_id)
+    token_id,
+    COUNT(*) OVER (PARTITION BY token_id),
+    MIN(scanned_at) OVER (PARTITION BY token_id),
+    MAX(scanned_at) OVER (PARTITION BY token_id),
+    player,
+    device_id
+FROM token_scans
+ORDER BY token_id, scanned_at DESC
+ON CONFLICT (token_id) DO NOTHING;
+
+-- ============================================
+-- ONE TOKEN PER TAG
+-- ============================================
+DROP INDEX IF EXISTS idx_tokens_nfc_tag;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_tokens_nfc_tag_unique ON tokens(nfc_tag_uid) WHERE nfc_tag_uid IS NOT NULL;
+
+-- ============================================
+-- COMMENTS
+-- ============================================
+COMMENT ON TABLE token_scans IS 'Append-only log of NFC scans; one row per scan';
+COMMENT ON TABLE token_scan_stats IS 'Per-token scan aggregates maintained on every scan';
+COMMENT ON COLUMN tokens.updated_at IS 'Last time the token row changed (tag rewritten); used for incremental index refresh';
+COMMENT ON COLUMN tokens.nfc_tag_uid IS 'NFC tag UID; unique, so each physical tag maps to one token';
+
+COMMIT;
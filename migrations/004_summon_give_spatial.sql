@@ -0,0 +1,98 @@
+-- Migration: Spatial index on summon and give history
+-- Date: 2026-10-19
+-- Description: summons and give_operations only had bare gps_lat/gps_lon
+--   doubles, so "what happened near here" scanned the whole table. Add a
+--   geography column kept in sync by trigger (same scheme as tokens in
+--   001_add_postgis_and_tokens.sql), a GiST index, and backfill it.
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS postgis;
+
+-- give_operations is created lazily by summon_db.insert_give_operation();
+-- make sure it exists so the ALTERs below apply on a fresh database
+CREATE TABLE IF NOT EXISTS give_operations (
+    id SERIAL PRIMARY KEY,
+    player VARCHAR(64) NOT NULL,
+    item VARCHAR(64) NOT NULL,
+    amount INTEGER NOT NULL,
+    timestamp TIMESTAMP NOT NULL,
+    gps_lat DOUBLE PRECISION,
+    gps_lon DOUBLE PRECISION,
+    device_id VARCHAR(64),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ============================================
+-- GEOGRAPHY COLUMNS
+-- ============================================
+ALTER TABLE summons ADD COLUMN IF NOT EXISTS gps_location GEOGRAPHY(POINT, 4326);
+ALTER TABLE give_operations ADD COLUMN IF NOT EXISTS gps_location GEOGRAPHY(POINT, 4326);
+
+-- ============================================
+-- TRIGGER: Sync gps_lat/gps_lon to PostGIS geography
+-- ============================================
+CREATE OR REPLACE FUNCTION sync_gps_lat_lon_location()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.gps_lat IS NOT NULL AND NEW.gps_lon IS NOT NULL THEN
+        NEW.gps_location := ST_SetSRID(
+            ST_MakePoint(NEW.gps_lon, NEW.gps_lat),
+            4326
+        )::geography;
+    ELSE
+        NEW.gps_location := NULL;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_sync_summon_gps_location ON summons;
+CREATE TRIGGER trigger_sync_summon_gps_location
+BEFORE INSERT OR UPDATE OF gps_lat, gps_lon ON summons
+FOR EACH ROW
+EXECUTE FUNCTION sync_gps_lat_lon_location();
+
+DROP TRIGGER IF EXISTS trigger_sync_give_gps_location ON give_operations;
+CREATE TRIGGER trigger_sync_give_gps_location
+BEFORE INSERT OR UPDATE OF gps_lat, gps_lon ON give_operations
+FOR EACH ROW
+EXECUTE FUNCTION sync_gps_lat_lon_location();
+
+-- ============================================
+-- BACKFILL
+-- ============================================
+UPDATE summons
+SET gps_location = ST_SetSRID(ST_MakePoint(gps_lon, gps_lat), 4326)::geography
+WHERE gps_lat IS NOT NULL AND gps_lon IS NOT NULL AND gps_location IS NULL;
+
+UPDATE give_operations
+SET gps_location = ST_SetSRID(ST_MakePoint(gps_lon, gps_lat), 4326)::geography
+WHERE gps_lat IS NOT NULL AND gps_lon IS NOT NULL AND gps_location IS NULL;
+
+-- ============================================
+-- INDEXES
+-- ============================================
+CREATE INDEX IF NOT EXISTS idx_summons_gps_location ON summons USING GIST (gps_location);
+CREATE INDEX IF NOT EXISTS idx_give_operations_gps_location ON give_operations USING GIST (gps_location);
+CREATE INDEX IF NOT EXISTS idx_give_operations_timestamp ON give_operations(timestamp DESC);
+
+COMMENT ON COLUMN summons.gps_location IS 'PostGIS geography point for spatial queries (auto-synced from lat/lon)';
+COMMENT ON COLUMN give_operations.gps_location IS 'PostGIS geography point for spatial queries (auto-synced from lat/lon)';
+
+COMMIT;
+
+ANALYZE summons;
+ANALYZE give_operations;
+
+-- ============================================
+-- EXAMPLE QUERIES
+-- ============================================
+
+-- Summons within 500 m of a point, nearest first
+-- SELECT id, summoned_object_type, summoning_player, timestamp_utc,
+--   ST_Distance(gps_location, ST_SetSRID(ST_MakePoint(-105.3009, 40.7580), 4326)::geography) AS distance_m
+-- FROM summons
+-- WHERE ST_DWithin(gps_location, ST_SetSRID(ST_MakePoint(-105.3009, 40.7580), 4326)::geography, 500)
+-- ORDER BY distance_m
+-- LIMIT 50;
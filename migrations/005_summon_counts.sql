@@ -0,0 +1,68 @@
+-- Migration: Per-mob summon counters
+-- Date: 2026-10-19
+-- Description: The admin home page counted summons per mob by fetching
+--   every summons row. Keep one counter row per summoned_object_type,
+--   maintained by trigger on every insert/delete/retype, so the counts are
+--   a read of (number of mob types) rows regardless of summon history.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS summon_counts (
+    summoned_object_type TEXT PRIMARY KEY,
+    summon_count BIGINT NOT NULL DEFAULT 0,
+    last_summoned_at TIMESTAMP WITH TIME ZONE
+);
+
+-- ============================================
+-- TRIGGER: Keep summon_counts in step with summons
+-- ============================================
+CREATE OR REPLACE FUNCTION maintain_summon_counts()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE summon_counts
+        SET summon_count = summon_count - 1
+        WHERE summoned_object_type = OLD.summoned_object_type;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO summon_counts (summoned_object_type, summon_count, last_summoned_at)
+        VALUES (NEW.summoned_object_type, 1, NEW.timestamp_utc)
+        ON CONFLICT (summoned_object_type) DO UPDATE
+        SET summon_count = summon_counts.summon_count + 1,
+            last_summoned_at = GREATEST(summon_counts.last_summoned_at, EXCLUDED.last_summoned_at);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Counts are exact as soon as the migration commits: nothing can insert
+-- between the backfill and the trigger going live
+LOCK TABLE summons IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS trigger_maintain_summon_counts ON summons;
+CREATE TRIGGER trigger_maintain_summon_counts
+AFTER INSERT OR DELETE OR UPDATE OF summoned_object_type ON summons
+FOR EACH ROW
+EXECUTE FUNCTION maintain_summon_counts();
+
+-- ============================================
+-- BACKFILL (also repairs drifted counters when re-run)
+-- ============================================
+DELETE FROM summon_counts;
+
+INSERT INTO summon_counts (summoned_object_type, summon_count, last_summoned_at)
+SELECT summoned_object_type, COUNT(*), MAX(timestamp_utc)
+FROM summons
+GROUP BY summoned_object_type;
+
+COMMENT ON TABLE summon_counts IS 'Summons per summoned_object_type (maintained by trigger on summons)';
+
+COMMIT;
+
+-- ============================================
+-- EXAMPLE QUERIES
+-- ============================================
+
+-- Most summoned mobs
+-- SELECT summoned_object_type, summon_count FROM summon_counts
+-- WHERE summon_count > 0 ORDER BY summon_count DESC;
@@ -0,0 +1,47 @@
+-- Migration: Spatial index on device locations
+-- Date: 2026-10-19
+-- Description: Map tiles of device tracks (/tiles/tracks/{z}/{x}/{y}) read
+--   every fix inside a tile's box. device_locations only had bare
+--   gps_lat/gps_lon doubles, so each tile scanned the table. Add the same
+--   trigger-synced geography column and GiST index as summons
+--   (004_summon_give_spatial.sql, which defines sync_gps_lat_lon_location()).
+
+BEGIN;
+
+-- ============================================
+-- GEOGRAPHY COLUMN
+-- ============================================
+ALTER TABLE device_locations ADD COLUMN IF NOT EXISTS gps_location GEOGRAPHY(POINT, 4326);
+
+DROP TRIGGER IF EXISTS trigger_sync_device_location_gps_location ON device_locations;
+CREATE TRIGGER trigger_sync_device_location_gps_location
+BEFORE INSERT OR UPDATE OF gps_lat, gps_lon ON device_locations
+FOR EACH ROW
+EXECUTE FUNCTION sync_gps_lat_lon_location();
+
+-- ============================================
+-- BACKFILL
+-- ============================================
+UPDATE device_locations
+SET gps_location = ST_SetSRID(ST_MakePoint(gps_lon, gps_lat), 4326)::geography
+WHERE gps_location IS NULL;
+
+-- ============================================
+-- INDEXES
+-- ============================================
+CREATE INDEX IF NOT EXISTS idx_device_locations_gps_location ON device_locations USING GIST (gps_location);
+
+COMMENT ON COLUMN device_locations.gps_location IS 'PostGIS geography point for spatial queries (auto-synced from lat/lon)';
+
+COMMIT;
+
+ANALYZE device_locations;
+
+-- ============================================
+-- EXAMPLE QUERIES
+-- ============================================
+
+-- Fixes inside a lon/lat box, by device and time
+-- SELECT device_id, gps_lat, gps_lon, timestamp FROM device_locations
+-- WHERE gps_location && ST_MakeEnvelope(-105.31, 40.75, -105.29, 40.77, 4326)::geography
+-- ORDER BY device_id, timestamp;
@@ -0,0 +1,31 @@
+-- Migration: Indexes for paginated mob and player history
+-- Date: 2026-10-19
+-- Description: The mob detail and player log pages read summons with
+--   LOWER(summoned_object_type) = LOWER(...) / LOWER(summoning_player) =
+--   LOWER(...), newest id first, one page at a time (id < last id seen).
+--   The plain column indexes in schema-postgres.sql cannot serve a
+--   LOWER() match, so every page and count scanned the table. Index the
+--   expressions together with id so each page is a short index range scan.
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_summons_object_type_lower_id
+    ON summons (LOWER(summoned_object_type), id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_summons_summoning_player_lower_id
+    ON summons (LOWER(summoning_player), id DESC);
+
+COMMIT;
+
+ANALYZE summons;
+
+-- ============================================
+-- EXAMPLE QUERIES
+-- ============================================
+
+-- Second page of a mob's history (100 per page, last id on page one was 52811)
+-- SELECT id, summoning_player, summoned_player, timestamp_utc, gps_lat, gps_lon
+-- FROM summons
+-- WHERE LOWER(summoned_object_type) = LOWER('Piglin') AND id < 52811
+-- ORDER BY id DESC
+-- LIMIT 100;
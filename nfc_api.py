@@ -4,16 +4,36 @@
 from fastapi import FastAPI, HTTPException, Header, Request
 from fastapi.responses import JSONResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.wsgi import WSGIMiddleware
+from starlette.routing import Match, Mount
+from werkzeug.exceptions import MethodNotAllowed, NotFound
+from werkzeug.routing import RequestRedirect
+from typing import Optional
+import json
 import os
+import sys
+import summon_db
 from services.summon_service import handle_summon
 from services.player_service import get_players as get_players_service
 from services.nfc_service import handle_nfc_event as handle_nfc_event_service
+from services.nfc_service import handle_nfc_event_batch, NFC_EVENT_IDENTITY_FIELDS
 from services.chat_service import handle_chat
 from services.give_service import handle_give
 from services.say_service import handle_say
 from services.time_service import handle_time
-from services.device_location_service import handle_device_location
+from services.device_location_service import (
+    handle_device_location, handle_device_location_bulk, handle_device_location_binary
+)
 from services import token_service
+from services import geofence_service
+from services import device_position_service
+from services import history_service
+from services import device_channel_service
+from utils.response_format import negotiate_response
+from utils.idempotency import (
+    IdempotencyError, REPLAYED_HEADER, idempotency_cache, is_success, request_key
+)
 
 
 app = FastAPI(title="NFC → Minecraft API v3.6")
@@ -21,6 +41,28 @@ app = FastAPI(title="NFC → Minecraft API v3.6")
 # Include token service router (new in v3.6.1)
 app.include_router(token_service.router)
 
+# Geofence enter/exit events from device location ingest
+app.include_router(geofence_service.router)
+
+# Last known position per device, served from memory
+app.include_router(device_position_service.router)
+
+# Summon/give history near a point or inside a bounding box
+app.include_router(history_service.router)
+
+# One multiplexed WebSocket per device for scans, fixes and nearby queries
+app.include_router(device_channel_service.router)
+
+
+@app.on_event("startup")
+def load_device_positions():
+    device_position_service.load_device_positions()
+
+
+@app.on_event("shutdown")
+def close_db_pool():
+    summon_db.close_pool()
+
 # Serve resized mob images and web UI
 app.mount("/mob_images", StaticFiles(directory="web/mob_images"), name="mob_images")
 app.mount("/web", StaticFiles(directory="web"), name="web")
@@ -66,12 +108,28 @@ def require_api_key(x_api_key: str = Header(...)):
 
 import asyncio
 
+# Body fields that identify one attempt when no Idempotency-Key header is sent
+SUMMON_IDENTITY_FIELDS = ("token_id", "client_device_id", "timestamp")
+
+
+def idempotent_response(scope, idempotency_key, data, identity_fields, handler, accept):
+    """Run handler(data) once per idempotency key; retries get the stored response."""
+    try:
+        key = request_key(scope, idempotency_key, data, identity_fields)
+        resp, replayed = idempotency_cache.run(key, lambda: handler(data), is_success)
+    except IdempotencyError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    response = negotiate_response(resp, accept)
+    if replayed:
+        response.headers[REPLAYED_HEADER] = "true"
+    return response
+
 @app.post("/summon")
-async def summon_endpoint(request: Request, x_api_key: str = Header(...)):
+async def summon_endpoint(request: Request, x_api_key: str = Header(...), accept: Optional[str] = Header(None),
+                          idempotency_key: Optional[str] = Header(None)):
     require_api_key(x_api_key)
     data = await request.json()
-    resp = handle_summon(data)
-    return JSONResponse(content=resp)
+    return idempotent_response("summon", idempotency_key, data, SUMMON_IDENTITY_FIELDS, handle_summon, accept)
 
 @app.post("/api/summon/sync")
 async def sync_endpoint(request: Request, x_api_key: str = Header(...)):
@@ -100,6 +158,47 @@ async def device_location_endpoint(request: Request, x_api_key: str = Header(...
     return JSONResponse(content=resp)
 
 
+@app.post("/api/device/locations/bulk")
+async def device_locations_bulk_endpoint(request: Request, x_api_key: str = Header(...)):
+    """Bulk-ingest buffered fixes.
+
+    Accepts a JSON array, {"fixes": [...]}, or NDJSON (one fix per line) when sent
+    as application/x-ndjson or application/jsonl.
+    """
+    require_api_key(x_api_key)
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines"):
+        body = (await request.body()).decode("utf-8")
+        fixes = []
+        for line_no, line in enumerate(body.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                fixes.append(json.loads(line))
+            except ValueError:
+                return JSONResponse(
+                    content={"status": "error", "error": f"Invalid JSON on line {line_no}"},
+                    status_code=400,
+                )
+    else:
+        data = await request.json()
+        fixes = data.get("fixes") if isinstance(data, dict) else data
+    resp = handle_device_location_bulk(fixes)
+    if resp.get("status") == "error":
+        return JSONResponse(content=resp, status_code=400)
+    return JSONResponse(content=resp)
+
+
+@app.post("/api/device/locations/binary")
+async def device_locations_binary_endpoint(request: Request, x_api_key: str = Header(...)):
+    """Ingest delta-encoded binary fixes (services/location_codec.py)."""
+    require_api_key(x_api_key)
+    resp = handle_device_location_binary(await request.body())
+    if resp.get("status") == "error":
+        return JSONResponse(content=resp, status_code=400)
+    return JSONResponse(content=resp)
+
+
 @app.get("/summons")
 def summons_list_endpoint(x_api_key: str = Header(...)):
     require_api_key(x_api_key)
@@ -109,6 +208,18 @@ def summons_list_endpoint(x_api_key: str = Header(...)):
     return {"status": "ok", "summons": summons}
 
 
+@app.get("/summons/counts")
+def summon_counts_endpoint(x_api_key: str = Header(...)):
+    """Number of summons per mob type, most summoned first."""
+    require_api_key(x_api_key)
+    from summon_db import get_summon_counts
+
+    counts = get_summon_counts()
+    mobs = [{"mob_id": mob_id, "count": count}
+            for mob_id, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))]
+    return {"status": "ok", "total": sum(counts.values()), "discovered": len(counts), "mobs": mobs}
+
+
 @app.get("/mobs")
 def mobs_list(x_api_key: str = Header(...)):
     """Return list of mobs available in web/mob_images directory.
@@ -172,16 +283,73 @@ def players_endpoint(x_api_key: str = Header(...)):
 
 # NFC Token v1.1.1 versioned endpoint
 @app.post("/api/v1.1.1/nfc-event")
-async def nfc_event_v1_1_1_endpoint(request: Request, x_api_key: str = Header(...)):
+async def nfc_event_v1_1_1_endpoint(request: Request, x_api_key: str = Header(...), accept: Optional[str] = Header(None),
+                                    idempotency_key: Optional[str] = Header(None)):
     """NFC Token v1.1.1 format with GPS coordinates support."""
     require_api_key(x_api_key)
     data = await request.json()
-    return handle_nfc_event_service(data)
+    return idempotent_response("nfc-event", idempotency_key, data, NFC_EVENT_IDENTITY_FIELDS,
+                               handle_nfc_event_service, accept)
+
+@app.post("/api/v1.1.1/nfc-events/batch")
+async def nfc_events_batch_endpoint(request: Request, x_api_key: str = Header(...), accept: Optional[str] = Header(None)):
+    """Replay scans buffered while the scanner was offline.
+
+    Accepts a JSON array of v1.1.1 scans or {"scans": [...]}. Scans are recorded
+    in one transaction and their commands sent in order; results are per scan.
+    """
+    require_api_key(x_api_key)
+    data = await request.json()
+    # Blocks on the database and on command results (up to COMMAND_TIMEOUT_S)
+    resp = await run_in_threadpool(handle_nfc_event_batch, data)
+    return negotiate_response(resp, accept, status_code=200 if "results" in resp else 400)
 
 # Legacy endpoint (alias to v1.1.1)
 @app.post("/nfc-event")
-async def nfc_event_endpoint(request: Request, x_api_key: str = Header(...)):
+async def nfc_event_endpoint(request: Request, x_api_key: str = Header(...), accept: Optional[str] = Header(None),
+                             idempotency_key: Optional[str] = Header(None)):
     """Legacy NFC event endpoint (uses v1.1.1 format)."""
     require_api_key(x_api_key)
     data = await request.json()
-    return handle_nfc_event_service(data)
\ No newline at end of file
+    return idempotent_response("nfc-event", idempotency_key, data, NFC_EVENT_IDENTITY_FIELDS,
+                               handle_nfc_event_service, accept)
+
+
+# Admin UI (web/website.py) served by this app and process, so its pages
+# share the database pool and in-memory indexes and caches with the API.
+# Opt-in (ADMIN_UI_MOUNT=1): the pages have no login, and port 8000 is
+# plain HTTP while the standalone Flask server uses TLS.
+ADMIN_UI_MOUNT = os.getenv("ADMIN_UI_MOUNT", "0") == "1"
+
+
+class AdminUIMount(Mount):
+    """
+    Mount of the Flask admin app at "/" that only claims paths one of its
+    routes matches. Everything else stays with FastAPI, so wrong methods
+    and unknown paths on the API still get JSON 405/404 responses.
+    """
+
+    def __init__(self, flask_app):
+        super().__init__("/", app=WSGIMiddleware(flask_app), name="admin")
+        self._urls = flask_app.url_map.bind("localhost")
+
+    def matches(self, scope):
+        if scope["type"] == "http":
+            try:
+                self._urls.match(scope["path"], method=scope["method"])
+            except (MethodNotAllowed, RequestRedirect):
+                pass
+            except NotFound:
+                return Match.NONE, {}
+        return super().matches(scope)
+
+
+def mount_admin_ui(app):
+    """Serve web/website.py from app, after every API route."""
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "web"))
+    import website
+    app.router.routes.append(AdminUIMount(website.app))
+
+
+if ADMIN_UI_MOUNT:
+    mount_admin_ui(app)
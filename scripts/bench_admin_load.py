@@ -0,0 +1,106 @@
+"""
+Benchmark: concurrent admin viewers against a running server.
+
+Each viewer is a thread with its own keep-alive session that loops over
+what the admin pages load: the mob list, a mob page and its next history
+page, the tokens map, its summary poll, token and heatmap tiles. For each
+viewer count this reports throughput, latency percentiles and errors.
+
+Point it at the API with the admin UI mounted (ADMIN_UI_MOUNT=1 uvicorn
+nfc_api:app, port 8000) and at the standalone Flask server (python web/website.py, port
+8080, self-signed TLS: add --insecure) to compare the two. Needs a
+populated database behind the server.
+
+Usage:
+    python scripts/bench_admin_load.py [--url http://localhost:8000] [--viewers 1 10 50]
+        [--duration 20] [--mob piglin] [--insecure]
+"""
+
+import argparse
+import statistics
+import threading
+import time
+
+import requests
+import urllib3
+
+# Map tile shown by the viewers (zoom 15 around the default map center)
+TILE = (15, 6799, 12314)
+
+
+def viewer_paths(mob):
+    z, x, y = TILE
+    return [
+        "/",
+        f"/mob/{mob}",
+        f"/api/mob/{mob}/summons?limit=100",
+        "/tokens",
+        "/api/tokens/summary",
+        f"/tiles/tokens/{z}/{x}/{y}",
+        f"/tiles/summons/{z}/{x}/{y}",
+        f"/tiles/heatmap/summons/{z}/{x}/{y}.png",
+    ]
+
+
+def run(url, viewers, duration, paths, verify):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def viewer(offset):
+        session = requests.Session()
+        session.verify = verify
+        mine, failed = [], []
+        i = offset
+        while time.perf_counter() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                response = session.get(url + path, timeout=30)
+                response.content
+                if response.status_code >= 400:
+                    failed.append(f"{path}: HTTP {response.status_code}")
+            except requests.RequestException as e:
+                failed.append(f"{path}: {type(e).__name__}")
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+            errors.extend(failed)
+
+    threads = [threading.Thread(target=viewer, args=(n,)) for n in range(viewers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--viewers", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--duration", type=float, default=20, help="seconds per viewer count")
+    parser.add_argument("--mob", default="piglin")
+    parser.add_argument("--insecure", action="store_true", help="skip TLS verification (self-signed cert)")
+    args = parser.parse_args()
+    if args.insecure:
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    paths = viewer_paths(args.mob)
+    url = args.url.rstrip("/")
+    for viewers in args.viewers:
+        latencies, errors, elapsed = run(url, viewers, args.duration, paths, not args.insecure)
+        if len(latencies) < 2:
+            print(f"{viewers:3d} viewers: no completed requests")
+            continue
+        ms = statistics.quantiles([l * 1000 for l in latencies], n=100)
+        print(f"{viewers:3d} viewers: {len(latencies) / elapsed:7.1f} req/s  "
+              f"p50 {ms[49]:7.1f} ms  p95 {ms[94]:7.1f} ms  p99 {ms[98]:7.1f} ms  errors {len(errors)}")
+        for error in sorted(set(errors))[:5]:
+            print(f"    {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: clustered map payload and latency vs token count.
+
+Loads N synthetic tokens into TokenClusterIndex and times typical map
+viewport queries (1280x800 px) at several zooms, reporting the number of
+features returned - which should stay flat as N grows - and the JSON
+payload size. No database needed.
+
+Usage:
+    python scripts/bench_cluster_index.py [--tokens 10000 100000] [--spread-deg 0.5]
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from services.cluster_index import TokenClusterIndex
+
+CENTER = (40.758, -105.3009)
+VIEW_PX = (1280, 800)
+
+
+def viewport(zoom):
+    """bbox of a VIEW_PX map view centered on CENTER at zoom."""
+    deg_per_px = 360.0 / (256 * 2 ** zoom)
+    half_w = VIEW_PX[0] / 2 * deg_per_px
+    half_h = VIEW_PX[1] / 2 * deg_per_px * math.cos(math.radians(CENTER[0]))
+    return (CENTER[1] - half_w, CENTER[0] - half_h, CENTER[1] + half_w, CENTER[0] + half_h)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tokens", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--spread-deg", type=float, default=0.5, help="std dev of token positions")
+    args = parser.parse_args()
+
+    for count in args.tokens:
+        rng = random.Random(1)
+        rows = [{
+            "token_id": i,
+            "action_type": rng.choice(("summon_entity", "give_item", "set_time")),
+            "lat": CENTER[0] + rng.gauss(0, args.spread_deg),
+            "lon": CENTER[1] + rng.gauss(0, args.spread_deg),
+        } for i in range(count)]
+        index = TokenClusterIndex(refresh_interval_s=3600)
+        start = time.perf_counter()
+        index.load(rows)
+        load_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for row in rows[:1000]:
+            index.add({**row, "lat": row["lat"] + 0.001})
+        move_us = (time.perf_counter() - start) / 1000 * 1e6
+
+        print(f"{count} tokens: load {load_s:.2f} s, incremental move {move_us:.0f} us/token")
+        for zoom in (6, 10, 13, 16, 18):
+            bbox = viewport(zoom)
+            start = time.perf_counter()
+            features = index.query(bbox, zoom)
+            query_ms = (time.perf_counter() - start) * 1000
+            payload = len(json.dumps(features, default=str))
+            print(f"  zoom {zoom:2d}: {len(features):5d} features, {payload / 1024:7.1f} kB, {query_ms:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: HTTP requests vs the multiplexed device WebSocket.
+
+Sends the same mix of location fixes, scans and nearby queries through
+the HTTP endpoints and through /api/device/ws, and reports messages per
+second. Everything runs in one process on one core (Starlette TestClient,
+no network, no TLS), with the service handlers stubbed out, so the
+numbers are the per-message cost of the API layer itself. Real devices
+also save a TLS handshake or session resumption per HTTP request.
+
+Usage:
+    python scripts/bench_device_channel.py [--messages 3000] [--window 8]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fastapi.testclient import TestClient
+
+import nfc_api
+from services import device_channel_service, token_service
+
+API_KEY = "super-secret-test-key22"
+HEADERS = {"x-api-key": API_KEY}
+
+LOCATION = {"device_id": "esp32-001", "player": "WiryHealer4014", "gps_lat": 40.758, "gps_lon": -105.3009}
+SCAN = {"action": "give_diamond", "player": "WiryHealer4014", "device_id": "esp32-001"}
+NEARBY = {"lat": 40.758, "lon": -105.3009, "limit": 5}
+
+
+def stub_handlers():
+    ok = {"status": "ok"}
+    nearby = {"status": "ok", "count": 0, "tokens": []}
+    nfc_api.handle_device_location = lambda data: ok
+    nfc_api.handle_nfc_event_service = lambda data: ok
+    token_service.summon_db.get_nearby_tokens = lambda **kwargs: []
+    device_channel_service.MESSAGE_HANDLERS.update(
+        location=lambda data: ok,
+        nfc_event=lambda data: ok,
+        nearby=lambda data: nearby,
+    )
+
+
+def bench_http(client, count):
+    start = time.perf_counter()
+    for i in range(count):
+        kind = i % 3
+        if kind == 0:
+            client.post("/api/device/location", json=LOCATION, headers=HEADERS)
+        elif kind == 1:
+            client.post("/api/v1.1.1/nfc-event", json=SCAN, headers=HEADERS)
+        else:
+            client.get("/api/tokens/nearby", params=NEARBY, headers=HEADERS)
+    return time.perf_counter() - start
+
+
+def bench_ws(client, count, window):
+    kinds = (("location", LOCATION), ("nfc_event", SCAN), ("nearby", NEARBY))
+    start = time.perf_counter()
+    with client.websocket_connect("/api/device/ws?device_id=esp32-001", headers=HEADERS) as ws:
+        sent = received = 0
+        while received < count:
+            # Keep up to window requests in flight, as a device would
+            while sent < count and sent - received < window:
+                msg_type, data = kinds[sent % 3]
+                ws.send_json({"id": sent, "type": msg_type, "data": data})
+                sent += 1
+            ws.receive_json()
+            received += 1
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=3000)
+    parser.add_argument("--window", type=int, default=8, help="WebSocket requests in flight")
+    args = parser.parse_args()
+
+    stub_handlers()
+    client = TestClient(nfc_api.app)
+    bench_http(client, 30)
+    bench_ws(client, 30, args.window)
+
+    http_s = bench_http(client, args.messages)
+    ws_s = bench_ws(client, args.messages, args.window)
+    print(f"{args.messages} messages (location/scan/nearby mix), one core, handlers stubbed")
+    print(f"  HTTP requests : {args.messages / http_s:8.0f} msg/s  ({http_s * 1e6 / args.messages:6.0f} us/msg)")
+    print(f"  WebSocket     : {args.messages / ws_s:8.0f} msg/s  ({ws_s * 1e6 / args.messages:6.0f} us/msg)")
+    print(f"  speedup       : {http_s / ws_s:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: single-fix vs bulk device location ingest.
+
+Replays a buffered track through handle_device_location() one fix at a time
+(one INSERT + commit per fix) and through handle_device_location_bulk()
+(one validation pass + one COPY), and reports fixes/sec for each.
+Needs a reachable database; rows written under the bench-* device ids are
+deleted afterwards.
+
+Usage:
+    python scripts/bench_device_location_bulk.py [--fixes 1000]
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from summon_db import get_connection
+from services.device_location_service import handle_device_location, handle_device_location_bulk
+
+
+def make_track(device_id, count):
+    start = datetime(2026, 1, 5, 12, 0, tzinfo=timezone.utc)
+    return [
+        {
+            "device_id": device_id,
+            "player": "WiryHealer4014",
+            "gps_lat": 40.7580 + i * 0.00001,
+            "gps_lon": -105.3009 - i * 0.00001,
+            "gps_alt": 1655.3,
+            "gps_speed": 1.4,
+            "satellites": 8,
+            "hdop": 1.2,
+            "timestamp": (start + timedelta(seconds=i)).isoformat(),
+        }
+        for i in range(count)
+    ]
+
+
+def cleanup():
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("DELETE FROM device_locations WHERE device_id LIKE 'bench-%%'")
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fixes", type=int, default=1000)
+    args = parser.parse_args()
+
+    try:
+        single = make_track("bench-single", args.fixes)
+        start = time.perf_counter()
+        for fix in single:
+            resp = handle_device_location(fix)
+            assert resp["status"] == "ok", resp
+        single_s = time.perf_counter() - start
+
+        bulk = make_track("bench-bulk", args.fixes)
+        start = time.perf_counter()
+        resp = handle_device_location_bulk(bulk)
+        bulk_s = time.perf_counter() - start
+        assert resp["status"] == "ok" and resp["inserted"] == args.fixes, resp
+    finally:
+        cleanup()
+
+    print(f"{args.fixes} fixes")
+    print(f"  single-fix path: {single_s:8.3f} s  {args.fixes / single_s:10.0f} fixes/s")
+    print(f"  bulk COPY path:  {bulk_s:8.3f} s  {args.fixes / bulk_s:10.0f} fixes/s")
+    print(f"  speedup: {single_s / bulk_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
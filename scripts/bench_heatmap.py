@@ -0,0 +1,74 @@
+"""
+Benchmark: heatmap tile latency, cold vs cached vs after inserts.
+
+Loads N synthetic points into a HeatmapSource and serves the tiles of a
+1280x800 viewport at several zooms: from scratch (histogram + blur +
+PNG), from the LRU, and after a batch of new points has been binned into
+the cached grids (blur + PNG only). No database needed.
+
+Usage:
+    python scripts/bench_heatmap.py [--points 100000 1000000] [--inserts 100]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from services.cluster_index import tile_of
+from services.heatmap import HeatmapSource
+
+CENTER = (40.758, -105.3009)
+VIEW_TILES = (1280 // 256 + 1, 800 // 256 + 1)
+
+
+def view_tiles(zoom):
+    """Tiles of a viewport centered on CENTER."""
+    cx, cy = tile_of(CENTER[0], CENTER[1], zoom)
+    return [(zoom, x, y) for x in range(cx - VIEW_TILES[0] // 2, cx + (VIEW_TILES[0] + 1) // 2)
+            for y in range(cy - VIEW_TILES[1] // 2, cy + (VIEW_TILES[1] + 1) // 2)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--inserts", type=int, default=100, help="points added between renders")
+    parser.add_argument("--spread-deg", type=float, default=0.2, help="std dev of point positions")
+    args = parser.parse_args()
+
+    for count in args.points:
+        rng = random.Random(1)
+        rows = [(i + 1, CENTER[0] + rng.gauss(0, args.spread_deg), CENTER[1] + rng.gauss(0, args.spread_deg))
+                for i in range(count + args.inserts)]
+        visible = rows[:count]
+        source = HeatmapSource("bench", lambda after_id, limit: [r for r in visible if r[0] > after_id][:limit],
+                               refresh_interval_s=3600)
+        start = time.perf_counter()
+        source.refresh()
+        print(f"{count} points: load {time.perf_counter() - start:.2f} s")
+
+        for zoom in (8, 12, 15, 18):
+            tiles = view_tiles(zoom)
+            start = time.perf_counter()
+            for t in tiles:
+                source.tile(*t)
+            cold_ms = (time.perf_counter() - start) * 1000 / len(tiles)
+            start = time.perf_counter()
+            for t in tiles:
+                source.tile(*t)
+            warm_ms = (time.perf_counter() - start) * 1000 / len(tiles)
+
+            new = [(r[0] + zoom * 10**8, r[1], r[2]) for r in rows[count:]]
+            start = time.perf_counter()
+            source.add(new)
+            for t in tiles:
+                source.tile(*t)
+            insert_ms = (time.perf_counter() - start) * 1000 / len(tiles)
+            print(f"  zoom {zoom:2d}: {len(tiles)} tiles, per tile: cold {cold_ms:6.2f} ms, "
+                  f"cached {warm_ms:5.3f} ms, after {len(new)} inserts {insert_ms:5.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark: JSON fixes vs delta-encoded binary frames.
+
+Compares body size and server-side parse cost for one buffered tracker
+upload: JSON goes through json.loads() plus validate_device_locations()
+(what /api/device/locations/bulk does), binary through decode_frames()
+(what /api/device/locations/binary does). No database needed.
+
+Usage:
+    python scripts/bench_location_codec.py [--fixes 1000] [--iterations 50]
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from services.device_location_service import validate_device_locations
+from services.location_codec import decode_frames, encode_frame
+
+START_MS = 1767614400000
+
+
+def make_track(count):
+    rng = np.random.default_rng(1)
+    lat = 40.758 + np.cumsum(rng.normal(0, 2e-5, count))
+    lon = -105.3009 + np.cumsum(rng.normal(0, 2e-5, count))
+    return [
+        {
+            "epoch_ms": START_MS + i * 1000,
+            "gps_lat": round(float(lat[i]), 6),
+            "gps_lon": round(float(lon[i]), 6),
+            "gps_alt": round(1655.3 + i * 0.1, 1),
+        }
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fixes", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    track = make_track(args.fixes)
+    json_body = json.dumps([
+        {
+            "device_id": "esp32-nfc-scanner-001",
+            "player": "WiryHealer4014",
+            "gps_lat": f["gps_lat"],
+            "gps_lon": f["gps_lon"],
+            "gps_alt": f["gps_alt"],
+            "timestamp": datetime.fromtimestamp(f["epoch_ms"] / 1000, tz=timezone.utc).isoformat(),
+        }
+        for f in track
+    ]).encode("utf-8")
+    binary_body = encode_frame("esp32-nfc-scanner-001", track, player="WiryHealer4014")
+
+    json_s = timeit.timeit(lambda: validate_device_locations(json.loads(json_body)), number=args.iterations)
+    binary_s = timeit.timeit(lambda: decode_frames(binary_body), number=args.iterations)
+
+    print(f"{args.fixes} fixes")
+    print(f"  JSON:   {len(json_body):8d} B  {json_s / args.iterations * 1e3:8.3f} ms parse+validate")
+    print(f"  binary: {len(binary_body):8d} B  {binary_s / args.iterations * 1e3:8.3f} ms decode")
+    print(f"  size ratio {len(json_body) / len(binary_body):.1f}x, CPU ratio {json_s / binary_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark: tokens map data as GeoJSON tiles vs one full token list.
+
+Loads N synthetic tokens into a TokenClusterIndex and serves the 256 px
+tiles covering a 1280x800 viewport at several zooms through the tokens
+tile layer: first from an empty disk cache (rendered), then again
+(cached). The full list is what the map used to receive on every load.
+No database needed; tiles are cached in a temporary directory.
+
+Usage:
+    python scripts/bench_map_tiles.py [--tokens 10000 100000] [--spread-deg 0.5]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from services.cluster_index import TokenClusterIndex, tile_of
+from services.map_tiles import TokenTileLayer
+from utils.tile_cache import TileCache
+
+CENTER = (40.758, -105.3009)
+VIEW_TILES = (1280 // 256 + 1, 800 // 256 + 1)
+
+
+def view_tiles(zoom):
+    """Tiles of a viewport centered on CENTER."""
+    cx, cy = tile_of(CENTER[0], CENTER[1], zoom)
+    n = 1 << zoom
+    return [(zoom, x % n, y) for x in range(cx - VIEW_TILES[0] // 2, cx + (VIEW_TILES[0] + 1) // 2)
+            for y in range(max(cy - VIEW_TILES[1] // 2, 0), min(cy + (VIEW_TILES[1] + 1) // 2, n))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tokens", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--spread-deg", type=float, default=0.5, help="std dev of token positions")
+    args = parser.parse_args()
+
+    for count in args.tokens:
+        rng = random.Random(1)
+        rows = [{
+            "token_id": i,
+            "action_type": rng.choice(("summon_entity", "give_item", "set_time")),
+            "lat": CENTER[0] + rng.gauss(0, args.spread_deg),
+            "lon": CENTER[1] + rng.gauss(0, args.spread_deg),
+        } for i in range(count)]
+        full_kb = len(json.dumps(rows)) / 1024
+
+        with tempfile.TemporaryDirectory() as root:
+            index = TokenClusterIndex(refresh_interval_s=3600)
+            index._refreshed_at = 0
+            layer = TokenTileLayer(TileCache(root), index=index)
+            index.load(rows)
+
+            print(f"{count} tokens: full list {full_kb:.0f} kB")
+            for zoom in (6, 10, 13, 16, 18):
+                tiles = view_tiles(zoom)
+                start = time.perf_counter()
+                size = sum(len(layer.tile(*t)) for t in tiles)
+                cold_ms = (time.perf_counter() - start) * 1000
+                start = time.perf_counter()
+                for t in tiles:
+                    layer.tile(*t)
+                warm_ms = (time.perf_counter() - start) * 1000
+                print(f"  zoom {zoom:2d}: {len(tiles)} tiles, {size / 1024:6.1f} kB, "
+                      f"rendered {cold_ms:6.2f} ms, cached {warm_ms:5.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: JSON vs MessagePack response encoding.
+
+Compares payload size and server-side encode time for representative
+/api/tokens/nearby, /summon and /api/v1.1.1/nfc-event responses.
+JSON is encoded the way Starlette's JSONResponse does it.
+
+Usage:
+    python scripts/bench_response_format.py [--tokens 50] [--iterations 2000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.response_format import encode_msgpack
+
+
+def encode_json(payload):
+    """Same settings as starlette.responses.JSONResponse.render()."""
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def nearby_payload(count):
+    tokens = []
+    for i in range(count):
+        tokens.append({
+            "token_id": str(uuid.UUID(int=i + 1)),
+            "action_type": "summon_entity",
+            "position": {"lat": 40.7580 + i * 0.0001, "lon": -105.3009 - i * 0.0001},
+            "distance_m": round(12.3 * (i + 1), 1),
+            "bearing": round((i * 37.5) % 360, 1),
+            "written_by": "WiryHealer4014",
+            "written_at": "2026-01-05T12:00:00+00:00",
+            "entity": "piglin",
+            "mob_type": "neutral",
+            "name": "Piglin",
+            "rarity": "common",
+            "image_url": "/mob_images/piglin.png"
+        })
+    return {
+        "status": "ok",
+        "current_position": {"lat": 40.7580, "lon": -105.3009},
+        "search_radius_km": 5.0,
+        "count": len(tokens),
+        "tokens": tokens
+    }
+
+
+def summon_payload():
+    return {
+        "status": "ok",
+        "executed": "execute as @a[name=WiryHealer4014] at @s run summon piglin ~ ~5 ~4",
+        "operation_id": "api-op-1a2b3c4d",
+        "sent": True,
+        "token_id": str(uuid.uuid4()),
+        "token_written": True,
+        "gps": {"lat": 40.7580, "lon": -105.3009}
+    }
+
+
+def nfc_event_payload():
+    return {
+        "status": "ok",
+        "action_type": "summon_entity",
+        "executed": "execute as @a[name=WiryHealer4014] at @s run summon piglin ~ ~5 ~4",
+        "sent": True,
+        "entity": "piglin",
+        "token_id": str(uuid.uuid4()),
+        "gps": {"lat": 40.7580, "lon": -105.3009}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tokens", type=int, default=50, help="Tokens in the nearby payload")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    
+    payloads = {
+        f"nearby ({args.tokens} tokens)": nearby_payload(args.tokens),
+        "nearby (10 tokens)": nearby_payload(10),
+        "summon": summon_payload(),
+        "nfc-event": nfc_event_payload(),
+    }
+    
+    print(f"{'payload':<22} {'json B':>8} {'msgpack B':>10} {'size':>6} {'json us':>9} {'msgpack us':>11}")
+    for name, payload in payloads.items():
+        json_bytes = encode_json(payload)
+        msgpack_bytes = encode_msgpack(payload)
+        json_us = timeit.timeit(lambda: encode_json(payload), number=args.iterations) / args.iterations * 1e6
+        msgpack_us = timeit.timeit(lambda: encode_msgpack(payload), number=args.iterations) / args.iterations * 1e6
+        print(f"{name:<22} {len(json_bytes):>8} {len(msgpack_bytes):>10} "
+              f"{len(msgpack_bytes) / len(json_bytes):>5.0%} {json_us:>9.1f} {msgpack_us:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Benchmark: route planning time vs number of tokens.
+
+Plans routes through N random tokens around CENTER with plan_route() and
+reports the median and worst time per plan. No database needed.
+
+Usage:
+    python scripts/bench_route_planner.py [--tokens 10 50 100] [--runs 20]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from services.route_planner import plan_route
+
+CENTER = (40.77, -105.30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tokens", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--runs", type=int, default=20, help="plans timed per token count")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    plan_route(*CENTER, [CENTER])  # warm up NumPy
+    for count in args.tokens:
+        times = []
+        for _ in range(args.runs):
+            points = [(CENTER[0] - 0.02 + rng.random() * 0.05, CENTER[1] - 0.02 + rng.random() * 0.05)
+                      for _ in range(count)]
+            start = time.perf_counter()
+            order = plan_route(*CENTER, points)
+            times.append((time.perf_counter() - start) * 1000)
+            assert sorted(order) == list(range(count))
+        print(f"{count:4d} tokens: median {statistics.median(times):7.2f} ms  max {max(times):7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
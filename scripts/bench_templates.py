@@ -0,0 +1,76 @@
+"""
+Benchmark: admin page rendering, per-request compile vs cached templates.
+
+Each page used to go through render_template_string(), which compiles the
+inline template source on every call. The pages now render named
+templates that Jinja compiles once (website.app.jinja_loader), and the
+long history tables stream (website.stream_page). For every page this
+times the old call, the cached render, and for streamed pages the time to
+the first chunk. No database needed: the templates get synthetic rows.
+
+Usage:
+    python scripts/bench_templates.py [--rows 100 5000] [--repeat 50]
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'web')))
+from flask import render_template, render_template_string
+import website
+
+WHEN = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def pages(rows):
+    entries = [{
+        'action_type': 'summon', 'summoning_player': 'Steve', 'summoned_player': 'Alex',
+        'timestamp': WHEN, 'gps_lat': 40.7 + i * 1e-5, 'gps_lon': -105.3, 'mob_id': 'piglin',
+    } for i in range(rows)]
+    mobs = [{'mob_id': f'mob_{i}', 'mob_name': f'Mob {i}', 'count': i % 7} for i in range(300)]
+    return [
+        ('global_log.html', website.GLOBAL_LOG_TEMPLATE, False, dict(
+            mobs=mobs, total_count=1000, discovered_count=250, all_mobs_count=300, show_discovered_only=False)),
+        ('player_log.html', website.PLAYER_LOG_TEMPLATE, True, dict(
+            player_name='Steve', discoveries=entries)),
+        ('mob_detail.html', website.DETAIL_TEMPLATE, True, dict(
+            mob_id='piglin', mob_name='Piglin', total_count=rows, action_counts={'summon': rows},
+            all_entries=entries)),
+        ('tokens_map.html', website.TOKENS_MAP_TEMPLATE, False, dict(
+            total_tokens=10, summon_count=5, give_count=3, time_count=2, center_lat=40.7, center_lon=-105.3)),
+    ]
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 5000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    app = website.app
+    for rows in args.rows:
+        print(f"{rows} table rows (ms per page)")
+        for name, source, streamed, context in pages(rows):
+            with app.test_request_context():
+                assert render_template_string(source, **context) == render_template(name, **context)
+                before = timed(lambda: render_template_string(source, **context), args.repeat)
+                after = timed(lambda: render_template(name, **context), args.repeat)
+                line = f"  {name:16s} compile per request {before:8.2f}  cached {after:8.2f}  ({before / after:4.1f}x)"
+                if streamed:
+                    first = timed(lambda: next(iter(website.stream_page(name, **context).response)), args.repeat)
+                    line += f"  first chunk {first:6.2f}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark: tokens map page build, per-token catalog lookups vs one joined query.
+
+The tokens map used to call get_all_mobs()/get_all_items() once per token
+and scan the result; it now reads tokens with their catalog metadata
+joined in (summon_db.get_all_tokens_enriched) and maps them in one pass
+(website.build_token_data). No database needed: each fake query costs
+--query-ms of round trip plus a dict copy of every row it returns, which
+is roughly what psycopg2's RealDictCursor hands back.
+
+Usage:
+    python scripts/bench_tokens_map.py [--tokens 1000 10000] [--query-ms 0.3]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'web')))
+from website import build_token_data
+
+MOBS = [{"minecraft_id": f"mob_{i}", "name": f"Mob {i}", "rarity": "common", "mob_type": "neutral",
+         "image_url": f"/mob_images/mob_{i}.png"} for i in range(300)]
+ITEMS = [{"minecraft_id": f"item_{i}", "name": f"Item {i}", "rarity": "rare",
+          "image_url": f"/item_images/item_{i}.png"} for i in range(1000)]
+
+
+class FakeDb:
+    def __init__(self, query_ms):
+        self.query_s = query_ms / 1000.0
+        self.queries = 0
+
+    def _query(self, rows):
+        self.queries += 1
+        time.sleep(self.query_s)
+        return [dict(r) for r in rows]
+
+    def get_all_mobs(self):
+        return self._query(MOBS)
+
+    def get_all_items(self):
+        return self._query(ITEMS)
+
+
+def make_tokens(count):
+    rng = random.Random(1)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    tokens = []
+    for i in range(count):
+        summon = rng.random() < 0.6
+        tokens.append({
+            "token_id": f"00000000-0000-0000-0000-{i:012d}",
+            "action_type": "summon_entity" if summon else "give_item",
+            "entity": f"mob_{rng.randrange(320)}" if summon else None,
+            "item": None if summon else f"item_{rng.randrange(1050)}",
+            "gps_write_lat": 40.7 + rng.random() * 0.1,
+            "gps_write_lon": -105.3 + rng.random() * 0.1,
+            "written_by": "WiryHealer4014",
+            "written_at": start + timedelta(minutes=i),
+        })
+    return tokens
+
+
+def enrich(tokens):
+    """What the LEFT JOINs in get_all_tokens_enriched() return."""
+    mobs = {m["minecraft_id"]: m for m in MOBS}
+    items = {i["minecraft_id"]: i for i in ITEMS}
+    rows = []
+    for t in tokens:
+        m = mobs.get(t["entity"]) if t["action_type"] == "summon_entity" else None
+        i = items.get(t["item"]) if t["action_type"] == "give_item" else None
+        rows.append({
+            **t,
+            "mob_found": m is not None, "mob_name": m and m["name"], "mob_rarity": m and m["rarity"],
+            "mob_type": m and m["mob_type"], "mob_image": m and m["image_url"],
+            "item_found": i is not None, "item_name": i and i["name"], "item_rarity": i and i["rarity"],
+            "item_image": i and i["image_url"],
+        })
+    return rows
+
+
+def build_per_token(db, tokens):
+    """The previous tokens_map()/tokens_data() loop."""
+    token_data = []
+    for token in tokens:
+        token_info = {
+            'token_id': str(token['token_id']),
+            'action_type': token['action_type'],
+            'lat': float(token['gps_write_lat']),
+            'lon': float(token['gps_write_lon']),
+            'written_by': token.get('written_by'),
+            'written_at': token.get('written_at').isoformat() if token.get('written_at') else None,
+            'entity': token.get('entity'),
+            'item': token.get('item'),
+        }
+        if token['action_type'] == 'summon_entity' and token.get('entity'):
+            mobs = db.get_all_mobs()
+            mob = next((m for m in mobs if m.get('minecraft_id') == token['entity']), None)
+            if mob:
+                token_info['name'] = mob.get('name', token['entity'])
+                token_info['rarity'] = mob.get('rarity')
+                token_info['mob_type'] = mob.get('mob_type')
+                token_info['image_url'] = mob.get('image_url')
+        elif token['action_type'] == 'give_item' and token.get('item'):
+            items = db.get_all_items()
+            item = next((i for i in items if i.get('minecraft_id') == token['item']), None)
+            if item:
+                token_info['name'] = item.get('name', token['item'])
+                token_info['rarity'] = item.get('rarity')
+                token_info['image_url'] = item.get('image_url')
+        token_data.append(token_info)
+    return token_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tokens", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--query-ms", type=float, default=0.3, help="simulated round trip per query")
+    args = parser.parse_args()
+
+    for count in args.tokens:
+        tokens = make_tokens(count)
+        db = FakeDb(args.query_ms)
+
+        start = time.perf_counter()
+        before = build_per_token(db, tokens)
+        before_s = time.perf_counter() - start
+        before_queries = db.queries + 1
+
+        joined = FakeDb(args.query_ms)
+        start = time.perf_counter()
+        after = build_token_data(joined._query(enrich(tokens)))
+        after_s = time.perf_counter() - start
+
+        assert before == after
+        print(f"{count} tokens")
+        print(f"  per-token lookups : {before_s * 1000:9.1f} ms  ({before_queries} queries)")
+        print(f"  joined query      : {after_s * 1000:9.1f} ms  (1 query)")
+        print(f"  speedup           : {before_s / after_s:9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
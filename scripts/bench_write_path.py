@@ -0,0 +1,89 @@
+"""
+Benchmark: summon/give write path, separate inserts vs one CTE statement.
+
+Times the old composite writes (insert_summon + insert_token, and
+insert_give_operation + insert_token: two connections, two transactions)
+against insert_summon_with_token / insert_give_operation_with_token (one
+connection, one statement). Needs a reachable database; rows written by
+the bench-player are deleted afterwards.
+
+Connections come from summon_db's pool, so the separate inserts no longer
+pay for a second connection; DB_POOL_MAX=0 times them as they ran before
+the pool, with a new connection per call.
+
+Usage:
+    [DB_POOL_MAX=0] python scripts/bench_write_path.py [--iterations 200]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import summon_db
+
+PLAYER = "bench-player"
+TIMESTAMP = "2026-01-05T12:00:00Z"
+
+
+def summon_separate():
+    summon_db.insert_summon("10.0.0.19", 19132, "piglin", PLAYER, PLAYER, TIMESTAMP, 40.758, -105.3009)
+    summon_db.insert_token(action_type="summon_entity", entity="piglin", gps_lat=40.758, gps_lon=-105.3009,
+                           written_by=PLAYER, written_at=TIMESTAMP)
+
+
+def summon_cte():
+    summon_db.insert_summon_with_token("10.0.0.19", 19132, "piglin", PLAYER, PLAYER, TIMESTAMP,
+                                       40.758, -105.3009, entity="piglin")
+
+
+def give_separate():
+    summon_db.insert_give_operation(PLAYER, "diamond", 1, TIMESTAMP, 40.758, -105.3009)
+    summon_db.insert_token(action_type="give_item", item="diamond", gps_lat=40.758, gps_lon=-105.3009,
+                           written_by=PLAYER, written_at=TIMESTAMP)
+
+
+def give_cte():
+    summon_db.insert_give_operation_with_token(PLAYER, "diamond", 1, TIMESTAMP, 40.758, -105.3009)
+
+
+def measure(fn, iterations):
+    fn()  # warm-up
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e3)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def cleanup():
+    conn = summon_db.get_connection()
+    cur = conn.cursor()
+    cur.execute("DELETE FROM summons WHERE summoning_player = %s", (PLAYER,))
+    cur.execute("DELETE FROM give_operations WHERE player = %s", (PLAYER,))
+    cur.execute("DELETE FROM tokens WHERE written_by = %s", (PLAYER,))
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    try:
+        for name, fn in [("summon: separate inserts", summon_separate), ("summon: single CTE", summon_cte),
+                         ("give:   separate inserts", give_separate), ("give:   single CTE", give_cte)]:
+            p50, p95 = measure(fn, args.iterations)
+            print(f"{name:26s} p50 {p50:7.2f} ms  p95 {p95:7.2f} ms")
+    finally:
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
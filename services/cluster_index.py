@@ -0,0 +1,317 @@
+"""
+Cluster Index - hierarchical grid clustering of tokens for the admin map.
+
+Each zoom level z (0..CLUSTER_MAX_ZOOM) splits the Web Mercator square
+into cells of 1/CLUSTER_CELLS_PER_TILE of a map tile (64 px on 256 px
+tiles by default), so a viewport holds a bounded number of cells at any
+zoom. Every level keeps, per non-empty cell, the token count, the
+coordinate sums (for the centroid) and the count per action_type. A cell
+at level z covers exactly four cells of level z+1, so adding, moving or
+removing a token updates one cell per level - the index is maintained
+incrementally from the same watermark refresh as the token spatial index,
+never rebuilt per request.
+
+query() answers a bbox at a zoom with one feature per non-empty cell in
+view: a cluster, or the token itself when it is alone in its cell. Above
+CLUSTER_MAX_ZOOM tokens are returned individually. The payload is bounded
+by the viewport size in pixels, not by the number of tokens. tile()
+answers the same for one z/x/y map tile, whose cells it holds exactly.
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+import math
+import os
+
+from services.spatial_index import TokenSpatialIndex
+
+# Deepest zoom with clusters; beyond it every token is returned as a point
+CLUSTER_MAX_ZOOM = int(os.getenv('CLUSTER_MAX_ZOOM', '16'))
+
+# Cells per tile edge, as a power of two (2 -> 4x4 cells of 64 px per 256 px tile)
+CLUSTER_CELLS_PER_TILE_SHIFT = 2
+
+# Largest viewport edge (pixels) answered at the requested zoom; larger
+# boxes are clustered at a lower zoom so the payload stays bounded
+CLUSTER_MAX_VIEW_PX = int(os.getenv('CLUSTER_MAX_VIEW_PX', '4096'))
+
+# Map tile edge in pixels
+TILE_SIZE_PX = 256
+
+# Web Mercator latitude limit
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def mercator(lat: float, lon: float) -> Tuple[float, float]:
+    """Project to the unit Web Mercator square (x east, y south), clamped to [0, 1)."""
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat))
+    x = (lon + 180.0) / 360.0
+    phi = math.radians(lat)
+    y = (1.0 - math.log(math.tan(phi) + 1.0 / math.cos(phi)) / math.pi) / 2.0
+    return min(max(x, 0.0), math.nextafter(1.0, 0.0)), min(max(y, 0.0), math.nextafter(1.0, 0.0))
+
+
+def unmercator(x: float, y: float) -> Tuple[float, float]:
+    """Inverse of mercator(): (lat, lon)."""
+    lon = x * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1.0 - 2.0 * y))))
+    return lat, lon
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(min_lon, min_lat, max_lon, max_lat) of Web Mercator tile z/x/y."""
+    n = 1 << z
+    max_lat, min_lon = unmercator(x / n, y / n)
+    min_lat, max_lon = unmercator((x + 1) / n, (y + 1) / n)
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def tile_of(lat: float, lon: float, z: int) -> Tuple[int, int]:
+    """(x, y) of the zoom z tile containing a point."""
+    x, y = mercator(lat, lon)
+    return int(x * (1 << z)), int(y * (1 << z))
+
+
+class TokenClusterIndex(TokenSpatialIndex):
+    """
+    TokenSpatialIndex plus per-zoom cluster aggregates.
+
+    Loading and refreshing work exactly as in TokenSpatialIndex (the
+    aggregates follow add/remove), so it can replace it wherever radius
+    queries are needed too.
+    """
+
+    def __init__(self, max_zoom: int = CLUSTER_MAX_ZOOM, **kwargs):
+        self.max_zoom = max_zoom
+        self._shift = CLUSTER_CELLS_PER_TILE_SHIFT
+        # levels[z]: (cx, cy) -> [count, sum_x, sum_y, {action_type: count}]
+        self._levels: List[Dict[tuple, list]] = [{} for _ in range(max_zoom + 1)]
+        # Finest cells hold the tokens themselves: (cx, cy) -> {token_id: token}
+        self._leaves: Dict[tuple, dict] = {}
+        # Bumped on every change; clients use it to detect an unchanged map
+        self.version = 0
+        self._listeners: List[Callable[[Optional[dict]], None]] = []
+        self._loading = False
+        super().__init__(**kwargs)
+
+    def subscribe(self, listener: Callable[[Optional[dict]], None]):
+        """
+        Call listener(token) with the old and the new entry whenever a token
+        is added, moved or removed, and listener(None) after load(). Runs
+        under the index lock, after the change.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, token: Optional[dict]):
+        for listener in self._listeners:
+            listener(token)
+
+    def _leaf(self, token: dict) -> Tuple[int, int, float, float]:
+        x, y = mercator(token["lat"], token["lon"])
+        scale = 1 << (self.max_zoom + self._shift)
+        return int(x * scale), int(y * scale), x, y
+
+    def _link(self, token: dict):
+        cx, cy, x, y = self._leaf(token)
+        self._leaves.setdefault((cx, cy), {})[token["token_id"]] = token
+        action_type = token["action_type"]
+        for z in range(self.max_zoom, -1, -1):
+            shift = self.max_zoom - z
+            cell = self._levels[z].get((cx >> shift, cy >> shift))
+            if cell is None:
+                cell = self._levels[z][(cx >> shift, cy >> shift)] = [0, 0.0, 0.0, {}]
+            cell[0] += 1
+            cell[1] += x
+            cell[2] += y
+            cell[3][action_type] = cell[3].get(action_type, 0) + 1
+
+    def _unlink(self, token: dict):
+        cx, cy, x, y = self._leaf(token)
+        leaf = self._leaves.get((cx, cy))
+        if leaf is None or leaf.pop(token["token_id"], None) is None:
+            return
+        if not leaf:
+            del self._leaves[(cx, cy)]
+        action_type = token["action_type"]
+        for z in range(self.max_zoom, -1, -1):
+            shift = self.max_zoom - z
+            key = (cx >> shift, cy >> shift)
+            cell = self._levels[z][key]
+            cell[0] -= 1
+            if cell[0] == 0:
+                del self._levels[z][key]
+                continue
+            cell[1] -= x
+            cell[2] -= y
+            cell[3][action_type] -= 1
+            if not cell[3][action_type]:
+                del cell[3][action_type]
+
+    def add(self, row: dict):
+        token = self._normalize(row)
+        token_id = token["token_id"]
+        with self._lock:
+            old = self._tokens.get(token_id)
+            if old == token:
+                # Re-read by a refresh overlap; nothing changed
+                return
+            if old is not None:
+                self._unlink(old)
+            super().add(row)
+            self._link(self._tokens[token_id])
+            self.version += 1
+            if not self._loading:
+                if old is not None:
+                    self._notify(old)
+                self._notify(self._tokens[token_id])
+
+    def remove(self, token_id: str):
+        with self._lock:
+            old = self._tokens.get(str(token_id))
+            if old is not None:
+                self._unlink(old)
+                self.version += 1
+            super().remove(token_id)
+            if old is not None:
+                self._notify(old)
+
+    def load(self, rows: list):
+        with self._lock:
+            for level in self._levels:
+                level.clear()
+            self._leaves.clear()
+            self._loading = True
+            try:
+                super().load(rows)
+            finally:
+                self._loading = False
+            self.version += 1
+            self._notify(None)
+
+    def summary(self) -> dict:
+        """Token count, count per action_type and centroid (None when empty)."""
+        with self._lock:
+            # Level 0 has a few cells per edge; fold them
+            count, sx, sy, by_type = 0, 0.0, 0.0, {}
+            for cell in self._levels[0].values():
+                count += cell[0]
+                sx += cell[1]
+                sy += cell[2]
+                for action_type, n in cell[3].items():
+                    by_type[action_type] = by_type.get(action_type, 0) + n
+        center = None
+        if count:
+            lat, lon = unmercator(sx / count, sy / count)
+            center = {"lat": lat, "lon": lon}
+        return {"count": count, "by_action_type": by_type, "center": center}
+
+    def _single(self, z: int, cx: int, cy: int) -> dict:
+        """The only token in cell (cx, cy) of level z."""
+        for level in range(z + 1, self.max_zoom + 1):
+            cx, cy = next(
+                (2 * cx + dx, 2 * cy + dy)
+                for dx in (0, 1) for dy in (0, 1)
+                if (2 * cx + dx, 2 * cy + dy) in self._levels[level]
+            )
+        return next(iter(self._leaves[(cx, cy)].values()))
+
+    def _feature(self, z: int, cx: int, cy: int, cell: list) -> dict:
+        """Cluster feature for a cell of level z, or its token when alone."""
+        if cell[0] == 1:
+            return {"type": "point", **self._single(z, cx, cy)}
+        lat, lon = unmercator(cell[1] / cell[0], cell[2] / cell[0])
+        return {
+            "type": "cluster",
+            "lat": lat,
+            "lon": lon,
+            "count": cell[0],
+            "by_action_type": dict(cell[3]),
+            "expansion_zoom": min(z + 1, self.max_zoom + 1),
+        }
+
+    def _cells_in_view(self, cells: dict, scale: int, bbox: tuple):
+        min_lon, min_lat, max_lon, max_lat = bbox
+        x0, y1 = mercator(min_lat, min_lon)
+        x1, y0 = mercator(max_lat, max_lon)
+        ix0, ix1 = int(x0 * scale), int(x1 * scale)
+        iy0, iy1 = int(y0 * scale), int(y1 * scale)
+        if (ix1 - ix0 + 1) * (iy1 - iy0 + 1) <= len(cells):
+            for ix in range(ix0, ix1 + 1):
+                for iy in range(iy0, iy1 + 1):
+                    cell = cells.get((ix, iy))
+                    if cell is not None:
+                        yield (ix, iy), cell
+        else:
+            # Fewer occupied cells than cells in view: scan those instead
+            for key, cell in cells.items():
+                if ix0 <= key[0] <= ix1 and iy0 <= key[1] <= iy1:
+                    yield key, cell
+
+    @staticmethod
+    def fit_zoom(bbox: tuple, zoom: int) -> int:
+        """Highest zoom <= zoom at which bbox spans at most CLUSTER_MAX_VIEW_PX."""
+        min_lon, min_lat, max_lon, max_lat = bbox
+        x0, y1 = mercator(min_lat, min_lon)
+        x1, y0 = mercator(max_lat, max_lon)
+        span = max(x1 - x0, y1 - y0, 1e-12)
+        fit = math.floor(math.log2(CLUSTER_MAX_VIEW_PX / (TILE_SIZE_PX * span)))
+        return max(0, min(zoom, fit))
+
+    def query(self, bbox: tuple, zoom: int) -> List[dict]:
+        """
+        Clusters and single tokens inside bbox (min_lon, min_lat, max_lon,
+        max_lat) at map zoom level zoom.
+
+        Returns:
+            Dicts with type "cluster" (lat/lon centroid, count,
+            by_action_type, expansion_zoom) or "point" (the token)
+        """
+        min_lon, min_lat, max_lon, max_lat = bbox
+        zoom = self.fit_zoom(bbox, zoom)
+        features = []
+        with self._lock:
+            if zoom > self.max_zoom:
+                scale = 1 << (self.max_zoom + self._shift)
+                for _, leaf in self._cells_in_view(self._leaves, scale, bbox):
+                    for token in leaf.values():
+                        if min_lon <= token["lon"] <= max_lon and min_lat <= token["lat"] <= max_lat:
+                            features.append({"type": "point", **token})
+                return features
+
+            z = zoom
+            scale = 1 << (z + self._shift)
+            for (cx, cy), cell in self._cells_in_view(self._levels[z], scale, bbox):
+                features.append(self._feature(z, cx, cy, cell))
+        return features
+
+    def tile(self, z: int, x: int, y: int) -> List[dict]:
+        """
+        Clusters and single tokens of map tile z/x/y, as query() returns
+        them. Cells never straddle tiles, so every token lands in exactly
+        one tile per zoom.
+        """
+        features = []
+        with self._lock:
+            if z > self.max_zoom:
+                shift = z - (self.max_zoom + self._shift)
+                leaves = [(x >> shift, y >> shift)] if shift >= 0 else [
+                    ((x << -shift) + dx, (y << -shift) + dy)
+                    for dx in range(1 << -shift) for dy in range(1 << -shift)
+                ]
+                for key in leaves:
+                    for token in self._leaves.get(key, {}).values():
+                        if tile_of(token["lat"], token["lon"], z) == (x, y):
+                            features.append({"type": "point", **token})
+                return features
+
+            cells = self._levels[z]
+            side = 1 << self._shift
+            for cx in range(x * side, (x + 1) * side):
+                for cy in range(y * side, (y + 1) * side):
+                    cell = cells.get((cx, cy))
+                    if cell is not None:
+                        features.append(self._feature(z, cx, cy, cell))
+        return features
+
+
+# Shared cluster index for the admin tokens map
+token_clusters = TokenClusterIndex()
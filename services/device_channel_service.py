@@ -0,0 +1,210 @@
+"""
+Device Channel Service - one persistent WebSocket per ESP32 device.
+
+Replaces separate HTTPS requests to /api/v1.1.1/nfc-event,
+/api/device/location and /api/tokens/nearby with typed messages on a
+single connection to /api/device/ws. The API key is checked once, at
+connect; after that every message costs one frame instead of a request
+(and, over TLS, no new handshake).
+
+Requests are JSON text frames (or MessagePack binary frames):
+
+    {"id": 17, "type": "nfc_event", "data": {...}}   -> handle_nfc_event()
+    {"id": 18, "type": "location",  "data": {...}}   -> handle_device_location()
+    {"id": 19, "type": "nearby",    "data": {...}}   -> /api/tokens/nearby body
+
+and every request gets exactly one reply echoing its id, in the frame
+type it was sent in:
+
+    {"id": 17, "type": "nfc_event", "ok": true, "data": {...}}
+    {"id": 19, "type": "nearby", "ok": false, "error": "..."}
+
+"data" is the same body the HTTP endpoint takes and "ok"/"data" mirror
+what it returns. Messages are handled concurrently (up to
+CHANNEL_MAX_IN_FLIGHT per connection), so replies can arrive out of
+order; match them by id. A device_id given in the connect URL
+(?device_id=...) is filled into nfc_event and location data that lack one.
+
+nfc_event messages share the HTTP endpoint's idempotency cache, so a scan
+resent after a dropped connection is not run twice. The message's
+"idempotency_key" field plays the part of the Idempotency-Key header;
+without one, data carrying device_id and timestamp is keyed by its body.
+Replayed replies carry "replayed": true.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+import msgpack
+from fastapi import APIRouter, Header, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+
+from services.device_location_service import handle_device_location
+from services.nfc_service import NFC_EVENT_IDENTITY_FIELDS, handle_nfc_event
+from services.token_service import EXPECTED_API_KEY, parse_nearby_params, query_nearby
+from utils.idempotency import IdempotencyError, idempotency_cache, is_success, request_key
+from utils.response_format import encode_msgpack
+
+_logger = logging.getLogger("summon.device_channel_service")
+
+router = APIRouter()
+
+# Messages handled at once per connection; further frames wait to be read
+CHANNEL_MAX_IN_FLIGHT = int(os.getenv('CHANNEL_MAX_IN_FLIGHT', '8'))
+
+
+def _nfc_event(data: Dict[str, Any]) -> Dict[str, Any]:
+    return handle_nfc_event(data)
+
+
+def _location(data: Dict[str, Any]) -> Dict[str, Any]:
+    return handle_device_location(data)
+
+
+def _nearby(data: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        lat, lon, filters = parse_nearby_params(data)
+    except ValueError as e:
+        return {"status": "error", "error": str(e)}
+    try:
+        return query_nearby(lat, lon, filters)
+    except Exception as e:
+        return {"status": "error", "error": f"Database error: {str(e)}"}
+
+
+# message type -> synchronous handler returning an HTTP-style response body
+MESSAGE_HANDLERS = {
+    "nfc_event": _nfc_event,
+    "location": _location,
+    "nearby": _nearby,
+}
+
+# Message types whose data belongs to the connected device
+_DEVICE_SCOPED = ("nfc_event", "location")
+
+# message type -> (idempotency scope, identity fields), matching the HTTP endpoint
+_IDEMPOTENT = {
+    "nfc_event": ("nfc-event", NFC_EVENT_IDENTITY_FIELDS),
+}
+
+
+def decode_message(frame: Dict[str, Any]) -> tuple[Optional[Dict[str, Any]], bool]:
+    """
+    Parse a received ASGI websocket frame.
+
+    Returns:
+        (message, binary): message is None if the frame is not a JSON or
+        MessagePack object; binary tells which format to reply in
+
+    Raises:
+        WebSocketDisconnect: on a disconnect frame
+    """
+    if frame["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(frame.get("code", 1000))
+    binary = frame.get("bytes") is not None
+    try:
+        if binary:
+            message = msgpack.unpackb(frame["bytes"], raw=False)
+        else:
+            message = json.loads(frame.get("text") or "")
+    except (ValueError, msgpack.UnpackException):
+        return None, binary
+    return (message if isinstance(message, dict) else None), binary
+
+
+async def dispatch(message: Dict[str, Any], device_id: Optional[str] = None) -> Dict[str, Any]:
+    """Run one request message through its handler and build the reply."""
+    msg_id = message.get("id")
+    msg_type = message.get("type")
+    reply = {"id": msg_id, "type": msg_type}
+
+    handler = MESSAGE_HANDLERS.get(msg_type)
+    if handler is None:
+        reply.update(ok=False, error=f"Unknown message type: must be one of {', '.join(MESSAGE_HANDLERS)}")
+        return reply
+    data = message.get("data")
+    if not isinstance(data, dict):
+        reply.update(ok=False, error="Field 'data' must be an object")
+        return reply
+    if device_id and msg_type in _DEVICE_SCOPED and not data.get("device_id"):
+        data = {**data, "device_id": device_id}
+
+    try:
+        key = None
+        if msg_type in _IDEMPOTENT:
+            scope, identity_fields = _IDEMPOTENT[msg_type]
+            key = request_key(scope, message.get("idempotency_key"), data, identity_fields)
+        # Handlers block on the database and game console
+        result, replayed = await run_in_threadpool(
+            idempotency_cache.run, key, lambda: handler(data), is_success)
+    except IdempotencyError as e:
+        reply.update(ok=False, error=e.message)
+        return reply
+    except Exception as e:
+        _logger.error("Channel %s handler failed: %s", msg_type, str(e))
+        reply.update(ok=False, error=f"Internal error: {str(e)}")
+        return reply
+
+    if result.get("status") == "error":
+        reply.update(ok=False, error=result.get("error"), data=result)
+    else:
+        reply.update(ok=True, data=result)
+    if replayed:
+        reply["replayed"] = True
+    return reply
+
+
+@router.websocket("/api/device/ws")
+async def device_channel(
+    websocket: WebSocket,
+    x_api_key: str = Header(...),
+    device_id: Optional[str] = Query(None)
+):
+    """Multiplexed scan/location/nearby channel; see the module docstring."""
+    if x_api_key != EXPECTED_API_KEY:
+        await websocket.close(code=1008, reason="Unauthorized")
+        return
+
+    await websocket.accept()
+    _logger.info("Device channel opened: device_id=%s", device_id)
+    send_lock = asyncio.Lock()
+    slots = asyncio.Semaphore(CHANNEL_MAX_IN_FLIGHT)
+    tasks = set()
+
+    async def send(reply: Dict[str, Any], binary: bool):
+        async with send_lock:
+            if binary:
+                await websocket.send_bytes(encode_msgpack(reply))
+            else:
+                await websocket.send_text(json.dumps(reply, default=str))
+
+    async def serve(message: Dict[str, Any], binary: bool):
+        try:
+            await send(await dispatch(message, device_id), binary)
+        except Exception:
+            # Connection went away mid-reply; the receive loop notices
+            pass
+        finally:
+            slots.release()
+
+    try:
+        while True:
+            message, binary = decode_message(await websocket.receive())
+            if message is None:
+                await send({"id": None, "type": "error", "ok": False,
+                            "error": "Message must be a JSON or MessagePack object"}, binary)
+                continue
+            await slots.acquire()
+            task = asyncio.create_task(serve(message, binary))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Let handlers already running finish (a scan may be mid-write)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        _logger.info("Device channel closed: device_id=%s", device_id)
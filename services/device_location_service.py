@@ -1,7 +1,18 @@
 import logging
+import os
+from collections import Counter
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Any
-from summon_db import insert_device_location
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from summon_db import insert_device_location, copy_device_locations
+from services.geofence_service import geofence_engine
+from services.device_position_service import device_positions
+from services.track_simplify import track_cache
+from services.location_codec import decode_frames
+from services.location_filter import location_filter, SUPPRESS_DUPLICATE
 
 # Set up logging
 _LOG_PATH = Path(__file__).resolve().parents[1] / "logs" / "device_location.log"
@@ -15,12 +26,21 @@ if not _logger.handlers:
     _logger.addHandler(fh)
     _logger.setLevel(logging.INFO)
 
+# Upper bound on fixes accepted by one bulk request
+MAX_BULK_FIXES = int(os.getenv('MAX_BULK_FIXES', '5000'))
 
-def handle_device_location(data: Dict[str, Any]) -> Dict[str, Any]:
+# Fix times accepted from binary uploads (epoch ms, 1970-01-01 to 2100-01-01);
+# one out-of-range time would otherwise fail the whole COPY
+MIN_FIX_EPOCH_MS = 0
+MAX_FIX_EPOCH_MS = 4102444800000
+
+
+def validate_device_location(data: Any) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
     """
-    Handle device location tracking for ESP32 NFC scanners.
+    Validate one device location fix.
     
-    Validates and stores GPS position data for display on admin panel map.
+    Returns:
+        (fix, None) with normalized fields on success, or (None, error message)
     
     Required fields:
     - device_id: string (max 64 chars)
@@ -35,55 +55,53 @@ def handle_device_location(data: Dict[str, Any]) -> Dict[str, Any]:
     - satellites: integer (number of satellites)
     - hdop: number (horizontal dilution of precision)
     """
-    _logger.info("Received device location request: %s", repr(data))
-    
     # Validate data is a dict
     if not isinstance(data, dict):
         _logger.error("Request body is not a JSON object")
-        return {"status": "error", "error": "Request body must be a JSON object"}
+        return None, "Request body must be a JSON object"
     
     # Validate required fields: device_id
     if "device_id" not in data or not isinstance(data["device_id"], str) or not data["device_id"].strip():
         _logger.error("Missing or invalid device_id")
-        return {"status": "error", "error": "device_id is required"}
+        return None, "device_id is required"
     
     device_id = data["device_id"].strip()
     if len(device_id) > 64:
         _logger.error("device_id exceeds max length: %d", len(device_id))
-        return {"status": "error", "error": "device_id must not exceed 64 characters"}
+        return None, "device_id must not exceed 64 characters"
     
     # Validate required fields: gps_lat
     if "gps_lat" not in data:
         _logger.error("Missing gps_lat")
-        return {"status": "error", "error": "gps_lat is required"}
+        return None, "gps_lat is required"
     
     try:
         gps_lat = float(data["gps_lat"])
         if gps_lat < -90 or gps_lat > 90:
             _logger.error("Invalid gps_lat: %f (must be between -90 and 90)", gps_lat)
-            return {"status": "error", "error": "gps_lat must be between -90 and 90"}
+            return None, "gps_lat must be between -90 and 90"
     except (ValueError, TypeError):
         _logger.error("gps_lat is not a valid number: %s", data.get("gps_lat"))
-        return {"status": "error", "error": "gps_lat must be a number"}
+        return None, "gps_lat must be a number"
     
     # Validate required fields: gps_lon
     if "gps_lon" not in data:
         _logger.error("Missing gps_lon")
-        return {"status": "error", "error": "gps_lon is required"}
+        return None, "gps_lon is required"
     
     try:
         gps_lon = float(data["gps_lon"])
         if gps_lon < -180 or gps_lon > 180:
             _logger.error("Invalid gps_lon: %f (must be between -180 and 180)", gps_lon)
-            return {"status": "error", "error": "gps_lon must be between -180 and 180"}
+            return None, "gps_lon must be between -180 and 180"
     except (ValueError, TypeError):
         _logger.error("gps_lon is not a valid number: %s", data.get("gps_lon"))
-        return {"status": "error", "error": "gps_lon must be a number"}
+        return None, "gps_lon must be a number"
     
     # Validate required fields: timestamp
     if "timestamp" not in data or not isinstance(data["timestamp"], str) or not data["timestamp"].strip():
         _logger.error("Missing or invalid timestamp")
-        return {"status": "error", "error": "timestamp is required"}
+        return None, "timestamp is required"
     
     timestamp = data["timestamp"].strip()
     
@@ -92,11 +110,11 @@ def handle_device_location(data: Dict[str, Any]) -> Dict[str, Any]:
     if "player" in data and data["player"]:
         if not isinstance(data["player"], str):
             _logger.error("Invalid player type")
-            return {"status": "error", "error": "player must be a string"}
+            return None, "player must be a string"
         player = data["player"].strip()
         if len(player) > 64:
             _logger.error("player exceeds max length: %d", len(player))
-            return {"status": "error", "error": "player must not exceed 64 characters"}
+            return None, "player must not exceed 64 characters"
     
     # Validate optional field: gps_alt
     gps_alt = None
@@ -105,7 +123,7 @@ def handle_device_location(data: Dict[str, Any]) -> Dict[str, Any]:
             gps_alt = float(data["gps_alt"])
         except (ValueError, TypeError):
             _logger.error("gps_alt is not a valid number: %s", data.get("gps_alt"))
-            return {"status": "error", "error": "gps_alt must be a number"}
+            return None, "gps_alt must be a number"
     
     # Validate optional field: gps_speed
     gps_speed = None
@@ -114,7 +132,7 @@ def handle_device_location(data: Dict[str, Any]) -> Dict[str, Any]:
             gps_speed = float(data["gps_speed"])
         except (ValueError, TypeError):
             _logger.error("gps_speed is not a valid number: %s", data.get("gps_speed"))
-            return {"status": "error", "error": "gps_speed must be a number"}
+            return None, "gps_speed must be a number"
     
     # Validate optional field: satellites
     satellites = None
@@ -123,7 +141,7 @@ def handle_device_location(data: Dict[str, Any]) -> Dict[str, Any]:
             satellites = int(data["satellites"])
         except (ValueError, TypeError):
             _logger.error("satellites is not a valid integer: %s", data.get("satellites"))
-            return {"status": "error", "error": "satellites must be an integer"}
+            return None, "satellites must be an integer"
     
     # Validate optional field: hdop
     hdop = None
@@ -132,23 +150,385 @@ def handle_device_location(data: Dict[str, Any]) -> Dict[str, Any]:
             hdop = float(data["hdop"])
         except (ValueError, TypeError):
             _logger.error("hdop is not a valid number: %s", data.get("hdop"))
-            return {"status": "error", "error": "hdop must be a number"}
+            return None, "hdop must be a number"
+    
+    return {
+        "device_id": device_id,
+        "gps_lat": gps_lat,
+        "gps_lon": gps_lon,
+        "timestamp": timestamp,
+        "player": player,
+        "gps_alt": gps_alt,
+        "gps_speed": gps_speed,
+        "satellites": satellites,
+        "hdop": hdop
+    }, None
+
+
+def handle_device_location(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Handle device location tracking for ESP32 NFC scanners.
+    
+    Validates and stores GPS position data for display on admin panel map.
+    See validate_device_location() for the accepted fields.
+    """
+    _logger.info("Received device location request: %s", repr(data))
+    
+    fix, error = validate_device_location(data)
+    if error:
+        return {"status": "error", "error": error}
+    
+    # Drop jitter, duplicates and low-quality fixes (location_filter_config.py)
+    suppressed = location_filter.check(fix)
+    if suppressed:
+        _logger.info("Device location suppressed (%s): device_id=%s", suppressed, fix["device_id"])
+        if suppressed == SUPPRESS_DUPLICATE:
+            # Same place, newer time: keeps last-seen fresh without a write
+            device_positions.update(fix)
+        return {"status": "ok", "message": "Device location suppressed", "suppressed": suppressed}
     
     # Store in database
     try:
-        insert_device_location(
-            device_id=device_id,
-            gps_lat=gps_lat,
-            gps_lon=gps_lon,
-            timestamp=timestamp,
-            player=player,
-            gps_alt=gps_alt,
-            gps_speed=gps_speed,
-            satellites=satellites,
-            hdop=hdop
-        )
-        _logger.info("Device location logged: device_id=%s, lat=%f, lon=%f", device_id, gps_lat, gps_lon)
-        return {"status": "ok", "message": "Device location logged"}
+        insert_device_location(**fix)
+        _logger.info("Device location logged: device_id=%s, lat=%f, lon=%f", fix["device_id"], fix["gps_lat"], fix["gps_lon"])
     except Exception as e:
         _logger.error("Failed to insert device location: %s", str(e))
+        location_filter.forget(fix["device_id"])
         return {"status": "error", "error": f"Failed to log device location: {str(e)}"}
+    
+    device_positions.update(fix)
+    track_cache.invalidate(fix["device_id"])
+    response = {"status": "ok", "message": "Device location logged"}
+    
+    # Proximity triggers: the fix is already stored, so a geofence failure must not fail the request
+    try:
+        events = geofence_engine.process_fix(
+            fix["device_id"], fix["gps_lat"], fix["gps_lon"], player=fix["player"], timestamp=fix["timestamp"]
+        )
+        if events:
+            response["geofence_events"] = events
+    except Exception as e:
+        _logger.error("Geofence processing failed: %s", str(e))
+    
+    return response
+
+
+def _numeric_column(fixes: List[Any], field: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Extract one numeric field from a batch of fixes.
+    
+    Returns (values, present, invalid) arrays. Missing or null values are NaN and
+    not present; values that do not parse as finite numbers are flagged invalid.
+    """
+    raw = [fix.get(field) if isinstance(fix, dict) else None for fix in fixes]
+    present = np.array([value is not None for value in raw], dtype=bool)
+    try:
+        values = np.array(raw, dtype=np.float64)
+    except (ValueError, TypeError):
+        values = None
+    if values is None or values.ndim != 1:
+        # At least one bad value (lists of equal length convert to a 2-D
+        # array): fall back to converting element by element
+        values = np.full(len(raw), np.nan)
+        for i, value in enumerate(raw):
+            if value is None:
+                continue
+            try:
+                values[i] = float(value)
+            except (ValueError, TypeError):
+                pass
+    invalid = present & ~np.isfinite(values)
+    return values, present, invalid
+
+
+def _strip_str(value: Any) -> Optional[str]:
+    return value.strip() if isinstance(value, str) else None
+
+
+def validate_device_locations(fixes: List[Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Validate a batch of device location fixes.
+    
+    Applies the same rules as validate_device_location(), plus the checks the
+    database would otherwise enforce mid-COPY (parseable timestamp, finite
+    numbers, non-negative satellites/hdop), so a single bad row cannot abort
+    the whole load. String and timestamp fields are checked in one pass over
+    the rows; numeric fields are converted and range-checked as NumPy columns.
+    Each fix reports the first rule it breaks, in the order of
+    validate_device_location().
+    
+    Returns:
+        (valid fixes with their batch index, errors as {"index", "device_id", "error"})
+    """
+    n = len(fixes)
+    messages: List[Optional[str]] = [None] * n
+    
+    def reject(mask, message: str):
+        for i in np.flatnonzero(mask):
+            if messages[i] is None:
+                messages[i] = message
+    
+    # Per-row fields that need Python objects (strings, dict keys, datetimes)
+    not_dict = np.zeros(n, dtype=bool)
+    no_lat_key = np.zeros(n, dtype=bool)
+    no_lon_key = np.zeros(n, dtype=bool)
+    bad_player = np.zeros(n, dtype=bool)
+    has_timestamp = np.zeros(n, dtype=bool)
+    bad_timestamp = np.zeros(n, dtype=bool)
+    device_id_len = np.zeros(n, dtype=np.int64)
+    player_len = np.zeros(n, dtype=np.int64)
+    device_ids: List[Optional[str]] = [None] * n
+    timestamps: List[Optional[str]] = [None] * n
+    parsed_times: List[Optional[datetime]] = [None] * n
+    players: List[Optional[str]] = [None] * n
+    for i, fix in enumerate(fixes):
+        if not isinstance(fix, dict):
+            not_dict[i] = no_lat_key[i] = no_lon_key[i] = True
+            continue
+        no_lat_key[i] = "gps_lat" not in fix
+        no_lon_key[i] = "gps_lon" not in fix
+        device_ids[i] = _strip_str(fix.get("device_id"))
+        device_id_len[i] = len(device_ids[i] or "")
+        timestamps[i] = _strip_str(fix.get("timestamp"))
+        if timestamps[i]:
+            has_timestamp[i] = True
+            try:
+                parsed_times[i] = datetime.fromisoformat(timestamps[i].replace("Z", "+00:00"))
+            except ValueError:
+                bad_timestamp[i] = True
+        value = fix.get("player")
+        if isinstance(value, str):
+            players[i] = value.strip()
+            player_len[i] = len(players[i])
+        elif value:
+            bad_player[i] = True
+    
+    reject(not_dict, "Fix must be a JSON object")
+    reject(device_id_len == 0, "device_id is required")
+    reject(device_id_len > 64, "device_id must not exceed 64 characters")
+    
+    lat, lat_present, lat_invalid = _numeric_column(fixes, "gps_lat")
+    reject(no_lat_key, "gps_lat is required")
+    reject(lat_invalid | ~lat_present, "gps_lat must be a number")
+    with np.errstate(invalid="ignore"):
+        reject((lat < -90) | (lat > 90), "gps_lat must be between -90 and 90")
+    
+    lon, lon_present, lon_invalid = _numeric_column(fixes, "gps_lon")
+    reject(no_lon_key, "gps_lon is required")
+    reject(lon_invalid | ~lon_present, "gps_lon must be a number")
+    with np.errstate(invalid="ignore"):
+        reject((lon < -180) | (lon > 180), "gps_lon must be between -180 and 180")
+    
+    reject(~has_timestamp, "timestamp is required")
+    reject(bad_timestamp, "timestamp must be an ISO 8601 date/time")
+    
+    reject(bad_player, "player must be a string")
+    reject(player_len > 64, "player must not exceed 64 characters")
+    
+    alt, alt_present, alt_invalid = _numeric_column(fixes, "gps_alt")
+    reject(alt_invalid, "gps_alt must be a number")
+    speed, speed_present, speed_invalid = _numeric_column(fixes, "gps_speed")
+    reject(speed_invalid, "gps_speed must be a number")
+    sats, sats_present, sats_invalid = _numeric_column(fixes, "satellites")
+    reject(sats_invalid, "satellites must be an integer")
+    hdop, hdop_present, hdop_invalid = _numeric_column(fixes, "hdop")
+    reject(hdop_invalid, "hdop must be a number")
+    with np.errstate(invalid="ignore"):
+        reject(sats < 0, "satellites must not be negative")
+        reject(hdop < 0, "hdop must not be negative")
+    sats = np.trunc(sats)
+    
+    valid: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+    for i in range(n):
+        if messages[i] is not None:
+            errors.append({"index": i, "device_id": device_ids[i], "error": messages[i]})
+            continue
+        valid.append({
+            "index": i,
+            "device_id": device_ids[i],
+            "gps_lat": float(lat[i]),
+            "gps_lon": float(lon[i]),
+            "timestamp": timestamps[i],
+            "player": players[i] or None,
+            "gps_alt": float(alt[i]) if alt_present[i] else None,
+            "gps_speed": float(speed[i]) if speed_present[i] else None,
+            "satellites": int(sats[i]) if sats_present[i] else None,
+            "hdop": float(hdop[i]) if hdop_present[i] else None,
+            "_epoch": _epoch(parsed_times[i]),
+        })
+    return valid, errors
+
+
+def handle_device_location_bulk(fixes: Any) -> Dict[str, Any]:
+    """
+    Handle a batch of buffered device location fixes.
+    
+    Invalid fixes are reported per row and skipped; valid ones go through the
+    jitter filter and are loaded with a single COPY (see _store_fixes()).
+    """
+    if not isinstance(fixes, list):
+        return {"status": "error", "error": "Request body must be a JSON array of fixes"}
+    if not fixes:
+        return {"status": "error", "error": "At least one fix is required"}
+    if len(fixes) > MAX_BULK_FIXES:
+        return {"status": "error", "error": f"At most {MAX_BULK_FIXES} fixes per request"}
+    
+    _logger.info("Received bulk device location request: %d fixes", len(fixes))
+    valid, errors = validate_device_locations(fixes)
+    return _store_fixes(valid, errors, len(fixes))
+
+
+def handle_device_location_binary(data: bytes) -> Dict[str, Any]:
+    """
+    Handle a delta-encoded binary upload (see services/location_codec.py).
+    
+    Frames are decoded into column arrays and range-checked with NumPy, then
+    go through the same COPY path as handle_device_location_bulk(). Record
+    indexes in errors count across all frames in the body.
+    """
+    try:
+        frames = decode_frames(data)
+    except ValueError as e:
+        _logger.error("Malformed binary location upload: %s", str(e))
+        return {"status": "error", "error": f"Malformed location data: {str(e)}"}
+    
+    total = sum(len(frame["epoch_ms"]) for frame in frames)
+    if not total:
+        return {"status": "error", "error": "At least one fix is required"}
+    if total > MAX_BULK_FIXES:
+        return {"status": "error", "error": f"At most {MAX_BULK_FIXES} fixes per request"}
+    _logger.info("Received binary device location request: %d frames, %d fixes", len(frames), total)
+    
+    valid: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+    base = 0
+    for frame in frames:
+        device_id = frame["device_id"].strip()
+        player = (frame["player"] or "").strip() or None
+        lat, lon, alt = frame["gps_lat"], frame["gps_lon"], frame["gps_alt"]
+        count = len(lat)
+        
+        messages: List[Optional[str]] = [None] * count
+        
+        def reject(mask, message: str):
+            for i in np.flatnonzero(mask):
+                if messages[i] is None:
+                    messages[i] = message
+        
+        if not device_id:
+            reject(np.ones(count, dtype=bool), "device_id is required")
+        elif len(device_id) > 64:
+            reject(np.ones(count, dtype=bool), "device_id must not exceed 64 characters")
+        if player is not None and len(player) > 64:
+            reject(np.ones(count, dtype=bool), "player must not exceed 64 characters")
+        reject((lat < -90) | (lat > 90), "gps_lat must be between -90 and 90")
+        reject((lon < -180) | (lon > 180), "gps_lon must be between -180 and 180")
+        reject((frame["epoch_ms"] < MIN_FIX_EPOCH_MS) | (frame["epoch_ms"] >= MAX_FIX_EPOCH_MS),
+               "epoch_ms must be between 1970-01-01 and 2100-01-01")
+        
+        epoch = frame["epoch_ms"] / 1000.0
+        timestamps = np.datetime_as_string(frame["epoch_ms"].astype("datetime64[ms]"), unit="ms", timezone="UTC")
+        for i in range(count):
+            if messages[i] is not None:
+                errors.append({"index": base + i, "device_id": device_id or None, "error": messages[i]})
+                continue
+            valid.append({
+                "index": base + i,
+                "device_id": device_id,
+                "gps_lat": float(lat[i]),
+                "gps_lon": float(lon[i]),
+                "timestamp": str(timestamps[i]),
+                "player": player,
+                "gps_alt": float(alt[i]) if alt is not None else None,
+                "gps_speed": None,
+                "satellites": None,
+                "hdop": None,
+                "_epoch": float(epoch[i]),
+            })
+        base += count
+    
+    return _store_fixes(valid, errors, total)
+
+
+def _store_fixes(valid: List[Dict[str, Any]], errors: List[Dict[str, Any]], received: int) -> Dict[str, Any]:
+    """
+    Filter validated fixes, COPY the kept ones in one transaction, then
+    update the in-memory views.
+    
+    Kept fixes are fed to the geofence engine in timestamp order so replayed
+    tracks produce enter/exit events in the order they happened.
+    """
+    for err in errors:
+        _logger.error("Rejected fix %d (%s): %s", err["index"], err["device_id"], err["error"])
+    
+    response: Dict[str, Any] = {
+        "received": received,
+        "inserted": 0,
+        "rejected": len(errors),
+        "suppressed": 0,
+        "errors": errors,
+    }
+    if not valid:
+        response["status"] = "error"
+        return response
+    
+    # Time order: the jitter filter compares each fix with the previous kept
+    # one, and geofence transitions must replay in the order they happened
+    valid = sorted(valid, key=lambda f: (f["_epoch"], f["index"]))
+    kept: List[Dict[str, Any]] = []
+    suppressed_by = Counter()
+    for f in valid:
+        reason = location_filter.check(f)
+        if reason is None:
+            kept.append(f)
+            continue
+        suppressed_by[reason] += 1
+        if reason == SUPPRESS_DUPLICATE:
+            device_positions.update(f)
+    response["suppressed"] = sum(suppressed_by.values())
+    if suppressed_by:
+        response["suppressed_by"] = dict(suppressed_by)
+        _logger.info("Suppressed %d fixes: %s", response["suppressed"], dict(suppressed_by))
+    response["status"] = "partial" if errors else "ok"
+    if not kept:
+        return response
+    
+    try:
+        response["inserted"] = copy_device_locations([
+            (f["device_id"], f["player"], f["gps_lat"], f["gps_lon"], f["gps_alt"],
+             f["gps_speed"], f["satellites"], f["hdop"], f["timestamp"])
+            for f in kept
+        ])
+        _logger.info("Bulk device locations logged: %d fixes", response["inserted"])
+    except Exception as e:
+        _logger.error("Failed to bulk insert device locations: %s", str(e))
+        for device_id in {f["device_id"] for f in kept}:
+            location_filter.forget(device_id)
+        return {"status": "error", "error": f"Failed to log device locations: {str(e)}",
+                "received": received, "inserted": 0, "rejected": len(errors),
+                "suppressed": response["suppressed"], "errors": errors}
+    
+    device_positions.update_many(kept)
+    for device_id in {f["device_id"] for f in kept}:
+        track_cache.invalidate(device_id)
+    
+    try:
+        events = []
+        for f in kept:
+            events.extend(geofence_engine.process_fix(
+                f["device_id"], f["gps_lat"], f["gps_lon"], player=f["player"], timestamp=f["timestamp"]
+            ))
+        if events:
+            response["geofence_events"] = events
+    except Exception as e:
+        _logger.error("Geofence processing failed: %s", str(e))
+    
+    return response
+
+
+def _epoch(parsed: datetime) -> float:
+    # Naive timestamps are stored as-is by Postgres; treat them as UTC for ordering
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
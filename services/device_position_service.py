@@ -0,0 +1,347 @@
+"""
+Device Position Service - in-memory last-known position per device.
+
+The latest-locations view used to be a DISTINCT ON scan over the whole
+device_locations table. Instead, every fix accepted by the device location
+endpoints updates a small array-backed table (one slot per device), which
+is loaded once from the database at startup. Latest-position, staleness
+and last-seen queries are answered from memory.
+
+Full location history goes through /api/device/{device_id}/track, which
+returns a simplified track (services/track_simplify.py) instead of every
+raw fix.
+"""
+
+from datetime import datetime, timezone
+from fastapi import APIRouter, Header, HTTPException, Query
+from typing import Any, Dict, List, Optional
+import logging
+import threading
+import time
+
+import numpy as np
+
+import summon_db
+from services.token_service import validate_api_key
+from services.track_simplify import douglas_peucker, time_buckets, bucket_means, track_cache
+from services.location_filter import location_filter
+from utils.validation import parse_bbox
+from location_filter_config import get_config_summary as get_filter_config_summary
+
+_logger = logging.getLogger("summon.device_position_service")
+
+router = APIRouter()
+
+# Initial number of device slots; the arrays double when full
+POSITION_TABLE_INITIAL_CAPACITY = 64
+
+# Default age after which a device counts as stale
+DEFAULT_STALE_AFTER_S = 300
+
+# Minimum delay between load attempts while the database is unreachable
+POSITION_LOAD_RETRY_S = 30
+
+# Default track resolution: Douglas-Peucker tolerance and time bucket width
+DEFAULT_TRACK_TOLERANCE_M = 5.0
+DEFAULT_TRACK_BUCKET_S = 60.0
+
+# Numeric columns kept per device (NaN = not reported)
+_NUMERIC_FIELDS = ("gps_lat", "gps_lon", "gps_alt", "gps_speed", "satellites", "hdop")
+
+
+def _to_epoch(timestamp: Any) -> Optional[float]:
+    """Convert a datetime or ISO 8601 string to epoch seconds (naive = UTC)."""
+    if isinstance(timestamp, str):
+        try:
+            timestamp = datetime.fromisoformat(timestamp.strip().replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if not isinstance(timestamp, datetime):
+        return None
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+class LatestPositionTable:
+    """
+    Last known fix per device, stored column-wise in NumPy arrays.
+
+    device_id -> slot lookups go through a dict; numeric fields and the fix
+    time (epoch seconds) live in parallel arrays so staleness queries are a
+    single vectorized comparison. Out-of-order fixes (older than the stored
+    one) are ignored, so replayed buffers cannot move a device backwards.
+    """
+
+    def __init__(self, capacity: int = POSITION_TABLE_INITIAL_CAPACITY):
+        self._slots: Dict[str, int] = {}
+        self._device_ids: List[str] = []
+        self._players: List[Optional[str]] = []
+        self._timestamps = np.full(capacity, -np.inf)
+        self._values = np.full((capacity, len(_NUMERIC_FIELDS)), np.nan)
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def __len__(self):
+        return len(self._device_ids)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def _grow(self):
+        capacity = len(self._timestamps) * 2
+        timestamps = np.full(capacity, -np.inf)
+        timestamps[:len(self._timestamps)] = self._timestamps
+        values = np.full((capacity, len(_NUMERIC_FIELDS)), np.nan)
+        values[:len(self._values)] = self._values
+        self._timestamps, self._values = timestamps, values
+
+    def update(self, fix: Dict[str, Any]) -> bool:
+        """
+        Record a fix if it is newer than the device's current one.
+
+        fix carries device_id, timestamp and the numeric fields of a
+        device_locations row. Returns True when the stored position changed.
+        """
+        ts = _to_epoch(fix.get("timestamp"))
+        if ts is None:
+            return False
+        device_id = fix["device_id"]
+        row = [np.nan if fix.get(f) is None else float(fix[f]) for f in _NUMERIC_FIELDS]
+        with self._lock:
+            slot = self._slots.get(device_id)
+            if slot is None:
+                slot = len(self._device_ids)
+                if slot == len(self._timestamps):
+                    self._grow()
+                self._slots[device_id] = slot
+                self._device_ids.append(device_id)
+                self._players.append(None)
+            elif ts < self._timestamps[slot]:
+                return False
+            self._timestamps[slot] = ts
+            self._values[slot] = row
+            self._players[slot] = fix.get("player")
+        return True
+
+    def update_many(self, fixes: List[Dict[str, Any]]) -> int:
+        """Record several fixes; returns how many changed a stored position."""
+        return sum(1 for fix in fixes if self.update(fix))
+
+    def load(self, rows: List[Dict[str, Any]]):
+        """
+        Merge latest-per-device rows from the database.
+
+        Fixes ingested before the load finished are newer than (or equal to)
+        what the database returned, so they are kept.
+        """
+        self.update_many(rows)
+        self._loaded = True
+
+    def _entry(self, slot: int, now: float) -> Dict[str, Any]:
+        values = self._values[slot]
+        entry = {"device_id": self._device_ids[slot], "player": self._players[slot]}
+        for name, value in zip(_NUMERIC_FIELDS, values):
+            if np.isnan(value):
+                entry[name] = None
+            elif name == "satellites":
+                entry[name] = int(value)
+            else:
+                entry[name] = float(value)
+        ts = float(self._timestamps[slot])
+        entry["timestamp"] = datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+        entry["seconds_since"] = round(now - ts, 3)
+        return entry
+
+    def latest(self) -> List[Dict[str, Any]]:
+        """Latest fix of every device, ordered by device_id."""
+        now = time.time()
+        with self._lock:
+            order = sorted(range(len(self._device_ids)), key=self._device_ids.__getitem__)
+            return [self._entry(slot, now) for slot in order]
+
+    def get(self, device_id: str) -> Optional[Dict[str, Any]]:
+        """Latest fix of one device, or None if it has never reported."""
+        now = time.time()
+        with self._lock:
+            slot = self._slots.get(device_id)
+            return None if slot is None else self._entry(slot, now)
+
+    def stale(self, older_than_s: float) -> List[Dict[str, Any]]:
+        """Devices whose latest fix is older than older_than_s, stalest first."""
+        now = time.time()
+        with self._lock:
+            count = len(self._device_ids)
+            timestamps = self._timestamps[:count]
+            slots = np.flatnonzero(timestamps < now - older_than_s)
+            slots = slots[np.argsort(timestamps[slots], kind="stable")]
+            return [self._entry(int(slot), now) for slot in slots]
+
+
+# Shared table updated by device location ingest
+device_positions = LatestPositionTable()
+
+_load_attempted_at = None
+
+
+def load_device_positions():
+    """Load the latest fix per device from the database (called at startup)."""
+    global _load_attempted_at
+    _load_attempted_at = time.monotonic()
+    try:
+        device_positions.load(summon_db.get_latest_device_locations())
+        _logger.info("Loaded latest positions for %d devices", len(device_positions))
+    except Exception as e:
+        _logger.error("Failed to load latest device positions: %s", str(e))
+
+
+def _ensure_loaded():
+    # Retry a failed startup load, but not on every request
+    if device_positions.loaded:
+        return
+    if _load_attempted_at is None or time.monotonic() - _load_attempted_at >= POSITION_LOAD_RETRY_S:
+        load_device_positions()
+
+
+@router.get("/api/device/locations/latest")
+async def latest_device_locations(x_api_key: str = Header(...)):
+    """Latest known position of every device."""
+    validate_api_key(x_api_key)
+    _ensure_loaded()
+    devices = device_positions.latest()
+    return {"status": "ok", "count": len(devices), "devices": devices}
+
+
+@router.get("/api/device/locations/stale")
+async def stale_device_locations(
+    older_than_s: float = Query(DEFAULT_STALE_AFTER_S, ge=0, description="Minimum age of the latest fix in seconds"),
+    x_api_key: str = Header(...)
+):
+    """Devices that have not reported a fix for at least older_than_s."""
+    validate_api_key(x_api_key)
+    _ensure_loaded()
+    devices = device_positions.stale(older_than_s)
+    return {"status": "ok", "older_than_s": older_than_s, "count": len(devices), "devices": devices}
+
+
+@router.get("/api/device/locations/filter-stats")
+async def location_filter_stats(x_api_key: str = Header(...)):
+    """How many fixes the ingest filter kept and suppressed, by reason and device."""
+    validate_api_key(x_api_key)
+    return {"status": "ok", "config": get_filter_config_summary(), **location_filter.stats()}
+
+
+@router.get("/api/device/{device_id}/last-seen")
+async def device_last_seen(device_id: str, x_api_key: str = Header(...)):
+    """Latest fix and its age for one device."""
+    validate_api_key(x_api_key)
+    _ensure_loaded()
+    entry = device_positions.get(device_id)
+    if entry is None:
+        raise HTTPException(
+            status_code=404,
+            detail={"status": "error", "error": f"No location reported for device {device_id}"}
+        )
+    return {"status": "ok", "device": entry}
+
+
+def _bad_request(message: str):
+    raise HTTPException(status_code=400, detail={"status": "error", "error": message})
+
+
+def _parse_time(value: Optional[str], name: str) -> Optional[datetime]:
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        _bad_request(f"{name} must be an ISO 8601 date/time")
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _parse_bbox(value: Optional[str]) -> Optional[tuple]:
+    try:
+        return parse_bbox(value)
+    except ValueError as e:
+        _bad_request(str(e))
+
+
+def build_track(rows: list, method: str, tolerance_m: float, bucket_s: float) -> List[Dict[str, Any]]:
+    """
+    Simplify (gps_lat, gps_lon, epoch, gps_speed) rows, oldest first.
+
+    "dp" keeps the raw fixes Douglas-Peucker needs to stay within
+    tolerance_m; "bucket" returns one averaged point per bucket_s seconds.
+    """
+    if not rows:
+        return []
+    data = np.array(rows, dtype=float)
+    lat, lon, ts, speed = data[:, 0], data[:, 1], data[:, 2], data[:, 3]
+    if method == "dp":
+        keep = douglas_peucker(lat, lon, tolerance_m)
+        return [
+            {
+                "lat": float(lat[i]),
+                "lon": float(lon[i]),
+                "timestamp": datetime.fromtimestamp(ts[i], tz=timezone.utc).isoformat(),
+                "gps_speed": None if np.isnan(speed[i]) else float(speed[i]),
+            }
+            for i in keep
+        ]
+    starts, counts = time_buckets(ts, bucket_s)
+    mean_lat = bucket_means(lat, starts, counts)
+    mean_lon = bucket_means(lon, starts, counts)
+    mean_ts = bucket_means(ts, starts, counts)
+    return [
+        {
+            "lat": float(mean_lat[b]),
+            "lon": float(mean_lon[b]),
+            "timestamp": datetime.fromtimestamp(mean_ts[b], tz=timezone.utc).isoformat(),
+            "count": int(counts[b]),
+        }
+        for b in range(len(starts))
+    ]
+
+
+@router.get("/api/device/{device_id}/track")
+async def device_track(
+    device_id: str,
+    start: Optional[str] = Query(None, description="ISO 8601 start of the window (inclusive)"),
+    end: Optional[str] = Query(None, description="ISO 8601 end of the window (exclusive)"),
+    bbox: Optional[str] = Query(None, description="min_lon,min_lat,max_lon,max_lat"),
+    method: str = Query("dp", pattern="^(dp|bucket)$", description="dp (Douglas-Peucker) or bucket (time buckets)"),
+    tolerance_m: float = Query(DEFAULT_TRACK_TOLERANCE_M, ge=0, description="Douglas-Peucker tolerance in meters"),
+    bucket_s: float = Query(DEFAULT_TRACK_BUCKET_S, gt=0, description="Time bucket width in seconds"),
+    x_api_key: str = Header(...)
+):
+    """Location history of one device, simplified for drawing."""
+    validate_api_key(x_api_key)
+    start_dt = _parse_time(start, "start")
+    end_dt = _parse_time(end, "end")
+    bbox_t = _parse_bbox(bbox)
+    
+    resolution = tolerance_m if method == "dp" else bucket_s
+    key = (start_dt, end_dt, bbox_t, method, resolution)
+    track = track_cache.get(device_id, key)
+    if track is None:
+        version = track_cache.version(device_id)
+        try:
+            rows = summon_db.get_device_track(device_id, start_dt, end_dt, bbox_t)
+        except Exception as e:
+            _logger.error("Failed to load track for %s: %s", device_id, str(e))
+            raise HTTPException(
+                status_code=500,
+                detail={"status": "error", "error": f"Failed to load track: {str(e)}"}
+            )
+        track = {"raw_points": len(rows), "points": build_track(rows, method, tolerance_m, bucket_s)}
+        track_cache.put(device_id, key, track, version)
+    
+    return {
+        "status": "ok",
+        "device_id": device_id,
+        "method": method,
+        "raw_points": track["raw_points"],
+        "count": len(track["points"]),
+        "points": track["points"],
+    }
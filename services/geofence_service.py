@@ -0,0 +1,236 @@
+"""
+Geofence Service - proximity enter/exit events from device location fixes.
+
+Every fix accepted by /api/device/location is tested against the
+in-memory token index (services/spatial_index.py). Per-device state
+remembers which tokens the device is currently inside, so only enter and
+exit transitions produce events. Events go to an in-memory event bus that
+clients read with a sequence cursor (/api/geofence/events) or as a
+Server-Sent Events stream (/api/geofence/events/stream).
+
+No database query is issued per fix; the token index refreshes itself at
+most once per TOKEN_INDEX_REFRESH_INTERVAL_S.
+"""
+
+from collections import deque
+from fastapi import APIRouter, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+
+from services.spatial_index import TokenSpatialIndex, token_index, haversine_m
+from services.token_service import validate_api_key
+
+_logger = logging.getLogger("summon.geofence_service")
+
+router = APIRouter()
+
+# Distance at which a device "enters" a token's geofence
+GEOFENCE_RADIUS_M = float(os.getenv('GEOFENCE_RADIUS_M', '30'))
+
+# Distance at which it "exits" again; larger than the enter radius so GPS
+# jitter at the boundary does not produce enter/exit storms
+GEOFENCE_EXIT_RADIUS_M = float(os.getenv('GEOFENCE_EXIT_RADIUS_M', '40'))
+
+# Number of recent events kept for cursor-based readers
+GEOFENCE_EVENT_BUFFER = int(os.getenv('GEOFENCE_EVENT_BUFFER', '10000'))
+
+# Poll interval of the SSE stream
+GEOFENCE_STREAM_POLL_S = 0.5
+
+if GEOFENCE_EXIT_RADIUS_M < GEOFENCE_RADIUS_M:
+    raise ValueError(f"GEOFENCE_EXIT_RADIUS_M must be >= GEOFENCE_RADIUS_M, got {GEOFENCE_EXIT_RADIUS_M}")
+
+
+class GeofenceEventBus:
+    """
+    Bounded, sequence-numbered event log with optional push subscribers.
+    
+    Readers either poll with events_after(seq) or subscribe() to get a
+    queue.Queue that receives every new event. Slow subscribers whose
+    queue is full miss events rather than blocking ingest.
+    """
+    
+    def __init__(self, max_events: int = GEOFENCE_EVENT_BUFFER):
+        self._events = deque(maxlen=max_events)
+        self._seq = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+    
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+    
+    def publish(self, event: dict) -> dict:
+        """Assign the next sequence number to event and deliver it."""
+        with self._lock:
+            self._seq += 1
+            event = {"seq": self._seq, **event}
+            self._events.append(event)
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                _logger.warning("Geofence subscriber queue full, dropping event %d", event["seq"])
+        return event
+    
+    def events_after(self, seq: int, device_id: Optional[str] = None, limit: int = 100) -> list:
+        """Return up to limit events with a sequence number greater than seq."""
+        with self._lock:
+            events = [e for e in self._events if e["seq"] > seq]
+        if device_id is not None:
+            events = [e for e in events if e["device_id"] == device_id]
+        return events[:limit]
+    
+    def subscribe(self, maxsize: int = 1000) -> queue.Queue:
+        q = queue.Queue(maxsize=maxsize)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+    
+    def unsubscribe(self, q: queue.Queue):
+        with self._lock:
+            self._subscribers.discard(q)
+
+
+class GeofenceEngine:
+    """
+    Tracks which token geofences each device is inside.
+    
+    State lives in memory only; after a restart the first fix of each
+    device re-announces the tokens it is inside.
+    """
+    
+    def __init__(self, index: TokenSpatialIndex, bus: GeofenceEventBus,
+                 radius_m: float = GEOFENCE_RADIUS_M, exit_radius_m: float = GEOFENCE_EXIT_RADIUS_M):
+        self.index = index
+        self.bus = bus
+        self.radius_m = radius_m
+        self.exit_radius_m = exit_radius_m
+        self._inside = {}   # device_id -> {token_id: token}
+        self._lock = threading.Lock()
+    
+    def _event(self, kind: str, device_id: str, player: Optional[str], token: dict,
+               distance_m: float, timestamp: Optional[str]) -> dict:
+        target = token.get("entity") or token.get("item") or token.get("action_type")
+        if kind == "enter":
+            message = f"Within {self.radius_m:g} m of a {target} token"
+        else:
+            message = f"Left the area of a {target} token"
+        return {
+            "event": kind,
+            "device_id": device_id,
+            "player": player,
+            "token_id": token["token_id"],
+            "action_type": token.get("action_type"),
+            "entity": token.get("entity"),
+            "item": token.get("item"),
+            "token_position": {"lat": token["lat"], "lon": token["lon"]},
+            "distance_m": round(distance_m, 1),
+            "timestamp": timestamp,
+            "message": message
+        }
+    
+    def process_fix(self, device_id: str, lat: float, lon: float,
+                    player: Optional[str] = None, timestamp: Optional[str] = None) -> list:
+        """
+        Test one location fix and publish enter/exit transitions.
+        
+        Returns:
+            List of published events (with seq numbers)
+        """
+        self.index.refresh()
+        nearby = self.index.query_radius(lat, lon, self.exit_radius_m)
+        
+        events = []
+        with self._lock:
+            inside = self._inside.get(device_id, {})
+            now_inside = {}
+            for distance, token in nearby:
+                token_id = token["token_id"]
+                if token_id in inside:
+                    now_inside[token_id] = token
+                elif distance <= self.radius_m:
+                    now_inside[token_id] = token
+                    events.append(self._event("enter", device_id, player, token, distance, timestamp))
+            for token_id, token in inside.items():
+                if token_id not in now_inside:
+                    distance = haversine_m(lat, lon, token["lat"], token["lon"])
+                    events.append(self._event("exit", device_id, player, token, distance, timestamp))
+            if now_inside:
+                self._inside[device_id] = now_inside
+            else:
+                self._inside.pop(device_id, None)
+        
+        return [self.bus.publish(event) for event in events]
+    
+    def inside(self, device_id: str) -> list:
+        """Token ids the device is currently inside."""
+        with self._lock:
+            return list(self._inside.get(device_id, {}))
+
+
+# Shared instances used by device_location_service and the endpoints below
+geofence_bus = GeofenceEventBus()
+geofence_engine = GeofenceEngine(token_index, geofence_bus)
+
+
+@router.get("/api/geofence/events")
+async def get_geofence_events(
+    after: int = Query(0, ge=0, description="Return events with seq greater than this"),
+    device_id: Optional[str] = Query(None, max_length=64),
+    limit: int = Query(100, ge=1, le=1000),
+    x_api_key: str = Header(...)
+):
+    """
+    Read geofence enter/exit events after a sequence cursor.
+    
+    Pass the returned last_seq as "after" on the next call.
+    """
+    validate_api_key(x_api_key)
+    
+    events = geofence_bus.events_after(after, device_id=device_id, limit=limit)
+    return {
+        "status": "ok",
+        "last_seq": events[-1]["seq"] if events else max(after, 0),
+        "count": len(events),
+        "events": events
+    }
+
+
+@router.get("/api/geofence/events/stream")
+async def stream_geofence_events(
+    request: Request,
+    after: Optional[int] = Query(None, ge=0, description="Start after this seq (default: only new events)"),
+    device_id: Optional[str] = Query(None, max_length=64),
+    x_api_key: str = Header(...),
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Server-Sent Events stream of geofence events.
+    
+    Each event is sent with its seq as the SSE id, so a reconnecting client
+    resumes from Last-Event-ID without losing events still in the buffer.
+    """
+    validate_api_key(x_api_key)
+    
+    cursor = after if after is not None else geofence_bus.last_seq
+    if last_event_id is not None and last_event_id.isdigit():
+        cursor = int(last_event_id)
+    
+    async def event_source(cursor: int):
+        while not await request.is_disconnected():
+            events = geofence_bus.events_after(cursor, device_id=device_id, limit=1000)
+            for event in events:
+                cursor = event["seq"]
+                yield f"id: {event['seq']}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n"
+            if not events:
+                await asyncio.sleep(GEOFENCE_STREAM_POLL_S)
+    
+    return StreamingResponse(event_source(cursor), media_type="text/event-stream")
@@ -1,5 +1,5 @@
 from utils.mc_send import send_command_to_minecraft
-from summon_db import insert_give_operation, insert_token
+from summon_db import insert_give_operation_with_token
 from datetime import datetime
 
 def handle_give(data):
@@ -62,7 +62,8 @@ def handle_give(data):
     device_id = data.get("device_id")
     
     try:
-        insert_give_operation(
+        # Give row and discovery token (if GPS is present) commit together
+        insert_give_operation_with_token(
             player=player,
             item=item,
             amount=amount,
@@ -71,18 +72,6 @@ def handle_give(data):
             gps_lon=gps_lon,
             device_id=device_id
         )
-        
-        # Create token for nearby discovery if GPS coordinates are present
-        if gps_lat is not None and gps_lon is not None:
-            insert_token(
-                action_type="give_item",
-                item=item,
-                gps_lat=gps_lat,
-                gps_lon=gps_lon,
-                written_by=player,
-                device_id=device_id,
-                written_at=timestamp
-            )
     except Exception as e:
         # Log error but don't fail the operation since command was already sent
         print(f"Warning: Failed to log give operation to database: {e}")
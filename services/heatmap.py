@@ -0,0 +1,290 @@
+"""
+Heatmap - density raster tiles of summons, gives, token scans and device fixes.
+
+Each source keeps its points in memory as Web Mercator coordinates
+(sorted by x, so a tile reads only its slice), loaded once from its
+table and then extended with the rows added since (by id watermark,
+re-reading TILE_WATERMARK_OVERLAP ids as the map tile layers do).
+
+A tile z/x/y is a HEATMAP_BINS x HEATMAP_BINS grid of point counts,
+histogrammed with NumPy over the tile plus a margin of
+HEATMAP_MARGIN_BINS so the Gaussian blur matches across tile edges. The
+blurred grid is log-scaled against a fixed HEATMAP_SATURATION (the same
+for every tile, so neighbouring tiles agree), scaled up to 256 px,
+colored and encoded as PNG with Pillow.
+
+Count grids of recently used tiles stay in an LRU. New points increment
+the bins of every cached grid they fall in instead of evicting it, so an
+insert only costs the blur/encode step of the tiles it touches.
+"""
+
+from collections import OrderedDict
+from typing import Callable, Dict
+import io
+import logging
+import math
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+import summon_db
+from services.cluster_index import MAX_MERCATOR_LAT
+from services.map_tiles import TILE_REFRESH_INTERVAL_S, TILE_SIZE_PX, TILE_WATERMARK_OVERLAP
+
+_logger = logging.getLogger("summon.heatmap")
+
+# Count bins per tile edge (4 px each on 256 px tiles)
+HEATMAP_BINS = 64
+
+# Gaussian blur radius (standard deviation) in bins, and the margin read
+# around each tile so the blur sees neighbouring points
+HEATMAP_SIGMA_BINS = 1.5
+HEATMAP_MARGIN_BINS = 5
+
+# Blurred count per bin drawn at full intensity
+HEATMAP_SATURATION = float(os.getenv('HEATMAP_SATURATION', '20'))
+
+# Count grids kept in memory (about 22 kB each)
+HEATMAP_CACHE_SIZE = int(os.getenv('HEATMAP_CACHE_SIZE', '1024'))
+
+# Rows read per query while loading a source
+HEATMAP_LOAD_BATCH = 50000
+
+# New points kept in an unsorted side list until there are this many
+HEATMAP_MERGE_POINTS = 50000
+
+# Color ramp: intensity stop -> RGBA
+HEATMAP_COLOR_STOPS = (
+    (0.0, (0, 0, 255, 0)),
+    (0.25, (0, 160, 255, 120)),
+    (0.5, (0, 255, 100, 170)),
+    (0.75, (255, 230, 0, 200)),
+    (1.0, (255, 0, 0, 230)),
+)
+
+
+def _color_lut() -> np.ndarray:
+    """256 x 4 uint8 lookup table from HEATMAP_COLOR_STOPS."""
+    stops = np.array([s for s, _ in HEATMAP_COLOR_STOPS])
+    colors = np.array([c for _, c in HEATMAP_COLOR_STOPS], dtype=float)
+    levels = np.linspace(0.0, 1.0, 256)
+    lut = np.column_stack([np.interp(levels, stops, colors[:, i]) for i in range(4)])
+    lut[0] = 0  # Empty bins stay fully transparent
+    return lut.round().astype(np.uint8)
+
+
+_LUT = _color_lut()
+
+
+def _gaussian_kernel(sigma: float) -> np.ndarray:
+    radius = int(math.ceil(3 * sigma))
+    offsets = np.arange(-radius, radius + 1)
+    kernel = np.exp(-0.5 * (offsets / sigma) ** 2)
+    return kernel / kernel.sum()
+
+
+_KERNEL = _gaussian_kernel(HEATMAP_SIGMA_BINS)
+
+
+def blur(grid: np.ndarray, kernel: np.ndarray = _KERNEL) -> np.ndarray:
+    """Separable convolution of a 2-D grid with kernel (zero outside the grid)."""
+    radius = len(kernel) // 2
+    out = np.zeros(grid.shape, dtype=float)
+    padded = np.pad(grid.astype(float), ((0, 0), (radius, radius)))
+    for i, weight in enumerate(kernel):
+        out += weight * padded[:, i:i + grid.shape[1]]
+    padded = np.pad(out, ((radius, radius), (0, 0)))
+    out = np.zeros(grid.shape, dtype=float)
+    for i, weight in enumerate(kernel):
+        out += weight * padded[i:i + grid.shape[0], :]
+    return out
+
+
+def render_png(counts: np.ndarray) -> bytes:
+    """Encode a count grid (tile plus margin) as a TILE_SIZE_PX PNG tile."""
+    m = HEATMAP_MARGIN_BINS
+    density = blur(counts)[m:m + HEATMAP_BINS, m:m + HEATMAP_BINS]
+    intensity = np.clip(np.log1p(density) / math.log1p(HEATMAP_SATURATION), 0.0, 1.0)
+    levels = Image.fromarray((intensity * 255).round().astype(np.uint8), mode="L")
+    levels = levels.resize((TILE_SIZE_PX, TILE_SIZE_PX), Image.BILINEAR)
+    rgba = Image.fromarray(_LUT[np.asarray(levels)], mode="RGBA")
+    buffer = io.BytesIO()
+    # Fast zlib level: tiles are re-encoded after every insert they see
+    rgba.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+class HeatmapSource:
+    """
+    The points of one table, with cached per-tile count grids.
+
+    points_since(after_id, limit) returns (id, lat, lon) rows with
+    id > after_id in id order (see summon_db.get_summon_points_since).
+    """
+
+    def __init__(self, name: str, points_since: Callable[[int, int], list],
+                 cache_size: int = HEATMAP_CACHE_SIZE,
+                 refresh_interval_s: float = TILE_REFRESH_INTERVAL_S):
+        self.name = name
+        self.points_since = points_since
+        self.cache_size = cache_size
+        self.refresh_interval_s = refresh_interval_s
+        self._x = np.zeros(0)               # Sorted ascending
+        self._y = np.zeros(0)
+        self._pending = []                  # (x array, y array) chunks not yet merged
+        self._grids = OrderedDict()         # (z, x, y) -> [counts, png or None]
+        self._watermark = None
+        self._seen = set()                  # ids read in the overlap window
+        self._refreshed_at = None
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._x) + sum(len(x) for x, _ in self._pending)
+
+    def _merge(self):
+        x = np.concatenate([self._x] + [x for x, _ in self._pending])
+        y = np.concatenate([self._y] + [y for _, y in self._pending])
+        order = np.argsort(x, kind="stable")
+        self._x, self._y = x[order], y[order]
+        self._pending = []
+
+    def load(self, rows: list):
+        """Replace the points with (id, lat, lon) rows."""
+        with self._lock:
+            self._x, self._y = np.zeros(0), np.zeros(0)
+            self._pending = [self._project(rows)]
+            self._merge()
+            self._grids.clear()
+
+    @staticmethod
+    def _project(rows: list):
+        """Unit Web Mercator x and y arrays of (id, lat, lon) rows (as cluster_index.mercator)."""
+        latlon = np.array([(lat, lon) for _, lat, lon in rows], dtype=float).reshape(-1, 2)
+        phi = np.radians(np.clip(latlon[:, 0], -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+        x = (latlon[:, 1] + 180.0) / 360.0
+        y = (1.0 - np.log(np.tan(phi) + 1.0 / np.cos(phi)) / np.pi) / 2.0
+        top = math.nextafter(1.0, 0.0)
+        return np.clip(x, 0.0, top), np.clip(y, 0.0, top)
+
+    def add(self, rows: list):
+        """Add (id, lat, lon) rows, updating the bins of cached grids in place."""
+        if not rows:
+            return
+        x, y = self._project(rows)
+        size = HEATMAP_BINS + 2 * HEATMAP_MARGIN_BINS
+        with self._lock:
+            self._pending.append((x, y))
+            if sum(len(px) for px, _ in self._pending) >= HEATMAP_MERGE_POINTS:
+                self._merge()
+            if not self._grids:
+                return
+            zooms = sorted({key[0] for key in self._grids})
+            for px, py in zip(x, y):
+                for z in zooms:
+                    scale = (1 << z) * HEATMAP_BINS
+                    bx, by = int(px * scale), int(py * scale)
+                    for tx in range((bx - HEATMAP_MARGIN_BINS) // HEATMAP_BINS,
+                                    (bx + HEATMAP_MARGIN_BINS) // HEATMAP_BINS + 1):
+                        for ty in range((by - HEATMAP_MARGIN_BINS) // HEATMAP_BINS,
+                                        (by + HEATMAP_MARGIN_BINS) // HEATMAP_BINS + 1):
+                            entry = self._grids.get((z, tx, ty))
+                            if entry is None:
+                                continue
+                            i = by - ty * HEATMAP_BINS + HEATMAP_MARGIN_BINS
+                            j = bx - tx * HEATMAP_BINS + HEATMAP_MARGIN_BINS
+                            if 0 <= i < size and 0 <= j < size:
+                                entry[0][i, j] += 1
+                                entry[1] = None
+
+    def refresh(self, force: bool = False):
+        """
+        Bring the points up to date with the table: the first call loads
+        every row, later calls only rows added since, at most once per
+        refresh_interval_s (unless force is set). Database errors are
+        logged and the current points are kept.
+        """
+        if not force and self._refreshed_at is not None and \
+                time.monotonic() - self._refreshed_at < self.refresh_interval_s:
+            return
+        if not self._refresh_lock.acquire(blocking=self._refreshed_at is None):
+            return
+        try:
+            if self._watermark is None:
+                rows = []
+                while True:
+                    batch = self.points_since(rows[-1][0] if rows else 0, HEATMAP_LOAD_BATCH)
+                    rows.extend(batch)
+                    if len(batch) < HEATMAP_LOAD_BATCH:
+                        break
+                self.load(rows)
+                self._watermark = rows[-1][0] if rows else 0
+                self._seen = {row[0] for row in rows if row[0] > self._watermark - TILE_WATERMARK_OVERLAP}
+                return
+            rows = self.points_since(max(self._watermark - TILE_WATERMARK_OVERLAP, 0), HEATMAP_LOAD_BATCH)
+            self.add([row for row in rows if row[0] not in self._seen])
+            self._seen = {row[0] for row in rows}
+            if rows:
+                self._watermark = max(self._watermark, rows[-1][0])
+        except Exception as e:
+            _logger.error("Heatmap %s refresh failed: %s", self.name, str(e))
+        finally:
+            self._refreshed_at = time.monotonic()
+            self._refresh_lock.release()
+
+    def counts(self, z: int, x: int, y: int) -> np.ndarray:
+        """Point counts of tile z/x/y plus margin, shape (rows, columns)."""
+        with self._lock:
+            entry = self._grids.get((z, x, y))
+            if entry is not None:
+                self._grids.move_to_end((z, x, y))
+                return entry[0]
+            scale = (1 << z) * HEATMAP_BINS
+            size = HEATMAP_BINS + 2 * HEATMAP_MARGIN_BINS
+            lo_x = x * HEATMAP_BINS - HEATMAP_MARGIN_BINS
+            lo_y = y * HEATMAP_BINS - HEATMAP_MARGIN_BINS
+            # Sorted points: only the slice in the tile's x range (with a
+            # bin of slack for rounding; the bin filter below is exact)
+            start, stop = np.searchsorted(self._x, [(lo_x - 1) / scale, (lo_x + size + 1) / scale])
+            px = np.concatenate([self._x[start:stop]] + [x for x, _ in self._pending])
+            py = np.concatenate([self._y[start:stop]] + [y for _, y in self._pending])
+            # Bin in global bin units so cached grids and add() agree exactly
+            bx = np.floor(px * scale) - lo_x
+            by = np.floor(py * scale) - lo_y
+            inside = (bx >= 0) & (bx < size) & (by >= 0) & (by < size)
+            grid, _, _ = np.histogram2d(by[inside], bx[inside], bins=size, range=((0, size), (0, size)))
+            self._grids[(z, x, y)] = [grid, None]
+            while len(self._grids) > self.cache_size:
+                self._grids.popitem(last=False)
+            return grid
+
+    def tile(self, z: int, x: int, y: int) -> bytes:
+        """Heatmap tile z/x/y as PNG bytes."""
+        self.refresh()
+        with self._lock:
+            counts = self.counts(z, x, y)
+            entry = self._grids.get((z, x, y))
+            if entry is not None and entry[1] is not None:
+                return entry[1]
+            counts = counts.copy()
+        png = render_png(counts)
+        with self._lock:
+            entry = self._grids.get((z, x, y))
+            # Only keep it if no point arrived while encoding
+            if entry is not None and np.array_equal(entry[0], counts):
+                entry[1] = png
+        return png
+
+
+# Heatmap sources by name
+heatmap_sources: Dict[str, HeatmapSource] = {
+    "summons": HeatmapSource("summons", lambda after_id, limit: summon_db.get_summon_points_since(after_id, limit)),
+    "gives": HeatmapSource("gives", lambda after_id, limit: summon_db.get_give_operation_points_since(after_id, limit)),
+    "scans": HeatmapSource("scans", lambda after_id, limit: summon_db.get_token_scan_points_since(after_id, limit)),
+    "locations": HeatmapSource("locations",
+                               lambda after_id, limit: summon_db.get_device_location_points_since(after_id, limit)),
+}
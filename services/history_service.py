@@ -0,0 +1,107 @@
+"""
+History Service - summon and give history near a place.
+
+Radius and bounding-box queries over summons and give_operations, served
+by the geography columns and GiST indexes added in
+migrations/004_summon_give_spatial.sql.
+"""
+
+from fastapi import APIRouter, Header, HTTPException, Query
+import logging
+
+import summon_db
+from services.token_service import validate_api_key
+from utils.validation import parse_bbox
+
+_logger = logging.getLogger("summon.history_service")
+
+router = APIRouter()
+
+# Largest radius accepted by the /near endpoints (meters)
+MAX_HISTORY_RADIUS_M = 50000
+
+# Row cap per response
+MAX_HISTORY_LIMIT = 1000
+
+# table name -> (radius query, bbox query, response key)
+_HISTORY_QUERIES = {
+    "summons": ("get_summons_near", "get_summons_in_bbox", "summons"),
+    "give": ("get_give_operations_near", "get_give_operations_in_bbox", "give_operations"),
+}
+
+
+def _run(kind: str, which: int, *args):
+    query = getattr(summon_db, _HISTORY_QUERIES[kind][which])
+    try:
+        rows = query(*args)
+    except Exception as e:
+        _logger.error("History query %s failed: %s", query.__name__, str(e))
+        raise HTTPException(
+            status_code=500,
+            detail={"status": "error", "error": f"Failed to query {kind} history: {str(e)}"}
+        )
+    return {"status": "ok", "count": len(rows), _HISTORY_QUERIES[kind][2]: rows}
+
+
+def _near(kind: str, lat: float, lon: float, radius_m: float, limit: int):
+    result = _run(kind, 0, lat, lon, radius_m, limit)
+    result["query"] = {"lat": lat, "lon": lon, "radius_m": radius_m}
+    return result
+
+
+def _bbox(kind: str, bbox: str, limit: int):
+    try:
+        box = parse_bbox(bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"status": "error", "error": str(e)})
+    result = _run(kind, 1, *box, limit)
+    result["query"] = {"bbox": list(box)}
+    return result
+
+
+@router.get("/api/summons/near")
+async def summons_near(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(500, gt=0, le=MAX_HISTORY_RADIUS_M),
+    limit: int = Query(100, ge=1, le=MAX_HISTORY_LIMIT),
+    x_api_key: str = Header(...)
+):
+    """Summons made within radius_m of a point, nearest first."""
+    validate_api_key(x_api_key)
+    return _near("summons", lat, lon, radius_m, limit)
+
+
+@router.get("/api/summons/bbox")
+async def summons_in_bbox(
+    bbox: str = Query(..., description="min_lon,min_lat,max_lon,max_lat"),
+    limit: int = Query(100, ge=1, le=MAX_HISTORY_LIMIT),
+    x_api_key: str = Header(...)
+):
+    """Summons made inside a bounding box, most recent first."""
+    validate_api_key(x_api_key)
+    return _bbox("summons", bbox, limit)
+
+
+@router.get("/api/give/near")
+async def give_near(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(500, gt=0, le=MAX_HISTORY_RADIUS_M),
+    limit: int = Query(100, ge=1, le=MAX_HISTORY_LIMIT),
+    x_api_key: str = Header(...)
+):
+    """Give operations within radius_m of a point, nearest first."""
+    validate_api_key(x_api_key)
+    return _near("give", lat, lon, radius_m, limit)
+
+
+@router.get("/api/give/bbox")
+async def give_in_bbox(
+    bbox: str = Query(..., description="min_lon,min_lat,max_lon,max_lat"),
+    limit: int = Query(100, ge=1, le=MAX_HISTORY_LIMIT),
+    x_api_key: str = Header(...)
+):
+    """Give operations inside a bounding box, most recent first."""
+    validate_api_key(x_api_key)
+    return _bbox("give", bbox, limit)
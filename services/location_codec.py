@@ -0,0 +1,181 @@
+"""
+Location Codec - compact binary format for high-rate tracker uploads.
+
+A request body is one or more frames, one per device:
+
+    version      u8       LOCATION_CODEC_VERSION
+    flags        u8       bit 0: records carry altitude
+    device_len   u8       followed by device_id (UTF-8)
+    player_len   u8       followed by player (UTF-8; 0 = no player)
+    count        varint   number of records
+    records      count x (time, lat, lon[, alt]) zigzag varints
+
+Record fields are integers: time in milliseconds since the Unix epoch,
+lat/lon in microdegrees, altitude in decimeters. The first record of a
+frame holds absolute values and every later record the delta from the
+previous one, so a 1 Hz walking track costs about 5 bytes per fix.
+
+decode_frames() decodes each frame's records in one vectorized pass
+(varint boundaries, zigzag and the running sum are NumPy operations).
+encode_frame() is the reference encoder for trackers and tests.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+LOCATION_CODEC_VERSION = 1
+
+FLAG_ALTITUDE = 0x01
+
+# Scale of the integer fields
+MICRODEGREES = 1_000_000
+DECIMETERS = 10
+
+# A 64-bit value needs at most 10 varint bytes
+_MAX_VARINT_BYTES = 10
+
+
+def _zigzag_encode(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    """Scalar varint read for header fields; returns (value, new offset)."""
+    value = 0
+    for i in range(_MAX_VARINT_BYTES):
+        if offset >= len(data):
+            raise ValueError("Truncated varint")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << (7 * i)
+        if byte < 0x80:
+            return value, offset
+    raise ValueError("Varint too long")
+
+
+def decode_varints(buf: np.ndarray, count: int) -> Tuple[np.ndarray, int]:
+    """
+    Decode the first count unsigned varints of a uint8 array.
+
+    Returns:
+        (values as uint64, number of bytes consumed)
+    """
+    if count == 0:
+        return np.zeros(0, dtype=np.uint64), 0
+    ends = np.flatnonzero(buf < 0x80)
+    if len(ends) < count:
+        raise ValueError("Truncated record data")
+    ends = ends[:count]
+    starts = np.empty(count, dtype=np.int64)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    lengths = ends - starts + 1
+    if lengths.max() > _MAX_VARINT_BYTES:
+        raise ValueError("Varint too long")
+    consumed = int(ends[-1]) + 1
+    # Bit offset of every byte within its own varint
+    shifts = (np.arange(consumed) - np.repeat(starts, lengths)) * 7
+    parts = (buf[:consumed] & 0x7F).astype(np.uint64) << shifts.astype(np.uint64)
+    # The 7-bit groups never overlap, so summing them is the same as OR-ing
+    return np.add.reduceat(parts, starts), consumed
+
+
+def zigzag_decode(values: np.ndarray) -> np.ndarray:
+    """Map zigzag-encoded uint64 back to signed int64."""
+    return (values >> np.uint64(1)).astype(np.int64) ^ -(values & np.uint64(1)).astype(np.int64)
+
+
+def encode_frame(device_id: str, fixes: Sequence[Dict[str, Any]], player: Optional[str] = None) -> bytes:
+    """
+    Encode fixes (dicts with epoch_ms, gps_lat, gps_lon and optional gps_alt)
+    for one device. Altitude is included only if every fix has one.
+    """
+    device_bytes = device_id.encode("utf-8")
+    player_bytes = (player or "").encode("utf-8")
+    if len(device_bytes) > 255 or len(player_bytes) > 255:
+        raise ValueError("device_id and player must encode to at most 255 bytes")
+    has_alt = bool(fixes) and all(f.get("gps_alt") is not None for f in fixes)
+
+    out = bytearray([LOCATION_CODEC_VERSION, FLAG_ALTITUDE if has_alt else 0])
+    out.append(len(device_bytes))
+    out += device_bytes
+    out.append(len(player_bytes))
+    out += player_bytes
+    _write_varint(out, len(fixes))
+
+    prev = None
+    for fix in fixes:
+        row = [
+            int(fix["epoch_ms"]),
+            round(fix["gps_lat"] * MICRODEGREES),
+            round(fix["gps_lon"] * MICRODEGREES),
+        ]
+        if has_alt:
+            row.append(round(fix["gps_alt"] * DECIMETERS))
+        deltas = row if prev is None else [a - b for a, b in zip(row, prev)]
+        for value in deltas:
+            _write_varint(out, _zigzag_encode(value))
+        prev = row
+    return bytes(out)
+
+
+def decode_frames(data: bytes) -> List[Dict[str, Any]]:
+    """
+    Decode a request body into per-device column arrays.
+
+    Returns:
+        One dict per frame: device_id, player, epoch_ms (int64 array),
+        gps_lat, gps_lon (float64 arrays) and gps_alt (float64 array or None)
+
+    Raises:
+        ValueError: if the body is malformed
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    frames = []
+    offset = 0
+    while offset < len(data):
+        if len(data) - offset < 4:
+            raise ValueError("Truncated frame header")
+        version, flags = data[offset], data[offset + 1]
+        if version != LOCATION_CODEC_VERSION:
+            raise ValueError(f"Unsupported codec version {version}")
+        offset += 2
+
+        strings = []
+        for _ in range(2):
+            if offset >= len(data):
+                raise ValueError("Truncated frame header")
+            length = data[offset]
+            end = offset + 1 + length
+            if end > len(data):
+                raise ValueError("Truncated frame header")
+            try:
+                strings.append(data[offset + 1:end].decode("utf-8"))
+            except UnicodeDecodeError:
+                raise ValueError("device_id and player must be UTF-8")
+            offset = end
+        device_id, player = strings
+
+        count, offset = _read_varint(data, offset)
+        fields = 4 if flags & FLAG_ALTITUDE else 3
+        values, consumed = decode_varints(buf[offset:], count * fields)
+        offset += consumed
+
+        columns = np.cumsum(zigzag_decode(values).reshape(count, fields), axis=0)
+        frames.append({
+            "device_id": device_id,
+            "player": player or None,
+            "epoch_ms": columns[:, 0],
+            "gps_lat": columns[:, 1] / MICRODEGREES,
+            "gps_lon": columns[:, 2] / MICRODEGREES,
+            "gps_alt": columns[:, 3] / DECIMETERS if fields == 4 else None,
+        })
+    return frames
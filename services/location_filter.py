@@ -0,0 +1,150 @@
+"""
+Location Filter - drops jitter, duplicates and low-quality fixes before they are written.
+
+Keeps the last kept fix of every device in memory and decides, per
+incoming fix, whether it adds information. Thresholds come from
+location_filter_config.py. Every decision is counted so the write
+reduction can be checked at /api/device/locations/filter-stats.
+"""
+
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+import threading
+import time
+
+from location_filter_config import (
+    LOCATION_FILTER_ENABLED,
+    LOCATION_FILTER_MIN_DISTANCE_M,
+    LOCATION_FILTER_HEARTBEAT_S,
+    LOCATION_FILTER_MIN_INTERVAL_S,
+    LOCATION_FILTER_MAX_HDOP,
+    LOCATION_FILTER_MIN_SATELLITES,
+)
+from services.spatial_index import haversine_m
+
+# Suppression reasons
+SUPPRESS_HDOP = "hdop"
+SUPPRESS_SATELLITES = "satellites"
+SUPPRESS_RATE = "rate"
+SUPPRESS_DUPLICATE = "duplicate"
+
+
+def _fix_epoch(fix: Dict[str, Any]) -> float:
+    """Fix time in epoch seconds; falls back to the receive time if unparseable."""
+    if fix.get("_epoch") is not None:
+        return fix["_epoch"]
+    try:
+        parsed = datetime.fromisoformat(str(fix.get("timestamp")).strip().replace("Z", "+00:00"))
+    except ValueError:
+        return time.time()
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class LocationFilter:
+    """
+    Per-device ingest filter.
+
+    Time comparisons use the fix timestamps, so buffered uploads are
+    filtered by when fixes were taken, not when they arrived. A fix older
+    than the device's last kept fix is history backfill and only goes
+    through the quality checks.
+    """
+
+    def __init__(self, enabled: bool = LOCATION_FILTER_ENABLED,
+                 min_distance_m: float = LOCATION_FILTER_MIN_DISTANCE_M,
+                 heartbeat_s: float = LOCATION_FILTER_HEARTBEAT_S,
+                 min_interval_s: float = LOCATION_FILTER_MIN_INTERVAL_S,
+                 max_hdop: float = LOCATION_FILTER_MAX_HDOP,
+                 min_satellites: int = LOCATION_FILTER_MIN_SATELLITES):
+        self.enabled = enabled
+        self.min_distance_m = min_distance_m
+        self.heartbeat_s = heartbeat_s
+        self.min_interval_s = min_interval_s
+        self.max_hdop = max_hdop
+        self.min_satellites = min_satellites
+        self._last_kept: Dict[str, tuple] = {}     # device_id -> (lat, lon, epoch)
+        self._totals = Counter()
+        self._by_device = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+    def check(self, fix: Dict[str, Any]) -> Optional[str]:
+        """
+        Decide whether to write fix.
+
+        Returns:
+            None if the fix should be written (it becomes the device's new
+            reference fix), otherwise the suppression reason
+        """
+        device_id = fix["device_id"]
+        reason = None
+        if self.enabled:
+            reason = self._quality_reason(fix)
+        with self._lock:
+            if self.enabled and reason is None:
+                reason = self._motion_reason(device_id, fix)
+            if reason is None:
+                epoch = _fix_epoch(fix)
+                last = self._last_kept.get(device_id)
+                if last is None or epoch >= last[2]:
+                    self._last_kept[device_id] = (fix["gps_lat"], fix["gps_lon"], epoch)
+            outcome = reason or "kept"
+            self._totals["received"] += 1
+            self._totals[outcome] += 1
+            self._by_device[device_id]["received"] += 1
+            self._by_device[device_id][outcome] += 1
+        return reason
+
+    def _quality_reason(self, fix: Dict[str, Any]) -> Optional[str]:
+        if fix.get("hdop") is not None and fix["hdop"] > self.max_hdop:
+            return SUPPRESS_HDOP
+        if fix.get("satellites") is not None and fix["satellites"] < self.min_satellites:
+            return SUPPRESS_SATELLITES
+        return None
+
+    def _motion_reason(self, device_id: str, fix: Dict[str, Any]) -> Optional[str]:
+        last = self._last_kept.get(device_id)
+        if last is None:
+            return None
+        elapsed = _fix_epoch(fix) - last[2]
+        if elapsed < 0:
+            return None
+        if elapsed < self.min_interval_s:
+            return SUPPRESS_RATE
+        if elapsed < self.heartbeat_s and \
+                haversine_m(last[0], last[1], fix["gps_lat"], fix["gps_lon"]) < self.min_distance_m:
+            return SUPPRESS_DUPLICATE
+        return None
+
+    def forget(self, device_id: str):
+        """Drop the reference fix of device_id, e.g. when writing the kept fix failed."""
+        with self._lock:
+            self._last_kept.pop(device_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counts of received/kept fixes and suppressions by reason, overall and per device."""
+        with self._lock:
+            totals = dict(self._totals)
+            devices = {device_id: dict(counts) for device_id, counts in self._by_device.items()}
+        received = totals.get("received", 0)
+        kept = totals.get("kept", 0)
+        return {
+            "enabled": self.enabled,
+            "received": received,
+            "kept": kept,
+            "suppressed": received - kept,
+            "suppressed_by": {k: v for k, v in totals.items() if k not in ("received", "kept")},
+            "devices": devices,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._last_kept.clear()
+            self._totals.clear()
+            self._by_device.clear()
+
+
+# Shared filter applied by device location ingest
+location_filter = LocationFilter()
@@ -0,0 +1,325 @@
+"""
+Map Tiles - GeoJSON tiles of tokens, summons and device tracks.
+
+The admin map requests /tiles/{layer}/{z}/{x}/{y} for the Web Mercator
+tiles in view, so the data it loads is bounded by the viewport rather
+than by how many rows exist. Each tile is a GeoJSON FeatureCollection:
+
+- tokens: clusters and single tokens of the tile, read from the shared
+  cluster index (TokenClusterIndex.tile).
+- summons: summon locations from the summons GiST index, merged into one
+  feature per TILE_GRID_PX px cell with a count and the newest summon.
+- tracks: device fixes from the device_locations GiST index drawn as one
+  line per device (split at gaps longer than TRACK_GAP_S), simplified to
+  the tile's pixel size. Track tiles read a TILE_BUFFER_PX margin so lines
+  continue across tile edges.
+
+Rendered tiles are cached on disk (utils.tile_cache.TileCache) until a
+write touches them. Tokens tiles are dropped as the cluster index picks
+up changed tokens; the summons and tracks layers follow the id watermark
+of their append-only tables and drop, at every zoom, the tiles each new
+row falls in. Updates and deletes of existing summons or fixes are not
+seen until the layer's cache is cleared.
+"""
+
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+import summon_db
+from services.cluster_index import TokenClusterIndex, mercator, tile_bounds, tile_of, token_clusters, unmercator
+from services.track_simplify import douglas_peucker
+from utils.tile_cache import TileCache
+
+_logger = logging.getLogger("summon.map_tiles")
+
+# Deepest zoom served (the admin map's maxZoom)
+TILE_MAX_ZOOM = int(os.getenv('TILE_MAX_ZOOM', '19'))
+
+# How often the summons/tracks layers look for new rows
+TILE_REFRESH_INTERVAL_S = float(os.getenv('TILE_REFRESH_INTERVAL_S', '5'))
+
+# Map tile edge in pixels
+TILE_SIZE_PX = 256
+
+# Summons closer than this many pixels are merged into one feature
+TILE_GRID_PX = 4
+
+# Most summons / device fixes read per tile (the newest are kept)
+TILE_MAX_SUMMONS = 5000
+TILE_MAX_TRACK_FIXES = 20000
+
+# Margin read around track tiles, in pixels
+TILE_BUFFER_PX = 16
+
+# A device silent for longer than this starts a new line
+TRACK_GAP_S = 300
+
+# New rows read per refresh, and ids re-read below the watermark so rows
+# committed out of id order (concurrent transactions) are not missed
+TILE_REFRESH_BATCH = 10000
+TILE_WATERMARK_OVERLAP = 100
+
+# Equatorial circumference of the Web Mercator sphere, meters
+EARTH_CIRCUMFERENCE_M = 40075016.686
+
+
+def tiles_covering(lat: float, lon: float, max_zoom: int = TILE_MAX_ZOOM,
+                   buffer_px: float = 0) -> Iterable[Tuple[int, int, int]]:
+    """(z, x, y) of every tile, zooms 0..max_zoom, within buffer_px of a point."""
+    mx, my = mercator(lat, lon)
+    margin = buffer_px / TILE_SIZE_PX
+    for z in range(max_zoom + 1):
+        n = 1 << z
+        x0, x1 = max(int(mx * n - margin), 0), min(int(mx * n + margin), n - 1)
+        y0, y1 = max(int(my * n - margin), 0), min(int(my * n + margin), n - 1)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                yield z, x, y
+
+
+def _iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+def _point(lat: float, lon: float, properties: dict) -> dict:
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [round(lon, 6), round(lat, 6)]},
+        "properties": properties,
+    }
+
+
+class TileLayer:
+    """A named tile layer: renders z/x/y to GeoJSON and keeps its cache valid."""
+
+    name = None
+
+    def __init__(self, cache: TileCache):
+        self.cache = cache
+
+    def refresh(self):
+        """Invalidate the cached tiles that changed since the last call."""
+
+    def features(self, z: int, x: int, y: int) -> List[dict]:
+        raise NotImplementedError
+
+    def render(self, z: int, x: int, y: int) -> bytes:
+        collection = {"type": "FeatureCollection", "features": self.features(z, x, y)}
+        return json.dumps(collection, separators=(",", ":"), default=str).encode("utf-8")
+
+    def tile(self, z: int, x: int, y: int) -> bytes:
+        """The tile as GeoJSON bytes, from the disk cache when still valid."""
+        self.refresh()
+        return self.cache.get(self.name, z, x, y, lambda: self.render(z, x, y))
+
+
+class TokenTileLayer(TileLayer):
+    """Clustered tokens from a TokenClusterIndex."""
+
+    name = "tokens"
+
+    def __init__(self, cache: TileCache, index: TokenClusterIndex = token_clusters,
+                 label: Optional[Callable[[dict], dict]] = None):
+        super().__init__(cache)
+        self.index = index
+        self.label = label
+        index.subscribe(self._changed)
+
+    def _changed(self, token: Optional[dict]):
+        if token is None:
+            # Reloaded: cached tiles may predate anything
+            self.cache.clear(self.name)
+        else:
+            self.cache.invalidate(self.name, tiles_covering(token["lat"], token["lon"]))
+
+    def refresh(self):
+        self.index.refresh()
+
+    def labels_changed(self):
+        """What label returns changed (e.g. a catalog edit): cached tiles carry the old labels."""
+        self.cache.clear(self.name)
+
+    def features(self, z, x, y):
+        features = []
+        for feature in self.index.tile(z, x, y):
+            if feature["type"] == "point" and self.label is not None:
+                feature = self.label(feature)
+            features.append(_point(feature["lat"], feature["lon"], feature))
+        return features
+
+
+class WatermarkTileLayer(TileLayer):
+    """
+    Layer over an append-only table with a serial id.
+
+    The highest id accounted for is saved next to the layer's tiles, so a
+    restarted process keeps every cached tile no new row has touched.
+    """
+
+    # Margin (pixels) a new row reaches into neighbouring tiles
+    buffer_px = 0
+
+    def __init__(self, cache: TileCache, refresh_interval_s: float = TILE_REFRESH_INTERVAL_S):
+        super().__init__(cache)
+        self.refresh_interval_s = refresh_interval_s
+        self._watermark = None
+        self._seen = set()                  # ids read in the overlap window
+        self._refreshed_at = None
+        self._refresh_lock = threading.Lock()
+
+    def points_since(self, after_id: Optional[int]) -> list:
+        """(id, lat, lon) rows with id > after_id (see summon_db.get_summon_points_since)."""
+        raise NotImplementedError
+
+    def _start(self):
+        state = self.cache.read_state(self.name)
+        if state is not None:
+            self._watermark = int(state)
+            return
+        # No record of what the cached tiles saw: start over from the newest row
+        rows = self.points_since(None)
+        self.cache.clear(self.name)
+        self._watermark = rows[0][0] if rows else 0
+        self.cache.write_state(self.name, str(self._watermark))
+
+    def refresh(self, force: bool = False):
+        """
+        Drop the tiles of rows added since the last refresh, at most once
+        per refresh_interval_s (unless force is set). Database errors are
+        logged and the cached tiles are kept.
+        """
+        if not force and self._refreshed_at is not None and \
+                time.monotonic() - self._refreshed_at < self.refresh_interval_s:
+            return
+        if not self._refresh_lock.acquire(blocking=self._refreshed_at is None):
+            return
+        try:
+            if self._watermark is None:
+                self._start()
+            rows = self.points_since(max(self._watermark - TILE_WATERMARK_OVERLAP, 0))
+            tiles = set()
+            for row_id, lat, lon in rows:
+                if row_id not in self._seen:
+                    tiles.update(tiles_covering(lat, lon, buffer_px=self.buffer_px))
+            if tiles:
+                self.cache.invalidate(self.name, tiles)
+            self._seen = {row[0] for row in rows}
+            if rows and rows[-1][0] > self._watermark:
+                self._watermark = rows[-1][0]
+                self.cache.write_state(self.name, str(self._watermark))
+        except Exception as e:
+            _logger.error("Tile layer %s refresh failed: %s", self.name, str(e))
+        finally:
+            self._refreshed_at = time.monotonic()
+            self._refresh_lock.release()
+
+
+class SummonTileLayer(WatermarkTileLayer):
+    """Summon locations, merged per TILE_GRID_PX cell."""
+
+    name = "summons"
+
+    def points_since(self, after_id):
+        return summon_db.get_summon_points_since(after_id, limit=TILE_REFRESH_BATCH)
+
+    def features(self, z, x, y):
+        scale = (1 << z) * (TILE_SIZE_PX // TILE_GRID_PX)
+        cells = {}
+        # Newest first, so the first summon seen in a cell is its newest
+        for summon in summon_db.get_summons_in_bbox(*tile_bounds(z, x, y), limit=TILE_MAX_SUMMONS):
+            lat, lon = summon["gps_lat"], summon["gps_lon"]
+            if tile_of(lat, lon, z) != (x, y):
+                continue  # On the shared edge; the neighbouring tile has it
+            mx, my = mercator(lat, lon)
+            cell = cells.get((int(mx * scale), int(my * scale)))
+            if cell is None:
+                cells[(int(mx * scale), int(my * scale))] = {"count": 1, "newest": summon}
+            else:
+                cell["count"] += 1
+        features = []
+        for cell in cells.values():
+            summon = cell["newest"]
+            features.append(_point(summon["gps_lat"], summon["gps_lon"], {
+                "count": cell["count"],
+                "id": summon["id"],
+                "summoned_object_type": summon["summoned_object_type"],
+                "summoning_player": summon["summoning_player"],
+                "summoned_player": summon["summoned_player"],
+                "timestamp_utc": summon["timestamp_utc"],
+            }))
+        return features
+
+
+class DeviceTrackTileLayer(WatermarkTileLayer):
+    """Device tracks, one simplified line per device and stretch of fixes."""
+
+    name = "tracks"
+    buffer_px = TILE_BUFFER_PX
+
+    def points_since(self, after_id):
+        return summon_db.get_device_location_points_since(after_id, limit=TILE_REFRESH_BATCH)
+
+    def features(self, z, x, y):
+        n = 1 << z
+        margin = TILE_BUFFER_PX / TILE_SIZE_PX
+        max_lat, min_lon = unmercator(max(x - margin, 0) / n, max(y - margin, 0) / n)
+        min_lat, max_lon = unmercator(min(x + 1 + margin, n) / n, min(y + 1 + margin, n) / n)
+        rows = summon_db.get_device_fixes_in_bbox(min_lon, min_lat, max_lon, max_lat,
+                                                  limit=TILE_MAX_TRACK_FIXES)
+        # One pixel of this tile, in meters
+        center_lat = (min_lat + max_lat) / 2
+        tolerance_m = EARTH_CIRCUMFERENCE_M * math.cos(math.radians(center_lat)) / (TILE_SIZE_PX * n)
+
+        features = []
+        start = 0
+        for i in range(1, len(rows) + 1):
+            if i < len(rows) and rows[i][0] == rows[start][0] and rows[i][4] - rows[i - 1][4] <= TRACK_GAP_S:
+                continue
+            features.append(self._line(rows[start:i], tolerance_m))
+            start = i
+        return features
+
+    @staticmethod
+    def _line(fixes: list, tolerance_m: float) -> dict:
+        device_id, player = fixes[0][0], fixes[-1][1]
+        properties = {
+            "device_id": device_id,
+            "player": player,
+            "start": _iso(fixes[0][4]),
+            "end": _iso(fixes[-1][4]),
+            "fixes": len(fixes),
+        }
+        if len(fixes) == 1:
+            return _point(fixes[0][2], fixes[0][3], properties)
+        lat = np.array([f[2] for f in fixes], dtype=float)
+        lon = np.array([f[3] for f in fixes], dtype=float)
+        keep = douglas_peucker(lat, lon, tolerance_m)
+        return {
+            "type": "Feature",
+            "geometry": {
+                "type": "LineString",
+                "coordinates": [[round(float(lon[i]), 6), round(float(lat[i]), 6)] for i in keep],
+            },
+            "properties": properties,
+        }
+
+
+def build_tile_layers(cache: TileCache, label: Optional[Callable[[dict], dict]] = None) -> Dict[str, TileLayer]:
+    """
+    The tile layers by name, sharing one cache. label maps a single token
+    from the cluster index to the properties the map shows for it.
+    """
+    layers = [
+        TokenTileLayer(cache, label=label),
+        SummonTileLayer(cache),
+        DeviceTrackTileLayer(cache),
+    ]
+    return {layer.name: layer for layer in layers}
@@ -3,9 +3,16 @@
 Handles all /nfc-event logic for the API (v3.4+).
 Supports NFC Token v1.1.1 format with GPS coordinates.
 """
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 import summon_db
 from datetime import datetime
+from utils.command_queue import command_queue, wait_all
+
+# Most scans accepted by one batch request
+MAX_NFC_BATCH = 500
+
+# Body fields that identify one scan attempt when no idempotency key is sent
+NFC_EVENT_IDENTITY_FIELDS = ("device_id", "timestamp")
 
 
 def parse_token_v1_1_1(data: Dict[str, Any]) -> Tuple[str, Optional[str], Optional[str]]:
@@ -33,107 +40,197 @@ def parse_token_v1_1_1(data: Dict[str, Any]) -> Tuple[str, Optional[str], Option
         return ("summon_entity", action, None)
 
 
-def handle_nfc_event(data: Dict[str, Any]) -> Dict[str, Any]:
+def _parse_nfc_event(data: Any) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
     """
-    Process NFC token scan event.
-    
-    Supports v1.1.1 token format:
-    {
-      "action": "piglin" or "give_diamond_sword",
-      "gps_lat": 40.7580,
-      "gps_lon": -105.3009,
-      "player": "WiryHealer4014",
-      "device_id": "ios-device-123",
-      "timestamp": "2026-01-05T12:00:00Z"
-    }
+    Validate one scan and extract its fields.
     
-    Writes token to database for nearby discovery and executes the action.
+    Returns:
+        (event, None) on success, or (None, error message)
     """
+    if not isinstance(data, dict):
+        return None, "Scan must be a JSON object"
+    
     # Validate required fields
     if "action" not in data or not data["action"]:
-        return {"status": "error", "error": "Missing required field: action"}
+        return None, "Missing required field: action"
     
     if "player" not in data or not data["player"]:
-        return {"status": "error", "error": "Missing required field: player"}
+        return None, "Missing required field: player"
     
     # Validate action is not empty after stripping whitespace
     action = str(data["action"]).strip()
     if not action:
-        return {"status": "error", "error": "Field 'action' cannot be empty"}
+        return None, "Field 'action' cannot be empty"
     
     # Parse v1.1.1 token format
     action_type, entity, item = parse_token_v1_1_1(data)
     
     # Additional validation: ensure we have entity or item
     if action_type == "summon_entity" and not entity:
-        return {"status": "error", "error": "Invalid action: entity name is empty"}
+        return None, "Invalid action: entity name is empty"
     
     if action_type == "give_item" and not item:
-        return {"status": "error", "error": "Invalid action: item name is empty after 'give_' prefix"}
-    
-    # Get optional GPS coordinates
-    gps_lat = data.get("gps_lat")
-    gps_lon = data.get("gps_lon")
-    
-    # Get other optional fields
-    player = data["player"]
-    device_id = data.get("device_id")
-    # Let database handle timestamp if not provided (ensures unique timestamps per scan)
-    timestamp = data.get("timestamp")
-    
-    # Write token to database if GPS coordinates present
-    token_id = None
-    token_write_error = None
-    if gps_lat is not None and gps_lon is not None:
+        return None, "Invalid action: item name is empty after 'give_' prefix"
+    
+    nfc_tag_uid = data.get("nfc_tag_uid") or None
+    if nfc_tag_uid is not None:
+        nfc_tag_uid = str(nfc_tag_uid).strip() or None
+    
+    return {
+        "action_type": action_type,
+        "entity": entity,
+        "item": item,
+        # Optional GPS coordinates
+        "gps_lat": data.get("gps_lat"),
+        "gps_lon": data.get("gps_lon"),
+        "player": data["player"],
+        "device_id": data.get("device_id"),
+        "nfc_tag_uid": nfc_tag_uid,
+        # Let database handle timestamp if not provided (ensures unique timestamps per scan)
+        "scanned_at": data.get("timestamp"),
+    }, None
+
+
+def _has_gps(event: Dict[str, Any]) -> bool:
+    return event["gps_lat"] is not None and event["gps_lon"] is not None
+
+
+def _build_command(event: Dict[str, Any]) -> str:
+    """Game command for a parsed scan."""
+    if event["action_type"] == "summon_entity":
+        return f"execute as @a[name={event['player']}] at @s run summon {event['entity']} ~ ~5 ~4"
+    return f"give {event['player']} {event['item']} 1"
+
+
+def _build_response(event: Dict[str, Any], cmd: str, sent: Optional[bool],
+                    scan: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    response = {"status": "ok", "action_type": event["action_type"], "executed": cmd, "sent": bool(sent)}
+    if sent is None:
+        # Still queued when the wait timed out; it will be sent, so a retry would repeat it
+        response["queued"] = True
+    if event["action_type"] == "summon_entity":
+        response["entity"] = event["entity"]
+    else:
+        response["item"] = event["item"]
+    if scan:
+        response["token_id"] = scan["token_id"]
+        response["gps"] = {"lat": event["gps_lat"], "lon": event["gps_lon"]}
+        response["scan_count"] = scan["scan_count"]
+    return response
+
+
+def _token_write_error(event: Dict[str, Any], error: str) -> Dict[str, Any]:
+    # GPS was provided but the token write failed: the action is not executed
+    return {
+        "status": "error",
+        "error": f"Failed to write token to database: {error}",
+        "action_type": event["action_type"],
+        "entity": event["entity"],
+        "item": event["item"]
+    }
+
+
+def handle_nfc_event(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Process NFC token scan event.
+    
+    Supports v1.1.1 token format:
+    {
+      "action": "piglin" or "give_diamond_sword",
+      "gps_lat": 40.7580,
+      "gps_lon": -105.3009,
+      "player": "WiryHealer4014",
+      "device_id": "ios-device-123",
+      "nfc_tag_uid": "04:A2:2B:1A:7F:61:80",  (optional)
+      "timestamp": "2026-01-05T12:00:00Z"
+    }
+    
+    Records the scan and executes the action. Scans carrying GPS create the
+    tag's token for nearby discovery on first sight; with nfc_tag_uid, later
+    scans of the same tag reuse that token and only append to the scan log.
+    """
+    event, error = _parse_nfc_event(data)
+    if error:
+        return {"status": "error", "error": error}
+    
+    # Record the scan (and the tag's token on first sight) if GPS coordinates present
+    scan = None
+    if _has_gps(event):
         try:
-            token_id = summon_db.insert_token(
-                action_type=action_type,
-                entity=entity,
-                item=item,
-                gps_lat=gps_lat,
-                gps_lon=gps_lon,
-                written_by=player,
-                device_id=device_id,
-                written_at=timestamp
-            )
-            print(f"[NFC] Successfully wrote token {token_id} at ({gps_lat}, {gps_lon}) - Entity: {entity}, Item: {item}")
+            scan = summon_db.record_nfc_scan(**event)
+            if scan["created"]:
+                print(f"[NFC] Successfully wrote token {scan['token_id']} at ({event['gps_lat']}, {event['gps_lon']}) - Entity: {event['entity']}, Item: {event['item']}")
+            else:
+                print(f"[NFC] Recorded scan #{scan['scan_count']} of token {scan['token_id']} (tag {event['nfc_tag_uid']})")
         except Exception as e:
-            token_write_error = str(e)
             print(f"[NFC] ERROR: Failed to write token: {e}")
             import traceback
             traceback.print_exc()
-            # Return error since GPS was provided but token write failed
-            return {
-                "status": "error",
-                "error": f"Failed to write token to database: {token_write_error}",
-                "action_type": action_type,
-                "entity": entity,
-                "item": item
-            }
-    
-    # Execute the action based on type
-    response = {"status": "ok", "action_type": action_type}
-    
-    if action_type == "summon_entity":
-        # Execute summon command
-        from utils.mc_send import send_command_to_minecraft
-        cmd = f"execute as @a[name={player}] at @s run summon {entity} ~ ~5 ~4"
-        sent = send_command_to_minecraft(cmd)
-        response["executed"] = cmd
-        response["sent"] = bool(sent)
-        response["entity"] = entity
-        
-    elif action_type == "give_item":
-        # Execute give command
-        from utils.mc_send import send_command_to_minecraft
-        cmd = f"give {player} {item} 1"
-        sent = send_command_to_minecraft(cmd)
-        response["executed"] = cmd
-        response["sent"] = bool(sent)
-        response["item"] = item
-    
-    if token_id:
-        response["token_id"] = token_id
-        response["gps"] = {"lat": gps_lat, "lon": gps_lon}
+            return _token_write_error(event, str(e))
     
-    return response
+    # Execute the action
+    from utils.mc_send import send_command_to_minecraft
+    cmd = _build_command(event)
+    sent = send_command_to_minecraft(cmd)
+    return _build_response(event, cmd, sent, scan)
+
+
+def handle_nfc_event_batch(scans: Any) -> Dict[str, Any]:
+    """
+    Process scans replayed by a scanner that was offline.
+    
+    Every scan is validated up front; the ones with GPS are recorded in one
+    database transaction (summon_db.record_nfc_scans), then the game
+    commands of all successful scans are queued back to back, in the order
+    given, and sent in as few screen invocations as possible.
+    
+    Returns:
+        status ok/partial/error and one result per scan (with its index),
+        shaped like the handle_nfc_event() response
+    """
+    if isinstance(scans, dict):
+        scans = scans.get("scans")
+    if not isinstance(scans, list):
+        return {"status": "error", "error": "Request body must be a JSON array of scans or {\"scans\": [...]}"}
+    if not scans:
+        return {"status": "error", "error": "At least one scan is required"}
+    if len(scans) > MAX_NFC_BATCH:
+        return {"status": "error", "error": f"At most {MAX_NFC_BATCH} scans per request"}
+    
+    results: List[Optional[Dict[str, Any]]] = [None] * len(scans)
+    events: Dict[int, Dict[str, Any]] = {}
+    for i, data in enumerate(scans):
+        event, error = _parse_nfc_event(data)
+        if error:
+            results[i] = {"status": "error", "error": error}
+        else:
+            events[i] = event
+    
+    # Record all GPS scans in one transaction
+    scan_rows: Dict[int, Dict[str, Any]] = {}
+    gps_indexes = [i for i, event in events.items() if _has_gps(event)]
+    if gps_indexes:
+        try:
+            recorded = summon_db.record_nfc_scans([events[i] for i in gps_indexes])
+        except Exception as e:
+            print(f"[NFC] ERROR: Failed to write batch tokens: {e}")
+            recorded = [e] * len(gps_indexes)
+        for i, outcome in zip(gps_indexes, recorded):
+            if isinstance(outcome, Exception):
+                results[i] = _token_write_error(events.pop(i), str(outcome))
+            else:
+                scan_rows[i] = outcome
+    
+    # Dispatch the commands of the surviving scans in order
+    order = sorted(events)
+    commands = [_build_command(events[i]) for i in order]
+    sent = wait_all(command_queue.submit_many(commands))
+    for i, cmd, was_sent in zip(order, commands, sent):
+        results[i] = _build_response(events[i], cmd, was_sent, scan_rows.get(i))
+    
+    for i, result in enumerate(results):
+        result["index"] = i
+    succeeded = sum(1 for r in results if r["status"] == "ok")
+    status = "ok" if succeeded == len(results) else ("partial" if succeeded else "error")
+    print(f"[NFC] Batch of {len(scans)} scans: {succeeded} ok, {len(scans) - succeeded} failed")
+    return {"status": status, "received": len(scans), "succeeded": succeeded, "results": results}
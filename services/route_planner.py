@@ -0,0 +1,202 @@
+"""
+Route Planner - ordered visiting routes over nearby tokens.
+
+Builds a pairwise great-circle distance matrix with NumPy, seeds a route
+with nearest-neighbor and improves it with 2-opt. The route is an open
+path that starts at the player's position and does not return.
+
+Used by the /api/tokens/route endpoint in services/token_service.py.
+"""
+
+from collections import OrderedDict
+from typing import Optional
+import threading
+import numpy as np
+
+# Earth radius in meters (matches token_service.EARTH_RADIUS_M)
+EARTH_RADIUS_M = 6371000
+
+# Geohash precision used for memoizing routes (7 chars ≈ 153m x 153m cell)
+ROUTE_CACHE_PRECISION = 7
+
+# Maximum number of memoized routes
+ROUTE_CACHE_SIZE = 1024
+
+# Upper bound on 2-opt passes (each pass is O(n²) and usually converges in a few)
+MAX_TWO_OPT_PASSES = 50
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def distance_matrix(lats, lons) -> np.ndarray:
+    """
+    Pairwise haversine distances between all points.
+    
+    Args:
+        lats, lons: Sequences of coordinates in degrees (same length)
+    
+    Returns:
+        (n, n) array of distances in meters
+    """
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearest_neighbor_route(matrix: np.ndarray, start: int = 0) -> list:
+    """
+    Greedy route: from start, always visit the closest unvisited point.
+    
+    Returns:
+        List of point indices beginning with start
+    """
+    n = matrix.shape[0]
+    visited = np.zeros(n, dtype=bool)
+    route = [start]
+    visited[start] = True
+    current = start
+    for _ in range(n - 1):
+        distances = np.where(visited, np.inf, matrix[current])
+        current = int(np.argmin(distances))
+        visited[current] = True
+        route.append(current)
+    return route
+
+
+def two_opt(route: list, matrix: np.ndarray) -> list:
+    """
+    Improve an open route with 2-opt segment reversals.
+    
+    The first stop (the player's position) stays fixed; the last stop is
+    free. For each i, the gain of reversing route[i..j] is computed for
+    every j at once.
+    
+    Returns:
+        Improved route (new list)
+    """
+    n = len(route)
+    if n < 4:
+        return list(route)
+    
+    # A zero-cost dummy node at the end turns the open path into a uniform formula
+    padded = np.zeros((matrix.shape[0] + 1, matrix.shape[1] + 1))
+    padded[:-1, :-1] = matrix
+    path = np.array(list(route) + [matrix.shape[0]])
+    
+    for _ in range(MAX_TWO_OPT_PASSES):
+        improved = False
+        for i in range(1, n - 1):
+            j = np.arange(i + 1, n)
+            a, b = path[i - 1], path[i]
+            c, d = path[j], path[j + 1]
+            delta = padded[a, c] + padded[b, d] - padded[a, b] - padded[c, d]
+            best = int(np.argmin(delta))
+            if delta[best] < -1e-9:
+                k = int(j[best])
+                path[i:k + 1] = path[i:k + 1][::-1]
+                improved = True
+        if not improved:
+            break
+    
+    return [int(p) for p in path[:-1]]
+
+
+def route_length(route: list, matrix: np.ndarray) -> float:
+    """Total length in meters of an open route."""
+    if len(route) < 2:
+        return 0.0
+    idx = np.asarray(route)
+    return float(matrix[idx[:-1], idx[1:]].sum())
+
+
+def plan_route(origin_lat: float, origin_lon: float, points: list) -> list:
+    """
+    Order points into a short visiting route starting at the origin.
+    
+    Args:
+        origin_lat, origin_lon: Player position
+        points: List of (lat, lon) tuples
+    
+    Returns:
+        List of indices into points, in visiting order
+    """
+    if not points:
+        return []
+    
+    lats = [origin_lat] + [p[0] for p in points]
+    lons = [origin_lon] + [p[1] for p in points]
+    matrix = distance_matrix(lats, lons)
+    
+    route = two_opt(nearest_neighbor_route(matrix, 0), matrix)
+    return [i - 1 for i in route[1:]]
+
+
+def geohash_encode(lat: float, lon: float, precision: int = ROUTE_CACHE_PRECISION) -> str:
+    """Encode a coordinate as a geohash string of the given length."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits = bits << 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+class RouteCache:
+    """
+    Bounded LRU memo of planned routes.
+    
+    Keys combine the origin's geohash cell, the query filters and the
+    candidate token set, so a route is reused only while the same tokens
+    are in play; any token added or removed changes the key.
+    """
+    
+    def __init__(self, max_size: int = ROUTE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(lat: float, lon: float, filters: tuple, token_ids: list) -> tuple:
+        return (geohash_encode(lat, lon), filters, tuple(sorted(token_ids)))
+    
+    def get(self, key: tuple) -> Optional[list]:
+        with self._lock:
+            order = self._entries.get(key)
+            if order is not None:
+                self._entries.move_to_end(key)
+            return order
+    
+    def put(self, key: tuple, order: list):
+        with self._lock:
+            self._entries[key] = order
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared cache for the /api/tokens/route endpoint
+route_cache = RouteCache()
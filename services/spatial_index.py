@@ -0,0 +1,187 @@
+"""
+Spatial Index - in-memory grid index of token positions.
+
+Answers "which tokens are within R meters of this point" without a
+database round trip. The index is loaded once from the tokens table and
+then refreshed incrementally (only rows created or rewritten since the last
+refresh), at most once per INDEX_REFRESH_INTERVAL_S, so callers on hot
+paths such as device location ingest never issue one query per request.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+import logging
+import math
+import os
+import threading
+import time
+import summon_db
+
+_logger = logging.getLogger("summon.spatial_index")
+
+# Grid cell size in degrees (0.01° ≈ 1.1 km of latitude)
+INDEX_CELL_SIZE_DEG = 0.01
+
+# How often the index picks up tokens written by other processes
+INDEX_REFRESH_INTERVAL_S = float(os.getenv('TOKEN_INDEX_REFRESH_INTERVAL_S', '10'))
+
+# Re-read this much history on each refresh so rows committed out of
+# updated_at order (concurrent transactions) are not missed
+INDEX_REFRESH_OVERLAP = timedelta(seconds=5)
+
+# Earth radius in meters (matches token_service.EARTH_RADIUS_M)
+EARTH_RADIUS_M = 6371000
+
+# Meters per degree of latitude
+METERS_PER_DEG_LAT = 111320.0
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in meters."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    a = (
+        math.sin(math.radians(lat2 - lat1) / 2) ** 2 +
+        math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+class TokenSpatialIndex:
+    """
+    Uniform lat/lon grid of tokens keyed by token_id.
+    
+    Tokens are stored as dicts with token_id, action_type, entity, item,
+    lat, lon, written_by, written_at and updated_at.
+    """
+    
+    def __init__(self, cell_size_deg: float = INDEX_CELL_SIZE_DEG,
+                 refresh_interval_s: float = INDEX_REFRESH_INTERVAL_S):
+        self.cell_size_deg = cell_size_deg
+        self.refresh_interval_s = refresh_interval_s
+        self._cells = defaultdict(dict)     # (ix, iy) -> {token_id: token}
+        self._tokens = {}                   # token_id -> token
+        self._watermark = None              # Highest updated_at seen
+        self._refreshed_at = None           # time.monotonic() of the last load/refresh
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._tokens)
+    
+    def _cell(self, lat: float, lon: float) -> tuple:
+        return (math.floor(lon / self.cell_size_deg), math.floor(lat / self.cell_size_deg))
+    
+    @staticmethod
+    def _normalize(row: dict) -> dict:
+        """Convert a tokens row (summon_db.get_tokens_since) into an index entry."""
+        return {
+            "token_id": str(row["token_id"]),
+            "action_type": row.get("action_type"),
+            "entity": row.get("entity"),
+            "item": row.get("item"),
+            "lat": float(row.get("lat", row.get("gps_write_lat"))),
+            "lon": float(row.get("lon", row.get("gps_write_lon"))),
+            "written_by": row.get("written_by"),
+            "written_at": row.get("written_at"),
+            "updated_at": row.get("updated_at", row.get("created_at")),
+        }
+    
+    def add(self, row: dict):
+        """Insert or move a token."""
+        token = self._normalize(row)
+        with self._lock:
+            old = self._tokens.get(token["token_id"])
+            if old is not None:
+                self._unplace(old)
+            self._tokens[token["token_id"]] = token
+            self._cells[self._cell(token["lat"], token["lon"])][token["token_id"]] = token
+            updated_at = token["updated_at"]
+            if updated_at is not None and (self._watermark is None or updated_at > self._watermark):
+                self._watermark = updated_at
+    
+    def remove(self, token_id: str):
+        """Drop a token if present."""
+        with self._lock:
+            old = self._tokens.pop(str(token_id), None)
+            if old is not None:
+                self._unplace(old)
+    
+    def _unplace(self, token: dict):
+        """Take a token out of its grid cell, dropping the cell once empty."""
+        cell = self._cell(token["lat"], token["lon"])
+        self._cells[cell].pop(token["token_id"], None)
+        if not self._cells[cell]:
+            del self._cells[cell]
+    
+    def load(self, rows: list):
+        """Replace the index contents with rows."""
+        with self._lock:
+            self._cells.clear()
+            self._tokens.clear()
+            self._watermark = None
+            for row in rows:
+                self.add(row)
+            self._refreshed_at = time.monotonic()
+    
+    def refresh(self, force: bool = False):
+        """
+        Bring the index up to date with the tokens table.
+        
+        The first call loads every token; later calls only fetch rows newer
+        than the watermark, and only once refresh_interval_s has elapsed
+        (unless force is set). A refresh already running in another thread
+        is not duplicated - callers keep using the current contents. Database
+        errors are logged and the stale index is kept.
+        """
+        if not force and self._refreshed_at is not None and \
+                time.monotonic() - self._refreshed_at < self.refresh_interval_s:
+            return
+        if not self._refresh_lock.acquire(blocking=self._refreshed_at is None):
+            return
+        try:
+            if self._refreshed_at is None:
+                self.load(summon_db.get_tokens_since(None))
+                return
+            since = self._watermark - INDEX_REFRESH_OVERLAP if self._watermark is not None else None
+            rows = summon_db.get_tokens_since(since)
+            with self._lock:
+                for row in rows:
+                    self.add(row)
+                self._refreshed_at = time.monotonic()
+        except Exception as e:
+            _logger.error("Token index refresh failed: %s", str(e))
+            # Back off until the next interval instead of retrying on every call
+            self._refreshed_at = time.monotonic()
+        finally:
+            self._refresh_lock.release()
+    
+    def query_radius(self, lat: float, lon: float, radius_m: float) -> list:
+        """
+        Find tokens within radius_m of (lat, lon).
+        
+        Returns:
+            List of (distance_m, token) tuples sorted by distance
+        """
+        dlat = radius_m / METERS_PER_DEG_LAT
+        dlon = radius_m / (METERS_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+        min_x, min_y = self._cell(lat - dlat, lon - dlon)
+        max_x, max_y = self._cell(lat + dlat, lon + dlon)
+        
+        results = []
+        with self._lock:
+            for ix in range(min_x, max_x + 1):
+                for iy in range(min_y, max_y + 1):
+                    cell = self._cells.get((ix, iy))
+                    if not cell:
+                        continue
+                    for token in cell.values():
+                        distance = haversine_m(lat, lon, token["lat"], token["lon"])
+                        if distance <= radius_m:
+                            results.append((distance, token))
+        results.sort(key=lambda r: r[0])
+        return results
+
+
+# Shared index of all tokens with GPS coordinates
+token_index = TokenSpatialIndex()
@@ -1,7 +1,7 @@
 from fastapi import HTTPException
 from typing import Dict, Any
 import uuid
-from summon_db import insert_summon, insert_token
+from summon_db import insert_summon_with_token
 from utils.mc_send import send_command_to_minecraft
 from debounce_service import check_summon_debounce, format_debounce_error
 from debounce_config import DEBOUNCE_STRICT_MODE, get_config_summary
@@ -146,34 +146,26 @@ def handle_summon(data: Dict[str, Any]) -> Dict[str, Any]:
     if gps_lon < -180 or gps_lon > 180:
         raise HTTPException(status_code=400, detail="Invalid gps_lon: must be between -180 and 180")
 
-    # Store summon request in DB with GPS coordinates
-    insert_summon(
-        data["server_ip"],
-        data["server_port"],
-        data["summoned_object_type"],
-        data["summoning_player"],
-        data["summoned_player"],
-        data["timestamp"],
-        gps_lat,
-        gps_lon
-    )
-    
-    # Create token for nearby discovery - GPS coordinates are now required
+    # Store the summon and its discovery token together (one statement, one
+    # transaction) - GPS coordinates are required, so a token write failure
+    # must fail the request without leaving the summon row behind
     entity = data.get("entity_summoned") or data.get("minecraft_id") or data.get("summoned_object_type")
     try:
-        token_id = insert_token(
-            action_type="summon_entity",
+        _, token_id = insert_summon_with_token(
+            data["server_ip"],
+            data["server_port"],
+            data["summoned_object_type"],
+            data["summoning_player"],
+            data["summoned_player"],
+            data["timestamp"],
+            gps_lat,
+            gps_lon,
             entity=entity,
-            gps_lat=gps_lat,
-            gps_lon=gps_lon,
-            written_by=data["summoning_player"],
             device_id=data.get("device_id"),
-            nfc_tag_uid=data.get("nfc_tag_uid"),
-            written_at=data["timestamp"]
+            nfc_tag_uid=data.get("nfc_tag_uid")
         )
     except Exception as e:
-        # Since GPS is required, token write failure should fail the request
-        print(f"ERROR: Failed to create discovery token: {e}")
+        print(f"ERROR: Failed to store summon and discovery token: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to store token: {str(e)}")
 
     # Build summon command using the target player and the entity type fields.
@@ -7,10 +7,16 @@ ESP32 devices to discover nearby NFC tokens and navigate to them.
 Spec: docs/api/api-v3.6.1-proposed.md
 """
 
-from fastapi import APIRouter, HTTPException, Header, Query, Request
+from fastapi import APIRouter, HTTPException, Header, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from typing import Optional
+import json
 import math
+import time
+import numpy as np
 import summon_db
+from services.route_planner import plan_route, route_cache
+from utils.response_format import negotiate_response
 
 router = APIRouter()
 
@@ -20,6 +26,35 @@ EXPECTED_API_KEY = "super-secret-test-key22"
 # Earth radius in meters (for haversine calculations)
 EARTH_RADIUS_M = 6371000
 
+# WGS84 ellipsoid (PostGIS geography distances)
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+
+# Nearby stream tuning (/api/tokens/nearby/stream)
+STREAM_REQUERY_DISTANCE_M = 25.0   # Re-run the spatial query after the device moves this far
+STREAM_REQUERY_INTERVAL_S = 30.0   # ...or after this many seconds, to pick up new tokens
+STREAM_DISTANCE_EPSILON_M = 1.0    # Smallest distance change pushed to the device
+STREAM_BEARING_EPSILON = 1.0       # Smallest bearing change (degrees) pushed to the device
+
+# Allowed filter values (mirrors the /api/tokens/nearby query validation)
+NEARBY_ACTION_TYPES = ("summon_entity", "give_item", "set_time")
+NEARBY_MOB_TYPES = ("hostile", "neutral", "passive")
+
+# Maximum number of origins accepted by /api/tokens/nearby/batch
+MAX_BATCH_ORIGINS = 100
+
+# Batch origins in the same grid cell (this many meters on a side) with the
+# same filters share one KNN sweep from their centroid
+NEARBY_GROUP_CELL_M = 250.0
+
+# Share of a group sweep's reach trusted when certifying a member's result
+# (the sweep orders by sphere distance, members re-rank with haversine)
+NEARBY_GROUP_REACH_MARGIN = 0.99
+
+# A group sweep fetches this many times the largest member limit, plus one
+# row per member
+NEARBY_GROUP_OVERFETCH = 4
+
 
 def validate_api_key(x_api_key: str = Header(...)):
     """Validate the API key from request headers."""
@@ -80,6 +115,59 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     return distance
 
 
+def spheroid_distance(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Distance in meters on the WGS84 ellipsoid (Vincenty's inverse formula).
+    
+    Matches ST_Distance() on geography, which the nearby queries report as
+    distance_m, to well under a millimeter. Arguments are scalars or arrays
+    of degrees; returns an array of distances.
+    """
+    b = WGS84_A * (1 - WGS84_F)
+    lat1, lon1, lat2, lon2 = (np.asarray(v, dtype=np.float64) for v in (lat1, lon1, lat2, lon2))
+    L = np.radians(lon2 - lon1)
+    U1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    sin_u1, cos_u1, sin_u2, cos_u2 = np.sin(U1), np.cos(U1), np.sin(U2), np.cos(U2)
+    
+    # Iterate lambda per pair; a pair keeps the terms of the step it converged
+    # in, so its distance does not depend on the rest of the batch
+    lam = L
+    active = np.ones(np.broadcast(lat1, lon1, lat2, lon2).shape, dtype=bool)
+    sin_sigma = cos_sigma = sigma = cos2_alpha = cos_2sigma_m = np.zeros(active.shape)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(100):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            step_sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+            step_cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sin_sigma = np.where(active, step_sin_sigma, sin_sigma)
+            cos_sigma = np.where(active, step_cos_sigma, cos_sigma)
+            sigma = np.where(active, np.arctan2(step_sin_sigma, step_cos_sigma), sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos2_alpha = np.where(active, 1 - sin_alpha ** 2, cos2_alpha)
+            # Zero on equatorial lines
+            cos_2sigma_m = np.where(active, np.where(cos2_alpha == 0, 0.0,
+                                                     cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha), cos_2sigma_m)
+            C = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+            step_lam = L + (1 - C) * WGS84_F * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2))
+            )
+            converged = np.abs(step_lam - lam) < 1e-12
+            lam = np.where(active, step_lam, lam)
+            active = active & ~converged
+            if not active.any():
+                break
+    
+    u2 = cos2_alpha * (WGS84_A ** 2 - b ** 2) / b ** 2
+    A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+    B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+    delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+        cos_sigma * (-1 + 2 * cos_2sigma_m ** 2) -
+        B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+    ))
+    return b * A * (sigma - delta_sigma)
+
+
 def calculate_bearing(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
     Calculate the initial bearing from origin to destination.
@@ -119,6 +207,67 @@ def calculate_bearing(lat1: float, lon1: float, lat2: float, lon2: float) -> flo
     return bearing
 
 
+
+def format_nearby_token(token: dict, lat: float, lon: float) -> Optional[dict]:
+    """
+    Build the response object for one row returned by summon_db.get_nearby_tokens().
+    
+    Args:
+        token: Database row (dict) with token, distance and catalog metadata
+        lat, lon: Search origin used for the bearing calculation
+    
+    Returns:
+        Token response dict, or None if the row has no GPS coordinates
+    """
+    token_lat = token.get('lat')
+    token_lon = token.get('lon')
+    
+    if token_lat is None or token_lon is None:
+        return None
+    
+    # Calculate bearing using Python (more precise than SQL for small distances)
+    bearing = calculate_bearing(lat, lon, token_lat, token_lon)
+    
+    # Build response object based on action type
+    token_response = {
+        "token_id": str(token['token_id']),
+        "action_type": token['action_type'],
+        "position": {
+            "lat": token_lat,
+            "lon": token_lon
+        },
+        "distance_m": round(float(token['distance_m']), 1),
+        "bearing": round(bearing, 1),
+        "written_by": token.get('written_by'),
+        "written_at": token.get('written_at').isoformat() if token.get('written_at') else None
+    }
+    
+    # Add entity-specific fields
+    if token['action_type'] == 'summon_entity' and token.get('entity'):
+        token_response.update({
+            "entity": token['entity'],
+            "mob_type": token.get('mob_type'),
+            "name": token.get('mob_name', token['entity']),
+            "rarity": token.get('mob_rarity'),
+            "image_url": token.get('mob_image')
+        })
+    
+    # Add item-specific fields
+    elif token['action_type'] == 'give_item' and token.get('item'):
+        token_response.update({
+            "item": token['item'],
+            "name": token.get('item_name', token['item']),
+            "rarity": token.get('item_rarity'),
+            "image_url": token.get('item_image')
+        })
+    
+    # Add time-specific fields (if we have set_time actions)
+    elif token['action_type'] == 'set_time':
+        token_response["name"] = "Time Change"
+    
+    return token_response
+
+
 @router.post("/api/tokens/register")
 async def register_token(
     request: Request,
@@ -263,6 +412,7 @@ async def get_nearby_tokens(
     action_type: Optional[str] = Query(None, regex="^(summon_entity|give_item|set_time)$"),
     mob_type: Optional[str] = Query(None, regex="^(hostile|neutral|passive)$"),
     x_api_key: str = Header(...),
+    accept: Optional[str] = Header(None),
 ):
     """
     Find N nearest NFC tokens within radius_km sorted by distance.
@@ -274,8 +424,80 @@ async def get_nearby_tokens(
     # Validate API key
     validate_api_key(x_api_key)
     
+    filters = {"limit": limit, "radius_km": radius_km, "action_type": action_type, "mob_type": mob_type}
+    try:
+        response = query_nearby(lat, lon, filters)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    
+    # Return response (JSON, or MessagePack if the device asks for it)
+    return negotiate_response(response, accept)
+
+
+def query_nearby(lat: float, lon: float, filters: dict) -> dict:
+    """
+    Build the /api/tokens/nearby response body for one validated query.
+    
+    Shared with the device channel (/api/device/ws) nearby messages.
+    
+    Args:
+        lat, lon: Current position
+        filters: limit, radius_km, action_type, mob_type (see parse_nearby_params)
+    """
+    # Query database for N nearest tokens within radius
+    tokens = summon_db.get_nearby_tokens(
+        lat=lat,
+        lon=lon,
+        radius_km=filters["radius_km"],
+        limit=filters["limit"],
+        action_type=filters["action_type"],
+        mob_type=filters["mob_type"]
+    )
+    
+    # Process results: add bearing and format response
+    result_tokens = []
+    for token in tokens:
+        token_response = format_nearby_token(token, lat, lon)
+        if token_response is not None:
+            result_tokens.append(token_response)
+    
+    return {
+        "status": "ok",
+        "current_position": {
+            "lat": lat,
+            "lon": lon
+        },
+        "search_radius_km": filters["radius_km"],
+        "count": len(result_tokens),
+        "tokens": result_tokens
+    }
+
+
+
+@router.get("/api/tokens/route")
+async def get_token_route(
+    lat: float = Query(..., ge=-90, le=90, description="Current latitude"),
+    lon: float = Query(..., ge=-180, le=180, description="Current longitude"),
+    limit: int = Query(10, ge=1, le=50, description="Number of tokens to visit"),
+    radius_km: float = Query(5.0, ge=0.1, le=50.0, description="Search radius in kilometers"),
+    action_type: Optional[str] = Query(None, regex="^(summon_entity|give_item|set_time)$"),
+    mob_type: Optional[str] = Query(None, regex="^(hostile|neutral|passive)$"),
+    x_api_key: str = Header(...),
+    accept: Optional[str] = Header(None),
+):
+    """
+    Plan an ordered route that visits the N nearest tokens.
+    
+    Takes the same candidates as /api/tokens/nearby and orders them with
+    nearest-neighbor + 2-opt over a pairwise distance matrix. Each stop carries
+    the usual token fields (distance_m/bearing from the current position) plus
+    the leg from the previous stop.
+    
+    Routes are memoized per geohash cell (~150 m) and candidate token set.
+    """
+    validate_api_key(x_api_key)
+    
     try:
-        # Query database for N nearest tokens within radius
         tokens = summon_db.get_nearby_tokens(
             lat=lat,
             lon=lon,
@@ -284,72 +506,466 @@ async def get_nearby_tokens(
             action_type=action_type,
             mob_type=mob_type
         )
-        
-        # Process results: add bearing and format response
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    
+    candidates = [t for t in (format_nearby_token(token, lat, lon) for token in tokens) if t is not None]
+    by_id = {t["token_id"]: t for t in candidates}
+    
+    cache_key = route_cache.make_key(lat, lon, (limit, action_type, mob_type), list(by_id))
+    order = route_cache.get(cache_key)
+    if order is None:
+        points = [(t["position"]["lat"], t["position"]["lon"]) for t in candidates]
+        order = [candidates[i]["token_id"] for i in plan_route(lat, lon, points)]
+        route_cache.put(cache_key, order)
+    
+    stops = []
+    total_distance = 0.0
+    prev_lat, prev_lon = lat, lon
+    for position, token_id in enumerate(order, start=1):
+        token = by_id[token_id]
+        token_lat = token["position"]["lat"]
+        token_lon = token["position"]["lon"]
+        leg = haversine_distance(prev_lat, prev_lon, token_lat, token_lon)
+        total_distance += leg
+        stops.append({
+            "order": position,
+            **token,
+            "leg_distance_m": round(leg, 1),
+            "leg_bearing": round(calculate_bearing(prev_lat, prev_lon, token_lat, token_lon), 1),
+            "cumulative_distance_m": round(total_distance, 1)
+        })
+        prev_lat, prev_lon = token_lat, token_lon
+    
+    return negotiate_response({
+        "status": "ok",
+        "current_position": {
+            "lat": lat,
+            "lon": lon
+        },
+        "search_radius_km": radius_km,
+        "count": len(stops),
+        "total_distance_m": round(total_distance, 1),
+        "stops": stops
+    }, accept)
+
+
+@router.post("/api/tokens/nearby/batch")
+async def get_nearby_tokens_batch(
+    request: Request,
+    x_api_key: str = Header(...),
+    accept: Optional[str] = Header(None)
+):
+    """
+    Answer many nearby queries (one per device/origin) in one request.
+    
+    Request body:
+        {
+          "origins": [
+            {"id": "esp32-001", "lat": 40.7580, "lon": -105.3009, "limit": 10},
+            {"id": "esp32-002", "lat": 40.7590, "lon": -105.3009, "action_type": "give_item"}
+          ]
+        }
+    
+    Each origin accepts the same fields and limits as the /api/tokens/nearby
+    query parameters; "id" is optional and echoed back. Nearby origins share
+    their spatial search (see nearby_batch).
+    """
+    validate_api_key(x_api_key)
+    
+    data = await request.json()
+    if not isinstance(data, dict) or not isinstance(data.get("origins"), list):
+        raise HTTPException(
+            status_code=400,
+            detail={"status": "error", "error": "Request body must be a JSON object with an 'origins' array"}
+        )
+    
+    origins = data["origins"]
+    if len(origins) > MAX_BATCH_ORIGINS:
+        raise HTTPException(
+            status_code=400,
+            detail={"status": "error", "error": f"Too many origins: maximum is {MAX_BATCH_ORIGINS}"}
+        )
+    
+    # Validate every origin up front and report all errors together
+    parsed = []
+    errors = []
+    for index, origin in enumerate(origins):
+        try:
+            parsed.append(parse_nearby_params(origin))
+        except ValueError as e:
+            errors.append({
+                "index": index,
+                "id": origin.get("id") if isinstance(origin, dict) else None,
+                "message": str(e)
+            })
+    if errors:
+        raise HTTPException(status_code=400, detail={"status": "error", "errors": errors})
+    
+    try:
+        origin_rows = nearby_batch(parsed)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    
+    results = []
+    for origin, (lat, lon, filters), rows in zip(origins, parsed, origin_rows):
         result_tokens = []
-        for token in tokens:
-            token_lat = token.get('lat')
-            token_lon = token.get('lon')
-            
-            if token_lat is None or token_lon is None:
-                continue
-            
-            # Calculate bearing using Python (more precise than SQL for small distances)
-            bearing = calculate_bearing(lat, lon, token_lat, token_lon)
-            
-            # Build response object based on action type
-            token_response = {
-                "token_id": str(token['token_id']),
-                "action_type": token['action_type'],
-                "position": {
-                    "lat": token_lat,
-                    "lon": token_lon
-                },
-                "distance_m": round(float(token['distance_m']), 1),
-                "bearing": round(bearing, 1),
-                "written_by": token.get('written_by'),
-                "written_at": token.get('written_at').isoformat() if token.get('written_at') else None
-            }
-            
-            # Add entity-specific fields
-            if token['action_type'] == 'summon_entity' and token.get('entity'):
-                token_response.update({
-                    "entity": token['entity'],
-                    "mob_type": token.get('mob_type'),
-                    "name": token.get('mob_name', token['entity']),
-                    "rarity": token.get('mob_rarity'),
-                    "image_url": token.get('mob_image')
-                })
-            
-            # Add item-specific fields
-            elif token['action_type'] == 'give_item' and token.get('item'):
-                token_response.update({
-                    "item": token['item'],
-                    "name": token.get('item_name', token['item']),
-                    "rarity": token.get('item_rarity'),
-                    "image_url": token.get('item_image')
-                })
-            
-            # Add time-specific fields (if we have set_time actions)
-            elif token['action_type'] == 'set_time':
-                token_response["name"] = "Time Change"
-            
-            result_tokens.append(token_response)
+        for token in rows:
+            token_response = format_nearby_token(token, lat, lon)
+            if token_response is not None:
+                result_tokens.append(token_response)
         
-        # Return response
-        return {
-            "status": "ok",
+        results.append({
+            "id": origin.get("id"),
             "current_position": {
                 "lat": lat,
                 "lon": lon
             },
-            "search_radius_km": radius_km,
+            "search_radius_km": filters["radius_km"],
             "count": len(result_tokens),
             "tokens": result_tokens
+        })
+    
+    return negotiate_response({
+        "status": "ok",
+        "count": len(results),
+        "results": results
+    }, accept)
+
+
+def nearby_batch(parsed: list) -> list:
+    """
+    The nearest tokens for many origins, sharing the spatial search.
+    
+    Origins with the same filters in the same NEARBY_GROUP_CELL_M grid cell
+    form a group, answered by one KNN sweep from the group's centroid that
+    fetches extra candidates. Each member re-ranks the candidates by its
+    own distance. The result is exact when the member's last neighbour is
+    nearer than any token the sweep left out could be: the sweep's reach
+    minus the member's offset from the centroid. Members that cannot be
+    certified get their own KNN in one more round trip. Lone origins get
+    their own KNN in the first one. Identical origins share a query.
+    Grouped rows get distance_m from spheroid_distance(), so an origin's
+    distances do not depend on how it was batched.
+    
+    Args:
+        parsed: (lat, lon, filters) per origin, from parse_nearby_params()
+    
+    Returns:
+        Rows per origin (as summon_db.get_nearby_tokens_batch), nearest first
+    """
+    cell_deg = NEARBY_GROUP_CELL_M / 111320.0
+    groups = {}
+    for i, (lat, lon, filters) in enumerate(parsed):
+        key = (math.floor(lat / cell_deg), math.floor(lon / cell_deg), filters["action_type"], filters["mob_type"])
+        groups.setdefault(key, []).append(i)
+    
+    queries = []        # get_nearby_tokens_batch() origins
+    query_of = {}       # exact (lat, lon, action_type, mob_type) -> index in queries
+    sweeps = []         # (query index, centroid lat, centroid lon, member indexes)
+    
+    def own_query(i):
+        lat, lon, filters = parsed[i]
+        key = (lat, lon, filters["action_type"], filters["mob_type"])
+        if key not in query_of:
+            query_of[key] = len(queries)
+            queries.append({"lat": lat, "lon": lon, "limit": filters["limit"],
+                            "action_type": filters["action_type"], "mob_type": filters["mob_type"]})
+        queries[query_of[key]]["limit"] = max(queries[query_of[key]]["limit"], filters["limit"])
+        return query_of[key]
+    
+    results = [None] * len(parsed)
+    direct = {}
+    for (_, _, action_type, mob_type), members in groups.items():
+        positions = {(parsed[i][0], parsed[i][1]) for i in members}
+        if len(positions) == 1:
+            for i in members:
+                direct[i] = own_query(i)
+            continue
+        center_lat = sum(parsed[i][0] for i in members) / len(members)
+        center_lon = sum(parsed[i][1] for i in members) / len(members)
+        limit = NEARBY_GROUP_OVERFETCH * max(parsed[i][2]["limit"] for i in members) + len(members)
+        sweeps.append((len(queries), center_lat, center_lon, members))
+        queries.append({"lat": center_lat, "lon": center_lon, "limit": limit,
+                        "action_type": action_type, "mob_type": mob_type})
+    
+    rows = summon_db.get_nearby_tokens_batch(queries)
+    for i, q in direct.items():
+        results[i] = rows[q][:parsed[i][2]["limit"]]
+    
+    grouped, uncertified = [], []
+    for q, center_lat, center_lon, members in sweeps:
+        candidates = rows[q]
+        # Every token within reach of the centroid was fetched
+        exhaustive = len(candidates) < queries[q]["limit"]
+        reach = float(candidates[-1]["distance_m"]) if candidates else 0.0
+        for i in members:
+            lat, lon, filters = parsed[i]
+            ranked = sorted(
+                ((haversine_distance(lat, lon, row["lat"], row["lon"]), row) for row in candidates),
+                key=lambda pair: pair[0]
+            )[:filters["limit"]]
+            offset = haversine_distance(lat, lon, center_lat, center_lon)
+            if exhaustive or (len(ranked) == filters["limit"] and
+                              ranked[-1][0] <= reach * NEARBY_GROUP_REACH_MARGIN - offset):
+                results[i] = [row for _, row in ranked]
+                grouped.append(i)
+            else:
+                uncertified.append(i)
+    
+    # Like the KNN search, rows are picked by sphere distance but reported
+    # and ordered by the spheroid distance_m the database returns
+    pairs = [(parsed[i][0], parsed[i][1], row["lat"], row["lon"]) for i in grouped for row in results[i]]
+    if pairs:
+        distances = iter(spheroid_distance(*np.array(pairs, dtype=np.float64).T).tolist())
+        for i in grouped:
+            results[i] = sorted(({**row, "distance_m": next(distances)} for row in results[i]),
+                                key=lambda row: row["distance_m"])
+    
+    if uncertified:
+        queries, query_of = [], {}
+        fallback = {i: own_query(i) for i in uncertified}
+        rows = summon_db.get_nearby_tokens_batch(queries)
+        for i, q in fallback.items():
+            results[i] = rows[q][:parsed[i][2]["limit"]]
+    return results
+
+
+def parse_nearby_params(message: dict, defaults: Optional[dict] = None) -> tuple[float, float, dict]:
+    """
+    Validate a nearby query given as a JSON object (stream updates, batch origins).
+    
+    Applies the same limits as the /api/tokens/nearby query parameters.
+    
+    Args:
+        message: Dict with lat, lon and optional limit, radius_km, action_type, mob_type
+        defaults: Filter values to start from (defaults to the /nearby defaults)
+    
+    Returns:
+        Tuple of (lat, lon, filters)
+    
+    Raises:
+        ValueError: If a field is missing or out of range
+    """
+    if not isinstance(message, dict):
+        raise ValueError("Message must be a JSON object")
+    
+    try:
+        lat = float(message["lat"])
+        lon = float(message["lon"])
+    except KeyError as e:
+        raise ValueError(f"Missing required field: {e.args[0]}")
+    except (ValueError, TypeError):
+        raise ValueError("lat and lon must be numbers")
+    if lat < -90 or lat > 90:
+        raise ValueError("Invalid lat: must be between -90 and 90")
+    if lon < -180 or lon > 180:
+        raise ValueError("Invalid lon: must be between -180 and 180")
+    
+    filters = dict(defaults) if defaults else {"limit": 10, "radius_km": 5.0, "action_type": None, "mob_type": None}
+    if "limit" in message:
+        try:
+            filters["limit"] = int(message["limit"])
+        except (ValueError, TypeError):
+            raise ValueError("limit must be an integer")
+        if filters["limit"] < 1 or filters["limit"] > 50:
+            raise ValueError("Invalid limit: must be between 1 and 50")
+    if "radius_km" in message:
+        try:
+            filters["radius_km"] = float(message["radius_km"])
+        except (ValueError, TypeError):
+            raise ValueError("radius_km must be a number")
+        if filters["radius_km"] < 0.1 or filters["radius_km"] > 50.0:
+            raise ValueError("Invalid radius_km: must be between 0.1 and 50")
+    if "action_type" in message:
+        if message["action_type"] is not None and message["action_type"] not in NEARBY_ACTION_TYPES:
+            raise ValueError(f"Invalid action_type: must be one of {', '.join(NEARBY_ACTION_TYPES)}")
+        filters["action_type"] = message["action_type"]
+    if "mob_type" in message:
+        if message["mob_type"] is not None and message["mob_type"] not in NEARBY_MOB_TYPES:
+            raise ValueError(f"Invalid mob_type: must be one of {', '.join(NEARBY_MOB_TYPES)}")
+        filters["mob_type"] = message["mob_type"]
+    
+    return lat, lon, filters
+
+
+def diff_nearby(previous: dict, current: dict) -> dict:
+    """
+    Compare two nearby snapshots (token_id -> token response dict).
+    
+    Returns:
+        Dict with:
+        - entered: full token objects that joined the nearby set
+        - exited: token_ids that left the nearby set
+        - updated: {token_id, distance_m, bearing} for tokens whose distance or
+          bearing moved by at least STREAM_DISTANCE_EPSILON_M / STREAM_BEARING_EPSILON
+    """
+    entered = [token for token_id, token in current.items() if token_id not in previous]
+    exited = [token_id for token_id in previous if token_id not in current]
+    
+    updated = []
+    for token_id, token in current.items():
+        old = previous.get(token_id)
+        if old is None:
+            continue
+        distance_delta = abs(token["distance_m"] - old["distance_m"])
+        bearing_delta = abs(token["bearing"] - old["bearing"]) % 360
+        bearing_delta = min(bearing_delta, 360 - bearing_delta)
+        if distance_delta >= STREAM_DISTANCE_EPSILON_M or bearing_delta >= STREAM_BEARING_EPSILON:
+            updated.append({
+                "token_id": token_id,
+                "distance_m": token["distance_m"],
+                "bearing": token["bearing"]
+            })
+    
+    return {"entered": entered, "exited": exited, "updated": updated}
+
+
+class NearbyStream:
+    """
+    Per-connection state for the nearby token stream.
+    
+    The spatial query only runs when the device has moved STREAM_REQUERY_DISTANCE_M
+    from the last query origin, when the filters change, or when the candidates are
+    older than STREAM_REQUERY_INTERVAL_S. In between, distance and bearing to the
+    cached candidates are recomputed locally and only the differences against the
+    last pushed snapshot are sent.
+    """
+    
+    def __init__(self):
+        self.filters = {"limit": 10, "radius_km": 5.0, "action_type": None, "mob_type": None}
+        self.candidates = []        # Token responses from the last spatial query
+        self.snapshot = {}          # token_id -> token response last pushed to the device
+        self.query_origin = None    # (lat, lon) of the last spatial query
+        self.query_time = 0.0
+        self.seq = 0
+    
+    def apply_message(self, message: dict) -> tuple[float, float]:
+        """
+        Validate a position update and merge any filter changes.
+        
+        Returns:
+            (lat, lon) of the update
+        
+        Raises:
+            ValueError: If the message is malformed
+        """
+        lat, lon, filters = parse_nearby_params(message, self.filters)
+        
+        if filters != self.filters:
+            self.filters = filters
+            self.query_origin = None  # Force a fresh spatial query
+        
+        return lat, lon
+    
+    def needs_query(self, lat: float, lon: float) -> bool:
+        """Return True if the cached candidates can no longer be trusted for (lat, lon)."""
+        if self.query_origin is None:
+            return True
+        if time.monotonic() - self.query_time >= STREAM_REQUERY_INTERVAL_S:
+            return True
+        moved = haversine_distance(self.query_origin[0], self.query_origin[1], lat, lon)
+        return moved >= STREAM_REQUERY_DISTANCE_M
+    
+    def set_candidates(self, rows: list, lat: float, lon: float):
+        """Store the rows returned by summon_db.get_nearby_tokens() for (lat, lon)."""
+        self.candidates = [t for t in (format_nearby_token(row, lat, lon) for row in rows) if t is not None]
+        self.query_origin = (lat, lon)
+        self.query_time = time.monotonic()
+    
+    def advance(self, lat: float, lon: float) -> Optional[dict]:
+        """
+        Recompute distance and bearing to the candidates from (lat, lon).
+        
+        Returns:
+            Diff message for the device, or None if nothing changed
+        """
+        current = {}
+        for token in self.candidates:
+            position = token["position"]
+            refreshed = dict(token)
+            refreshed["distance_m"] = round(haversine_distance(lat, lon, position["lat"], position["lon"]), 1)
+            refreshed["bearing"] = round(calculate_bearing(lat, lon, position["lat"], position["lon"]), 1)
+            current[token["token_id"]] = refreshed
+        
+        diff = diff_nearby(self.snapshot, current)
+        first = self.seq == 0
+        if not first and not (diff["entered"] or diff["exited"] or diff["updated"]):
+            return None
+        
+        # Keep the last pushed values for tokens whose change was below the epsilon,
+        # so slow drift still accumulates into an update.
+        updated_ids = {u["token_id"] for u in diff["updated"]}
+        self.snapshot = {
+            token_id: token if (token_id not in self.snapshot or token_id in updated_ids) else self.snapshot[token_id]
+            for token_id, token in current.items()
         }
+        self.seq += 1
         
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        return {
+            "type": "diff",
+            "seq": self.seq,
+            "current_position": {"lat": lat, "lon": lon},
+            "count": len(current),
+            **diff
+        }
+
+
+@router.websocket("/api/tokens/nearby/stream")
+async def nearby_token_stream(websocket: WebSocket, x_api_key: str = Header(...)):
+    """
+    Push-based alternative to polling /api/tokens/nearby.
+    
+    The device connects once and sends position updates as JSON text frames:
+        {"lat": 40.7580, "lon": -105.3009, "limit": 10, "action_type": "summon_entity"}
+    Filters (limit, radius_km, action_type, mob_type) are optional and persist
+    until changed; later updates only need lat/lon.
+    
+    The server answers with diffs against what the device already has:
+        {"type": "diff", "seq": 3, "entered": [...], "exited": [...], "updated": [...]}
+    Nothing is sent when an update changes nothing. The first update always
+    gets a reply carrying the full initial set in "entered".
+    
+    The nearby set matches /api/tokens/nearby for the same position and filters.
+    """
+    if x_api_key != EXPECTED_API_KEY:
+        await websocket.close(code=1008, reason="Unauthorized")
+        return
+    
+    await websocket.accept()
+    stream = NearbyStream()
+    
+    try:
+        while True:
+            text = await websocket.receive_text()
+            try:
+                lat, lon = stream.apply_message(json.loads(text))
+            except ValueError as e:
+                # json.JSONDecodeError is a ValueError subclass
+                await websocket.send_json({"type": "error", "error": str(e)})
+                continue
+            
+            if stream.needs_query(lat, lon):
+                try:
+                    rows = await run_in_threadpool(
+                        summon_db.get_nearby_tokens,
+                        lat=lat,
+                        lon=lon,
+                        radius_km=stream.filters["radius_km"],
+                        limit=stream.filters["limit"],
+                        action_type=stream.filters["action_type"],
+                        mob_type=stream.filters["mob_type"]
+                    )
+                except Exception as e:
+                    await websocket.send_json({"type": "error", "error": f"Database error: {str(e)}"})
+                    continue
+                stream.set_candidates(rows, lat, lon)
+            
+            message = stream.advance(lat, lon)
+            if message is not None:
+                await websocket.send_json(message)
+    except WebSocketDisconnect:
+        return
 
 
 @router.get("/api/tokens")
@@ -0,0 +1,154 @@
+"""
+Track Simplify - reduce a device's raw GPS fixes to a drawable track.
+
+Two reductions, both on NumPy arrays:
+
+- douglas_peucker(): keeps the fixes needed to stay within tolerance_m of
+  the raw path (shape-preserving; good for drawing a route).
+- time_buckets(): averages fixes into fixed-width time buckets (uniform
+  sampling; good for timelines and playback).
+
+TrackCache memoizes simplified tracks per device and query window. Each
+device has a version number that location ingest bumps, so a cached track
+is served only until that device reports another fix.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import os
+import threading
+
+import numpy as np
+
+# Meters per degree of latitude (matches spatial_index.METERS_PER_DEG_LAT)
+METERS_PER_DEG_LAT = 111320.0
+
+# Number of simplified tracks kept in memory
+TRACK_CACHE_SIZE = int(os.getenv('TRACK_CACHE_SIZE', '256'))
+
+
+def _project(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Equirectangular projection to meters around the track's mean latitude."""
+    cos_lat = np.cos(np.radians(np.mean(lat)))
+    return np.column_stack((lon * METERS_PER_DEG_LAT * cos_lat, lat * METERS_PER_DEG_LAT))
+
+
+def douglas_peucker(lat: np.ndarray, lon: np.ndarray, tolerance_m: float) -> np.ndarray:
+    """
+    Ramer-Douglas-Peucker simplification.
+
+    Returns:
+        Sorted indices of the fixes to keep (always includes first and last)
+    """
+    n = len(lat)
+    if n <= 2:
+        return np.arange(n)
+    xy = _project(np.asarray(lat, dtype=float), np.asarray(lon, dtype=float))
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+
+    # Iterative to avoid recursion limits on long tracks
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = xy[first], xy[last]
+        seg = end - start
+        seg_len2 = float(seg @ seg)
+        pts = xy[first + 1:last] - start
+        if seg_len2 == 0.0:
+            # Closed loop (or stationary device): distance to the endpoint
+            dists = np.hypot(pts[:, 0], pts[:, 1])
+        else:
+            # Distance to the segment, clamped to its endpoints
+            t = np.clip(pts @ seg / seg_len2, 0.0, 1.0)
+            diff = pts - np.outer(t, seg)
+            dists = np.hypot(diff[:, 0], diff[:, 1])
+        i = int(np.argmax(dists))
+        if dists[i] > tolerance_m:
+            split = first + 1 + i
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(keep)
+
+
+def time_buckets(timestamps: np.ndarray, bucket_s: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Group time-sorted fixes into buckets of bucket_s seconds.
+
+    Returns:
+        (starts, counts): index of the first fix of each non-empty bucket and
+        the number of fixes in it, suitable for np.add.reduceat
+    """
+    timestamps = np.asarray(timestamps, dtype=float)
+    if len(timestamps) == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    buckets = np.floor((timestamps - timestamps[0]) / bucket_s).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    counts = np.diff(np.r_[starts, len(timestamps)])
+    return starts, counts
+
+
+def bucket_means(values: np.ndarray, starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Mean of values within each bucket from time_buckets()."""
+    if len(starts) == 0:
+        return np.zeros(0)
+    return np.add.reduceat(np.asarray(values, dtype=float), starts) / counts
+
+
+class TrackCache:
+    """
+    Bounded LRU memo of simplified tracks with per-device invalidation.
+
+    Entries remember the device version they were computed at; invalidate()
+    bumps the version so the next get() for that device misses.
+    """
+
+    def __init__(self, max_size: int = TRACK_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()           # key -> (version, track)
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def version(self, device_id: str) -> int:
+        """Current version of device_id; read it before querying the fixes."""
+        with self._lock:
+            return self._versions.get(device_id, 0)
+
+    def get(self, device_id: str, key: tuple) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get((device_id, key))
+            if entry is None:
+                return None
+            if entry[0] != self._versions.get(device_id, 0):
+                del self._entries[(device_id, key)]
+                return None
+            self._entries.move_to_end((device_id, key))
+            return entry[1]
+
+    def put(self, device_id: str, key: tuple, track: dict, version: int):
+        """
+        Store track computed from the fixes as of version; if the device
+        reported since, the entry is already stale and the next get() misses.
+        """
+        with self._lock:
+            self._entries[(device_id, key)] = (version, track)
+            self._entries.move_to_end((device_id, key))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, device_id: str):
+        """Mark every cached track of device_id as stale."""
+        with self._lock:
+            self._versions[device_id] = self._versions.get(device_id, 0) + 1
+
+    def clear(self):
+        # Versions are kept so an in-flight put() cannot resurrect old data
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared cache for the /api/device/{device_id}/track endpoint
+track_cache = TrackCache()
@@ -92,6 +92,9 @@ Notes:
     - To list screen sessions: screen -ls
     - API log: logs/api.log
     - Web log: logs/web.log
+    - With ADMIN_UI_MOUNT=1 the Summon API (port 8000, plain HTTP) also
+      serves the admin pages, sharing its database pool and caches;
+      otherwise start-web runs them standalone (port 8080, TLS).
     - Minecraft log: ../bedrock-server-1.21.131.1/bedrock_server.log
 EOF
 }
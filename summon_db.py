@@ -1,7 +1,12 @@
 import psycopg2
 import psycopg2.extras
+import psycopg2.extensions
+import psycopg2.pool
 from datetime import datetime
+import csv
+import io
 import os
+import threading
 
 # PostgreSQL connection parameters
 DB_HOST = os.getenv('DB_HOST', 'localhost')
@@ -10,8 +15,17 @@ DB_NAME = os.getenv('DB_NAME', 'summon_db')
 DB_USER = os.getenv('DB_USER', 'summon_user')
 DB_PASSWORD = os.getenv('DB_PASSWORD', 'summon_pass123')
 
-def get_connection():
-    """Get a PostgreSQL database connection."""
+# Connections kept open per process (API and admin UI share them when the
+# admin UI is mounted in nfc_api). DB_POOL_MAX=0 connects on every call.
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '20'))
+
+_pool = None
+_pool_slots = threading.BoundedSemaphore(max(DB_POOL_MAX, 1))
+_pool_lock = threading.Lock()
+
+
+def _connect():
     return psycopg2.connect(
         host=DB_HOST,
         port=DB_PORT,
@@ -20,6 +34,92 @@ def get_connection():
         password=DB_PASSWORD
     )
 
+
+class PooledConnection:
+    """
+    A connection borrowed from the pool. Used exactly like a psycopg2
+    connection; close() rolls back anything uncommitted and returns it to
+    the pool instead of closing it. A connection never closed (an
+    exception before conn.close()) is returned when it is garbage collected.
+    """
+    
+    def __init__(self, conn, pool):
+        object.__setattr__(self, '_conn', conn)
+        object.__setattr__(self, '_pool', pool)
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+    
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+    
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+    
+    def __exit__(self, *exc_info):
+        return self._conn.__exit__(*exc_info)
+    
+    def close(self):
+        conn = self._conn
+        if conn is None:
+            return
+        object.__setattr__(self, '_conn', None)
+        broken = bool(conn.closed)
+        if not broken and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+        try:
+            self._pool.putconn(conn, close=broken)
+        except psycopg2.pool.PoolError:
+            # The pool was closed (close_pool) while this was borrowed
+            conn.close()
+        finally:
+            _pool_slots.release()
+    
+    def __del__(self):
+        if self.__dict__.get('_conn') is not None:
+            self.close()
+
+
+def get_connection():
+    """
+    Get a PostgreSQL database connection, from the process-wide pool.
+    
+    Waits for a free connection when DB_POOL_MAX are in use. Callers close
+    it as before; see PooledConnection.
+    """
+    global _pool
+    if DB_POOL_MAX <= 0:
+        return _connect()
+    _pool_slots.acquire()
+    try:
+        if _pool is None:
+            with _pool_lock:
+                if _pool is None:
+                    _pool = psycopg2.pool.ThreadedConnectionPool(
+                        min(DB_POOL_MIN, DB_POOL_MAX), DB_POOL_MAX,
+                        host=DB_HOST, port=DB_PORT, database=DB_NAME,
+                        user=DB_USER, password=DB_PASSWORD
+                    )
+        pool = _pool
+        conn = pool.getconn()
+    except Exception:
+        _pool_slots.release()
+        raise
+    return PooledConnection(conn, pool)
+
+
+def close_pool():
+    """Close every pooled connection (process shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
 def init_db():
     """Initialize database - tables should already exist."""
     pass  # Tables are created via SQL schema file
@@ -58,6 +158,33 @@ def get_all_summons():
     return [dict(r) for r in rows]
 
 
+def get_summon_counts():
+    """
+    Return {summoned_object_type: number of summons} for every type summoned.
+
+    Reads the summon_counts table kept up to date by trigger
+    (migrations/005_summon_counts.sql). Databases without that migration
+    fall back to a GROUP BY over summons.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """SELECT summoned_object_type, summon_count FROM summon_counts
+            WHERE summon_count > 0"""
+        )
+    except psycopg2.errors.UndefinedTable:
+        conn.rollback()
+        cur.execute(
+            """SELECT summoned_object_type, COUNT(*) FROM summons
+            GROUP BY summoned_object_type"""
+        )
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return {mob_type: count for mob_type, count in rows}
+
+
 def get_summon_by_id(summon_id):
     """Return a single summon by id as a dict, or None if not found."""
     conn = get_connection()
@@ -107,6 +234,63 @@ def get_summons_by_player(player_name: str):
     return [dict(r) for r in rows]
 
 
+# Columns matched case-insensitively by the paginated history queries
+# (indexed as LOWER(column), id DESC in migrations/007_summon_history_pages.sql)
+_SUMMON_HISTORY_FILTERS = {
+    "mob": "summoned_object_type",
+    "player": "summoning_player",
+}
+
+
+def _summons_page(by, value, limit, before_id):
+    clauses = [f"LOWER({_SUMMON_HISTORY_FILTERS[by]}) = LOWER(%s)"]
+    params = [value]
+    if before_id is not None:
+        clauses.append("id < %s")
+        params.append(before_id)
+    params.append(limit)
+    conn = get_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cur.execute(
+        """SELECT id, server_ip, server_port, summoned_object_type, summoning_player, summoned_player,
+        timestamp_utc, gps_lat, gps_lon FROM summons
+        WHERE """ + " AND ".join(clauses) + """ ORDER BY id DESC LIMIT %s""",
+        params
+    )
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return [dict(r) for r in rows]
+
+
+def get_summons_page_by_mob(mob_name: str, limit=100, before_id=None):
+    """
+    One page of get_summons_by_mob(): at most limit summons with id below
+    before_id (the last id of the previous page; None for the first page),
+    most recent first.
+    """
+    return _summons_page("mob", mob_name, limit, before_id)
+
+
+def get_summons_page_by_player(player_name: str, limit=100, before_id=None):
+    """One page of get_summons_by_player(); see get_summons_page_by_mob()."""
+    return _summons_page("player", player_name, limit, before_id)
+
+
+def count_summons_by_mob(mob_name: str):
+    """Number of summons of a mob (case-insensitive), counted in SQL."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT COUNT(*) FROM summons WHERE LOWER(summoned_object_type) = LOWER(%s)",
+        (mob_name,)
+    )
+    count = cur.fetchone()[0]
+    cur.close()
+    conn.close()
+    return count
+
+
 # ==================== Device Location Functions ====================
 
 def insert_device_location(
@@ -134,6 +318,38 @@ def insert_device_location(
     conn.close()
 
 
+def copy_device_locations(rows):
+    """Bulk-load device location rows with COPY in a single transaction.
+
+    Each row is (device_id, player, gps_lat, gps_lon, gps_alt, gps_speed,
+    satellites, hdop, timestamp); None becomes NULL. Returns the row count.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        # Unquoted empty fields are NULL in COPY's CSV format
+        writer.writerow(["" if value is None else value for value in row])
+    buf.seek(0)
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.copy_expert(
+            """COPY device_locations
+            (device_id, player, gps_lat, gps_lon, gps_alt, gps_speed, satellites, hdop, timestamp)
+            FROM STDIN WITH (FORMAT csv)""",
+            buf
+        )
+        count = cur.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+    return count
+
+
 def get_all_device_locations():
     """Return all device locations as a list of dicts (most recent first)."""
     conn = get_connection()
@@ -164,6 +380,37 @@ def get_device_locations_by_device_id(device_id: str):
     return [dict(r) for r in rows]
 
 
+def get_device_track(device_id: str, start=None, end=None, bbox=None):
+    """Return (gps_lat, gps_lon, epoch seconds, gps_speed) rows for a device, oldest first.
+
+    start/end bound the fix timestamp (start inclusive, end exclusive);
+    bbox is (min_lon, min_lat, max_lon, max_lat).
+    """
+    clauses = ["device_id = %s"]
+    params = [device_id]
+    if start is not None:
+        clauses.append("timestamp >= %s")
+        params.append(start)
+    if end is not None:
+        clauses.append("timestamp < %s")
+        params.append(end)
+    if bbox is not None:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        clauses.append("gps_lat BETWEEN %s AND %s AND gps_lon BETWEEN %s AND %s")
+        params.extend([min_lat, max_lat, min_lon, max_lon])
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """SELECT gps_lat, gps_lon, EXTRACT(EPOCH FROM timestamp)::float8, gps_speed
+        FROM device_locations WHERE """ + " AND ".join(clauses) + """
+        ORDER BY timestamp, id""",
+        params
+    )
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return rows
+
 def get_latest_device_locations():
     """Return the most recent location for each unique device_id."""
     conn = get_connection()
@@ -364,10 +611,177 @@ def get_all_give_operations():
     return [dict(r) for r in rows]
 
 
+
+# ============================================
+# SPATIAL HISTORY QUERIES (migration 004)
+# ============================================
+
+# Columns returned for each history table; keys are the only accepted table names
+_HISTORY_COLUMNS = {
+    "summons": """id, server_ip, server_port, summoned_object_type, summoning_player,
+        summoned_player, timestamp_utc, gps_lat, gps_lon""",
+    "give_operations": """id, player, item, amount, timestamp, gps_lat, gps_lon,
+        device_id, created_at""",
+}
+
+_HISTORY_TIME_COLUMN = {"summons": "timestamp_utc", "give_operations": "timestamp"}
+
+
+def _history_near(table, lat, lon, radius_m, limit):
+    conn = get_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cur.execute(
+        f"""WITH origin AS (
+            SELECT ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography AS point
+        )
+        SELECT {_HISTORY_COLUMNS[table]},
+            ST_Distance(t.gps_location, origin.point) AS distance_m
+        FROM {table} t, origin
+        WHERE ST_DWithin(t.gps_location, origin.point, %s)
+        ORDER BY distance_m, {_HISTORY_TIME_COLUMN[table]} DESC
+        LIMIT %s""",
+        (lon, lat, radius_m, limit)
+    )
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return [dict(r) for r in rows]
+
+
+def _history_in_bbox(table, min_lon, min_lat, max_lon, max_lat, limit):
+    conn = get_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    # && on the geography column uses the GiST index; the lat/lon recheck
+    # trims points the geodetic box admits just outside the rectangle
+    cur.execute(
+        f"""SELECT {_HISTORY_COLUMNS[table]}
+        FROM {table}
+        WHERE gps_location && ST_MakeEnvelope(%s, %s, %s, %s, 4326)::geography
+          AND gps_lat BETWEEN %s AND %s
+          AND gps_lon BETWEEN %s AND %s
+        ORDER BY {_HISTORY_TIME_COLUMN[table]} DESC
+        LIMIT %s""",
+        (min_lon, min_lat, max_lon, max_lat, min_lat, max_lat, min_lon, max_lon, limit)
+    )
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return [dict(r) for r in rows]
+
+
+def get_summons_near(lat, lon, radius_m, limit=100):
+    """Summons within radius_m meters of (lat, lon), nearest first, with distance_m."""
+    return _history_near("summons", lat, lon, radius_m, limit)
+
+
+def get_summons_in_bbox(min_lon, min_lat, max_lon, max_lat, limit=100):
+    """Summons inside a lon/lat bounding box, most recent first."""
+    return _history_in_bbox("summons", min_lon, min_lat, max_lon, max_lat, limit)
+
+
+def get_give_operations_near(lat, lon, radius_m, limit=100):
+    """Give operations within radius_m meters of (lat, lon), nearest first, with distance_m."""
+    return _history_near("give_operations", lat, lon, radius_m, limit)
+
+
+def get_give_operations_in_bbox(min_lon, min_lat, max_lon, max_lat, limit=100):
+    """Give operations inside a lon/lat bounding box, most recent first."""
+    return _history_in_bbox("give_operations", min_lon, min_lat, max_lon, max_lat, limit)
+
+
+def get_device_fixes_in_bbox(min_lon, min_lat, max_lon, max_lat, limit=20000):
+    """
+    The most recent limit device fixes inside a lon/lat bounding box, as
+    (device_id, player, gps_lat, gps_lon, epoch seconds) rows ordered by
+    device and time - ready to be drawn as per-device track lines.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """SELECT device_id, player, gps_lat, gps_lon, ts FROM (
+            SELECT id, device_id, player, gps_lat, gps_lon,
+                EXTRACT(EPOCH FROM timestamp)::float8 AS ts
+            FROM device_locations
+            WHERE gps_location && ST_MakeEnvelope(%s, %s, %s, %s, 4326)::geography
+              AND gps_lat BETWEEN %s AND %s
+              AND gps_lon BETWEEN %s AND %s
+            ORDER BY timestamp DESC
+            LIMIT %s
+        ) recent
+        ORDER BY device_id, ts, id""",
+        (min_lon, min_lat, max_lon, max_lat, min_lat, max_lat, min_lon, max_lon, limit)
+    )
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return rows
+
+
+def _points_since(table, after_id, limit):
+    conn = get_connection()
+    cur = conn.cursor()
+    if after_id is None:
+        cur.execute(f"SELECT id, gps_lat, gps_lon FROM {table} ORDER BY id DESC LIMIT 1")
+    else:
+        cur.execute(
+            f"""SELECT id, gps_lat, gps_lon FROM {table}
+            WHERE id > %s AND gps_lat IS NOT NULL AND gps_lon IS NOT NULL
+            ORDER BY id
+            LIMIT %s""",
+            (after_id, limit)
+        )
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return rows
+
+
+def get_summon_points_since(after_id=None, limit=10000):
+    """
+    (id, gps_lat, gps_lon) of summons with GPS and id > after_id, in id
+    order. With after_id None, only the newest summon (to start a watermark).
+    """
+    return _points_since("summons", after_id, limit)
+
+
+def get_device_location_points_since(after_id=None, limit=10000):
+    """Same as get_summon_points_since() for device_locations."""
+    return _points_since("device_locations", after_id, limit)
+
+
+def get_give_operation_points_since(after_id=None, limit=10000):
+    """Same as get_summon_points_since() for give_operations."""
+    return _points_since("give_operations", after_id, limit)
+
+
+def get_token_scan_points_since(after_id=None, limit=10000):
+    """Same as get_summon_points_since() for token_scans."""
+    return _points_since("token_scans", after_id, limit)
+
+
 # ============================================
 # TOKEN FUNCTIONS (GPS-based discovery)
 # ============================================
 
+# Token upsert shared by insert_token() and the composite writes below.
+# Parameters: action_type, entity, item, gps_lat, gps_lon, written_by,
+# device_id, nfc_tag_uid, written_at
+_INSERT_TOKEN_SQL = """INSERT INTO tokens 
+        (action_type, entity, item, gps_write_lat, gps_write_lon, written_by, device_id, nfc_tag_uid, written_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, COALESCE(%s, NOW()))
+        ON CONFLICT (nfc_tag_uid) WHERE nfc_tag_uid IS NOT NULL DO UPDATE SET
+            action_type = EXCLUDED.action_type,
+            entity = EXCLUDED.entity,
+            item = EXCLUDED.item,
+            gps_write_lat = EXCLUDED.gps_write_lat,
+            gps_write_lon = EXCLUDED.gps_write_lon,
+            written_by = EXCLUDED.written_by,
+            device_id = EXCLUDED.device_id,
+            written_at = EXCLUDED.written_at,
+            updated_at = NOW()
+        RETURNING token_id"""
+
+
 def insert_token(
     action_type, entity=None, item=None,
     gps_lat=None, gps_lon=None,
@@ -377,6 +791,9 @@ def insert_token(
     """
     Insert a token record for GPS-based discovery.
     
+    nfc_tag_uid is unique: writing a tag that already has a token updates
+    that token in place (the tag was rewritten) instead of adding a row.
+    
     Args:
         action_type: 'summon_entity', 'give_item', or 'set_time'
         entity: Minecraft entity ID (required for summon_entity)
@@ -389,16 +806,13 @@ def insert_token(
         written_at: Timestamp (defaults to NOW())
     
     Returns:
-        UUID of the created token
+        UUID of the created (or rewritten) token
     """
     conn = get_connection()
     cur = conn.cursor()
     
     cur.execute(
-        """INSERT INTO tokens 
-        (action_type, entity, item, gps_write_lat, gps_write_lon, written_by, device_id, nfc_tag_uid, written_at)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, COALESCE(%s, NOW()))
-        RETURNING token_id""",
+        _INSERT_TOKEN_SQL,
         (action_type, entity, item, gps_lat, gps_lon, written_by, device_id, nfc_tag_uid, written_at)
     )
     
@@ -409,6 +823,255 @@ def insert_token(
     return str(token_id)
 
 
+def insert_summon_with_token(
+    server_ip, server_port, summoned_object_type,
+    summoning_player, summoned_player, timestamp_utc,
+    gps_lat, gps_lon, entity,
+    device_id=None, nfc_tag_uid=None
+):
+    """
+    Record a summon and its discovery token in one statement.
+    
+    Both inserts run as a single CTE on one connection, so they commit or
+    fail together - a token error cannot leave an orphan summon row.
+    
+    Returns:
+        (summon id, token UUID as str)
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """WITH summon AS (
+                INSERT INTO summons 
+                (server_ip, server_port, summoned_object_type, summoning_player, summoned_player, timestamp_utc, gps_lat, gps_lon) 
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING id
+            ), token AS (
+                """ + _INSERT_TOKEN_SQL + """
+            )
+            SELECT (SELECT id FROM summon), (SELECT token_id FROM token)""",
+            (server_ip, server_port, summoned_object_type, summoning_player, summoned_player, timestamp_utc, gps_lat, gps_lon,
+             "summon_entity", entity, None, gps_lat, gps_lon, summoning_player, device_id, nfc_tag_uid, timestamp_utc)
+        )
+        summon_id, token_id = cur.fetchone()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+    return summon_id, str(token_id)
+
+
+_give_table_ready = False
+
+
+def insert_give_operation_with_token(
+    player: str,
+    item: str,
+    amount: int,
+    timestamp: str = None,
+    gps_lat: float = None,
+    gps_lon: float = None,
+    device_id: str = None
+):
+    """
+    Log a give operation and, when GPS is present, its discovery token in one statement.
+    
+    Atomic like insert_summon_with_token(). timestamp defaults to NOW().
+    
+    Returns:
+        Token UUID as str, or None when no GPS was given
+    """
+    global _give_table_ready
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        if not _give_table_ready:
+            # Same lazy creation as insert_give_operation(), once per process
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS give_operations (
+                    id SERIAL PRIMARY KEY,
+                    player VARCHAR(64) NOT NULL,
+                    item VARCHAR(64) NOT NULL,
+                    amount INTEGER NOT NULL,
+                    timestamp TIMESTAMP NOT NULL,
+                    gps_lat DOUBLE PRECISION,
+                    gps_lon DOUBLE PRECISION,
+                    device_id VARCHAR(64),
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+        
+        give_sql = """INSERT INTO give_operations 
+            (player, item, amount, timestamp, gps_lat, gps_lon, device_id) 
+            VALUES (%s, %s, %s, COALESCE(%s, NOW()), %s, %s, %s)"""
+        give_params = (player, item, amount, timestamp, gps_lat, gps_lon, device_id)
+        token_id = None
+        if gps_lat is not None and gps_lon is not None:
+            cur.execute(
+                "WITH give AS (" + give_sql + " RETURNING id), token AS (" + _INSERT_TOKEN_SQL + """)
+                SELECT token_id FROM token""",
+                give_params + ("give_item", None, item, gps_lat, gps_lon, player, device_id, None, timestamp)
+            )
+            token_id = str(cur.fetchone()[0])
+        else:
+            cur.execute(give_sql, give_params)
+        conn.commit()
+        _give_table_ready = True
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+    return token_id
+
+
+# One NFC scan: create the tag's token on first sight (or reuse it), append
+# to token_scans and bump token_scan_stats. Named parameters: action_type,
+# entity, item, gps_lat, gps_lon, player, device_id, nfc_tag_uid, scanned_at
+_RECORD_NFC_SCAN_SQL = """
+    WITH ins AS (
+        INSERT INTO tokens
+        (action_type, entity, item, gps_write_lat, gps_write_lon, written_by, device_id, nfc_tag_uid, written_at)
+        VALUES (%(action_type)s, %(entity)s, %(item)s, %(gps_lat)s, %(gps_lon)s, %(player)s,
+                %(device_id)s, %(nfc_tag_uid)s, COALESCE(%(scanned_at)s, NOW()))
+        ON CONFLICT (nfc_tag_uid) WHERE nfc_tag_uid IS NOT NULL DO NOTHING
+        RETURNING token_id
+    ), tok AS (
+        SELECT token_id, TRUE AS created FROM ins
+        UNION ALL
+        SELECT token_id, FALSE FROM tokens
+        WHERE nfc_tag_uid = %(nfc_tag_uid)s AND NOT EXISTS (SELECT 1 FROM ins)
+    ), scan AS (
+        INSERT INTO token_scans (token_id, player, device_id, gps_lat, gps_lon, scanned_at)
+        SELECT token_id, %(player)s, %(device_id)s, %(gps_lat)s, %(gps_lon)s, COALESCE(%(scanned_at)s, NOW())
+        FROM tok
+        RETURNING token_id, scanned_at
+    ), stats AS (
+        INSERT INTO token_scan_stats (token_id, scan_count, first_seen_at, last_seen_at, last_player, last_device_id)
+        SELECT token_id, 1, scanned_at, scanned_at, %(player)s, %(device_id)s FROM scan
+        ON CONFLICT (token_id) DO UPDATE SET
+            scan_count = token_scan_stats.scan_count + 1,
+            first_seen_at = LEAST(token_scan_stats.first_seen_at, EXCLUDED.first_seen_at),
+            last_seen_at = GREATEST(token_scan_stats.last_seen_at, EXCLUDED.last_seen_at),
+            last_player = EXCLUDED.last_player,
+            last_device_id = EXCLUDED.last_device_id
+        RETURNING token_id, scan_count
+    )
+    SELECT tok.token_id, tok.created, stats.scan_count
+    FROM tok JOIN stats ON stats.token_id = tok.token_id
+"""
+
+
+# Both attempts found neither a new nor an existing token for the tag
+_NFC_SCAN_RACE_ERROR = "No token for NFC tag %s after retrying a concurrent first scan"
+
+
+def record_nfc_scan(
+    action_type, entity=None, item=None,
+    gps_lat=None, gps_lon=None,
+    player=None, device_id=None, nfc_tag_uid=None,
+    scanned_at=None
+):
+    """
+    Record an NFC scan in one statement.
+    
+    With an nfc_tag_uid the tag's existing token is reused (its position is
+    not moved by scans); a token is only created on the tag's first scan.
+    Without a UID every scan creates a token, as before. The scan itself
+    goes to the append-only token_scans log and bumps token_scan_stats.
+    
+    Returns:
+        Dict with token_id, created (bool) and scan_count
+    
+    Raises:
+        RuntimeError: the tag's token could not be found or created (a
+            concurrent first scan that did not commit)
+    """
+    conn = get_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    
+    params = {
+        "action_type": action_type, "entity": entity, "item": item,
+        "gps_lat": gps_lat, "gps_lon": gps_lon,
+        "player": player, "device_id": device_id, "nfc_tag_uid": nfc_tag_uid,
+        "scanned_at": scanned_at
+    }
+    query = _RECORD_NFC_SCAN_SQL
+    cur.execute(query, params)
+    row = cur.fetchone()
+    if row is None:
+        # A concurrent first scan of the same tag inserted the token after our
+        # snapshot was taken; it is committed now, so a retry finds it.
+        conn.rollback()
+        cur.execute(query, params)
+        row = cur.fetchone()
+    conn.commit()
+    cur.close()
+    conn.close()
+    if row is None:
+        raise RuntimeError(_NFC_SCAN_RACE_ERROR % nfc_tag_uid)
+    return {"token_id": str(row["token_id"]), "created": row["created"], "scan_count": row["scan_count"]}
+
+
+def record_nfc_scans(scans):
+    """
+    Record many NFC scans on one connection in one transaction.
+    
+    Each scan is a dict with the arguments of record_nfc_scan(). Scans run
+    in order, each behind a savepoint, so one bad scan (e.g. coordinates
+    out of range) is rolled back alone while the others commit. Scans of
+    the same tag later in the batch see the token created by the first.
+    
+    Returns:
+        One entry per scan: the record_nfc_scan() result dict, or the
+        exception that scan raised
+    """
+    conn = get_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    results = []
+    try:
+        have_savepoint = False
+        for scan in scans:
+            params = {
+                "action_type": scan.get("action_type"), "entity": scan.get("entity"), "item": scan.get("item"),
+                "gps_lat": scan.get("gps_lat"), "gps_lon": scan.get("gps_lon"),
+                "player": scan.get("player"), "device_id": scan.get("device_id"),
+                "nfc_tag_uid": scan.get("nfc_tag_uid"), "scanned_at": scan.get("scanned_at")
+            }
+            # Savepoint bookkeeping rides along with the scan statement: one round trip per scan
+            prefix = ("RELEASE SAVEPOINT nfc_scan; " if have_savepoint else "") + "SAVEPOINT nfc_scan; "
+            have_savepoint = True
+            try:
+                cur.execute(prefix + _RECORD_NFC_SCAN_SQL, params)
+                row = cur.fetchone()
+                if row is None:
+                    # Lost a race for the tag's first scan; see record_nfc_scan()
+                    cur.execute(_RECORD_NFC_SCAN_SQL, params)
+                    row = cur.fetchone()
+                if row is None:
+                    # Nothing was written for this scan; the others still commit
+                    results.append(RuntimeError(_NFC_SCAN_RACE_ERROR % params["nfc_tag_uid"]))
+                    continue
+                results.append({"token_id": str(row["token_id"]), "created": row["created"],
+                                "scan_count": row["scan_count"]})
+            except psycopg2.Error as e:
+                cur.execute("ROLLBACK TO SAVEPOINT nfc_scan")
+                results.append(e)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+    return results
+
+
 def get_nearby_tokens(
     lat, lon, radius_km,
     limit=50, action_type=None, mob_type=None
@@ -493,6 +1156,91 @@ def get_nearby_tokens(
     return [dict(r) for r in rows]
 
 
+def get_nearby_tokens_batch(origins):
+    """
+    Run several nearby queries in a single round trip.
+    
+    Each origin becomes one row of an unnest() relation, and a LATERAL
+    subquery returns its N nearest tokens using the GiST index
+    (KNN ordering with the <-> operator). Results match get_nearby_tokens()
+    for the same origin and filters.
+    
+    Args:
+        origins: List of dicts with lat, lon, limit and optional
+                 action_type and mob_type
+    
+    Returns:
+        List of row lists, one per origin (same order as origins)
+    """
+    if not origins:
+        return []
+    
+    conn = get_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    
+    cur.execute(
+        """
+        WITH origins AS (
+            SELECT *
+            FROM unnest(%s::int[], %s::float8[], %s::float8[], %s::int[], %s::text[], %s::text[])
+                AS o(origin_idx, lat, lon, lim, action_type, mob_type)
+        )
+        SELECT o.origin_idx, n.*
+        FROM origins o
+        CROSS JOIN LATERAL (
+            SELECT 
+                t.token_id,
+                t.action_type,
+                t.entity,
+                t.item,
+                t.gps_write_lat AS lat,
+                t.gps_write_lon AS lon,
+                t.written_by,
+                t.device_id,
+                t.nfc_tag_uid,
+                t.written_at,
+                ST_Distance(
+                    t.gps_location,
+                    ST_SetSRID(ST_MakePoint(o.lon, o.lat), 4326)::geography
+                ) AS distance_m,
+                m.name AS mob_name,
+                m.rarity AS mob_rarity,
+                m.mob_type,
+                m.image_url AS mob_image,
+                i.name AS item_name,
+                i.rarity AS item_rarity,
+                i.image_url AS item_image
+            FROM tokens t
+            LEFT JOIN mobs m ON t.entity = m.minecraft_id
+            LEFT JOIN items i ON t.item = i.minecraft_id
+            WHERE t.gps_location IS NOT NULL
+              AND (o.action_type IS NULL OR t.action_type = o.action_type)
+              AND (o.mob_type IS NULL OR m.mob_type = o.mob_type)
+            ORDER BY t.gps_location <-> ST_SetSRID(ST_MakePoint(o.lon, o.lat), 4326)::geography
+            LIMIT o.lim
+        ) n
+        ORDER BY o.origin_idx, n.distance_m ASC
+        """,
+        (
+            list(range(len(origins))),
+            [o["lat"] for o in origins],
+            [o["lon"] for o in origins],
+            [o["limit"] for o in origins],
+            [o.get("action_type") for o in origins],
+            [o.get("mob_type") for o in origins],
+        )
+    )
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    
+    results = [[] for _ in origins]
+    for r in rows:
+        row = dict(r)
+        results[row.pop("origin_idx")].append(row)
+    return results
+
+
 def get_all_tokens(limit=100):
     """Get all tokens (for testing/debugging)."""
     conn = get_connection()
@@ -513,5 +1261,105 @@ def get_all_tokens(limit=100):
     return [dict(r) for r in rows]
 
 
+def get_all_tokens_enriched(limit=1000, updated_after=None, after_token_id=None):
+    """
+    Get tokens that have GPS coordinates, with their mob/item catalog
+    metadata joined in (for the admin tokens map).
+
+    Args:
+        limit: Maximum number of tokens
+        updated_after: updated_at watermark; if given, only tokens created or
+            rewritten after it, oldest change first (else newest written first)
+        after_token_id: with updated_after, continue after the change
+            (updated_after, after_token_id) - the last row of a previous page,
+            so tokens sharing its updated_at are neither repeated nor skipped
+
+    mob_found/item_found tell whether the entity/item has a catalog row.
+    """
+    conn = get_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    query = """SELECT
+            t.token_id, t.action_type, t.entity, t.item,
+            t.gps_write_lat, t.gps_write_lon,
+            t.written_by, t.device_id, t.nfc_tag_uid, t.written_at, t.updated_at,
+            m.minecraft_id IS NOT NULL AS mob_found,
+            m.name AS mob_name,
+            m.rarity AS mob_rarity,
+            m.mob_type,
+            m.image_url AS mob_image,
+            i.minecraft_id IS NOT NULL AS item_found,
+            i.name AS item_name,
+            i.rarity AS item_rarity,
+            i.image_url AS item_image
+        FROM tokens t
+        LEFT JOIN mobs m ON t.action_type = 'summon_entity' AND t.entity = m.minecraft_id
+        LEFT JOIN items i ON t.action_type = 'give_item' AND t.item = i.minecraft_id
+        WHERE t.gps_write_lat IS NOT NULL AND t.gps_write_lon IS NOT NULL"""
+    params = []
+    if updated_after is not None and after_token_id is not None:
+        query += " AND (t.updated_at, t.token_id) > (%s, %s) ORDER BY t.updated_at, t.token_id"
+        params += [updated_after, after_token_id]
+    elif updated_after is not None:
+        query += " AND t.updated_at > %s ORDER BY t.updated_at, t.token_id"
+        params.append(updated_after)
+    else:
+        query += " ORDER BY t.written_at DESC"
+    query += " LIMIT %s"
+    params.append(limit)
+    cur.execute(query, params)
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return [dict(r) for r in rows]
+
+
+def get_tokens_version():
+    """
+    Return (number of GPS tokens, latest updated_at) - changes whenever a
+    token is written, rewritten or deleted. Cheap enough to check per poll.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """SELECT COUNT(*), MAX(updated_at) FROM tokens
+        WHERE gps_write_lat IS NOT NULL AND gps_write_lon IS NOT NULL"""
+    )
+    count, last_updated = cur.fetchone()
+    cur.close()
+    conn.close()
+    return count, last_updated
+
+
+def get_tokens_since(updated_after=None):
+    """
+    Get tokens with GPS coordinates created or rewritten after a watermark.
+    
+    Used to build and incrementally refresh in-memory token indexes.
+    
+    Args:
+        updated_after: updated_at watermark (None returns every token)
+    
+    Returns:
+        List of token dicts ordered by updated_at
+    """
+    conn = get_connection()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    query = """SELECT 
+            token_id, action_type, entity, item,
+            gps_write_lat, gps_write_lon,
+            written_by, device_id, nfc_tag_uid, written_at, created_at, updated_at
+        FROM tokens
+        WHERE gps_location IS NOT NULL"""
+    params = []
+    if updated_after is not None:
+        query += " AND updated_at > %s"
+        params.append(updated_after)
+    query += " ORDER BY updated_at"
+    cur.execute(query, params)
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return [dict(r) for r in rows]
+
 # Initialize database (no-op for PostgreSQL, tables already exist)
 init_db()
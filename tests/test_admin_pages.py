@@ -0,0 +1,131 @@
+"""
+Tests for the admin HTML pages (web/website.py): named, precompiled
+templates and keyset-paginated history tables.
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'web')))
+import website
+import summon_db
+
+WHEN = datetime(2026, 1, 5, 12, 0, tzinfo=timezone.utc)
+
+
+def _summon(i, mob="piglin"):
+    return {"id": i, "summoned_object_type": mob, "summoning_player": "Steve", "summoned_player": "Alex",
+            "timestamp_utc": WHEN, "gps_lat": 40.0, "gps_lon": -105.0}
+
+
+def _page(rows):
+    """get_summons_page_by_* over rows (newest first), as the SQL pages them."""
+    def page(value, limit=100, before_id=None):
+        return [r for r in rows if before_id is None or r["id"] < before_id][:limit]
+    return page
+
+
+@pytest.fixture
+def client(monkeypatch):
+    summons = [_summon(i) for i in range(2000, 0, -1)]
+    monkeypatch.setattr(summon_db, "get_summons_page_by_player", _page(summons))
+    monkeypatch.setattr(summon_db, "get_summons_page_by_mob",
+                        lambda mob, **kw: _page(summons)(mob, **kw) if mob == "piglin" else [])
+    monkeypatch.setattr(summon_db, "count_summons_by_mob", lambda mob: 2000 if mob == "piglin" else 0)
+    monkeypatch.setattr(summon_db, "get_summon_counts", lambda: {"piglin": 2000})
+    monkeypatch.setattr(summon_db, "get_all_mobs", lambda: [
+        {"minecraft_id": "piglin", "name": "Piglin"},
+        {"minecraft_id": "cow", "name": "<script>Cow</script>"},
+    ])
+    return website.app.test_client()
+
+
+def test_templates_compiled_once():
+    env = website.app.jinja_env
+    for name in ("global_log.html", "player_log.html", "mob_detail.html", "tokens_map.html"):
+        assert env.get_template(name) is env.get_template(name)
+
+
+def test_home_page_escapes_names(client):
+    response = client.get("/")
+    assert response.status_code == 200
+    assert b"&lt;script&gt;Cow&lt;/script&gt;" in response.data
+    assert b"2000 summons" in response.data
+
+
+def test_player_log_renders_first_page(client):
+    body = client.get("/player/Steve").get_data(as_text=True)
+    assert body.count('class="mob-link" href="/mob/piglin"') == website.HISTORY_PAGE_SIZE
+    assert 'id="history-more" data-next="1901" data-url="/api/player/Steve/summons"' in body
+
+
+def test_player_summons_pages_cover_history(client):
+    ids, before = [], ""
+    while True:
+        data = client.get(f"/api/player/Steve/summons?limit=300&before={before}").get_json()
+        ids += [s["id"] for s in data["summons"]]
+        if data["next_before"] is None:
+            break
+        before = data["next_before"]
+    assert ids == list(range(2000, 0, -1))
+    assert data["summons"][-1]["timestamp"] == str(WHEN)
+
+
+def test_summons_page_rejects_bad_params(client):
+    assert client.get("/api/player/Steve/summons?before=abc").status_code == 400
+    limit = website.MAX_HISTORY_PAGE_SIZE + 1
+    assert client.get(f"/api/mob/piglin/summons?limit={limit}").status_code == 400
+
+
+def test_mob_detail_counts_in_sql_and_pages_history(client):
+    body = client.get("/mob/piglin").get_data(as_text=True)
+    assert "<strong>2000</strong> total summons" in body
+    assert body.count('class="action-badge action-summon"') == website.HISTORY_PAGE_SIZE
+
+    data = client.get("/api/mob/piglin/summons?before=1901&limit=50").get_json()
+    assert [s["id"] for s in data["summons"]] == list(range(1900, 1850, -1))
+    assert data["summons"][0]["action_type"] == "summon"
+    assert data["next_before"] == 1851
+
+
+def test_mob_detail_without_summons(client):
+    response = client.get("/mob/cow")
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert "No summons recorded yet" in body
+    assert 'id="history-more"' not in body
+
+
+@pytest.fixture
+def api(client):
+    """The API app with the admin UI mounted (ADMIN_UI_MOUNT=1)."""
+    import nfc_api
+    from fastapi.testclient import TestClient
+
+    routes = list(nfc_api.app.router.routes)
+    nfc_api.mount_admin_ui(nfc_api.app)
+    yield TestClient(nfc_api.app)
+    nfc_api.app.router.routes[:] = routes
+
+
+def test_admin_pages_served_by_api_app(api):
+    response = api.get("/mob/piglin")
+    assert response.status_code == 200
+    assert "<strong>2000</strong> total summons" in response.text
+    assert api.get("/api/mob/piglin/summons?limit=5").json()["next_before"] == 1996
+    # API routes still win over the mount
+    assert api.post("/summon", json={}).status_code == 422
+
+
+def test_mounted_admin_ui_keeps_api_json_errors(api):
+    response = api.get("/api/v1.1.1/nfc-events/batch")
+    assert response.status_code == 405
+    assert response.json() == {"detail": "Method Not Allowed"}
+    response = api.get("/api/no-such-endpoint")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Not Found"}
+    assert api.post("/mob/piglin").status_code == 405
+
@@ -0,0 +1,87 @@
+"""
+Tests for the hierarchical grid cluster index (services/cluster_index.py).
+"""
+
+import random
+
+from services.cluster_index import TokenClusterIndex, mercator, unmercator
+
+WORLD = (-180.0, -85.0, 180.0, 85.0)
+
+
+def _row(token_id, lat, lon, action_type="summon_entity"):
+    return {"token_id": token_id, "action_type": action_type, "lat": lat, "lon": lon}
+
+
+def _index(rows, **kwargs):
+    index = TokenClusterIndex(refresh_interval_s=3600, **kwargs)
+    index.load(rows)
+    return index
+
+
+def _total(features):
+    return sum(f.get("count", 1) for f in features)
+
+
+def test_mercator_round_trip():
+    lat, lon = unmercator(*mercator(40.758, -105.3009))
+    assert abs(lat - 40.758) < 1e-9
+    assert abs(lon + 105.3009) < 1e-9
+
+
+def test_clusters_every_zoom_account_for_all_tokens():
+    rng = random.Random(3)
+    rows = [_row(i, 40 + rng.gauss(0, 0.05), -105 + rng.gauss(0, 0.05),
+                 rng.choice(["summon_entity", "give_item"])) for i in range(2000)]
+    index = _index(rows)
+    bbox = (-106.0, 39.0, -104.0, 41.0)
+    previous = 0
+    for zoom in range(0, 20):
+        features = index.query(bbox, zoom)
+        assert _total(features) == 2000
+        # More detail as the map zooms in
+        assert len(features) >= previous
+        previous = len(features)
+    assert all(f["type"] == "point" for f in index.query((-105.001, 39.999, -105.0, 40.0), 18))
+
+
+def test_cluster_contents():
+    index = _index([
+        _row("a", 40.0, -105.0), _row("b", 40.0001, -105.0001, "give_item"), _row("far", -33.9, 151.2),
+    ])
+    features = index.query(WORLD, 3)
+    cluster = next(f for f in features if f["type"] == "cluster")
+    assert cluster["count"] == 2
+    assert cluster["by_action_type"] == {"summon_entity": 1, "give_item": 1}
+    assert abs(cluster["lat"] - 40.00005) < 1e-4
+    single = next(f for f in features if f["type"] == "point")
+    assert single["token_id"] == "far"
+    summary = index.summary()
+    assert summary["count"] == 3
+    assert summary["by_action_type"] == {"summon_entity": 2, "give_item": 1}
+
+
+def test_incremental_add_move_remove():
+    index = _index([_row("a", 40.0, -105.0), _row("b", 40.0001, -105.0001)])
+    version = index.version
+    # Re-reading an unchanged row (refresh overlap) is not a change
+    index.add(_row("a", 40.0, -105.0))
+    assert index.version == version
+    index.add(_row("b", -33.9, 151.2))
+    assert index.version > version
+    assert {f["type"] for f in index.query(WORLD, 3)} == {"point"}
+    index.remove("b")
+    assert [f["token_id"] for f in index.query(WORLD, 3)] == ["a"]
+    assert index.summary()["count"] == 1
+    index.remove("a")
+    assert index.query(WORLD, 3) == []
+    assert index.summary() == {"count": 0, "by_action_type": {}, "center": None}
+
+
+def test_large_box_is_clustered_at_a_lower_zoom():
+    rng = random.Random(5)
+    index = _index([_row(i, rng.uniform(-60, 60), rng.uniform(-170, 170)) for i in range(5000)])
+    assert index.fit_zoom(WORLD, 18) < 18
+    features = index.query(WORLD, 18)
+    assert _total(features) == 5000
+    assert len(features) < 5000
@@ -0,0 +1,118 @@
+"""
+Tests for the summon_db connection pool (get_connection / PooledConnection),
+against a stand-in for psycopg2's ThreadedConnectionPool.
+"""
+
+import gc
+import threading
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+import pytest
+
+import summon_db
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        if self.closed:
+            raise psycopg2.InterfaceError("connection already closed")
+        self.rollbacks += 1
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class FakePool:
+    def __init__(self, minconn, maxconn, **params):
+        self.idle, self.discarded, self.opened = [], [], 0
+
+    def getconn(self):
+        if self.idle:
+            return self.idle.pop()
+        self.opened += 1
+        return FakeConnection()
+
+    def putconn(self, conn, close=False):
+        (self.discarded if close else self.idle).append(conn)
+
+    def closeall(self):
+        pass
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(psycopg2.pool, "ThreadedConnectionPool", FakePool)
+    monkeypatch.setattr(summon_db, "DB_POOL_MAX", 2)
+    monkeypatch.setattr(summon_db, "_pool_slots", threading.BoundedSemaphore(2))
+    monkeypatch.setattr(summon_db, "_pool", None)
+    summon_db.get_connection().close()
+    return summon_db._pool
+
+
+def test_close_returns_connection_for_reuse(pool):
+    conn = summon_db.get_connection()
+    raw = conn._conn
+    conn.close()
+    conn.close()
+    assert summon_db.get_connection()._conn is raw
+    assert pool.opened == 1
+
+
+def test_uncommitted_work_rolled_back_on_close(pool):
+    conn = summon_db.get_connection()
+    conn.status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+    raw = conn._conn
+    conn.close()
+    assert raw.rollbacks == 1
+    assert pool.idle == [raw]
+
+
+def test_broken_connection_discarded(pool):
+    conn = summon_db.get_connection()
+    raw = conn._conn
+    raw.closed = 2
+    conn.close()
+    assert pool.discarded == [raw]
+    assert summon_db.get_connection()._conn is not raw
+
+
+def test_unclosed_connection_returned_when_collected(pool):
+    def failing_query():
+        conn = summon_db.get_connection()
+        raise RuntimeError("query failed before conn.close()")
+
+    for _ in range(5):
+        with pytest.raises(RuntimeError):
+            failing_query()
+    gc.collect()
+    assert len(pool.idle) == 1
+    assert pool.opened == 1
+
+
+def test_waits_for_a_free_connection(pool):
+    held = [summon_db.get_connection(), summon_db.get_connection()]
+    got = threading.Event()
+
+    def borrow():
+        summon_db.get_connection().close()
+        got.set()
+
+    thread = threading.Thread(target=borrow)
+    thread.start()
+    assert not got.wait(0.1)
+    held.pop().close()
+    assert got.wait(2)
+    thread.join()
+    held.pop().close()
+    assert pool.opened == 2
@@ -0,0 +1,123 @@
+"""
+Tests for the multiplexed device WebSocket (/api/device/ws).
+"""
+
+import msgpack
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from nfc_api import app
+from services import device_channel_service
+from utils.idempotency import idempotency_cache
+
+client = TestClient(app)
+API_KEY = "super-secret-test-key22"
+
+
+@pytest.fixture
+def handlers(monkeypatch):
+    idempotency_cache.clear()
+    calls = []
+
+    def record(name, result):
+        def handler(data):
+            calls.append((name, data))
+            return result
+        return handler
+
+    monkeypatch.setitem(device_channel_service.MESSAGE_HANDLERS, "nfc_event",
+                        record("nfc_event", {"status": "ok", "executed": "give Steve apple 1"}))
+    monkeypatch.setitem(device_channel_service.MESSAGE_HANDLERS, "location",
+                        record("location", {"status": "error", "error": "Missing required field: gps_lat"}))
+    monkeypatch.setattr(device_channel_service, "query_nearby",
+                        lambda lat, lon, filters: {"status": "ok", "count": 0, "tokens": [], "filters": filters})
+    return calls
+
+
+def test_rejects_bad_api_key():
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect("/api/device/ws", headers={"x-api-key": "wrong"}) as ws:
+            ws.receive_text()
+    assert exc.value.code == 1008
+
+
+def test_multiplexes_typed_messages(handlers):
+    with client.websocket_connect("/api/device/ws?device_id=esp32-7", headers={"x-api-key": API_KEY}) as ws:
+        ws.send_json({"id": 1, "type": "nfc_event", "data": {"action": "give_apple", "player": "Steve"}})
+        ws.send_json({"id": 2, "type": "location", "data": {"device_id": "other"}})
+        ws.send_json({"id": 3, "type": "nearby", "data": {"lat": 40.0, "lon": -105.0, "limit": 3}})
+        replies = {r["id"]: r for r in (ws.receive_json() for _ in range(3))}
+
+    assert replies[1]["ok"] is True
+    assert replies[1]["type"] == "nfc_event"
+    assert replies[1]["data"]["executed"] == "give Steve apple 1"
+    assert replies[2]["ok"] is False
+    assert replies[2]["error"] == "Missing required field: gps_lat"
+    assert replies[3]["ok"] is True
+    assert replies[3]["data"]["filters"]["limit"] == 3
+    # device_id from the connect URL fills in, but never overrides
+    assert dict(handlers)["nfc_event"]["device_id"] == "esp32-7"
+    assert dict(handlers)["location"]["device_id"] == "other"
+
+
+def test_invalid_messages_get_errors(handlers):
+    with client.websocket_connect("/api/device/ws", headers={"x-api-key": API_KEY}) as ws:
+        ws.send_text("not json")
+        assert ws.receive_json()["type"] == "error"
+        ws.send_json({"id": 5, "type": "teleport", "data": {}})
+        reply = ws.receive_json()
+        assert reply["id"] == 5 and reply["ok"] is False
+        assert "Unknown message type" in reply["error"]
+        ws.send_json({"id": 6, "type": "nearby", "data": {"lat": 91, "lon": 0}})
+        reply = ws.receive_json()
+        assert reply["ok"] is False
+        assert reply["error"] == "Invalid lat: must be between -90 and 90"
+        ws.send_json({"id": 7, "type": "nearby"})
+        assert ws.receive_json()["error"] == "Field 'data' must be an object"
+    assert handlers == []
+
+
+def test_msgpack_frames_get_msgpack_replies(handlers):
+    with client.websocket_connect("/api/device/ws", headers={"x-api-key": API_KEY}) as ws:
+        ws.send_bytes(msgpack.packb({"id": 9, "type": "nfc_event", "data": {"action": "zombie", "player": "Steve"}}))
+        reply = msgpack.unpackb(ws.receive_bytes(), raw=False)
+    assert reply["id"] == 9
+    assert reply["ok"] is True
+
+
+def test_nfc_event_retries_are_replayed(handlers):
+    scan = {"action": "give_apple", "player": "Steve", "timestamp": "2026-01-05T12:00:00Z"}
+    with client.websocket_connect("/api/device/ws?device_id=esp32-7", headers={"x-api-key": API_KEY}) as ws:
+        ws.send_json({"id": 1, "type": "nfc_event", "data": scan})
+        first = ws.receive_json()
+        ws.send_json({"id": 2, "type": "nfc_event", "data": scan})
+        retry = ws.receive_json()
+        ws.send_json({"id": 3, "type": "nfc_event", "idempotency_key": "scan-42", "data": {"action": "zombie"}})
+        ws.receive_json()
+        ws.send_json({"id": 4, "type": "nfc_event", "idempotency_key": "scan-42", "data": {"action": "zombie"}})
+        keyed_retry = ws.receive_json()
+        ws.send_json({"id": 5, "type": "nfc_event", "idempotency_key": "scan-42", "data": {"action": "creeper"}})
+        conflict = ws.receive_json()
+
+    assert "replayed" not in first
+    assert retry["ok"] is True and retry["replayed"] is True
+    assert retry["data"] == first["data"]
+    assert keyed_retry["replayed"] is True
+    assert conflict["ok"] is False
+    assert conflict["error"] == "Idempotency-Key was already used with a different request body"
+    assert len(handlers) == 2
+
+
+def test_nfc_event_replays_http_response(handlers, monkeypatch):
+    import nfc_api
+    monkeypatch.setattr(nfc_api, "handle_nfc_event_service", lambda data: {"status": "ok", "executed": "summon zombie"})
+    response = client.post("/api/v1.1.1/nfc-event", json={"action": "zombie"},
+                           headers={"x-api-key": API_KEY, "Idempotency-Key": "scan-43"})
+    assert response.status_code == 200
+    with client.websocket_connect("/api/device/ws", headers={"x-api-key": API_KEY}) as ws:
+        ws.send_json({"id": 1, "type": "nfc_event", "idempotency_key": "scan-43", "data": {"action": "zombie"}})
+        reply = ws.receive_json()
+    assert reply["replayed"] is True
+    assert reply["data"]["executed"] == "summon zombie"
+    assert handlers == []
@@ -322,3 +322,80 @@ def test_device_location_boundary_values():
         assert response.status_code == 200
         data = response.json()
         assert data["status"] == "ok"
+
+
+def test_device_locations_bulk_success():
+    """Test bulk ingest of valid and invalid fixes in one request."""
+    fixes = [
+        {"device_id": "esp32-bulk", "gps_lat": 40.7580, "gps_lon": -105.3009, "timestamp": "2025-12-25T22:30:00Z"},
+        {"device_id": "esp32-bulk", "gps_lat": 91.0, "gps_lon": -105.3009, "timestamp": "2025-12-25T22:30:05Z"},
+        {"device_id": "esp32-bulk", "gps_lat": 40.7581, "gps_lon": -105.3008, "satellites": 7, "hdop": 1.1,
+         "timestamp": "2025-12-25T22:30:10Z"},
+    ]
+    response = client.post("/api/device/locations/bulk", json=fixes, headers={"x-api-key": API_KEY})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "partial"
+    assert data["received"] == 3
+    assert data["inserted"] == 2
+    assert data["errors"] == [{"index": 1, "device_id": "esp32-bulk", "error": "gps_lat must be between -90 and 90"}]
+
+
+def test_device_locations_bulk_all_invalid():
+    """Test bulk ingest reports per-row errors when no fix is valid."""
+    fixes = [
+        {"gps_lat": 40.0, "gps_lon": -105.0, "timestamp": "2025-12-25T22:30:00Z"},
+        {"device_id": "esp32-bulk", "gps_lat": "abc", "gps_lon": -105.0, "timestamp": "2025-12-25T22:30:00Z"},
+        {"device_id": "esp32-bulk", "gps_lat": 40.0, "gps_lon": -105.0, "timestamp": "yesterday"},
+        {"device_id": "esp32-bulk", "gps_lat": 40.0, "gps_lon": -105.0, "hdop": -1,
+         "timestamp": "2025-12-25T22:30:00Z"},
+        "not an object",
+    ]
+    response = client.post("/api/device/locations/bulk", json={"fixes": fixes}, headers={"x-api-key": API_KEY})
+    assert response.status_code == 400
+    data = response.json()
+    assert data["status"] == "error"
+    assert data["inserted"] == 0
+    assert data["rejected"] == 5
+    assert [e["error"] for e in data["errors"]] == [
+        "device_id is required",
+        "gps_lat must be a number",
+        "timestamp must be an ISO 8601 date/time",
+        "hdop must not be negative",
+        "Fix must be a JSON object",
+    ]
+
+
+@pytest.mark.parametrize("field, error", [
+    ("gps_lat", "gps_lat must be a number"),
+    ("gps_lon", "gps_lon must be a number"),
+    ("satellites", "satellites must be an integer"),
+    ("hdop", "hdop must be a number"),
+])
+@pytest.mark.parametrize("bad", [[1.0], {"value": 1.0}, [[1.0]]])
+def test_device_locations_bulk_non_scalar_numbers(field, error, bad):
+    """Test bulk ingest rejects lists and objects in numeric fields per row."""
+    fix = {"device_id": "esp32-bulk", "gps_lat": 40.0, "gps_lon": -105.0, "timestamp": "2025-12-25T22:30:00Z"}
+    fixes = [{**fix, field: bad}, {**fix, field: bad}]
+    response = client.post("/api/device/locations/bulk", json=fixes, headers={"x-api-key": API_KEY})
+    assert response.status_code == 400
+    assert [e["error"] for e in response.json()["errors"]] == [error, error]
+
+
+def test_device_locations_bulk_ndjson_invalid_line():
+    """Test bulk ingest rejects NDJSON bodies with malformed lines."""
+    body = '{"device_id": "esp32-bulk", "gps_lat": 40.0, "gps_lon": -105.0, "timestamp": "2025-12-25T22:30:00Z"}\n{oops\n'
+    response = client.post(
+        "/api/device/locations/bulk",
+        content=body,
+        headers={"x-api-key": API_KEY, "content-type": "application/x-ndjson"},
+    )
+    assert response.status_code == 400
+    assert response.json()["error"] == "Invalid JSON on line 2"
+
+
+def test_device_locations_bulk_empty():
+    """Test bulk ingest with an empty array."""
+    response = client.post("/api/device/locations/bulk", json=[], headers={"x-api-key": API_KEY})
+    assert response.status_code == 400
+    assert response.json()["status"] == "error"
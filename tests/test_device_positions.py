@@ -0,0 +1,76 @@
+"""
+Tests for the in-memory latest device position table (services/device_position_service.py).
+"""
+
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+
+from nfc_api import app
+from services.device_position_service import LatestPositionTable, device_positions
+
+client = TestClient(app)
+API_KEY = "super-secret-test-key22"
+
+
+def _fix(device_id, lat, lon, timestamp, **extra):
+    return {"device_id": device_id, "gps_lat": lat, "gps_lon": lon, "timestamp": timestamp, **extra}
+
+
+def test_update_keeps_newest_fix():
+    table = LatestPositionTable()
+    assert table.update(_fix("esp32-a", 40.0, -105.0, "2026-01-05T12:00:10Z", satellites=8))
+    # Older replayed fix must not move the device backwards
+    assert not table.update(_fix("esp32-a", 41.0, -106.0, "2026-01-05T12:00:00Z"))
+    entry = table.get("esp32-a")
+    assert entry["gps_lat"] == 40.0
+    assert entry["satellites"] == 8
+    assert entry["hdop"] is None
+    assert entry["timestamp"] == "2026-01-05T12:00:10+00:00"
+
+
+def test_load_merges_database_rows():
+    table = LatestPositionTable()
+    table.update(_fix("esp32-a", 40.0, -105.0, "2026-01-05T12:00:10Z"))
+    table.load([
+        _fix("esp32-a", 39.0, -104.0, datetime(2026, 1, 5, 11, 0, tzinfo=timezone.utc)),
+        _fix("esp32-b", 38.0, -103.0, datetime(2026, 1, 5, 11, 0, tzinfo=timezone.utc), player="Steve"),
+    ])
+    assert table.loaded
+    latest = table.latest()
+    assert [e["device_id"] for e in latest] == ["esp32-a", "esp32-b"]
+    assert latest[0]["gps_lat"] == 40.0
+    assert latest[1]["player"] == "Steve"
+
+
+def test_table_grows_past_initial_capacity():
+    table = LatestPositionTable(capacity=2)
+    for i in range(10):
+        table.update(_fix(f"dev-{i}", i, i, "2026-01-05T12:00:00Z"))
+    assert len(table) == 10
+    assert table.get("dev-9")["gps_lat"] == 9.0
+
+
+def test_stale_orders_stalest_first():
+    now = datetime.now(timezone.utc)
+    table = LatestPositionTable()
+    table.update(_fix("fresh", 40.0, -105.0, now.isoformat()))
+    table.update(_fix("old", 40.0, -105.0, (now - timedelta(hours=1)).isoformat()))
+    table.update(_fix("older", 40.0, -105.0, (now - timedelta(hours=2)).isoformat()))
+    stale = table.stale(600)
+    assert [e["device_id"] for e in stale] == ["older", "old"]
+    assert stale[0]["seconds_since"] >= 7200
+
+
+def test_last_seen_endpoint():
+    device_positions.update(_fix("esp32-last-seen", 40.0, -105.0, "2026-01-05T12:00:00Z"))
+    response = client.get("/api/device/esp32-last-seen/last-seen", headers={"x-api-key": API_KEY})
+    assert response.status_code == 200
+    assert response.json()["device"]["gps_lon"] == -105.0
+
+    response = client.get("/api/device/never-reported/last-seen", headers={"x-api-key": API_KEY})
+    assert response.status_code == 404
+
+
+def test_latest_endpoint_requires_api_key():
+    response = client.get("/api/device/locations/latest", headers={"x-api-key": "wrong-key"})
+    assert response.status_code == 401
@@ -0,0 +1,127 @@
+"""
+Tests for geofence enter/exit events (services/geofence_service.py).
+"""
+
+import random
+import time
+from datetime import datetime, timezone
+from fastapi.testclient import TestClient
+
+from nfc_api import app
+from services.geofence_service import GeofenceEngine, GeofenceEventBus, geofence_bus
+from services.spatial_index import TokenSpatialIndex
+
+client = TestClient(app)
+API_KEY = "super-secret-test-key22"
+
+# ~1.1 m of latitude
+ONE_METER_LAT = 1 / 111320
+
+
+def _token(token_id, lat, lon, entity="piglin"):
+    return {
+        "token_id": token_id,
+        "action_type": "summon_entity",
+        "entity": entity,
+        "item": None,
+        "gps_write_lat": lat,
+        "gps_write_lon": lon,
+        "written_by": "TestPlayer",
+        "written_at": datetime(2026, 1, 5, tzinfo=timezone.utc),
+        "created_at": datetime(2026, 1, 5, tzinfo=timezone.utc),
+    }
+
+
+def _engine(tokens):
+    index = TokenSpatialIndex(refresh_interval_s=3600)
+    index.load(tokens)
+    return GeofenceEngine(index, GeofenceEventBus(), radius_m=30, exit_radius_m=40)
+
+
+def test_index_query_radius():
+    index = TokenSpatialIndex(refresh_interval_s=3600)
+    index.load([_token("near", 40.7580, -105.3009), _token("far", 40.7680, -105.3009)])
+    results = index.query_radius(40.7581, -105.3009, 100)
+    assert [t["token_id"] for _, t in results] == ["near"]
+    assert results[0][0] < 15
+
+
+def test_index_moved_token_leaves_no_empty_cell():
+    index = TokenSpatialIndex(refresh_interval_s=3600)
+    index.load([_token("moving", 40.7580, -105.3009)])
+    for step in range(1, 20):
+        index.add(_token("moving", 40.7580 + step * 0.02, -105.3009))
+    assert len(index._cells) == 1
+    assert [t["token_id"] for _, t in index.query_radius(40.7580 + 19 * 0.02, -105.3009, 100)] == ["moving"]
+
+
+def test_enter_is_reported_once():
+    engine = _engine([_token("t1", 40.7580, -105.3009)])
+    events = engine.process_fix("dev-1", 40.7580 - 20 * ONE_METER_LAT, -105.3009, player="P1")
+    assert [(e["event"], e["token_id"]) for e in events] == [("enter", "t1")]
+    assert events[0]["player"] == "P1"
+    assert "piglin" in events[0]["message"]
+    # Still inside: no new event
+    assert engine.process_fix("dev-1", 40.7580 - 10 * ONE_METER_LAT, -105.3009) == []
+    assert engine.inside("dev-1") == ["t1"]
+
+
+def test_exit_uses_hysteresis():
+    engine = _engine([_token("t1", 40.7580, -105.3009)])
+    engine.process_fix("dev-1", 40.7580, -105.3009)
+    # 35 m away: outside the enter radius but inside the exit radius
+    assert engine.process_fix("dev-1", 40.7580 - 35 * ONE_METER_LAT, -105.3009) == []
+    events = engine.process_fix("dev-1", 40.7580 - 50 * ONE_METER_LAT, -105.3009)
+    assert [(e["event"], e["token_id"]) for e in events] == [("exit", "t1")]
+    assert engine.inside("dev-1") == []
+
+
+def test_devices_are_tracked_independently():
+    engine = _engine([_token("t1", 40.7580, -105.3009)])
+    assert len(engine.process_fix("dev-1", 40.7580, -105.3009)) == 1
+    assert len(engine.process_fix("dev-2", 40.7580, -105.3009)) == 1
+    assert engine.process_fix("dev-1", 40.7580, -105.3009) == []
+
+
+def test_event_bus_cursor_and_subscribers():
+    bus = GeofenceEventBus(max_events=3)
+    q = bus.subscribe()
+    for i in range(5):
+        bus.publish({"event": "enter", "device_id": f"dev-{i % 2}"})
+    assert [e["seq"] for e in bus.events_after(0)] == [3, 4, 5]
+    assert [e["seq"] for e in bus.events_after(3, device_id="dev-0")] == [5]
+    assert q.qsize() == 5
+    bus.unsubscribe(q)
+    bus.publish({"event": "exit", "device_id": "dev-0"})
+    assert q.qsize() == 5
+
+
+def test_many_fixes_without_database():
+    rng = random.Random(1)
+    tokens = [_token(f"t{i}", 40.70 + rng.random() * 0.1, -105.35 + rng.random() * 0.1) for i in range(10000)]
+    engine = _engine(tokens)
+    fixes = [(f"dev-{i % 50}", 40.70 + rng.random() * 0.1, -105.35 + rng.random() * 0.1) for i in range(1000)]
+    start = time.perf_counter()
+    for device_id, lat, lon in fixes:
+        engine.process_fix(device_id, lat, lon)
+    # Hundreds of fixes per second with plenty of headroom
+    assert time.perf_counter() - start < 1.0
+
+
+def test_geofence_events_endpoint():
+    published = geofence_bus.publish({"event": "enter", "device_id": "endpoint-test-device", "token_id": "t1"})
+    response = client.get(
+        "/api/geofence/events",
+        params={"after": published["seq"] - 1, "device_id": "endpoint-test-device"},
+        headers={"x-api-key": API_KEY}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "ok"
+    assert data["last_seq"] == published["seq"]
+    assert data["events"][0]["token_id"] == "t1"
+
+
+def test_geofence_events_invalid_api_key():
+    response = client.get("/api/geofence/events", headers={"x-api-key": "wrong-key"})
+    assert response.status_code == 401
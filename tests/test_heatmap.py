@@ -0,0 +1,118 @@
+"""
+Tests for the density heatmap tiles (services/heatmap.py) and the
+/tiles/heatmap/{source}/{z}/{x}/{y}.png admin endpoint.
+"""
+
+import io
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'web')))
+import website
+from services import heatmap
+from services.cluster_index import tile_of
+
+
+def _rows(count, start_id=1, seed=2):
+    rng = random.Random(seed)
+    return [(start_id + i, 40 + rng.gauss(0, 0.01), -105 + rng.gauss(0, 0.01)) for i in range(count)]
+
+
+@pytest.fixture
+def source():
+    rows = _rows(300)
+
+    def points_since(after_id, limit):
+        return [r for r in rows if r[0] > after_id][:limit]
+
+    src = heatmap.HeatmapSource("scans", points_since, refresh_interval_s=3600)
+    src.rows = rows
+    return src
+
+
+def test_counts_cover_every_point(source):
+    source.refresh()
+    assert len(source) == 300
+    z = 12
+    tiles = {tile_of(lat, lon, z) for _, lat, lon in source.rows}
+    m, b = heatmap.HEATMAP_MARGIN_BINS, heatmap.HEATMAP_BINS
+    total = sum(source.counts(z, x, y)[m:m + b, m:m + b].sum() for x, y in tiles)
+    assert total == 300
+
+
+def test_added_points_update_cached_grids(source):
+    source.refresh()
+    x, y = tile_of(40.0, -105.0, 13)
+    cached = source.counts(13, x, y).copy()
+    source.tile(13, x, y)
+
+    new = _rows(50, start_id=301, seed=9)
+    source.rows.extend(new)
+    source.refresh(force=True)
+    updated = source.counts(13, x, y)
+
+    # Same as histogramming every point from scratch
+    fresh = heatmap.HeatmapSource("scans", lambda after_id, limit: [r for r in source.rows if r[0] > after_id][:limit])
+    fresh.refresh()
+    assert np.array_equal(updated, fresh.counts(13, x, y))
+    assert updated.sum() > cached.sum()
+    assert source._grids[(13, x, y)][1] is None
+
+
+def test_overlap_rows_not_counted_twice(source):
+    source.refresh()
+    x, y = tile_of(40.0, -105.0, 10)
+    before = source.counts(10, x, y).sum()
+    source.refresh(force=True)
+    assert source.counts(10, x, y).sum() == before
+
+
+def test_lru_evicts_oldest_grid(source):
+    source.cache_size = 2
+    source.refresh()
+    source.counts(5, 0, 0)
+    source.counts(6, 0, 0)
+    source.counts(5, 0, 0)
+    source.counts(7, 0, 0)
+    assert list(source._grids) == [(5, 0, 0), (7, 0, 0)]
+
+
+def test_tile_is_rgba_png_transparent_where_empty(source):
+    source.refresh()
+    x, y = tile_of(40.0, -105.0, 11)
+    image = Image.open(io.BytesIO(source.tile(11, x, y)))
+    assert image.format == "PNG"
+    assert image.size == (256, 256)
+    alpha = np.asarray(image)[:, :, 3]
+    assert alpha.max() > 0
+
+    empty = Image.open(io.BytesIO(source.tile(11, 0, 0)))
+    assert np.asarray(empty)[:, :, 3].max() == 0
+
+
+def test_blur_keeps_mass():
+    grid = np.zeros((20, 20))
+    grid[10, 10] = 4
+    blurred = heatmap.blur(grid)
+    assert abs(blurred.sum() - 4) < 1e-9
+    assert blurred[10, 10] == blurred.max() < 4
+
+
+def test_heatmap_endpoint(monkeypatch, source):
+    monkeypatch.setattr(website, "heatmap_sources", {"scans": source})
+    client = website.app.test_client()
+    x, y = tile_of(40.0, -105.0, 12)
+    response = client.get(f"/tiles/heatmap/scans/12/{x}/{y}.png")
+    assert response.status_code == 200
+    assert response.mimetype == "image/png"
+    etag = response.headers["ETag"]
+    assert client.get(f"/tiles/heatmap/scans/12/{x}/{y}.png",
+                      headers={"If-None-Match": etag}).status_code == 304
+
+    assert client.get("/tiles/heatmap/nope/1/0/0.png").status_code == 404
+    assert client.get("/tiles/heatmap/scans/1/2/0.png").status_code == 404
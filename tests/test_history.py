@@ -0,0 +1,57 @@
+"""
+Tests for spatial summon/give history endpoints (services/history_service.py).
+"""
+
+from datetime import datetime, timezone
+from fastapi.testclient import TestClient
+
+from nfc_api import app
+
+client = TestClient(app)
+API_KEY = "super-secret-test-key22"
+
+
+def test_summons_near(monkeypatch):
+    calls = []
+
+    def fake_near(lat, lon, radius_m, limit=100):
+        calls.append((lat, lon, radius_m, limit))
+        return [{
+            "id": 7,
+            "summoned_object_type": "piglin",
+            "summoning_player": "WiryHealer4014",
+            "timestamp_utc": datetime(2026, 1, 5, 12, tzinfo=timezone.utc),
+            "gps_lat": 40.7581,
+            "gps_lon": -105.3009,
+            "distance_m": 11.1,
+        }]
+
+    monkeypatch.setattr("summon_db.get_summons_near", fake_near)
+    resp = client.get("/api/summons/near", params={"lat": 40.758, "lon": -105.3009, "radius_m": 250},
+                      headers={"x-api-key": API_KEY})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["count"] == 1
+    assert data["summons"][0]["distance_m"] == 11.1
+    assert calls == [(40.758, -105.3009, 250.0, 100)]
+
+
+def test_give_bbox(monkeypatch):
+    calls = []
+    monkeypatch.setattr("summon_db.get_give_operations_in_bbox",
+                        lambda *args: calls.append(args) or [])
+    resp = client.get("/api/give/bbox", params={"bbox": "-105.31,40.75,-105.29,40.77", "limit": 5},
+                      headers={"x-api-key": API_KEY})
+    assert resp.status_code == 200
+    assert resp.json()["give_operations"] == []
+    assert calls == [(-105.31, 40.75, -105.29, 40.77, 5)]
+
+
+def test_history_rejects_bad_parameters():
+    resp = client.get("/api/summons/bbox", params={"bbox": "-105.29,40.75,-105.31,40.77"},
+                      headers={"x-api-key": API_KEY})
+    assert resp.status_code == 400
+    resp = client.get("/api/give/near", params={"lat": 95, "lon": 0}, headers={"x-api-key": API_KEY})
+    assert resp.status_code == 422
+    resp = client.get("/api/summons/near", params={"lat": 40, "lon": 0}, headers={"x-api-key": "wrong-key"})
+    assert resp.status_code == 401
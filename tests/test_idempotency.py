@@ -0,0 +1,115 @@
+"""
+Tests for idempotent retries of /summon and /nfc-event.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+import nfc_api
+from nfc_api import app
+from utils.idempotency import IdempotencyCache, IdempotencyError, idempotency_cache, request_key
+
+client = TestClient(app)
+headers = {"x-api-key": "super-secret-test-key22"}
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    idempotency_cache.clear()
+    yield
+    idempotency_cache.clear()
+
+
+@pytest.fixture
+def nfc_calls(monkeypatch):
+    calls = []
+
+    def handler(data):
+        calls.append(data)
+        if data.get("action") == "fail":
+            return {"status": "error", "error": "Failed to write token to database: down"}
+        return {"status": "ok", "call": len(calls)}
+
+    monkeypatch.setattr(nfc_api, "handle_nfc_event_service", handler)
+    return calls
+
+
+def _scan(**extra):
+    scan = {"action": "zombie", "player": "Steve", "device_id": "esp32-1", "timestamp": "2026-01-05T12:00:00Z"}
+    scan.update(extra)
+    return scan
+
+
+def test_retry_with_same_body_is_replayed(nfc_calls):
+    first = client.post("/api/v1.1.1/nfc-event", json=_scan(), headers=headers)
+    retry = client.post("/nfc-event", json=_scan(), headers=headers)
+    assert first.json() == retry.json() == {"status": "ok", "call": 1}
+    assert "Idempotent-Replayed" not in first.headers
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert len(nfc_calls) == 1
+    # A later scan is a new request
+    client.post("/nfc-event", json=_scan(timestamp="2026-01-05T12:00:05Z"), headers=headers)
+    assert len(nfc_calls) == 2
+
+
+def test_body_without_identity_is_not_deduplicated(nfc_calls):
+    scan = {"action": "zombie", "player": "Steve"}
+    client.post("/nfc-event", json=scan, headers=headers)
+    client.post("/nfc-event", json=scan, headers=headers)
+    assert len(nfc_calls) == 2
+
+
+def test_header_key(nfc_calls):
+    h = {**headers, "Idempotency-Key": "scan-0001"}
+    client.post("/nfc-event", json={"action": "zombie", "player": "Steve"}, headers=h)
+    retry = client.post("/nfc-event", json={"action": "zombie", "player": "Steve"}, headers=h)
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert len(nfc_calls) == 1
+    reused = client.post("/nfc-event", json={"action": "piglin", "player": "Steve"}, headers=h)
+    assert reused.status_code == 422
+    assert len(nfc_calls) == 1
+
+
+def test_errors_are_not_stored(nfc_calls):
+    client.post("/nfc-event", json=_scan(action="fail"), headers=headers)
+    client.post("/nfc-event", json=_scan(action="fail"), headers=headers)
+    assert len(nfc_calls) == 2
+
+
+def test_summon_retry_skips_db_and_server(monkeypatch):
+    writes, sent = [], []
+    monkeypatch.setattr("services.summon_service.insert_summon_with_token",
+                        lambda *a, **k: writes.append(a) or (1, "tok-1"))
+    monkeypatch.setattr("services.summon_service.send_command_to_minecraft", lambda cmd: sent.append(cmd) or True)
+    payload = {
+        "token_id": "550e8400-e29b-41d4-a716-446655440000", "server_ip": "10.0.0.19", "server_port": 19132,
+        "summoned_object_type": "piglin", "summoning_player": "A", "summoned_player": "B",
+        "action_type": "Read", "minecraft_id": "piglin", "entity_summoned": "piglin",
+        "timestamp": "2025-12-22T12:00:00Z", "gps_lat": 37.7749, "gps_lon": -122.4194,
+        "client_device_id": "ios-device-123",
+    }
+    first = client.post("/summon", json=payload, headers=headers).json()
+    retry = client.post("/summon", json=payload, headers=headers).json()
+    assert retry["operation_id"] == first["operation_id"]
+    assert len(writes) == len(sent) == 1
+
+
+def test_cache_ttl_lru_and_in_flight():
+    cache = IdempotencyCache(ttl_s=0, max_size=2)
+    key = request_key("t", "k", {}, ())
+    assert cache.run(key, lambda: {"n": 1}, lambda r: True) == ({"n": 1}, False)
+    # Expired immediately
+    assert cache.run(key, lambda: {"n": 2}, lambda r: True) == ({"n": 2}, False)
+
+    cache = IdempotencyCache(ttl_s=60, max_size=2)
+    for name in ("a", "b", "c"):
+        cache.run(request_key("t", name, {}, ()), lambda: {"name": name}, lambda r: True)
+    assert cache.run(request_key("t", "a", {}, ()), lambda: {"name": "new"}, lambda r: True)[1] is False
+    assert cache.run(request_key("t", "c", {}, ()), lambda: {"name": "new"}, lambda r: True)[1] is True
+
+    def reentrant():
+        cache.run(request_key("t", "busy", {}, ()), dict, lambda r: True)
+
+    with pytest.raises(IdempotencyError) as exc:
+        cache.run(request_key("t", "busy", {}, ()), reentrant, lambda r: True)
+    assert exc.value.status_code == 409
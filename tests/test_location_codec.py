@@ -0,0 +1,110 @@
+"""
+Tests for the binary location codec (services/location_codec.py) and /api/device/locations/binary.
+"""
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from nfc_api import app
+from services.location_codec import decode_frames, decode_varints, encode_frame, zigzag_decode
+
+client = TestClient(app)
+API_KEY = "super-secret-test-key22"
+
+START_MS = 1767614400000  # 2026-01-05T12:00:00Z
+
+
+def _track(count, alt=True):
+    rng = np.random.default_rng(3)
+    lat = 40.758 + np.cumsum(rng.normal(0, 2e-5, count))
+    lon = -105.3009 + np.cumsum(rng.normal(0, 2e-5, count))
+    return [
+        {
+            "epoch_ms": START_MS + i * 1000,
+            "gps_lat": round(float(lat[i]), 6),
+            "gps_lon": round(float(lon[i]), 6),
+            "gps_alt": 1655.3 + i * 0.1 if alt else None,
+        }
+        for i in range(count)
+    ]
+
+
+def test_varints_and_zigzag_roundtrip():
+    values = [0, 1, -1, 63, -64, 300, -300, 2 ** 40, -(2 ** 40), 2 ** 62]
+    body = encode_frame("d", [{"epoch_ms": v, "gps_lat": 0, "gps_lon": 0} for v in values])
+    frame = decode_frames(body)[0]
+    assert list(frame["epoch_ms"]) == values
+
+
+def test_decode_varints_counts_bytes():
+    buf = np.frombuffer(bytes([0x01, 0xAC, 0x02, 0x7F, 0xFF]), dtype=np.uint8)
+    values, consumed = decode_varints(buf, 3)
+    assert list(values) == [1, 300, 127]
+    assert consumed == 4
+    assert list(zigzag_decode(np.array([0, 1, 2, 3], dtype=np.uint64))) == [0, -1, 1, -2]
+
+
+def test_frame_roundtrip_with_altitude():
+    fixes = _track(500)
+    body = encode_frame("esp32-codec", fixes, player="WiryHealer4014")
+    # Deltas of a 1 Hz walking track fit in a few bytes per fix
+    assert len(body) < 500 * 8
+    frame, = decode_frames(body)
+    assert frame["device_id"] == "esp32-codec"
+    assert frame["player"] == "WiryHealer4014"
+    assert list(frame["epoch_ms"]) == [f["epoch_ms"] for f in fixes]
+    assert np.allclose(frame["gps_lat"], [f["gps_lat"] for f in fixes], atol=1e-9)
+    assert np.allclose(frame["gps_lon"], [f["gps_lon"] for f in fixes], atol=1e-9)
+    assert np.allclose(frame["gps_alt"], [f["gps_alt"] for f in fixes], atol=0.05)
+
+
+def test_multiple_frames_without_altitude():
+    body = encode_frame("a", _track(3, alt=False)) + encode_frame("b", _track(2, alt=False))
+    frames = decode_frames(body)
+    assert [f["device_id"] for f in frames] == ["a", "b"]
+    assert frames[0]["gps_alt"] is None
+    assert len(frames[1]["gps_lat"]) == 2
+
+
+@pytest.mark.parametrize("body", [b"\x02\x00\x01a\x00\x00", b"\x01\x00\x01a\x00\x05\x00", b"\x01\x00\x09a"])
+def test_malformed_frames_raise(body):
+    with pytest.raises(ValueError):
+        decode_frames(body)
+
+
+def test_binary_endpoint_rejects_out_of_range_fixes():
+    fixes = [{"epoch_ms": START_MS, "gps_lat": 95.0, "gps_lon": 0.0}]
+    resp = client.post(
+        "/api/device/locations/binary",
+        content=encode_frame("esp32-codec", fixes),
+        headers={"x-api-key": API_KEY, "content-type": "application/octet-stream"},
+    )
+    assert resp.status_code == 400
+    data = resp.json()
+    assert data["rejected"] == 1
+    assert data["errors"][0]["error"] == "gps_lat must be between -90 and 90"
+
+
+def test_binary_endpoint_rejects_out_of_range_times():
+    fixes = [{"epoch_ms": 10**17, "gps_lat": 40.0, "gps_lon": -105.0},
+             {"epoch_ms": -START_MS, "gps_lat": 40.0, "gps_lon": -105.0}]
+    resp = client.post(
+        "/api/device/locations/binary",
+        content=encode_frame("esp32-codec", fixes),
+        headers={"x-api-key": API_KEY, "content-type": "application/octet-stream"},
+    )
+    assert resp.status_code == 400
+    data = resp.json()
+    assert data["rejected"] == 2
+    assert {e["error"] for e in data["errors"]} == {"epoch_ms must be between 1970-01-01 and 2100-01-01"}
+
+
+def test_binary_endpoint_malformed_body():
+    resp = client.post(
+        "/api/device/locations/binary",
+        content=b"\x07garbage",
+        headers={"x-api-key": API_KEY, "content-type": "application/octet-stream"},
+    )
+    assert resp.status_code == 400
+    assert "Malformed" in resp.json()["error"]
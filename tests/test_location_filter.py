@@ -0,0 +1,94 @@
+"""
+Tests for ingest-side jitter/duplicate suppression (services/location_filter.py).
+"""
+
+from fastapi.testclient import TestClient
+
+from nfc_api import app
+from services.location_filter import LocationFilter
+
+client = TestClient(app)
+API_KEY = "super-secret-test-key22"
+
+# ~1 m of latitude
+ONE_METER_LAT = 1 / 111320
+
+
+def _fix(lat, second, device_id="esp32-filter", **extra):
+    return {"device_id": device_id, "gps_lat": lat, "gps_lon": -105.0,
+            "timestamp": f"2026-01-05T12:{second // 60:02d}:{second % 60:02d}Z", **extra}
+
+
+def _filter(**overrides):
+    settings = dict(enabled=True, min_distance_m=5, heartbeat_s=300, min_interval_s=0,
+                    max_hdop=5, min_satellites=4)
+    settings.update(overrides)
+    return LocationFilter(**settings)
+
+
+def test_stationary_jitter_suppressed_until_heartbeat():
+    f = _filter()
+    assert f.check(_fix(40.0, 0)) is None
+    assert f.check(_fix(40.0 + 2 * ONE_METER_LAT, 5)) == "duplicate"
+    assert f.check(_fix(40.0 - 2 * ONE_METER_LAT, 10)) == "duplicate"
+    # Heartbeat: a stationary device still gets a fix written every heartbeat_s
+    assert f.check(_fix(40.0, 300)) is None
+
+
+def test_movement_is_kept():
+    f = _filter()
+    assert f.check(_fix(40.0, 0)) is None
+    assert f.check(_fix(40.0 + 10 * ONE_METER_LAT, 5)) is None
+    # Compared with the last kept fix, not the last received one
+    assert f.check(_fix(40.0 + 12 * ONE_METER_LAT, 10)) == "duplicate"
+
+
+def test_quality_thresholds():
+    f = _filter()
+    assert f.check(_fix(40.0, 0, hdop=9.9)) == "hdop"
+    assert f.check(_fix(40.0, 1, satellites=3)) == "satellites"
+    # Rejected fixes do not become the reference
+    assert f.check(_fix(40.0, 2, hdop=1.0, satellites=8)) is None
+
+
+def test_rate_limit_and_backfill():
+    f = _filter(min_interval_s=10)
+    assert f.check(_fix(40.0, 60)) is None
+    assert f.check(_fix(41.0, 65)) == "rate"
+    # Older than the reference fix: history backfill, only quality-checked
+    assert f.check(_fix(40.0, 30)) is None
+    assert f.check(_fix(41.0, 70)) is None
+
+
+def test_disabled_filter_keeps_everything_and_counts():
+    f = _filter(enabled=False)
+    for second in range(5):
+        assert f.check(_fix(40.0, second, hdop=50)) is None
+    stats = f.stats()
+    assert stats["received"] == 5
+    assert stats["kept"] == 5
+    assert stats["suppressed"] == 0
+
+
+def test_stats_by_reason_and_device():
+    f = _filter()
+    f.check(_fix(40.0, 0, device_id="a"))
+    f.check(_fix(40.0, 1, device_id="a"))
+    f.check(_fix(40.0, 0, device_id="b", hdop=20))
+    stats = f.stats()
+    assert stats["suppressed_by"] == {"duplicate": 1, "hdop": 1}
+    assert stats["devices"]["a"] == {"received": 2, "kept": 1, "duplicate": 1}
+
+
+def test_suppressed_fix_is_not_written():
+    payload = {"device_id": "esp32-filter-endpoint", "gps_lat": 40.0, "gps_lon": -105.0,
+               "hdop": 25.0, "timestamp": "2026-01-05T12:00:00Z"}
+    response = client.post("/api/device/location", json=payload, headers={"x-api-key": API_KEY})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "ok"
+    assert data["suppressed"] == "hdop"
+
+    response = client.get("/api/device/locations/filter-stats", headers={"x-api-key": API_KEY})
+    assert response.status_code == 200
+    assert response.json()["devices"]["esp32-filter-endpoint"]["hdop"] == 1
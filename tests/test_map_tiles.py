@@ -0,0 +1,219 @@
+"""
+Tests for the GeoJSON map tiles (services/map_tiles.py, utils/tile_cache.py)
+and the /tiles/{layer}/{z}/{x}/{y} admin endpoint.
+"""
+
+import json
+import os
+import random
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'web')))
+import website
+import summon_db
+from services import map_tiles
+from services.cluster_index import TokenClusterIndex, tile_bounds, tile_of
+from utils.tile_cache import TileCache
+
+WHEN = datetime(2026, 1, 5, 12, 0, tzinfo=timezone.utc)
+
+
+def _features(layer, z, x, y):
+    return json.loads(layer.tile(z, x, y))["features"]
+
+
+def test_tile_bounds_contain_their_points():
+    min_lon, min_lat, max_lon, max_lat = tile_bounds(12, 847, 1548)
+    assert tile_of((min_lat + max_lat) / 2, (min_lon + max_lon) / 2, 12) == (847, 1548)
+    assert tile_of(40.758, -105.3009, 0) == (0, 0)
+
+
+def test_tile_cache_stores_and_invalidates(tmp_path):
+    cache = TileCache(str(tmp_path))
+    renders = []
+
+    def render():
+        renders.append(1)
+        return b"tile"
+
+    assert cache.get("summons", 3, 1, 2, render) == b"tile"
+    assert cache.get("summons", 3, 1, 2, render) == b"tile"
+    assert len(renders) == 1
+    assert cache.invalidate("summons", [(3, 1, 2), (3, 0, 0)]) == 1
+    cache.get("summons", 3, 1, 2, render)
+    assert len(renders) == 2
+
+
+def test_tile_cache_skips_store_when_invalidated_during_render(tmp_path):
+    cache = TileCache(str(tmp_path))
+
+    def render():
+        cache.invalidate("tokens", [(0, 0, 0)])
+        return b"stale"
+
+    assert cache.get("tokens", 0, 0, 0, render) == b"stale"
+    assert not os.path.exists(cache.path("tokens", 0, 0, 0))
+
+
+def test_tile_cache_invalidation_seen_across_processes(tmp_path):
+    # Two caches on one directory share no memory, like two server processes
+    cache, other = TileCache(str(tmp_path)), TileCache(str(tmp_path))
+
+    def render():
+        other.invalidate("tokens", [(0, 0, 0)])
+        return b"stale"
+
+    assert cache.get("tokens", 0, 0, 0, render) == b"stale"
+    assert not os.path.exists(cache.path("tokens", 0, 0, 0))
+
+    def render_then_clear():
+        other.clear("tokens")
+        return b"stale"
+
+    assert cache.get("tokens", 1, 0, 0, render_then_clear) == b"stale"
+    assert not os.path.exists(cache.path("tokens", 1, 0, 0))
+    assert cache.get("tokens", 1, 0, 0, lambda: b"fresh") == b"fresh"
+    assert other.get("tokens", 1, 0, 0, lambda: b"unused") == b"fresh"
+
+
+def test_token_tiles_partition_the_index():
+    rng = random.Random(5)
+    index = TokenClusterIndex(refresh_interval_s=3600)
+    index.load([{"token_id": i, "action_type": "summon_entity",
+                 "lat": 40 + rng.gauss(0, 0.05), "lon": -105 + rng.gauss(0, 0.05)} for i in range(500)])
+    for z in (4, 10, 14, 17, 19):
+        tiles = {tile_of(t["lat"], t["lon"], z) for t in index._tokens.values()}
+        features = [f for x, y in tiles for f in index.tile(z, x, y)]
+        assert sum(f.get("count", 1) for f in features) == 500
+
+
+@pytest.fixture
+def token_layer(tmp_path):
+    index = TokenClusterIndex(refresh_interval_s=3600)
+    index._refreshed_at = 0  # Loaded by the test, never from the database
+    layer = map_tiles.TokenTileLayer(TileCache(str(tmp_path)), index=index)
+    index.load([{"token_id": "a", "action_type": "summon_entity", "lat": 40.0, "lon": -105.0}])
+    return layer, index
+
+
+def test_token_tile_invalidated_by_index_change(token_layer):
+    layer, index = token_layer
+    x, y = tile_of(40.0, -105.0, 18)
+    assert [f["properties"]["token_id"] for f in _features(layer, 18, x, y)] == ["a"]
+
+    index.add({"token_id": "b", "action_type": "give_item", "lat": 40.0001, "lon": -105.0001})
+    assert {f["properties"]["token_id"] for f in _features(layer, 18, x, y)} == {"a", "b"}
+    assert _features(layer, 2, *tile_of(40.0, -105.0, 2))[0]["properties"]["count"] == 2
+
+    index.add({"token_id": "b", "action_type": "give_item", "lat": 45.0, "lon": -100.0})
+    assert [f["properties"]["token_id"] for f in _features(layer, 18, x, y)] == ["a"]
+    bx, by = tile_of(45.0, -100.0, 18)
+    assert [f["properties"]["token_id"] for f in _features(layer, 18, bx, by)] == ["b"]
+
+
+def test_token_tiles_cleared_on_reload(token_layer):
+    layer, index = token_layer
+    x, y = tile_of(40.0, -105.0, 8)
+    _features(layer, 8, x, y)
+    index.load([])
+    assert _features(layer, 8, x, y) == []
+
+
+def _summon(summon_id, lat, lon, mob="piglin"):
+    return {"id": summon_id, "summoned_object_type": mob, "summoning_player": "Steve",
+            "summoned_player": "Alex", "timestamp_utc": WHEN, "gps_lat": lat, "gps_lon": lon}
+
+
+@pytest.fixture
+def summons_db(monkeypatch):
+    summons = [_summon(1, 40.0, -105.0)]
+
+    def in_bbox(min_lon, min_lat, max_lon, max_lat, limit=100):
+        rows = [s for s in summons if min_lon <= s["gps_lon"] <= max_lon and min_lat <= s["gps_lat"] <= max_lat]
+        return sorted(rows, key=lambda s: -s["id"])[:limit]
+
+    def points_since(after_id=None, limit=10000):
+        if after_id is None:
+            return [(summons[-1]["id"], summons[-1]["gps_lat"], summons[-1]["gps_lon"])]
+        return [(s["id"], s["gps_lat"], s["gps_lon"]) for s in summons if s["id"] > after_id][:limit]
+
+    monkeypatch.setattr(summon_db, "get_summons_in_bbox", in_bbox)
+    monkeypatch.setattr(summon_db, "get_summon_points_since", points_since)
+    return summons
+
+
+def test_summon_tiles_merge_nearby_summons(tmp_path, summons_db):
+    summons_db.append(_summon(2, 40.00001, -105.00001, "zombie"))
+    layer = map_tiles.SummonTileLayer(TileCache(str(tmp_path)))
+    x, y = tile_of(40.0, -105.0, 10)
+    features = _features(layer, 10, x, y)
+    assert len(features) == 1
+    assert features[0]["properties"]["count"] == 2
+    assert features[0]["properties"]["summoned_object_type"] == "zombie"
+
+
+def test_summon_tiles_invalidated_by_new_rows(tmp_path, summons_db):
+    cache = TileCache(str(tmp_path))
+    layer = map_tiles.SummonTileLayer(cache)
+    x, y = tile_of(40.0, -105.0, 14)
+    assert len(_features(layer, 14, x, y)) == 1
+    far_x, far_y = tile_of(45.0, -100.0, 14)
+    _features(layer, 14, far_x, far_y)
+
+    summons_db.append(_summon(2, 40.001, -105.001))
+    layer.refresh(force=True)
+    assert len(_features(layer, 14, x, y)) == 2
+    # Untouched tiles stay cached
+    assert os.path.exists(cache.path("summons", 14, far_x, far_y))
+    assert cache.read_state("summons") == "2"
+
+    # A restarted process resumes from the saved watermark
+    summons_db.append(_summon(3, 40.0, -105.0))
+    restarted = map_tiles.SummonTileLayer(cache)
+    assert sum(f["properties"]["count"] for f in _features(restarted, 14, x, y)) == 3
+    assert os.path.exists(cache.path("summons", 14, far_x, far_y))
+
+
+def test_track_tiles_split_at_gaps(tmp_path, monkeypatch):
+    fixes = [("dev-1", "Steve", 40.0 + i * 0.0001, -105.0, 1000.0 + i) for i in range(50)]
+    fixes += [("dev-1", "Steve", 40.0, -105.0 + i * 0.0001, 5000.0 + i) for i in range(10)]
+    fixes += [("dev-2", None, 40.001, -105.001, 1000.0)]
+    monkeypatch.setattr(summon_db, "get_device_fixes_in_bbox", lambda *bbox, limit=20000: fixes)
+    monkeypatch.setattr(summon_db, "get_device_location_points_since", lambda after_id=None, limit=10000: [])
+
+    layer = map_tiles.DeviceTrackTileLayer(TileCache(str(tmp_path)))
+    features = _features(layer, 16, *tile_of(40.0, -105.0, 16))
+    assert [(f["properties"]["device_id"], f["geometry"]["type"]) for f in features] == [
+        ("dev-1", "LineString"), ("dev-1", "LineString"), ("dev-2", "Point"),
+    ]
+    # A straight run simplifies to its endpoints
+    assert len(features[0]["geometry"]["coordinates"]) == 2
+    assert features[0]["properties"]["fixes"] == 50
+
+
+@pytest.fixture
+def tiles_client(monkeypatch, tmp_path, token_layer):
+    layer, _ = token_layer
+    layer.label = lambda token: {**token, "name": "Piglin"}
+    monkeypatch.setattr(website, "tile_layers", {"tokens": layer})
+    return website.app.test_client()
+
+
+def test_tile_endpoint(tiles_client):
+    x, y = tile_of(40.0, -105.0, 12)
+    response = tiles_client.get(f"/tiles/tokens/12/{x}/{y}")
+    assert response.status_code == 200
+    assert response.mimetype == "application/geo+json"
+    assert response.get_json()["features"][0]["properties"]["name"] == "Piglin"
+
+    etag = response.headers["ETag"]
+    assert tiles_client.get(f"/tiles/tokens/12/{x}/{y}", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_tile_endpoint_validation(tiles_client):
+    assert tiles_client.get("/tiles/heatmap/1/0/0").status_code == 404
+    assert tiles_client.get("/tiles/tokens/2/4/0").status_code == 404
+    assert tiles_client.get("/tiles/tokens/30/0/0").status_code == 404
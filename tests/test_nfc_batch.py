@@ -0,0 +1,238 @@
+import os
+import sys
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from nfc_api import app
+from services import nfc_service
+from utils.command_queue import CommandQueue, wait_all
+import summon_db
+
+client = TestClient(app)
+headers = {"x-api-key": "super-secret-test-key22"}
+
+
+def _queue(monkeypatch, sent=True):
+    batches = []
+
+    def send_batch(cmds):
+        batches.append(list(cmds))
+        return sent
+
+    q = CommandQueue(send_batch=send_batch, batch_size=8)
+    monkeypatch.setattr(nfc_service, "command_queue", q)
+    return batches
+
+
+def _scan(action="zombie", **extra):
+    scan = {"action": action, "player": "Steve", "device_id": "dev-1"}
+    scan.update(extra)
+    return scan
+
+
+def test_command_queue_keeps_order_and_batches():
+    batches = []
+    gate = threading.Event()
+
+    def send_batch(cmds):
+        gate.wait(2)
+        batches.append(list(cmds))
+        return True
+
+    q = CommandQueue(send_batch=send_batch, batch_size=4)
+    first = q.submit("cmd0")
+    rest = q.submit_many([f"cmd{i}" for i in range(1, 10)])
+    gate.set()
+    assert wait_all([first] + rest, timeout=5) == [True] * 10
+    assert [c for batch in batches for c in batch] == [f"cmd{i}" for i in range(10)]
+    assert all(len(batch) <= 4 for batch in batches)
+    assert len(batches) < 10
+
+
+def test_command_queue_failed_send():
+    def send_batch(cmds):
+        raise OSError("screen not running")
+
+    q = CommandQueue(send_batch=send_batch)
+    assert wait_all(q.submit_many(["a", "b"]), timeout=5) == [False, False]
+
+
+def test_command_queue_batches_do_not_mix_callers():
+    gate = threading.Event()
+    batches = []
+
+    def send_batch(cmds):
+        gate.wait(2)
+        batches.append(list(cmds))
+        return not any(c.startswith("bad") for c in cmds)
+
+    q = CommandQueue(send_batch=send_batch, batch_size=8)
+    first = q.submit("warmup")
+    good = q.submit_many(["good0", "good1"])
+    bad = q.submit_many(["bad0", "bad1"])
+    gate.set()
+    assert wait_all([first] + good + bad, timeout=5) == [True, True, True, False, False]
+    assert batches == [["warmup"], ["good0", "good1"], ["bad0", "bad1"]]
+
+
+def test_wait_all_reports_unsent_commands_as_queued():
+    gate = threading.Event()
+    q = CommandQueue(send_batch=lambda cmds: gate.wait(5))
+    futures = q.submit_many(["a", "b"])
+    assert wait_all(futures, timeout=0.05) == [None, None]
+    gate.set()
+    assert wait_all(futures, timeout=5) == [True, True]
+
+
+def test_single_scan_sends_directly(monkeypatch):
+    batches = _queue(monkeypatch)
+    sent = []
+    monkeypatch.setattr("utils.mc_send.send_command_to_minecraft", lambda cmd: sent.append(cmd) or True)
+    response = nfc_service.handle_nfc_event(_scan("give_apple"))
+    assert response["sent"] is True
+    assert sent == ["give Steve apple 1"]
+    assert batches == []
+
+
+def test_nfc_batch_reports_timed_out_commands_as_queued(monkeypatch):
+    gate = threading.Event()
+    q = CommandQueue(send_batch=lambda cmds: gate.wait(5))
+    monkeypatch.setattr(nfc_service, "command_queue", q)
+    monkeypatch.setattr(nfc_service, "wait_all", lambda futures: wait_all(futures, timeout=0.05))
+    body = client.post("/api/v1.1.1/nfc-events/batch", json=[_scan("give_apple")], headers=headers).json()
+    gate.set()
+    result, = body["results"]
+    assert result["status"] == "ok"
+    assert result["sent"] is False
+    assert result["queued"] is True
+
+
+def test_nfc_batch_records_and_sends_in_order(monkeypatch):
+    batches = _queue(monkeypatch)
+    recorded = []
+
+    def fake_record(scans):
+        recorded.append(scans)
+        return [{"token_id": f"tok-{i}", "created": True, "scan_count": 1} for i in range(len(scans))]
+
+    monkeypatch.setattr(summon_db, "record_nfc_scans", fake_record)
+    scans = [
+        _scan("zombie", gps_lat=40.0, gps_lon=-105.0),
+        _scan("give_diamond"),
+        _scan("piglin", gps_lat=40.1, gps_lon=-105.1, nfc_tag_uid=" 04:A2 "),
+    ]
+    response = client.post("/api/v1.1.1/nfc-events/batch", json={"scans": scans}, headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "ok"
+    assert body["succeeded"] == 3
+    assert [r["index"] for r in body["results"]] == [0, 1, 2]
+    assert body["results"][0]["token_id"] == "tok-0"
+    assert "token_id" not in body["results"][1]
+    assert body["results"][2]["token_id"] == "tok-1"
+    # Only GPS scans are recorded, in one call
+    assert len(recorded) == 1
+    assert [s["entity"] for s in recorded[0]] == ["zombie", "piglin"]
+    assert recorded[0][1]["nfc_tag_uid"] == "04:A2"
+    assert [c for batch in batches for c in batch] == [
+        "execute as @a[name=Steve] at @s run summon zombie ~ ~5 ~4",
+        "give Steve diamond 1",
+        "execute as @a[name=Steve] at @s run summon piglin ~ ~5 ~4",
+    ]
+
+
+def test_nfc_batch_partial_failures(monkeypatch):
+    batches = _queue(monkeypatch)
+    monkeypatch.setattr(summon_db, "record_nfc_scans",
+                        lambda scans: [RuntimeError("constraint violated")])
+    scans = [_scan("zombie", gps_lat=40.0, gps_lon=-105.0), {"player": "Steve"}, _scan("give_apple")]
+    body = client.post("/api/v1.1.1/nfc-events/batch", json=scans, headers=headers).json()
+    assert body["status"] == "partial"
+    assert body["succeeded"] == 1
+    first, second, third = body["results"]
+    assert first["status"] == "error"
+    assert "constraint violated" in first["error"]
+    assert second == {"status": "error", "error": "Missing required field: action", "index": 1}
+    assert third["status"] == "ok"
+    # Failed scans send nothing
+    assert [c for batch in batches for c in batch] == ["give Steve apple 1"]
+
+
+def test_nfc_batch_rejects_bad_bodies(monkeypatch):
+    _queue(monkeypatch)
+    assert client.post("/api/v1.1.1/nfc-events/batch", json=[], headers=headers).status_code == 400
+    assert client.post("/api/v1.1.1/nfc-events/batch", json={"scan": []}, headers=headers).status_code == 400
+    monkeypatch.setattr(nfc_service, "MAX_NFC_BATCH", 2)
+    too_many = [_scan()] * 3
+    assert client.post("/api/v1.1.1/nfc-events/batch", json=too_many, headers=headers).status_code == 400
+    assert client.post("/api/v1.1.1/nfc-events/batch", json=[_scan()],
+                       headers={"x-api-key": "wrong"}).status_code == 401
+
+
+class _NoRowCursor:
+    """Cursor whose scan statement never returns a row (lost tag race twice)."""
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+
+    def fetchone(self):
+        return None
+
+    def close(self):
+        pass
+
+
+class _FakeConnection:
+    def __init__(self):
+        self.cur = _NoRowCursor()
+        self.committed = False
+
+    def cursor(self, cursor_factory=None):
+        return self.cur
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_record_nfc_scans_reports_missing_row_per_scan(monkeypatch):
+    conn = _FakeConnection()
+    monkeypatch.setattr(summon_db, "get_connection", lambda: conn)
+    scans = [{"action_type": "summon_entity", "entity": "zombie", "gps_lat": 40.0, "gps_lon": -105.0,
+              "nfc_tag_uid": "04:A2"}] * 2
+    results = summon_db.record_nfc_scans(scans)
+    assert [type(r) for r in results] == [RuntimeError, RuntimeError]
+    assert "04:A2" in str(results[0])
+    assert conn.committed
+
+
+def test_record_nfc_scan_raises_on_missing_row(monkeypatch):
+    monkeypatch.setattr(summon_db, "get_connection", _FakeConnection)
+    with pytest.raises(RuntimeError):
+        summon_db.record_nfc_scan("summon_entity", entity="zombie", gps_lat=40.0, gps_lon=-105.0,
+                                  nfc_tag_uid="04:A2")
+
+
+def test_nfc_batch_runs_off_the_event_loop(monkeypatch):
+    import asyncio
+    import nfc_api
+
+    def handler(data):
+        with pytest.raises(RuntimeError):
+            asyncio.get_running_loop()
+        return {"status": "ok", "results": []}
+
+    monkeypatch.setattr(nfc_api, "handle_nfc_event_batch", handler)
+    response = client.post("/api/v1.1.1/nfc-events/batch", json=[_scan()], headers=headers)
+    assert response.status_code == 200
@@ -79,6 +79,27 @@ def test_handle_nfc_event_give():
     assert response["gps"]["lon"] == -105.2705
 
 
+def test_handle_nfc_event_repeat_scan_reuses_token():
+    """Test that repeated scans of one tag UID share a single token."""
+    import uuid
+    data = {
+        "action": "piglin",
+        "player": "TestPlayer",
+        "device_id": "test-device-003",
+        "nfc_tag_uid": f"TEST-{uuid.uuid4().hex[:12]}",
+        "gps_lat": 40.0150,
+        "gps_lon": -105.2705
+    }
+    
+    first = handle_nfc_event(data)
+    second = handle_nfc_event({**data, "gps_lat": 40.0151})
+    
+    assert first["status"] == "ok" and second["status"] == "ok"
+    assert second["token_id"] == first["token_id"]
+    assert first["scan_count"] == 1
+    assert second["scan_count"] == 2
+
+
 def test_handle_nfc_event_no_gps():
     """Test handling v1.1.1 token without GPS (legacy mode)."""
     data = {
@@ -0,0 +1,64 @@
+"""
+Tests for JSON / MessagePack content negotiation (utils/response_format.py).
+"""
+
+import json
+import msgpack
+import pytest
+from fastapi.testclient import TestClient
+
+from nfc_api import app
+from utils.response_format import negotiate_response, wants_msgpack
+
+client = TestClient(app)
+API_KEY = "super-secret-test-key22"
+
+
+@pytest.mark.parametrize("accept,expected", [
+    (None, False),
+    ("", False),
+    ("application/json", False),
+    ("*/*", False),
+    ("application/msgpack", True),
+    ("application/x-msgpack", True),
+    ("application/msgpack, application/json;q=0.5", True),
+    ("application/json, application/msgpack;q=0.5", False),
+    ("application/msgpack;q=0", False),
+    ("text/html, application/msgpack", True),
+])
+def test_wants_msgpack(accept, expected):
+    assert wants_msgpack(accept) is expected
+
+
+def test_negotiate_response_same_payload_both_formats():
+    payload = {"status": "ok", "count": 1, "tokens": [{"position": {"lat": 40.758, "lon": -105.3009}, "name": "Piglin"}]}
+    
+    as_json = negotiate_response(payload, "application/json")
+    assert as_json.media_type == "application/json"
+    assert json.loads(as_json.body) == payload
+    
+    as_msgpack = negotiate_response(payload, "application/msgpack", status_code=201)
+    assert as_msgpack.media_type == "application/msgpack"
+    assert as_msgpack.status_code == 201
+    assert as_msgpack.headers["vary"] == "Accept"
+    assert msgpack.unpackb(as_msgpack.body) == payload
+    assert len(as_msgpack.body) < len(as_json.body)
+
+
+def test_nfc_event_validation_error_as_msgpack():
+    response = client.post(
+        "/api/v1.1.1/nfc-event",
+        json={"player": "TestPlayer"},
+        headers={"x-api-key": API_KEY, "accept": "application/msgpack"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    data = msgpack.unpackb(response.content)
+    assert data["status"] == "error"
+    assert "action" in data["error"]
+
+
+def test_nfc_event_defaults_to_json():
+    response = client.post("/api/v1.1.1/nfc-event", json={"player": "TestPlayer"}, headers={"x-api-key": API_KEY})
+    assert response.headers["content-type"] == "application/json"
+    assert response.json()["status"] == "error"
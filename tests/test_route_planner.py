@@ -0,0 +1,78 @@
+"""
+Tests for the route planner behind /api/tokens/route.
+"""
+
+import itertools
+import random
+
+import numpy as np
+
+from services.route_planner import (
+    RouteCache, distance_matrix, geohash_encode, nearest_neighbor_route,
+    plan_route, route_length, two_opt,
+)
+from services.token_service import haversine_distance
+
+
+def test_distance_matrix_matches_haversine():
+    lats = [40.7580, 40.7590, 40.7580]
+    lons = [-105.3009, -105.3009, -105.2880]
+    matrix = distance_matrix(lats, lons)
+    assert matrix.shape == (3, 3)
+    assert np.allclose(np.diag(matrix), 0)
+    assert np.allclose(matrix, matrix.T)
+    assert abs(matrix[0, 1] - haversine_distance(40.7580, -105.3009, 40.7590, -105.3009)) < 0.01
+    assert abs(matrix[0, 2] - haversine_distance(40.7580, -105.3009, 40.7580, -105.2880)) < 0.01
+
+
+def test_plan_route_straight_line_visits_in_order():
+    # Tokens along a line north of the origin, given out of order
+    points = [(40.7620, -105.3009), (40.7590, -105.3009), (40.7610, -105.3009), (40.7600, -105.3009)]
+    assert plan_route(40.7580, -105.3009, points) == [1, 3, 2, 0]
+
+
+def test_plan_route_empty():
+    assert plan_route(40.7580, -105.3009, []) == []
+
+
+def test_two_opt_reaches_local_optimum():
+    rng = random.Random(7)
+    for _ in range(20):
+        coords = [(40.75 + rng.random() * 0.02, -105.31 + rng.random() * 0.02) for _ in range(8)]
+        matrix = distance_matrix([c[0] for c in coords], [c[1] for c in coords])
+        greedy = nearest_neighbor_route(matrix, 0)
+        route = two_opt(greedy, matrix)
+        assert route[0] == 0 and sorted(route) == list(range(8))
+        length = route_length(route, matrix)
+        assert length <= route_length(greedy, matrix) + 1e-6
+        # No single segment reversal can shorten the result any further
+        for i, j in itertools.combinations(range(1, 8), 2):
+            reversed_route = route[:i] + route[i:j + 1][::-1] + route[j + 1:]
+            assert route_length(reversed_route, matrix) >= length - 1e-6
+
+
+def test_plan_route_50_tokens_visits_each_once():
+    rng = random.Random(42)
+    points = [(40.75 + rng.random() * 0.05, -105.32 + rng.random() * 0.05) for _ in range(50)]
+    order = plan_route(40.77, -105.30, points)
+    assert sorted(order) == list(range(50))
+
+
+def test_geohash_encode_known_value():
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+
+def test_route_cache_lru_and_token_set_key():
+    cache = RouteCache(max_size=2)
+    key_a = cache.make_key(40.7580, -105.3009, (10, None, None), ["b", "a"])
+    key_a_nearby = cache.make_key(40.75801, -105.30091, (10, None, None), ["a", "b"])
+    key_new_token = cache.make_key(40.7580, -105.3009, (10, None, None), ["a", "b", "c"])
+    assert key_a == key_a_nearby
+    assert key_a != key_new_token
+    
+    cache.put(key_a, ["a", "b"])
+    cache.put(key_new_token, ["c", "a", "b"])
+    assert cache.get(key_a) == ["a", "b"]
+    cache.put(("other",), [])
+    assert cache.get(key_new_token) is None  # least recently used was evicted
+    assert cache.get(key_a) == ["a", "b"]
@@ -4,10 +4,19 @@ import pytest
 from fastapi.testclient import TestClient
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from nfc_api import app
+from utils.idempotency import idempotency_cache
 
 client = TestClient(app)
 headers = {"x-api-key": "super-secret-test-key22"}
 
+
+@pytest.fixture(autouse=True)
+def fresh_idempotency_cache():
+    # Tests reuse one payload; a stored response would be replayed
+    idempotency_cache.clear()
+    yield
+    idempotency_cache.clear()
+
 def test_summon():
     data = {
         "token_id": "550e8400-e29b-41d4-a716-446655440000",
@@ -35,3 +44,47 @@ def test_summon():
     assert "operation_id" in resp
     # Ensure the command was sent to the server console
     assert resp.get("sent") is True
+
+
+def _summon_payload():
+    return {
+        "token_id": "550e8400-e29b-41d4-a716-446655440000",
+        "server_ip": "10.0.0.19",
+        "server_port": 19132,
+        "summoned_object_type": "piglin",
+        "summoning_player": "ActorPlayer",
+        "summoned_player": "TargetPlayer",
+        "action_type": "Read",
+        "minecraft_id": "piglin",
+        "entity_summoned": "piglin",
+        "timestamp": "2025-12-22T12:00:00Z",
+        "gps_lat": 37.7749,
+        "gps_lon": -122.4194,
+        "client_device_id": "ios-device-123"
+    }
+
+
+def test_summon_writes_summon_and_token_in_one_call(monkeypatch):
+    calls = []
+
+    def fake_write(*args, **kwargs):
+        calls.append((args, kwargs))
+        return 42, "11111111-2222-3333-4444-555555555555"
+
+    monkeypatch.setattr("services.summon_service.insert_summon_with_token", fake_write)
+    monkeypatch.setattr("services.summon_service.send_command_to_minecraft", lambda cmd: True)
+    response = client.post("/summon", json=_summon_payload(), headers=headers)
+    assert response.status_code == 200
+    assert response.json()["token_id"] == "11111111-2222-3333-4444-555555555555"
+    assert len(calls) == 1
+    assert calls[0][1]["entity"] == "piglin"
+
+
+def test_summon_storage_failure_returns_500(monkeypatch):
+    def failing_write(*args, **kwargs):
+        raise RuntimeError("token insert failed")
+
+    monkeypatch.setattr("services.summon_service.insert_summon_with_token", failing_write)
+    response = client.post("/summon", json=_summon_payload(), headers=headers)
+    assert response.status_code == 500
+    assert "token insert failed" in response.json()["detail"]
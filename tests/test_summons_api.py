@@ -32,3 +32,18 @@ def test_list_summons_success(monkeypatch):
 def test_list_summons_invalid_key():
     resp = client.get("/summons", headers={"x-api-key": "bad"})
     assert resp.status_code == 401
+
+
+def test_summon_counts(monkeypatch):
+    monkeypatch.setattr("summon_db.get_summon_counts", lambda: {"zombie": 2, "piglin": 5, "allay": 2})
+    resp = client.get("/summons/counts", headers={"x-api-key": API_KEY})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["total"] == 9
+    assert data["discovered"] == 3
+    assert [m["mob_id"] for m in data["mobs"]] == ["piglin", "allay", "zombie"]
+
+
+def test_summon_counts_invalid_key():
+    resp = client.get("/summons/counts", headers={"x-api-key": "bad"})
+    assert resp.status_code == 401
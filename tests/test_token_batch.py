@@ -0,0 +1,121 @@
+"""
+Tests for the batch multi-origin nearby endpoint (/api/tokens/nearby/batch).
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from nfc_api import app
+import summon_db
+
+client = TestClient(app)
+API_KEY = "super-secret-test-key22"
+HEADERS = {"x-api-key": API_KEY}
+
+
+def test_batch_nearby_multiple_origins():
+    summon_db.insert_token(
+        action_type="summon_entity",
+        entity="piglin",
+        gps_lat=40.7580,
+        gps_lon=-105.3009,
+        written_by="BatchTestPlayer",
+        device_id="test-device-batch"
+    )
+    payload = {
+        "origins": [
+            {"id": "a", "lat": 40.7580, "lon": -105.3009, "limit": 5},
+            {"id": "b", "lat": 40.7580, "lon": -105.3009, "limit": 2},
+            {"id": "c", "lat": 40.7590, "lon": -105.3009, "action_type": "summon_entity"},
+        ]
+    }
+    response = client.post("/api/tokens/nearby/batch", json=payload, headers=HEADERS)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "ok"
+    assert [r["id"] for r in data["results"]] == ["a", "b", "c"]
+    assert len(data["results"][1]["tokens"]) <= 2
+    for result in data["results"]:
+        distances = [t["distance_m"] for t in result["tokens"]]
+        assert distances == sorted(distances)
+    for token in data["results"][2]["tokens"]:
+        assert token["action_type"] == "summon_entity"
+
+
+def test_batch_nearby_reports_all_invalid_origins():
+    payload = {
+        "origins": [
+            {"id": "ok", "lat": 40.7580, "lon": -105.3009},
+            {"id": "bad-lat", "lat": 100, "lon": -105.3009},
+            {"id": "bad-limit", "lat": 40.7580, "lon": -105.3009, "limit": 0},
+        ]
+    }
+    response = client.post("/api/tokens/nearby/batch", json=payload, headers=HEADERS)
+    assert response.status_code == 400
+    errors = response.json()["detail"]["errors"]
+    assert [e["id"] for e in errors] == ["bad-lat", "bad-limit"]
+
+
+def test_batch_nearby_requires_origins_array():
+    response = client.post("/api/tokens/nearby/batch", json={"lat": 40.7580}, headers=HEADERS)
+    assert response.status_code == 400
+
+
+def test_batch_nearby_too_many_origins():
+    payload = {"origins": [{"lat": 40.0, "lon": -105.0}] * 101}
+    response = client.post("/api/tokens/nearby/batch", json=payload, headers=HEADERS)
+    assert response.status_code == 400
+
+
+def test_batch_nearby_invalid_api_key():
+    response = client.post("/api/tokens/nearby/batch", json={"origins": []}, headers={"x-api-key": "wrong-key"})
+    assert response.status_code == 401
+
+
+def _fake_knn(tokens, calls):
+    """
+    get_nearby_tokens_batch over an in-memory token list: like PostGIS, picks
+    the nearest by sphere distance and reports spheroid distance_m.
+    """
+    from services.token_service import haversine_distance, spheroid_distance
+
+    def batch(origins):
+        calls.append(origins)
+        results = []
+        for o in origins:
+            rows = [t for t in tokens if o["action_type"] in (None, t["action_type"])]
+            rows.sort(key=lambda t: haversine_distance(o["lat"], o["lon"], t["lat"], t["lon"]))
+            rows = [{**t, "distance_m": float(spheroid_distance(o["lat"], o["lon"], t["lat"], t["lon"]))}
+                    for t in rows[:o["limit"]]]
+            results.append(sorted(rows, key=lambda r: r["distance_m"]))
+        return results
+    return batch
+
+
+def test_nearby_batch_groups_overlapping_origins(monkeypatch):
+    import random
+    from services import token_service
+
+    rng = random.Random(7)
+    tokens = [{"token_id": i, "action_type": rng.choice(["summon_entity", "give_item"]),
+               "lat": 40.758 + rng.gauss(0, 0.003), "lon": -105.3009 + rng.gauss(0, 0.003)}
+              for i in range(400)]
+    calls = []
+    monkeypatch.setattr(summon_db, "get_nearby_tokens_batch", _fake_knn(tokens, calls))
+
+    # 40 devices within ~100 m of each other, a few with a filter, one far away
+    parsed = []
+    for i in range(40):
+        filters = {"limit": rng.choice([1, 5, 10]), "radius_km": 5.0, "mob_type": None,
+                   "action_type": "give_item" if i % 10 == 0 else None}
+        parsed.append((40.7581 + rng.uniform(0, 0.0008), -105.3008 + rng.uniform(0, 0.0008), filters))
+    parsed.append((41.5, -104.0, {"limit": 3, "radius_km": 5.0, "action_type": None, "mob_type": None}))
+
+    results = token_service.nearby_batch(parsed)
+    expected = _fake_knn(tokens, [])([{"lat": lat, "lon": lon, **f} for lat, lon, f in parsed])
+    assert [[r["token_id"] for r in rows] for rows in results] == \
+           [[r["token_id"] for r in rows] for rows in expected]
+    for rows, want in zip(results, expected):
+        assert [r["distance_m"] for r in rows] == pytest.approx([r["distance_m"] for r in want], abs=1e-6)
+    # Far fewer KNN searches than origins, in at most two round trips
+    assert len(calls) <= 2
+    assert sum(len(c) for c in calls) < len(parsed) / 2
@@ -0,0 +1,120 @@
+"""
+Tests for the push-based nearby token stream (/api/tokens/nearby/stream).
+"""
+
+import pytest
+from datetime import datetime, timezone
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from nfc_api import app
+from services.token_service import NearbyStream, diff_nearby
+
+client = TestClient(app)
+API_KEY = "super-secret-test-key22"
+
+
+def _row(token_id, lat, lon, entity="piglin"):
+    """Build a row shaped like summon_db.get_nearby_tokens() output."""
+    return {
+        "token_id": token_id,
+        "action_type": "summon_entity",
+        "entity": entity,
+        "item": None,
+        "lat": lat,
+        "lon": lon,
+        "written_by": "TestPlayer",
+        "device_id": "test-device",
+        "nfc_tag_uid": None,
+        "written_at": datetime(2026, 1, 5, 12, 0, tzinfo=timezone.utc),
+        "distance_m": 0.0,
+        "mob_name": entity.title(),
+        "mob_rarity": "common",
+        "mob_type": "neutral",
+        "mob_image": None,
+        "item_name": None,
+        "item_rarity": None,
+        "item_image": None,
+    }
+
+
+def test_diff_nearby_enter_exit_update():
+    previous = {
+        "a": {"token_id": "a", "distance_m": 100.0, "bearing": 10.0},
+        "b": {"token_id": "b", "distance_m": 50.0, "bearing": 359.5},
+    }
+    current = {
+        "b": {"token_id": "b", "distance_m": 50.4, "bearing": 0.2},
+        "c": {"token_id": "c", "distance_m": 20.0, "bearing": 90.0},
+    }
+    diff = diff_nearby(previous, current)
+    assert [t["token_id"] for t in diff["entered"]] == ["c"]
+    assert diff["exited"] == ["a"]
+    # 0.4 m and 0.7 degrees (across north) are below the push thresholds
+    assert diff["updated"] == []
+
+
+def test_stream_first_update_sends_full_set():
+    stream = NearbyStream()
+    lat, lon = stream.apply_message({"lat": 40.7580, "lon": -105.3009})
+    assert stream.needs_query(lat, lon)
+    stream.set_candidates([_row("t1", 40.7590, -105.3009), _row("t2", 40.7580, -105.2880)], lat, lon)
+    
+    message = stream.advance(lat, lon)
+    assert message["type"] == "diff"
+    assert message["seq"] == 1
+    assert {t["token_id"] for t in message["entered"]} == {"t1", "t2"}
+    assert message["exited"] == []
+    
+    # Same position again: nothing to push
+    assert stream.advance(lat, lon) is None
+
+
+def test_stream_small_move_updates_without_requery():
+    stream = NearbyStream()
+    lat, lon = stream.apply_message({"lat": 40.7580, "lon": -105.3009})
+    stream.set_candidates([_row("t1", 40.7590, -105.3009)], lat, lon)
+    stream.advance(lat, lon)
+    
+    # ~11 m north: cached candidates are reused, distance update is pushed
+    lat, lon = stream.apply_message({"lat": 40.7581, "lon": -105.3009})
+    assert not stream.needs_query(lat, lon)
+    message = stream.advance(lat, lon)
+    assert message["entered"] == [] and message["exited"] == []
+    assert message["updated"][0]["token_id"] == "t1"
+    assert message["updated"][0]["distance_m"] < 111
+
+
+def test_stream_filter_change_forces_requery():
+    stream = NearbyStream()
+    lat, lon = stream.apply_message({"lat": 40.7580, "lon": -105.3009})
+    stream.set_candidates([], lat, lon)
+    lat, lon = stream.apply_message({"lat": 40.7580, "lon": -105.3009, "action_type": "give_item"})
+    assert stream.needs_query(lat, lon)
+
+
+@pytest.mark.parametrize("message", [
+    {"lon": -105.3009},
+    {"lat": 100, "lon": -105.3009},
+    {"lat": 40.7580, "lon": -105.3009, "limit": 100},
+    {"lat": 40.7580, "lon": -105.3009, "mob_type": "friendly"},
+])
+def test_stream_rejects_invalid_messages(message):
+    with pytest.raises(ValueError):
+        NearbyStream().apply_message(message)
+
+
+def test_stream_invalid_api_key():
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect("/api/tokens/nearby/stream", headers={"x-api-key": "wrong-key"}) as ws:
+            ws.receive_json()
+
+
+def test_stream_invalid_message_reports_error():
+    with client.websocket_connect("/api/tokens/nearby/stream", headers={"x-api-key": API_KEY}) as ws:
+        ws.send_text("not json")
+        assert ws.receive_json()["type"] == "error"
+        ws.send_json({"lat": 40.7580})
+        data = ws.receive_json()
+        assert data["type"] == "error"
+        assert "lon" in data["error"]
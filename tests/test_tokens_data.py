@@ -0,0 +1,192 @@
+"""
+Tests for the admin tokens map feed (/api/tokens-data): joined catalog
+metadata, the since-cursor delta and ETag/If-None-Match.
+"""
+
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'web')))
+import website
+import summon_db
+
+UPDATED = datetime(2026, 1, 5, 12, 0, tzinfo=timezone.utc)
+
+
+def _row(token_id, action_type="summon_entity", **extra):
+    row = {
+        "token_id": token_id, "action_type": action_type,
+        "entity": "piglin" if action_type == "summon_entity" else None,
+        "item": "diamond" if action_type == "give_item" else None,
+        "gps_write_lat": 40.0, "gps_write_lon": -105.0, "written_by": "Steve",
+        "written_at": UPDATED, "updated_at": UPDATED,
+        "mob_found": False, "mob_name": None, "mob_rarity": None, "mob_type": None, "mob_image": None,
+        "item_found": False, "item_name": None, "item_rarity": None, "item_image": None,
+    }
+    row.update(extra)
+    return row
+
+
+@pytest.fixture
+def feed(monkeypatch):
+    calls = []
+
+    def enriched(limit=1000, updated_after=None):
+        calls.append(updated_after)
+        return [_row("a", mob_found=True, mob_name="Piglin", mob_rarity="common",
+                     mob_type="neutral", mob_image="/mob_images/piglin.png")]
+
+    monkeypatch.setattr(summon_db, "get_all_tokens_enriched", enriched)
+    monkeypatch.setattr(summon_db, "get_tokens_version", lambda: (1, UPDATED))
+    return website.app.test_client(), calls
+
+
+def test_build_token_data_uses_joined_metadata():
+    data = website.build_token_data([
+        _row("a", mob_found=True, mob_name="Piglin", mob_rarity="common", mob_type="neutral", mob_image="/p.png"),
+        _row("b", "give_item", item_found=True, item_name="Diamond", item_rarity="rare", item_image="/d.png"),
+        _row("c"),
+    ])
+    assert data[0]["name"] == "Piglin" and data[0]["mob_type"] == "neutral"
+    assert data[1]["name"] == "Diamond" and data[1]["image_url"] == "/d.png"
+    assert "name" not in data[2]
+    assert data[2]["written_at"] == UPDATED.isoformat()
+
+
+def test_full_then_delta_then_not_modified(feed):
+    client, calls = feed
+    full = client.get("/api/tokens-data")
+    assert full.status_code == 200
+    body = full.get_json()
+    assert body["full"] is True
+    assert body["total"] == 1
+    assert body["tokens"][0]["name"] == "Piglin"
+    assert body["cursor"] == UPDATED.isoformat()
+    assert calls == [None]
+    etag = full.headers["ETag"]
+
+    delta = client.get("/api/tokens-data", query_string={"since": body["cursor"]})
+    assert delta.get_json()["full"] is False
+    # Re-reads a short overlap before the cursor
+    assert calls[1] == UPDATED - website.TOKENS_DELTA_OVERLAP
+
+    unchanged = client.get("/api/tokens-data", query_string={"since": body["cursor"]},
+                           headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.headers["ETag"] == etag
+    assert len(calls) == 2
+
+
+def test_changed_version_misses_etag(feed, monkeypatch):
+    client, _ = feed
+    etag = client.get("/api/tokens-data").headers["ETag"]
+    monkeypatch.setattr(summon_db, "get_tokens_version", lambda: (2, UPDATED))
+    response = client.get("/api/tokens-data", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_bad_cursor(feed):
+    client, _ = feed
+    assert client.get("/api/tokens-data", query_string={"since": "yesterday"}).status_code == 400
+    bad_page = UPDATED.isoformat() + ",not-a-token"
+    assert client.get("/api/tokens-data", query_string={"since": bad_page}).status_code == 400
+
+
+def test_large_delta_pages_without_skipping(monkeypatch):
+    # 25 changes, 10 sharing each timestamp, served 10 per response
+    changes = sorted((_row(str(uuid.UUID(int=i)), updated_at=UPDATED + timedelta(seconds=i // 10))
+                      for i in range(25)), key=lambda r: (r["updated_at"], r["token_id"]))
+
+    def enriched(limit=1000, updated_after=None, after_token_id=None):
+        if after_token_id is not None:
+            rows = [r for r in changes if (r["updated_at"], r["token_id"]) > (updated_after, after_token_id)]
+        else:
+            rows = [r for r in changes if updated_after is None or r["updated_at"] > updated_after]
+        return rows[:limit]
+
+    monkeypatch.setattr(summon_db, "get_all_tokens_enriched", enriched)
+    monkeypatch.setattr(summon_db, "get_tokens_version", lambda: (25, changes[-1]["updated_at"]))
+    monkeypatch.setattr(website, "TOKENS_DATA_LIMIT", 10)
+    client = website.app.test_client()
+
+    cursor, seen, pages = (UPDATED - timedelta(hours=1)).isoformat(), [], []
+    while True:
+        response = client.get("/api/tokens-data", query_string={"since": cursor})
+        body = response.get_json()
+        seen += [t["token_id"] for t in body["tokens"]]
+        pages.append((body["more"], response.headers.get("ETag")))
+        cursor = body["cursor"]
+        if not body["more"]:
+            break
+    assert seen == [r["token_id"] for r in changes]
+    assert [more for more, _ in pages] == [True, True, False]
+    # Only the caught-up response can be revalidated with If-None-Match
+    assert [etag is None for _, etag in pages] == [True, True, False]
+    assert cursor == changes[-1]["updated_at"].isoformat()
+
+
+@pytest.fixture
+def clusters(monkeypatch):
+    from services.cluster_index import TokenClusterIndex
+    index = TokenClusterIndex(refresh_interval_s=3600)
+    index.load([
+        {"token_id": "a", "action_type": "summon_entity", "entity": "piglin", "lat": 40.0, "lon": -105.0,
+         "written_at": UPDATED},
+        {"token_id": "b", "action_type": "give_item", "item": "diamond", "lat": 40.0001, "lon": -105.0001},
+    ])
+    monkeypatch.setattr(website, "token_clusters", index)
+    monkeypatch.setattr(summon_db, "get_all_mobs", lambda: [{"minecraft_id": "piglin", "name": "Piglin"}])
+    monkeypatch.setattr(summon_db, "get_all_items", lambda: [])
+    monkeypatch.setattr(website, "_catalog_cache", {"loaded_at": None, "mobs": {}, "items": {}})
+    return website.app.test_client(), index
+
+
+def test_token_clusters_by_zoom(clusters):
+    client, _ = clusters
+    far = client.get("/api/tokens/clusters", query_string={"bbox": "-106,39,-104,41", "zoom": 5}).get_json()
+    assert [f["type"] for f in far["features"]] == ["cluster"]
+    assert far["features"][0]["count"] == 2
+    assert far["total"] == 2
+    assert far["counts"] == {"summon_entity": 1, "give_item": 1}
+
+    near = client.get("/api/tokens/clusters", query_string={"bbox": "-105.001,39.999,-104.999,40.001", "zoom": 19})
+    points = {f["token_id"]: f for f in near.get_json()["features"]}
+    assert points["a"]["name"] == "Piglin"
+    assert points["a"]["written_at"] == UPDATED.isoformat()
+    assert "name" not in points["b"]
+
+
+def test_token_clusters_etag(clusters):
+    client, index = clusters
+    query = {"bbox": "-106,39,-104,41", "zoom": 5}
+    etag = client.get("/api/tokens/clusters", query_string=query).headers["ETag"]
+    assert client.get("/api/tokens/clusters", query_string=query,
+                      headers={"If-None-Match": etag}).status_code == 304
+    index.add({"token_id": "c", "action_type": "set_time", "lat": 40.5, "lon": -105.5})
+    assert client.get("/api/tokens/clusters", query_string=query,
+                      headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_token_clusters_validation(clusters):
+    client, _ = clusters
+    assert client.get("/api/tokens/clusters", query_string={"zoom": 5}).status_code == 400
+    assert client.get("/api/tokens/clusters", query_string={"bbox": "1,2,3", "zoom": 5}).status_code == 400
+    assert client.get("/api/tokens/clusters", query_string={"bbox": "-106,39,-104,41", "zoom": "x"}).status_code == 400
+
+
+def test_catalog_change_clears_token_tiles(clusters, monkeypatch):
+    cleared = []
+    monkeypatch.setattr(website.tile_layers["tokens"], "labels_changed", lambda: cleared.append(1))
+    monkeypatch.setattr(website, "CATALOG_CACHE_TTL_S", -1)  # Reload on every call
+    website.catalog_metadata()
+    website.catalog_metadata()
+    assert cleared == []
+    monkeypatch.setattr(summon_db, "get_all_mobs", lambda: [{"minecraft_id": "piglin", "name": "Zombified Piglin"}])
+    mobs, _ = website.catalog_metadata()
+    assert mobs["piglin"]["name"] == "Zombified Piglin"
+    assert cleared == [1]
@@ -0,0 +1,101 @@
+"""
+Tests for track simplification (services/track_simplify.py) and /api/device/{device_id}/track.
+"""
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from nfc_api import app
+from services.track_simplify import TrackCache, douglas_peucker, time_buckets, bucket_means, track_cache
+
+client = TestClient(app)
+API_KEY = "super-secret-test-key22"
+
+# ~1 m of latitude
+ONE_METER_LAT = 1 / 111320
+
+
+def test_douglas_peucker_straight_line_keeps_endpoints():
+    lat = 40.0 + np.arange(100) * ONE_METER_LAT
+    lon = np.full(100, -105.0)
+    assert list(douglas_peucker(lat, lon, 1.0)) == [0, 99]
+
+
+def test_douglas_peucker_keeps_corner():
+    # North 50 m, then east 50 m
+    lat = np.r_[40.0 + np.arange(51) * ONE_METER_LAT, np.full(50, 40.0 + 50 * ONE_METER_LAT)]
+    lon = np.r_[np.full(51, -105.0), -105.0 + np.arange(1, 51) * ONE_METER_LAT / np.cos(np.radians(40))]
+    assert list(douglas_peucker(lat, lon, 1.0)) == [0, 50, 100]
+
+
+def test_douglas_peucker_within_tolerance():
+    rng = np.random.default_rng(7)
+    lat = 40.0 + np.cumsum(rng.normal(0, 3, 500)) * ONE_METER_LAT
+    lon = -105.0 + np.cumsum(rng.normal(0, 3, 500)) * ONE_METER_LAT
+    keep = douglas_peucker(lat, lon, 5.0)
+    assert keep[0] == 0 and keep[-1] == 499
+    assert len(keep) < 500
+    # Every dropped fix lies within tolerance of the kept polyline
+    x = (lon - lon[0]) * 111320 * np.cos(np.radians(np.mean(lat)))
+    y = (lat - lat[0]) * 111320
+    for a, b in zip(keep[:-1], keep[1:]):
+        seg = np.array([x[b] - x[a], y[b] - y[a]])
+        pts = np.column_stack((x[a + 1:b] - x[a], y[a + 1:b] - y[a]))
+        t = np.clip(pts @ seg / max(seg @ seg, 1e-12), 0, 1)
+        assert np.all(np.hypot(*(pts - np.outer(t, seg)).T) <= 5.0 + 1e-6)
+
+
+def test_time_buckets():
+    ts = np.array([0, 10, 59, 60, 61, 200])
+    starts, counts = time_buckets(ts, 60)
+    assert list(starts) == [0, 3, 5]
+    assert list(counts) == [3, 2, 1]
+    assert list(bucket_means(ts, starts, counts)) == [23.0, 60.5, 200.0]
+
+
+def test_track_cache_invalidation():
+    cache = TrackCache(max_size=2)
+    version = cache.version("esp32-a")
+    cache.put("esp32-a", ("k",), {"points": []}, version)
+    assert cache.get("esp32-a", ("k",)) == {"points": []}
+    cache.invalidate("esp32-a")
+    assert cache.get("esp32-a", ("k",)) is None
+    # A track computed before a concurrent invalidate is never served
+    cache.put("esp32-a", ("k",), {"points": []}, version)
+    assert cache.get("esp32-a", ("k",)) is None
+
+
+def test_track_endpoint_cached_until_new_fix(monkeypatch):
+    calls = []
+    rows = [(40.0 + i * ONE_METER_LAT, -105.0, 1767614400.0 + i, 1.0) for i in range(120)]
+
+    def fake_track(device_id, start=None, end=None, bbox=None):
+        calls.append((device_id, start, end, bbox))
+        return rows
+
+    monkeypatch.setattr("summon_db.get_device_track", fake_track)
+    track_cache.clear()
+    params = {"method": "bucket", "bucket_s": 60, "bbox": "-106,39,-104,41"}
+    resp = client.get("/api/device/esp32-track/track", params=params, headers={"x-api-key": API_KEY})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["raw_points"] == 120
+    assert [p["count"] for p in data["points"]] == [60, 60]
+    assert calls[0][3] == (-106.0, 39.0, -104.0, 41.0)
+
+    client.get("/api/device/esp32-track/track", params=params, headers={"x-api-key": API_KEY})
+    assert len(calls) == 1
+
+    track_cache.invalidate("esp32-track")
+    resp = client.get("/api/device/esp32-track/track", headers={"x-api-key": API_KEY})
+    assert len(calls) == 2
+    assert resp.json()["count"] == 2
+
+
+def test_track_endpoint_rejects_bad_window():
+    resp = client.get("/api/device/esp32-track/track", params={"start": "yesterday"},
+                      headers={"x-api-key": API_KEY})
+    assert resp.status_code == 400
+    resp = client.get("/api/device/esp32-track/track", params={"bbox": "1,2,3"},
+                      headers={"x-api-key": API_KEY})
+    assert resp.status_code == 400
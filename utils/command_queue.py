@@ -0,0 +1,105 @@
+# command_queue.py
+"""
+Ordered, batching dispatch of game commands to the Minecraft server.
+
+Every send_command_to_minecraft() call spawns a `screen -X stuff`
+process. Callers that produce many commands at once (replayed NFC scans)
+submit them here instead: a single worker thread drains the queue in FIFO
+order and sends whatever one caller has queued back to back - up to
+COMMAND_BATCH_SIZE commands - with one screen invocation. Batches never mix
+callers, so a failed send only fails that caller's commands. Each
+submitted command gets a Future that resolves to whether its batch was
+delivered.
+"""
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, List, Optional, Sequence
+import os
+import queue
+import threading
+import time
+
+from utils import mc_send
+
+# Most commands stuffed into the console per screen invocation
+COMMAND_BATCH_SIZE = int(os.getenv('COMMAND_BATCH_SIZE', '32'))
+
+# How long callers wait for their commands to be delivered (seconds)
+COMMAND_TIMEOUT_S = float(os.getenv('COMMAND_TIMEOUT_S', '10'))
+
+
+def _send_batch(cmds: List[str]) -> bool:
+    # Looked up at call time so tests can patch mc_send
+    return mc_send.send_commands_to_minecraft(cmds)
+
+
+class CommandQueue:
+    """FIFO command queue served by one lazily started worker thread."""
+
+    def __init__(self, send_batch: Optional[Callable[[List[str]], bool]] = None,
+                 batch_size: int = COMMAND_BATCH_SIZE):
+        self._send_batch = send_batch or _send_batch
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._submit_lock = threading.Lock()
+        self._worker = None
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="command-queue", daemon=True)
+            self._worker.start()
+
+    def submit(self, cmd: str) -> Future:
+        """Queue one command; the Future resolves to True once it was sent."""
+        return self.submit_many([cmd])[0]
+
+    def submit_many(self, cmds: Sequence[str]) -> List[Future]:
+        """Queue commands back to back, so no other caller's commands interleave."""
+        futures = [Future() for _ in cmds]
+        caller = object()
+        with self._submit_lock:
+            self._ensure_worker()
+            for cmd, future in zip(cmds, futures):
+                self._queue.put((caller, cmd, future))
+        return futures
+
+    def _run(self):
+        # First item of the next batch, taken while filling the current one
+        carried = None
+        while True:
+            batch = [carried or self._queue.get()]
+            carried = None
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item[0] is not batch[0][0]:
+                    carried = item
+                    break
+                batch.append(item)
+            try:
+                sent = bool(self._send_batch([cmd for _, cmd, _ in batch]))
+            except Exception:
+                sent = False
+            for _, _, future in batch:
+                future.set_result(sent)
+
+
+def wait_all(futures: Sequence[Future], timeout: float = COMMAND_TIMEOUT_S) -> List[Optional[bool]]:
+    """
+    Results of futures from submit()/submit_many(): True once sent, False
+    if the send failed, None for commands still queued after timeout (they
+    are sent later, not dropped).
+    """
+    deadline = time.monotonic() + timeout
+    results = []
+    for future in futures:
+        try:
+            results.append(bool(future.result(timeout=max(0.0, deadline - time.monotonic()))))
+        except FutureTimeoutError:
+            results.append(None)
+    return results
+
+
+# Shared queue for game commands
+command_queue = CommandQueue()
@@ -0,0 +1,145 @@
+# idempotency.py
+"""
+Idempotency keys for retried device requests (/summon, /nfc-event).
+
+ESP32 clients retry on timeout, often after the first attempt already
+stored the summon and sent the game command. Responses of successful
+requests are kept in a bounded TTL cache; a retry with the same key gets
+the stored response back without touching the database or the server.
+
+A request's key is, in order of preference:
+  - its Idempotency-Key header, scoped to the endpoint. Reusing a header
+    key with a different body is rejected.
+  - a fingerprint of the whole body, when the body carries the fields
+    that identify one attempt (e.g. token_id, client_device_id and
+    timestamp for /summon). Retries resend the identical body.
+Requests with neither are not deduplicated.
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Seconds a stored response is replayed for
+IDEMPOTENCY_TTL_S = float(os.getenv('IDEMPOTENCY_TTL_S', '600'))
+
+# Most stored responses; the least recently used are evicted first
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv('IDEMPOTENCY_CACHE_SIZE', '4096'))
+
+# Longest accepted Idempotency-Key header
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+# Response header set on replayed responses
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+class IdempotencyError(Exception):
+    """A keyed request that cannot run; status_code is the HTTP status to answer with."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def fingerprint(data: Any) -> str:
+    """Stable hash of a JSON body."""
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def request_key(scope: str, header_key: Optional[str], data: Any,
+                identity_fields: Sequence[str]) -> Optional[Tuple[str, str]]:
+    """
+    Idempotency key for a request.
+
+    Returns:
+        (key, body fingerprint), or None if the request is not deduplicated
+
+    Raises:
+        IdempotencyError: if the header key is too long
+    """
+    body = fingerprint(data)
+    if header_key:
+        header_key = header_key.strip()
+        if len(header_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+            raise IdempotencyError(400, f"Idempotency-Key must not exceed {MAX_IDEMPOTENCY_KEY_LENGTH} characters")
+        if header_key:
+            return f"{scope}:key:{header_key}", body
+    if isinstance(data, dict) and all(data.get(f) not in (None, "") for f in identity_fields):
+        return f"{scope}:body:{body}", body
+    return None
+
+
+class IdempotencyCache:
+    """Bounded LRU of successful responses with a TTL, plus the keys still running."""
+
+    def __init__(self, ttl_s: float = IDEMPOTENCY_TTL_S, max_size: int = IDEMPOTENCY_CACHE_SIZE):
+        self.ttl_s = ttl_s
+        self.max_size = max_size
+        self._entries = OrderedDict()    # key -> (expires_at, fingerprint, response)
+        self._in_flight: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def run(self, key: Optional[Tuple[str, str]], handler: Callable[[], Dict[str, Any]],
+            cacheable: Callable[[Dict[str, Any]], bool]) -> Tuple[Dict[str, Any], bool]:
+        """
+        Return the stored response for key, or call handler and store its
+        response if cacheable(response). Exceptions from handler propagate
+        and store nothing, so the client can retry.
+
+        Returns:
+            (response, replayed)
+
+        Raises:
+            IdempotencyError: 409 while the first request with key is still
+            running, 422 if a header key is reused with a different body
+        """
+        if key is None:
+            return handler(), False
+        cache_key, body = key
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[cache_key]
+                entry = None
+            if entry is not None:
+                if entry[1] != body:
+                    raise IdempotencyError(422, "Idempotency-Key was already used with a different request body")
+                self._entries.move_to_end(cache_key)
+                return entry[2], True
+            if cache_key in self._in_flight:
+                raise IdempotencyError(409, "A request with this Idempotency-Key is still being processed")
+            self._in_flight[cache_key] = body
+
+        try:
+            response = handler()
+        finally:
+            with self._lock:
+                self._in_flight.pop(cache_key, None)
+
+        if cacheable(response):
+            with self._lock:
+                self._entries[cache_key] = (time.monotonic() + self.ttl_s, body, response)
+                self._entries.move_to_end(cache_key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return response, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._in_flight.clear()
+
+
+def is_success(response: Dict[str, Any]) -> bool:
+    """Store everything but error bodies, so failed attempts can be retried."""
+    return isinstance(response, dict) and response.get("status") != "error"
+
+
+# Shared cache for /summon and /nfc-event
+idempotency_cache = IdempotencyCache()
@@ -11,3 +11,16 @@ def send_command_to_minecraft(cmd: str) -> bool:
         return result.returncode == 0
     except Exception:
         return False
+
+
+def send_commands_to_minecraft(cmds) -> bool:
+    """Send several commands, in order, with a single screen invocation."""
+    if not cmds:
+        return True
+    try:
+        payload = "".join(f"{cmd}\r" for cmd in cmds)
+        full_cmd = f'screen -S {MINECRAFT_SCREEN_NAME} -p 0 -X stuff "{payload}"'
+        result = subprocess.run(full_cmd, shell=True)
+        return result.returncode == 0
+    except Exception:
+        return False
@@ -0,0 +1,72 @@
+# response_format.py
+"""
+Content negotiation between JSON and MessagePack responses.
+
+ESP32 clients parse MessagePack directly with ArduinoJson
+(deserializeMsgPack), which needs less RAM than JSON: no quoting or
+escaping, and numbers arrive as binary instead of digit strings. A client
+opts in by sending "Accept: application/msgpack"; everything else keeps
+getting JSON. The payload is the same dict either way.
+"""
+from typing import Any, Optional
+from fastapi.responses import JSONResponse, Response
+import msgpack
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# Media types accepted as a request for MessagePack
+MSGPACK_ALIASES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+def _parse_accept(accept: str) -> list:
+    """Parse an Accept header into (media_type, q) pairs."""
+    entries = []
+    for part in accept.split(","):
+        fields = [f.strip() for f in part.split(";")]
+        media_type = fields[0].lower()
+        if not media_type:
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        entries.append((media_type, q))
+    return entries
+
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    """
+    Return True if the Accept header prefers MessagePack over JSON.
+    
+    Ties go to JSON, so "Accept: */*" and browsers keep the default format.
+    """
+    if not accept:
+        return False
+    msgpack_q = 0.0
+    json_q = 0.0
+    for media_type, q in _parse_accept(accept):
+        if media_type in MSGPACK_ALIASES:
+            msgpack_q = max(msgpack_q, q)
+        elif media_type in ("application/json", "application/*", "*/*"):
+            json_q = max(json_q, q)
+    return msgpack_q > 0 and msgpack_q > json_q
+
+
+def encode_msgpack(payload: Any) -> bytes:
+    """Encode a JSON-compatible payload as MessagePack."""
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def negotiate_response(payload: Any, accept: Optional[str], status_code: int = 200) -> Response:
+    """Build a MessagePack or JSON response for payload based on the Accept header."""
+    if wants_msgpack(accept):
+        return Response(
+            content=encode_msgpack(payload),
+            status_code=status_code,
+            media_type=MSGPACK_MEDIA_TYPE,
+            headers={"Vary": "Accept"}
+        )
+    return JSONResponse(content=payload, status_code=status_code, headers={"Vary": "Accept"})
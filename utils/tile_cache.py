@@ -0,0 +1,141 @@
+# tile_cache.py
+"""
+On-disk cache of rendered map tiles, laid out as <root>/<layer>/<z>/<x>/<y>.
+
+Tiles are rendered on first request and kept until a write invalidates
+them: layers call invalidate() with the tiles a changed row falls in, or
+clear() when they cannot tell which tiles changed. Files are written to a
+temporary name and renamed, so readers never see a partial tile.
+
+A tile rendered while an invalidation of its layer ran may already be
+stale; it is served but not stored. Each invalidation bumps the layer's
+generation, kept in a file next to its tiles, and a render only stores
+its result if the generation it started from is still current. Bumping
+and storing both hold an flock on the layer's lock file, so the check
+also holds between processes sharing the directory.
+
+Layers can also keep a small state string next to their tiles (e.g. the
+id watermark of the rows already accounted for) so a restarted process
+knows which cached tiles are still valid.
+"""
+from contextlib import contextmanager
+from typing import Callable, Iterable, Optional, Tuple
+import fcntl
+import os
+import shutil
+import tempfile
+
+# Default cache directory (shared by every process serving tiles)
+TILE_CACHE_DIR = os.getenv(
+    'TILE_CACHE_DIR',
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'tile_cache'))
+)
+
+# Name of the per-layer state file
+STATE_FILE = "_state"
+
+# Per-layer generation counter and the lock guarding it
+GENERATION_FILE = "_generation"
+LOCK_FILE = "_lock"
+
+
+class TileCache:
+    """Rendered tiles by layer and z/x/y, stored as files under root."""
+
+    def __init__(self, root: str = TILE_CACHE_DIR):
+        self.root = root
+
+    @contextmanager
+    def _locked(self, layer: str):
+        directory = os.path.join(self.root, layer)
+        os.makedirs(directory, exist_ok=True)
+        # Released when the file is closed
+        with open(os.path.join(directory, LOCK_FILE), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _generation(self, layer: str) -> int:
+        try:
+            with open(os.path.join(self.root, layer, GENERATION_FILE), encoding="utf-8") as f:
+                return int(f.read())
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _bump_generation(self, layer: str):
+        # Caller holds _locked(layer)
+        self._write(layer, GENERATION_FILE, str(self._generation(layer) + 1))
+
+    def _write(self, layer: str, name: str, text: str):
+        directory = os.path.join(self.root, layer)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, os.path.join(directory, name))
+
+    def path(self, layer: str, z: int, x: int, y: int) -> str:
+        return os.path.join(self.root, layer, str(z), str(x), str(y))
+
+    def get(self, layer: str, z: int, x: int, y: int, render: Callable[[], bytes]) -> bytes:
+        """Return the cached tile, rendering and storing it on a miss."""
+        path = self.path(layer, z, x, y)
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+
+        generation = self._generation(layer)
+        data = render()
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            with self._locked(layer):
+                if self._generation(layer) == generation:
+                    os.replace(tmp_path, path)
+                    tmp_path = None
+        finally:
+            if tmp_path is not None:
+                os.unlink(tmp_path)
+        return data
+
+    def invalidate(self, layer: str, tiles: Iterable[Tuple[int, int, int]]) -> int:
+        """Drop cached (z, x, y) tiles of a layer; returns how many existed."""
+        removed = 0
+        with self._locked(layer):
+            self._bump_generation(layer)
+            for z, x, y in tiles:
+                try:
+                    os.unlink(self.path(layer, z, x, y))
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def clear(self, layer: str):
+        """Drop every cached tile (and the state) of a layer."""
+        directory = os.path.join(self.root, layer)
+        with self._locked(layer):
+            self._bump_generation(layer)
+            for name in os.listdir(directory):
+                if name in (GENERATION_FILE, LOCK_FILE):
+                    continue
+                path = os.path.join(directory, name)
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.unlink(path)
+
+    def read_state(self, layer: str) -> Optional[str]:
+        """The layer's saved state string, or None."""
+        try:
+            with open(os.path.join(self.root, layer, STATE_FILE), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write_state(self, layer: str, state: str):
+        self._write(layer, STATE_FILE, state)
@@ -5,3 +5,23 @@ Shared validation utilities for API v3.4
 def validate_request(data, schema):
     # TODO: Implement validation logic
     return []
+
+
+def parse_bbox(value):
+    """
+    Parse "min_lon,min_lat,max_lon,max_lat" into a tuple of floats.
+
+    Returns None for None; raises ValueError with a client-facing message
+    if the box is malformed, out of range or inverted.
+    """
+    if value is None:
+        return None
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in value.split(","))
+    except ValueError:
+        raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+    if not (-180 <= min_lon <= 180 and -180 <= max_lon <= 180 and -90 <= min_lat <= 90 and -90 <= max_lat <= 90):
+        raise ValueError("bbox coordinates out of range")
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValueError("bbox minimums must not exceed maximums")
+    return (min_lon, min_lat, max_lon, max_lat)
@@ -223,11 +223,7 @@ TOKENS_MAP_TEMPLATE = '''
             }
         });
         
-        // Token data from server
-        let tokens = {{ tokens_json|safe }};
-        let markers = {};  // Track markers by token_id
-        
-        // Initialize map (centered on average of all token positions)
+        // Initialize map (centered on the centroid of all tokens)
         const centerLat = {{ center_lat }};
         const centerLon = {{ center_lon }};
         const map = L.map('map').setView([centerLat, centerLon], 13);
@@ -266,7 +262,7 @@ TOKENS_MAP_TEMPLATE = '''
             if (token.action_type === 'give_item') icon = giveIcon;
             if (token.action_type === 'set_time') icon = timeIcon;
             
-            const marker = L.marker([token.lat, token.lon], { icon: icon }).addTo(map);
+            const marker = L.marker([token.lat, token.lon], { icon: icon });
             
             // Build popup content
             let actionBadgeClass = 'action-summon';
@@ -300,52 +296,184 @@ TOKENS_MAP_TEMPLATE = '''
             return marker;
         }
         
-        // Add initial markers
-        tokens.forEach(token => {
-            markers[token.token_id] = createMarker(token);
-        });
-        
-        // Fit map to show all markers
-        if (tokens.length > 0) {
-            const bounds = L.latLngBounds(tokens.map(t => [t.lat, t.lon]));
-            map.fitBounds(bounds, { padding: [50, 50] });
+        // Marker for a cluster of tokens; clicking zooms in until it splits
+        function createClusterMarker(cluster) {
+            const size = Math.round(30 + 8 * Math.log10(cluster.count));
+            const icon = L.divIcon({
+                className: 'custom-marker',
+                html: `<div style="background: var(--summon-purple); color: white; width: ${size}px; height: ${size}px; border-radius: 50%; display: flex; align-items: center; justify-content: center; font-weight: bold; font-size: 12px; border: 3px solid white; box-shadow: 0 2px 5px rgba(0,0,0,0.3);">${cluster.count}</div>`,
+                iconSize: [size, size],
+                iconAnchor: [size / 2, size / 2]
+            });
+            const marker = L.marker([cluster.lat, cluster.lon], { icon: icon });
+            marker.on('click', () => map.setView([cluster.lat, cluster.lon], cluster.expansion_zoom));
+            return marker;
         }
         
         // Function to update stats panel
-        function updateStats(newTokens) {
-            const summonCount = newTokens.filter(t => t.action_type === 'summon_entity').length;
-            const giveCount = newTokens.filter(t => t.action_type === 'give_item').length;
-            const timeCount = newTokens.filter(t => t.action_type === 'set_time').length;
+        function updateStats(total, counts) {
+            document.querySelector('.stats .stat:nth-child(2) span:last-child').textContent = total;
+            document.querySelector('.stats .stat:nth-child(3) span:last-child').textContent = counts.summon_entity || 0;
+            document.querySelector('.stats .stat:nth-child(4) span:last-child').textContent = counts.give_item || 0;
+            document.querySelector('.stats .stat:nth-child(5) span:last-child').textContent = counts.set_time || 0;
+        }
+        
+        // Map data comes as GeoJSON tiles (/tiles/{layer}/{z}/{x}/{y}), so only
+        // what is in view is fetched. Each tile's features live in their own
+        // layer group, dropped when the tile leaves the view.
+        const GeoJsonTiles = L.GridLayer.extend({
+            initialize: function(name, toLayer, options) {
+                L.GridLayer.prototype.initialize.call(this, options);
+                this._name = name;
+                this._toLayer = toLayer;
+                this._groups = {};
+                this._etags = {};
+                this.on('tileunload', e => {
+                    const key = this._tileCoordsToKey(e.coords);
+                    this._drop(key);
+                    delete this._etags[key];
+                });
+            },
+            
+            createTile: function(coords, done) {
+                const tile = document.createElement('div');
+                this._load(coords).then(() => done(null, tile), error => done(error, tile));
+                return tile;
+            },
             
-            document.querySelector('.stats .stat:nth-child(2) span:last-child').textContent = newTokens.length;
-            document.querySelector('.stats .stat:nth-child(3) span:last-child').textContent = summonCount;
-            document.querySelector('.stats .stat:nth-child(4) span:last-child').textContent = giveCount;
-            document.querySelector('.stats .stat:nth-child(5) span:last-child').textContent = timeCount;
+            _drop: function(key) {
+                if (this._groups[key]) {
+                    this._groups[key].remove();
+                    delete this._groups[key];
+                }
+            },
+            
+            // Fetch a tile; an unchanged tile answers 304 to its last ETag
+            _load: async function(coords) {
+                const key = this._tileCoordsToKey(coords);
+                const headers = this._etags[key] ? { 'If-None-Match': this._etags[key] } : {};
+                const response = await fetch(`/tiles/${this._name}/${coords.z}/${coords.x}/${coords.y}`,
+                                             { headers: headers, cache: 'no-store' });
+                if (response.status === 304) {
+                    return;
+                }
+                if (!response.ok) {
+                    throw new Error('HTTP ' + response.status);
+                }
+                const data = await response.json();
+                if (!this._map || !this._tiles[key]) {
+                    return;  // Tile left the view meanwhile
+                }
+                this._drop(key);
+                this._groups[key] = L.layerGroup(data.features.map(this._toLayer)).addTo(this._map);
+                this._etags[key] = response.headers.get('ETag');
+            },
+            
+            // Pick up changes to the tiles in view
+            revalidate: function() {
+                Object.values(this._tiles).forEach(tile => {
+                    this._load(tile.coords).catch(error => console.error(`Error fetching ${this._name} tile:`, error));
+                });
+            }
+        });
+        
+        const tileOptions = { maxZoom: 19 };
+        
+        const tokenTiles = new GeoJsonTiles('tokens', feature =>
+            feature.properties.type === 'cluster' ? createClusterMarker(feature.properties) : createMarker(feature.properties),
+            tileOptions
+        ).addTo(map);
+        
+        const summonTiles = new GeoJsonTiles('summons', feature => {
+            const summon = feature.properties;
+            const [lon, lat] = feature.geometry.coordinates;
+            const marker = L.circleMarker([lat, lon], {
+                radius: Math.min(4 + 2 * Math.log2(summon.count), 14),
+                color: 'white', weight: 1, fillColor: '#1976d2', fillOpacity: 0.8
+            });
+            marker.bindPopup(`
+                <div class="popup-title">${summon.summoned_object_type}</div>
+                <div class="popup-detail"><strong>Summoned by:</strong> ${summon.summoning_player}</div>
+                <div class="popup-detail"><strong>For:</strong> ${summon.summoned_player}</div>
+                <div class="popup-detail"><strong>Date:</strong> ${new Date(summon.timestamp_utc).toLocaleString()}</div>
+                ${summon.count > 1 ? `<div class="popup-detail">${summon.count - 1} more summons here</div>` : ''}
+            `);
+            return marker;
+        }, tileOptions);
+        
+        // Stable color per device
+        function deviceColor(deviceId) {
+            let hash = 0;
+            for (const ch of deviceId) hash = (hash * 31 + ch.charCodeAt(0)) | 0;
+            return `hsl(${Math.abs(hash) % 360}, 70%, 45%)`;
         }
         
-        // Poll for new tokens every 5 seconds
-        setInterval(async () => {
+        const trackTiles = new GeoJsonTiles('tracks', feature => {
+            const track = feature.properties;
+            const color = deviceColor(track.device_id);
+            return L.geoJSON(feature, {
+                style: { color: color, weight: 3, opacity: 1 },
+                pointToLayer: (f, latlng) => L.circleMarker(latlng, { radius: 3, color: color })
+            }).bindPopup(`
+                <div class="popup-title">${track.player || track.device_id}</div>
+                <div class="popup-detail"><strong>Device:</strong> ${track.device_id}</div>
+                <div class="popup-detail"><strong>From:</strong> ${new Date(track.start).toLocaleString()}</div>
+                <div class="popup-detail"><strong>To:</strong> ${new Date(track.end).toLocaleString()}</div>
+            `);
+        }, tileOptions);
+        
+        // Density heatmaps (PNG tiles)
+        const heatmapOptions = { maxZoom: 19, opacity: 0.75 };
+        const heatmaps = {
+            'Heatmap: token scans': L.tileLayer('/tiles/heatmap/scans/{z}/{x}/{y}.png', heatmapOptions),
+            'Heatmap: summons': L.tileLayer('/tiles/heatmap/summons/{z}/{x}/{y}.png', heatmapOptions),
+            'Heatmap: gives': L.tileLayer('/tiles/heatmap/gives/{z}/{x}/{y}.png', heatmapOptions),
+            'Heatmap: device locations': L.tileLayer('/tiles/heatmap/locations/{z}/{x}/{y}.png', heatmapOptions)
+        };
+        
+        L.control.layers(null, {
+            'Tokens': tokenTiles,
+            'Summons': summonTiles,
+            'Device tracks': trackTiles,
+            ...heatmaps
+        }).addTo(map);
+        
+        // Statistics; unchanged totals answer 304 to the last ETag
+        let summaryEtag = null;
+        
+        async function loadSummary() {
             try {
-                const response = await fetch('/api/tokens-data');
+                const headers = summaryEtag ? { 'If-None-Match': summaryEtag } : {};
+                const response = await fetch('/api/tokens/summary', { headers: headers, cache: 'no-store' });
+                if (response.status === 304) {
+                    return;
+                }
+                if (!response.ok) {
+                    throw new Error('HTTP ' + response.status);
+                }
                 const data = await response.json();
-                
-                // Check for new tokens
-                data.tokens.forEach(token => {
-                    if (!markers[token.token_id]) {
-                        // New token - add marker
-                        markers[token.token_id] = createMarker(token);
-                        console.log('Added new token:', token.token_id);
-                    }
-                });
-                
-                // Update stats
-                updateStats(data.tokens);
-                tokens = data.tokens;
+                updateStats(data.total, data.counts);
+                summaryEtag = response.headers.get('ETag');
                 
             } catch (error) {
-                console.error('Error fetching token updates:', error);
+                console.error('Error fetching token statistics:', error);
             }
+        }
+        
+        // Poll for changes every 5 seconds
+        setInterval(() => {
+            [tokenTiles, summonTiles, trackTiles].forEach(layer => {
+                if (map.hasLayer(layer)) layer.revalidate();
+            });
+            loadSummary();
         }, 5000);
+        
+        // Heatmaps change slowly; redraw the visible ones every 30 seconds
+        setInterval(() => {
+            Object.values(heatmaps).forEach(layer => {
+                if (map.hasLayer(layer)) layer.redraw();
+            });
+        }, 30000);
     </script>
 </body>
 </html>
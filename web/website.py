@@ -1,11 +1,21 @@
-from flask import Flask, render_template_string, abort, send_from_directory, jsonify
+from flask import Flask, render_template, stream_template, abort, send_from_directory, jsonify
+from jinja2 import DictLoader
 import ssl
 from mob_data import mob_metadata
 import os
 import sys
 import json
+import hashlib
+import time
+import uuid
+from datetime import datetime, timedelta
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import summon_db
+from services.cluster_index import token_clusters
+from services.heatmap import heatmap_sources
+from services.map_tiles import TILE_MAX_ZOOM, build_tile_layers
+from utils.tile_cache import TileCache
+from utils.validation import parse_bbox
 from tokens_template import TOKENS_MAP_TEMPLATE
 
 app = Flask(__name__, static_folder='mob_images', static_url_path='/mob_images')
@@ -148,9 +158,25 @@ PLAYER_LOG_TEMPLATE = '''
                         {% else %}
                         <tr><td colspan="3">No discoveries yet.</td></tr>
                         {% endfor %}
+                        {% if next_before %}
+                        <tr id="history-more" data-next="{{ next_before }}" data-url="{{ url_for('player_summons_data', player_name=player_name) }}"><td colspan="3">Loading more…</td></tr>
+                        {% endif %}
                 </table>
                 <a href="/log" class="back-link">← Back to all mobs</a>
         </div>
+        <script>
+        function renderHistoryRow(entry) {
+            var mob = escapeHtml(entry.mob_id);
+            var location = '—';
+            if (entry.gps_lat && entry.gps_lon) {
+                var coords = entry.gps_lat + ',' + entry.gps_lon;
+                location = '<a class="map-link" href="https://maps.google.com/?q=' + coords + '" target="_blank">' + coords + '</a>';
+            }
+            return '<tr><td><a class="mob-link" href="/mob/' + mob + '"><img src="/mob/' + mob + '.png" alt="' + mob + '"> ' + mob + '</a></td>' +
+                '<td>' + escapeHtml(entry.timestamp) + '</td><td>' + location + '</td></tr>';
+        }
+        </script>
+        {% include 'history_scroll.html' %}
 </body>
 </html>
 '''
@@ -325,19 +351,94 @@ GLOBAL_LOG_TEMPLATE = '''
 </html>
 '''
 
-# Player log page
+# Summons per page of the mob and player history tables
+HISTORY_PAGE_SIZE = 100
+MAX_HISTORY_PAGE_SIZE = 500
+
+
+def history_page_args():
+    """(before, limit) from the query string; raises ValueError with a client-facing message."""
+    from flask import request
+    before = request.args.get('before')
+    limit = request.args.get('limit', HISTORY_PAGE_SIZE)
+    try:
+        before = int(before) if before else None
+        limit = int(limit)
+    except ValueError:
+        raise ValueError('before and limit must be integers')
+    if not 1 <= limit <= MAX_HISTORY_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_HISTORY_PAGE_SIZE}')
+    return before, limit
+
+
+def history_page(fetch_page, value, before=None, limit=HISTORY_PAGE_SIZE):
+    """
+    Read one page of summons with fetch_page (summon_db.get_summons_page_by_*).
+
+    Returns:
+        (rows, next_before): rows newest first, and the id to pass as
+        ?before= for the next page (None on the last page)
+    """
+    rows = fetch_page(value, limit=limit + 1, before_id=before)
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1]['id']
+    return rows, None
+
+
+def discovery_entry(row):
+    """A player log table row."""
+    timestamp = row.get('timestamp_utc')
+    return {
+        'id': row['id'],
+        'mob_id': row.get('summoned_object_type', ''),
+        'timestamp': str(timestamp) if timestamp else '',
+        'gps_lat': row.get('gps_lat'),
+        'gps_lon': row.get('gps_lon'),
+    }
+
+
+def summon_entry(row):
+    """A mob history table row (summons rows have no action_type; all are summons)."""
+    timestamp = row.get('timestamp_utc')
+    return {
+        'id': row['id'],
+        'action_type': row.get('action_type', 'summon'),
+        'summoning_player': row.get('summoning_player', ''),
+        'summoned_player': row.get('summoned_player', ''),
+        'timestamp': str(timestamp) if timestamp else '',
+        'gps_lat': row.get('gps_lat'),
+        'gps_lon': row.get('gps_lon'),
+    }
+
+
+# Player log page (first page of discoveries; the rest load on scroll)
 @app.route('/player/<player_name>')
 def player_log(player_name):
-    db_discoveries = summon_db.get_summons_by_player(player_name)
-    discoveries = []
-    for entry in db_discoveries:
-        discoveries.append({
-            'mob_id': entry.get('summoned_object_type', ''),
-            'timestamp': entry.get('timestamp_utc', ''),
-            'gps_lat': entry.get('gps_lat'),
-            'gps_lon': entry.get('gps_lon'),
-        })
-    return render_template_string(PLAYER_LOG_TEMPLATE, player_name=player_name, discoveries=discoveries)
+    rows, next_before = history_page(summon_db.get_summons_page_by_player, player_name)
+    return stream_page('player_log.html',
+                       player_name=player_name,
+                       discoveries=[discovery_entry(r) for r in rows],
+                       next_before=next_before)
+
+
+@app.route('/api/player/<player_name>/summons')
+def player_summons_data(player_name):
+    """
+    One page of a player's discoveries, newest first.
+    
+    Query: before=<next_before of the previous page> and limit (default
+    HISTORY_PAGE_SIZE). Pages are keyed on summon id, so rows added while
+    scrolling do not shift or repeat later pages.
+    """
+    try:
+        before, limit = history_page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        rows, next_before = history_page(summon_db.get_summons_page_by_player, player_name, before, limit)
+        return jsonify({'summons': [discovery_entry(r) for r in rows], 'next_before': next_before})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 LIST_TEMPLATE = '''
 <!DOCTYPE html>
@@ -446,14 +547,119 @@ DETAIL_TEMPLATE = '''
             {% else %}
             <tr><td colspan="5" class="empty-message">No summons recorded yet</td></tr>
             {% endfor %}
+            {% if next_before %}
+            <tr id="history-more" data-next="{{ next_before }}" data-url="{{ url_for('mob_summons_data', mob_id=mob_id) }}"><td colspan="5" class="empty-message">Loading more…</td></tr>
+            {% endif %}
         </table>
 
         <a href="/" class="back-link">← Back to all mobs</a>
     </div>
+    <script>
+    function renderHistoryRow(entry) {
+        var action = escapeHtml(entry.action_type);
+        var location = '—';
+        if (entry.gps_lat && entry.gps_lon) {
+            location = '<a class="map-link" href="https://maps.google.com/?q=' + entry.gps_lat + ',' + entry.gps_lon + '" target="_blank">📍 ' +
+                entry.gps_lat.toFixed(4) + ', ' + entry.gps_lon.toFixed(4) + '</a>';
+        }
+        return '<tr><td><span class="action-badge action-' + action + '">' + action + '</span></td>' +
+            '<td>' + escapeHtml(entry.summoning_player) + '</td><td>' + escapeHtml(entry.summoned_player) + '</td>' +
+            '<td class="timestamp">' + escapeHtml(entry.timestamp) + '</td><td>' + location + '</td></tr>';
+    }
+    </script>
+    {% include 'history_scroll.html' %}
 </body>
 </html>
 '''
 
+# Infinite scroll for the history tables. The page renders the first page
+# of rows and a #history-more row holding the next ?before= cursor; when that
+# row scrolls into view the next page is fetched and rendered above it with
+# the page's renderHistoryRow(entry).
+HISTORY_SCROLL_TEMPLATE = '''
+<script>
+function escapeHtml(value) {
+    return String(value == null ? '' : value).replace(/[&<>"']/g, function(c) {
+        return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+    });
+}
+
+(function() {
+    var more = document.getElementById('history-more');
+    if (!more) return;
+    var loading = false;
+
+    function load() {
+        if (loading) return;
+        loading = true;
+        more.cells[0].textContent = 'Loading more…';
+        fetch(more.dataset.url + '?before=' + encodeURIComponent(more.dataset.next))
+            .then(function(response) {
+                if (!response.ok) throw new Error('HTTP ' + response.status);
+                return response.json();
+            })
+            .then(function(page) {
+                more.insertAdjacentHTML('beforebegin', page.summons.map(renderHistoryRow).join(''));
+                if (page.next_before === null) {
+                    observer.disconnect();
+                    more.remove();
+                    return;
+                }
+                more.dataset.next = page.next_before;
+                // Re-observe so a row still in view loads the next page too
+                observer.unobserve(more);
+                observer.observe(more);
+            })
+            .catch(function() {
+                more.cells[0].textContent = 'Could not load more. Click to retry.';
+            })
+            .finally(function() { loading = false; });
+    }
+
+    var observer = new IntersectionObserver(function(entries) {
+        if (entries[0].isIntersecting) load();
+    }, { rootMargin: '400px' });
+    observer.observe(more);
+    more.addEventListener('click', load);
+})();
+</script>
+'''
+
+# Page templates by name. Jinja compiles each once and keeps it in the
+# environment's cache; render_template_string() recompiled on every request.
+app.jinja_loader = DictLoader({
+    'global_log.html': GLOBAL_LOG_TEMPLATE,
+    'player_log.html': PLAYER_LOG_TEMPLATE,
+    'mob_list.html': LIST_TEMPLATE,
+    'mob_detail.html': DETAIL_TEMPLATE,
+    'tokens_map.html': TOKENS_MAP_TEMPLATE,
+    'history_scroll.html': HISTORY_SCROLL_TEMPLATE,
+})
+for _name in app.jinja_loader.list_templates():
+    app.jinja_env.get_template(_name)
+
+# Streamed pages are sent in chunks of at least this many characters
+# (Jinja yields every template fragment separately)
+STREAM_CHUNK_CHARS = 16384
+
+
+def stream_page(name, **context):
+    """Stream a page with a long table, sending rows as they render."""
+    # Called here, in the request context; the stream keeps it while iterated
+    stream = stream_template(name, **context)
+    
+    def chunks():
+        buffered, size = [], 0
+        for chunk in stream:
+            buffered.append(chunk)
+            size += len(chunk)
+            if size >= STREAM_CHUNK_CHARS:
+                yield ''.join(buffered)
+                buffered, size = [], 0
+        if buffered:
+            yield ''.join(buffered)
+    return app.response_class(chunks(), mimetype='text/html')
+
 
 # Home page - show all mobs with counts
 @app.route('/')
@@ -462,12 +668,8 @@ def home():
     # Default to showing all types, filter to discovered only if specified
     show_discovered_only = request.args.get('discovered_only', '').lower() == 'true'
     
-    # Get summon counts for discovered mobs
-    all_summons = summon_db.get_all_summons()
-    mob_counts = {}
-    for summon in all_summons:
-        mob_id = summon.get('summoned_object_type', 'unknown')
-        mob_counts[mob_id] = mob_counts.get(mob_id, 0) + 1
+    # Get summon counts for discovered mobs (one row per mob type, not per summon)
+    mob_counts = summon_db.get_summon_counts()
     
     discovered_count = len(mob_counts)
     total_count = sum(mob_counts.values())
@@ -495,12 +697,12 @@ def home():
     
     all_mobs_count = len(all_db_mobs)
     
-    return render_template_string(GLOBAL_LOG_TEMPLATE, 
-                                 mobs=mobs, 
-                                 total_count=total_count,
-                                 discovered_count=discovered_count,
-                                 all_mobs_count=all_mobs_count,
-                                 show_discovered_only=show_discovered_only)
+    return render_template('global_log.html',
+                           mobs=mobs,
+                           total_count=total_count,
+                           discovered_count=discovered_count,
+                           all_mobs_count=all_mobs_count,
+                           show_discovered_only=show_discovered_only)
 
 # Global log page - redirects to home
 @app.route('/log')
@@ -510,55 +712,31 @@ def global_log():
 
 @app.route('/mob/<mob_id>')
 def mob_detail(mob_id):
-    # Get all summons for this mob from database
-    db_discoveries = summon_db.get_summons_by_mob(mob_id)
-    
-    if not db_discoveries:
-        # Mob exists but no summons yet, or doesn't exist
-        return render_template_string(DETAIL_TEMPLATE, 
-                                     mob_id=mob_id,
-                                     mob_name=mob_id.replace('_', ' ').title(),
-                                     total_count=0,
-                                     action_counts={},
-                                     actions=[],
-                                     all_entries=[],
-                                     entries_by_action={})
-    
-    # Organize data by action type
-    entries_by_action = {}
-    action_counts = {}
-    all_entries = []
+    # Counted in SQL; only the first page of history is read here
+    total_count = summon_db.count_summons_by_mob(mob_id)
+    rows, next_before = history_page(summon_db.get_summons_page_by_mob, mob_id)
     
-    for entry in db_discoveries:
-        action_type = entry.get('action_type', 'summon')
-        if action_type not in entries_by_action:
-            entries_by_action[action_type] = []
-            action_counts[action_type] = 0
-        
-        entry_data = {
-            'action_type': action_type,
-            'summoning_player': entry.get('summoning_player', ''),
-            'summoned_player': entry.get('summoned_player', ''),
-            'timestamp': entry.get('timestamp_utc', ''),
-            'gps_lat': entry.get('gps_lat'),
-            'gps_lon': entry.get('gps_lon'),
-        }
-        entries_by_action[action_type].append(entry_data)
-        action_counts[action_type] += 1
-        all_entries.append(entry_data)
-    
-    actions = sorted(entries_by_action.keys())
-    total_count = len(all_entries)
-    mob_name = mob_id.replace('_', ' ').title()
-    
-    return render_template_string(DETAIL_TEMPLATE,
-                                 mob_id=mob_id,
-                                 mob_name=mob_name,
-                                 total_count=total_count,
-                                 action_counts=action_counts,
-                                 actions=actions,
-                                 all_entries=all_entries,
-                                 entries_by_action=entries_by_action)
+    return stream_page('mob_detail.html',
+                       mob_id=mob_id,
+                       mob_name=mob_id.replace('_', ' ').title(),
+                       total_count=total_count,
+                       action_counts={'summon': total_count} if total_count else {},
+                       all_entries=[summon_entry(r) for r in rows],
+                       next_before=next_before)
+
+
+@app.route('/api/mob/<mob_id>/summons')
+def mob_summons_data(mob_id):
+    """One page of a mob's summon history, newest first (see player_summons_data)."""
+    try:
+        before, limit = history_page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        rows, next_before = history_page(summon_db.get_summons_page_by_mob, mob_id, before, limit)
+        return jsonify({'summons': [summon_entry(r) for r in rows], 'next_before': next_before})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/mob_fallback/<filename>')
 def serve_mob_image(filename):
@@ -568,74 +746,58 @@ def serve_mob_image(filename):
         return send_from_directory(mob_dir, filename)
     abort(404)
 
+def build_token_data(tokens):
+    """Map rows from summon_db.get_all_tokens_enriched() to the map's token objects."""
+    token_data = []
+    for token in tokens:
+        token_info = {
+            'token_id': str(token['token_id']),
+            'action_type': token['action_type'],
+            'lat': float(token['gps_write_lat']),
+            'lon': float(token['gps_write_lon']),
+            'written_by': token.get('written_by'),
+            'written_at': token.get('written_at').isoformat() if token.get('written_at') else None,
+            'entity': token.get('entity'),
+            'item': token.get('item'),
+        }
+        
+        # Mob/item metadata comes joined in with the token row
+        if token['action_type'] == 'summon_entity' and token.get('mob_found'):
+            token_info['name'] = token['mob_name']
+            token_info['rarity'] = token['mob_rarity']
+            token_info['mob_type'] = token['mob_type']
+            token_info['image_url'] = token['mob_image']
+        
+        elif token['action_type'] == 'give_item' and token.get('item_found'):
+            token_info['name'] = token['item_name']
+            token_info['rarity'] = token['item_rarity']
+            token_info['image_url'] = token['item_image']
+        
+        token_data.append(token_info)
+    return token_data
+
 @app.route('/tokens')
 def tokens_map():
-    """Display all tokens on an interactive map"""
+    """Display all tokens on an interactive map (clustered server-side)"""
     try:
-        # Get all tokens from database with GPS coordinates
-        all_tokens = summon_db.get_all_tokens(limit=1000)
+        # Statistics and initial center come from the cluster index, not a token list
+        token_clusters.refresh()
+        summary = token_clusters.summary()
+        by_type = summary['by_action_type']
         
-        # Filter tokens with GPS coordinates
-        tokens_with_gps = [
-            t for t in all_tokens 
-            if t.get('gps_write_lat') is not None and t.get('gps_write_lon') is not None
-        ]
-        
-        # Calculate statistics
-        total_tokens = len(tokens_with_gps)
-        summon_count = sum(1 for t in tokens_with_gps if t.get('action_type') == 'summon_entity')
-        give_count = sum(1 for t in tokens_with_gps if t.get('action_type') == 'give_item')
-        time_count = sum(1 for t in tokens_with_gps if t.get('action_type') == 'set_time')
-        
-        # Calculate center point (average of all positions)
-        if total_tokens > 0:
-            center_lat = sum(t['gps_write_lat'] for t in tokens_with_gps) / total_tokens
-            center_lon = sum(t['gps_write_lon'] for t in tokens_with_gps) / total_tokens
+        if summary['center'] is not None:
+            center_lat = summary['center']['lat']
+            center_lon = summary['center']['lon']
         else:
             center_lat = 40.7580  # Default to Fort Collins
             center_lon = -105.3009
         
-        # Prepare token data for JavaScript (get mob/item metadata)
-        token_data = []
-        for token in tokens_with_gps:
-            token_info = {
-                'token_id': str(token['token_id']),
-                'action_type': token['action_type'],
-                'lat': float(token['gps_write_lat']),
-                'lon': float(token['gps_write_lon']),
-                'written_by': token.get('written_by'),
-                'written_at': token.get('written_at').isoformat() if token.get('written_at') else None,
-                'entity': token.get('entity'),
-                'item': token.get('item'),
-            }
-            
-            # Get metadata from mobs or items tables
-            if token['action_type'] == 'summon_entity' and token.get('entity'):
-                mobs = summon_db.get_all_mobs()
-                mob = next((m for m in mobs if m.get('minecraft_id') == token['entity']), None)
-                if mob:
-                    token_info['name'] = mob.get('name', token['entity'])
-                    token_info['rarity'] = mob.get('rarity')
-                    token_info['mob_type'] = mob.get('mob_type')
-                    token_info['image_url'] = mob.get('image_url')
-            
-            elif token['action_type'] == 'give_item' and token.get('item'):
-                items = summon_db.get_all_items()
-                item = next((i for i in items if i.get('minecraft_id') == token['item']), None)
-                if item:
-                    token_info['name'] = item.get('name', token['item'])
-                    token_info['rarity'] = item.get('rarity')
-                    token_info['image_url'] = item.get('image_url')
-            
-            token_data.append(token_info)
-        
-        return render_template_string(
-            TOKENS_MAP_TEMPLATE,
-            tokens_json=json.dumps(token_data),
-            total_tokens=total_tokens,
-            summon_count=summon_count,
-            give_count=give_count,
-            time_count=time_count,
+        return render_template(
+            'tokens_map.html',
+            total_tokens=summary['count'],
+            summon_count=by_type.get('summon_entity', 0),
+            give_count=by_type.get('give_item', 0),
+            time_count=by_type.get('set_time', 0),
             center_lat=center_lat,
             center_lon=center_lon
         )
@@ -643,56 +805,267 @@ def tokens_map():
     except Exception as e:
         return f"Error loading token map: {str(e)}", 500
 
+# Mob/item catalog used to label clustered map points, re-read at most this often
+CATALOG_CACHE_TTL_S = 60
+_catalog_cache = {'loaded_at': None, 'mobs': {}, 'items': {}}
+
+
+def catalog_metadata():
+    """Return ({minecraft_id: mob}, {minecraft_id: item}), cached for CATALOG_CACHE_TTL_S."""
+    loaded_at = _catalog_cache['loaded_at']
+    if loaded_at is None or time.monotonic() - loaded_at > CATALOG_CACHE_TTL_S:
+        mobs = {m['minecraft_id']: m for m in summon_db.get_all_mobs()}
+        items = {i['minecraft_id']: i for i in summon_db.get_all_items()}
+        changed = loaded_at is not None and (mobs, items) != (_catalog_cache['mobs'], _catalog_cache['items'])
+        _catalog_cache.update(mobs=mobs, items=items, loaded_at=time.monotonic())
+        if changed:
+            # Token tiles embed catalog names and images
+            tile_layers['tokens'].labels_changed()
+    return _catalog_cache['mobs'], _catalog_cache['items']
+
+
+def cluster_point(token, mobs, items):
+    """Map a single token from the cluster index to the map's token object."""
+    written_at = token.get('written_at')
+    point = {
+        'type': 'point',
+        'token_id': token['token_id'],
+        'action_type': token['action_type'],
+        'lat': token['lat'],
+        'lon': token['lon'],
+        'written_by': token.get('written_by'),
+        'written_at': written_at.isoformat() if written_at else None,
+        'entity': token.get('entity'),
+        'item': token.get('item'),
+    }
+    if token['action_type'] == 'summon_entity' and token.get('entity') in mobs:
+        mob = mobs[token['entity']]
+        point['name'] = mob.get('name')
+        point['rarity'] = mob.get('rarity')
+        point['mob_type'] = mob.get('mob_type')
+        point['image_url'] = mob.get('image_url')
+    elif token['action_type'] == 'give_item' and token.get('item') in items:
+        item = items[token['item']]
+        point['name'] = item.get('name')
+        point['rarity'] = item.get('rarity')
+        point['image_url'] = item.get('image_url')
+    return point
+
+
+@app.route('/api/tokens/clusters')
+def token_clusters_data():
+    """
+    Clustered tokens for the map viewport.
+    
+    Query: bbox=min_lon,min_lat,max_lon,max_lat and zoom (map zoom level).
+    Returns one feature per occupied grid cell in view - a cluster with its
+    count and centroid, or the token itself when alone - so the payload
+    depends on the viewport, not on how many tokens exist. Responses carry
+    an ETag; an unchanged view answers 304 to If-None-Match.
+    """
+    from flask import request
+    try:
+        bbox = parse_bbox(request.args.get('bbox'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if bbox is None:
+        return jsonify({'error': 'bbox is required'}), 400
+    zoom = request.args.get('zoom', type=int)
+    if zoom is None or zoom < 0 or zoom > 24:
+        return jsonify({'error': 'zoom must be an integer between 0 and 24'}), 400
+    
+    try:
+        token_clusters.refresh()
+        summary = token_clusters.summary()
+        state = f"{token_clusters.version}-{bbox}-{zoom}"
+        etag = hashlib.md5(state.encode('utf-8')).hexdigest()
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+        
+        features = token_clusters.query(bbox, zoom)
+        if any(f['type'] == 'point' for f in features):
+            mobs, items = catalog_metadata()
+            features = [cluster_point(f, mobs, items) if f['type'] == 'point' else f for f in features]
+        
+        response = jsonify({
+            'features': features,
+            'zoom': token_clusters.fit_zoom(bbox, zoom),
+            'total': summary['count'],
+            'counts': summary['by_action_type'],
+        })
+        response.set_etag(etag)
+        return response
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/tokens/summary')
+def token_summary():
+    """Token count, count per action_type and centroid; 304 while unchanged."""
+    from flask import request
+    try:
+        token_clusters.refresh()
+        etag = str(token_clusters.version)
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+        summary = token_clusters.summary()
+        response = jsonify({
+            'total': summary['count'],
+            'counts': summary['by_action_type'],
+            'center': summary['center'],
+        })
+        response.set_etag(etag)
+        return response
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# GeoJSON map tiles, cached on disk until a write touches them
+tile_layers = build_tile_layers(
+    TileCache(),
+    label=lambda token: cluster_point(token, *catalog_metadata())
+)
+
+
+@app.route('/tiles/<layer>/<int:z>/<int:x>/<int:y>')
+def map_tile(layer, z, x, y):
+    """
+    One Web Mercator tile of a map layer (tokens, summons or tracks) as a
+    GeoJSON FeatureCollection. Tiles carry an ETag and must be revalidated;
+    an unchanged tile answers 304 to If-None-Match.
+    """
+    from flask import request
+    tile_layer = tile_layers.get(layer)
+    if tile_layer is None:
+        return jsonify({'error': f'Unknown layer: {layer}'}), 404
+    if z > TILE_MAX_ZOOM or x >= 1 << z or y >= 1 << z:
+        return jsonify({'error': 'Tile out of range'}), 404
+    
+    try:
+        data = tile_layer.tile(z, x, y)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    response = app.response_class(data, mimetype='application/geo+json')
+    response.set_etag(hashlib.md5(data).hexdigest())
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.route('/tiles/heatmap/<source>/<int:z>/<int:x>/<int:y>.png')
+def heatmap_tile(source, z, x, y):
+    """
+    Density heatmap tile (PNG) of summons, gives, token scans or device
+    locations. Tiles carry an ETag and must be revalidated; an unchanged
+    tile answers 304 to If-None-Match.
+    """
+    from flask import request
+    heatmap = heatmap_sources.get(source)
+    if heatmap is None:
+        return jsonify({'error': f'Unknown heatmap: {source}'}), 404
+    if z > TILE_MAX_ZOOM or x >= 1 << z or y >= 1 << z:
+        return jsonify({'error': 'Tile out of range'}), 404
+    
+    try:
+        data = heatmap.tile(z, x, y)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    response = app.response_class(data, mimetype='image/png')
+    response.set_etag(hashlib.md5(data).hexdigest())
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+# Tokens changed this long before the last poll's cursor are sent again,
+# so rows committed late by slower writers are not skipped
+TOKENS_DELTA_OVERLAP = timedelta(seconds=10)
+
+# Most tokens per /api/tokens-data response
+TOKENS_DATA_LIMIT = 1000
+
+
+def tokens_version_etag(count, last_updated):
+    """ETag for the current set of GPS tokens (see summon_db.get_tokens_version)."""
+    stamp = last_updated.timestamp() if last_updated else 0
+    return f"{count}-{stamp:.6f}"
+
+
 @app.route('/api/tokens-data')
 def tokens_data():
-    """API endpoint for fetching token data (for auto-refresh)"""
+    """
+    API endpoint for fetching token data (for auto-refresh).
+    
+    Without parameters returns the newest tokens. With ?since=<cursor> (the
+    "cursor" of a previous response) returns only tokens created or
+    rewritten since then, with "full": false. Responses carry an ETag; a
+    poll with a matching If-None-Match gets 304 Not Modified without any
+    token rows being read.
+    
+    A delta holds at most TOKENS_DATA_LIMIT changes, oldest first. When more
+    are pending the response has "more": true and a cursor pointing just
+    after its last token; poll again with it until "more" is false.
+    """
+    from flask import request
     try:
-        # Get all tokens with GPS coordinates
-        all_tokens = summon_db.get_all_tokens(limit=1000)
-        tokens_with_gps = [
-            t for t in all_tokens 
-            if t.get('gps_write_lat') is not None and t.get('gps_write_lon') is not None
-        ]
+        since = request.args.get('since')
+        after_token_id = None
+        if since:
+            try:
+                since, after_token_id = parse_tokens_cursor(since)
+            except ValueError:
+                return jsonify({'error': 'since must be a cursor from a previous response'}), 400
         
-        # Prepare token data with metadata
-        token_data = []
-        for token in tokens_with_gps:
-            token_info = {
-                'token_id': str(token['token_id']),
-                'action_type': token['action_type'],
-                'lat': float(token['gps_write_lat']),
-                'lon': float(token['gps_write_lon']),
-                'written_by': token.get('written_by'),
-                'written_at': token.get('written_at').isoformat() if token.get('written_at') else None,
-                'entity': token.get('entity'),
-                'item': token.get('item'),
-            }
-            
-            # Get metadata
-            if token['action_type'] == 'summon_entity' and token.get('entity'):
-                mobs = summon_db.get_all_mobs()
-                mob = next((m for m in mobs if m.get('minecraft_id') == token['entity']), None)
-                if mob:
-                    token_info['name'] = mob.get('name', token['entity'])
-                    token_info['rarity'] = mob.get('rarity')
-                    token_info['mob_type'] = mob.get('mob_type')
-                    token_info['image_url'] = mob.get('image_url')
-            
-            elif token['action_type'] == 'give_item' and token.get('item'):
-                items = summon_db.get_all_items()
-                item = next((i for i in items if i.get('minecraft_id') == token['item']), None)
-                if item:
-                    token_info['name'] = item.get('name', token['item'])
-                    token_info['rarity'] = item.get('rarity')
-                    token_info['image_url'] = item.get('image_url')
-            
-            token_data.append(token_info)
+        count, last_updated = summon_db.get_tokens_version()
+        etag = tokens_version_etag(count, last_updated)
+        # A page cursor continues a catch-up: the version alone cannot tell it is done
+        if after_token_id is None and request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+        
+        # Get tokens with GPS coordinates and their metadata
+        if after_token_id is not None:
+            rows = summon_db.get_all_tokens_enriched(limit=TOKENS_DATA_LIMIT, updated_after=since,
+                                                     after_token_id=after_token_id)
+        elif since:
+            rows = summon_db.get_all_tokens_enriched(limit=TOKENS_DATA_LIMIT,
+                                                     updated_after=since - TOKENS_DELTA_OVERLAP)
+        else:
+            rows = summon_db.get_all_tokens_enriched(limit=TOKENS_DATA_LIMIT)
+        token_data = build_token_data(rows)
         
-        return jsonify({'tokens': token_data})
+        more = bool(since) and len(rows) >= TOKENS_DATA_LIMIT
+        if more:
+            cursor = f"{rows[-1]['updated_at'].isoformat()},{rows[-1]['token_id']}"
+        else:
+            cursor = last_updated.isoformat() if last_updated else None
+        response = jsonify({
+            'tokens': token_data,
+            'full': not since,
+            'more': more,
+            'total': count,
+            'cursor': cursor,
+        })
+        if not more:
+            response.set_etag(etag)
+        return response
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+
+def parse_tokens_cursor(cursor):
+    """
+    (updated_at, token_id) from a /api/tokens-data cursor: an ISO timestamp,
+    or "<timestamp>,<token_id>" for the next page of a delta (token_id None
+    otherwise). Raises ValueError if malformed.
+    """
+    stamp, _, token_id = cursor.partition(',')
+    return datetime.fromisoformat(stamp), (str(uuid.UUID(token_id)) if token_id else None)
+
 if __name__ == '__main__':
     context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
     context.load_cert_chain('web/server.crt', 'web/server.key')